@@ -0,0 +1,664 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Event loop engine for parallel operations on small objects.
+
+When the small_object_engine boto config option is set to "async", parallel
+(-m) cp, rm and stat commands run their tasks as coroutines on one asyncio
+event loop instead of in processes and threads. The requests of all tasks
+share a bounded pool of keep-alive connections per host, so thousands of
+tasks can be in flight without a thread, and an httplib2 connection, each.
+
+Requests are built by the same apitools methods the GcsJsonApi uses, carry
+the same credentials and headers, and are retried with the same backoff. Only
+JSON API calls on small objects are run this way; tasks the engine can't
+perform are run by the command's usual function, in a pool of threads.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import asyncio
+from concurrent import futures
+import ssl
+import threading
+import time
+import zlib
+
+import six
+from six.moves import http_client
+from six.moves import urllib
+
+from apitools.base.py import exceptions as apitools_exceptions
+from apitools.base.py import http_wrapper
+from apitools.base.py import transfer as apitools_transfer
+from apitools.base.py.util import CalculateWaitForRetry
+from boto import config
+import httplib2
+
+from gslib import context_config
+from gslib.cloud_api import Preconditions
+from gslib.cs_api_map import ApiSelector
+from gslib.exception import CommandException
+from gslib.gcs_json_api import GcsJsonApi
+from gslib.gcs_json_api import TRANSLATABLE_APITOOLS_EXCEPTIONS
+from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
+from gslib.utils.boto_util import GetNewHttp
+from gslib.utils.cloud_api_helper import ValidateDstObjectMetadata
+from gslib.utils.constants import SSL_TIMEOUT_SEC
+from gslib.utils.retry_util import LogRetryableError
+from gslib.utils.translation_helper import CreateNotFoundExceptionForObjectWrite
+from gslib.utils.translation_helper import DEFAULT_CONTENT_TYPE
+from gslib.utils.unit_util import HumanReadableToBytes
+
+if six.PY3:
+  long = int
+
+# Engines accepted by the small_object_engine option.
+SMALL_OBJECT_ENGINES = ('threads', 'async')
+DEFAULT_SMALL_OBJECT_ENGINE = 'threads'
+# Objects up to this size are copied by the async engine.
+DEFAULT_SMALL_OBJECT_THRESHOLD = '64K'
+# Connections the async engine keeps open to each host.
+DEFAULT_SMALL_OBJECT_MAX_CONNECTIONS = 64
+# Tasks the async engine runs at once.
+DEFAULT_SMALL_OBJECT_MAX_IN_FLIGHT = 1000
+
+# Returned by a command's async function to have a task performed by its
+# usual function, in a thread, instead.
+RUN_IN_THREAD = object()
+
+# Seconds credentials' headers are used before the credentials are asked for
+# them again, which refreshes access tokens that are about to expire.
+_AUTH_HEADERS_TTL = 60
+
+# Errors a request is retried after, as apitools' http_wrapper retries them.
+# OSError covers socket and SSL errors.
+_RETRYABLE_EXCEPTIONS = (http_client.HTTPException, OSError,
+                         asyncio.TimeoutError,
+                         apitools_exceptions.BadStatusCodeError,
+                         apitools_exceptions.RetryAfterError)
+
+# Errors that show a reused connection was closed by the server while idle.
+_STALE_CONNECTION_EXCEPTIONS = (ConnectionError, http_client.BadStatusLine,
+                                http_client.IncompleteRead)
+
+
+def GetSmallObjectEngine():
+  """Returns the engine selected by the small_object_engine option."""
+  engine = config.get('GSUtil', 'small_object_engine',
+                      DEFAULT_SMALL_OBJECT_ENGINE).lower()
+  if engine not in SMALL_OBJECT_ENGINES:
+    raise CommandException(
+        'Invalid small_object_engine "%s"; must be one of %s.' %
+        (engine, ', '.join(SMALL_OBJECT_ENGINES)))
+  return engine
+
+
+def GetSmallObjectThreshold():
+  """Returns the size, in bytes, of the largest object the engine copies."""
+  return HumanReadableToBytes(
+      config.get('GSUtil', 'small_object_threshold',
+                 DEFAULT_SMALL_OBJECT_THRESHOLD))
+
+
+def _DecompressContent(headers, content):
+  """Decompresses a gzip or deflate encoded response, as httplib2 does."""
+  encoding = headers.get('content-encoding')
+  if not content or encoding not in ('gzip', 'deflate'):
+    return content
+  try:
+    if encoding == 'gzip':
+      content = zlib.decompress(content, 16 + zlib.MAX_WBITS)
+    else:
+      try:
+        content = zlib.decompress(content)
+      except zlib.error:
+        # Some servers send raw deflate streams, without the zlib header.
+        content = zlib.decompress(content, -zlib.MAX_WBITS)
+  except (IOError, zlib.error):
+    raise httplib2.FailedToDecompressContent(
+        'Content purported to be compressed with %s but failed to '
+        'decompress.' % encoding, headers, content)
+  headers['content-length'] = str(len(content))
+  headers['-content-encoding'] = headers.pop('content-encoding')
+  return content
+
+
+class _HttpConnectionPool(object):
+  """Keep-alive HTTP/1.1 connections to one host, shared by coroutines.
+
+  At most max_connections requests are sent at once; other requests wait for
+  a connection to become free.
+  """
+
+  def __init__(self, host, port, ssl_context, max_connections, timeout):
+    self._host = host
+    self._port = port
+    self._ssl_context = ssl_context
+    self._timeout = timeout
+    self._semaphore = asyncio.Semaphore(max_connections)
+    # (reader, writer) tuples of open connections no request is using.
+    self._idle = []
+
+  async def Request(self, method, url, headers, body):
+    """Sends a request and returns its apitools http_wrapper.Response."""
+    parsed_url = urllib.parse.urlsplit(url)
+    path = parsed_url.path or '/'
+    if parsed_url.query:
+      path += '?' + parsed_url.query
+    request_bytes = self._FormatRequest(method, parsed_url.netloc, path,
+                                        headers, body)
+    async with self._semaphore:
+      while self._idle:
+        reader, writer = self._idle.pop()
+        if reader.at_eof():
+          writer.close()
+          continue
+        try:
+          return await self._SendAndReceive(reader, writer, method, url,
+                                            request_bytes)
+        except _STALE_CONNECTION_EXCEPTIONS:
+          # The server may have closed the connection while it was idle, so
+          # the request is sent again on a new one.
+          break
+      reader, writer = await asyncio.wait_for(
+          asyncio.open_connection(self._host,
+                                  self._port,
+                                  ssl=self._ssl_context),
+          self._timeout)
+      return await self._SendAndReceive(reader, writer, method, url,
+                                        request_bytes)
+
+  def Close(self):
+    while self._idle:
+      _, writer = self._idle.pop()
+      writer.close()
+
+  def _FormatRequest(self, method, netloc, path, headers, body):
+    if body is None:
+      body = b''
+    elif isinstance(body, six.text_type):
+      body = body.encode('utf-8')
+    header_names = set(name.lower() for name in headers)
+    lines = ['%s %s HTTP/1.1' % (method, path)]
+    if 'host' not in header_names:
+      lines.append('Host: %s' % netloc)
+    if 'content-length' not in header_names and (body or
+                                                  method in ('POST', 'PUT')):
+      lines.append('Content-Length: %d' % len(body))
+    for name, value in six.iteritems(headers):
+      lines.append('%s: %s' % (name, value))
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('iso-8859-1') + body
+
+  async def _SendAndReceive(self, reader, writer, method, url, request_bytes):
+    try:
+      writer.write(request_bytes)
+      status, headers, content, keep_alive = await asyncio.wait_for(
+          self._ReadResponse(reader, writer, method), self._timeout)
+    except:  # pylint: disable=bare-except
+      writer.close()
+      raise
+    if keep_alive:
+      self._idle.append((reader, writer))
+    else:
+      writer.close()
+    content = _DecompressContent(headers, content)
+    headers['status'] = str(status)
+    return http_wrapper.Response(headers, content, url)
+
+  async def _ReadResponse(self, reader, writer, method):
+    """Returns the status, headers, body and keep-alive flag of a response."""
+    await writer.drain()
+    try:
+      while True:
+        version, status, headers = await self._ReadStatusAndHeaders(reader)
+        # Informational responses precede the actual response.
+        if not 100 <= status < 200:
+          break
+      connection = headers.get('connection', '').lower()
+      if version == 'HTTP/1.0':
+        keep_alive = 'keep-alive' in connection
+      else:
+        keep_alive = 'close' not in connection
+      if method == 'HEAD' or status in (http_client.NO_CONTENT,
+                                        http_client.NOT_MODIFIED):
+        content = b''
+      elif 'chunked' in headers.get('transfer-encoding', '').lower():
+        content = await self._ReadChunkedBody(reader)
+      elif 'content-length' in headers:
+        content = await reader.readexactly(int(headers['content-length']))
+      else:
+        # The body ends when the server closes the connection.
+        content = await reader.read()
+        keep_alive = False
+    except asyncio.IncompleteReadError as e:
+      raise http_client.IncompleteRead(e.partial)
+    return status, headers, content, keep_alive
+
+  async def _ReadStatusAndHeaders(self, reader):
+    status_line = await reader.readline()
+    if not status_line:
+      raise http_client.RemoteDisconnected(
+          'Remote end closed connection without response')
+    parts = status_line.decode('iso-8859-1').split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+      raise http_client.BadStatusLine(status_line)
+    try:
+      status = int(parts[1])
+    except ValueError:
+      raise http_client.BadStatusLine(status_line)
+    headers = {}
+    while True:
+      line = await reader.readline()
+      if line in (b'\r\n', b'\n', b''):
+        break
+      name, _, value = line.decode('iso-8859-1').partition(':')
+      name = name.strip().lower()
+      value = value.strip()
+      # Repeated headers are joined, as httplib2 joins them.
+      headers[name] = headers[name] + ', ' + value if name in headers else value
+    return parts[0], status, headers
+
+  async def _ReadChunkedBody(self, reader):
+    chunks = []
+    while True:
+      size_line = await reader.readline()
+      try:
+        size = int(size_line.split(b';', 1)[0].strip(), 16)
+      except ValueError:
+        raise http_client.IncompleteRead(b''.join(chunks))
+      if not size:
+        break
+      chunks.append(await reader.readexactly(size))
+      await reader.readexactly(2)
+    # Skips trailers, up to the blank line that ends the body.
+    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+      pass
+    return b''.join(chunks)
+
+
+class _AuthHeaderRecorder(object):
+  """Stands in for an httplib2.Http, to get the headers credentials add.
+
+  Credentials authorize the recorder like any other Http object. Requesting
+  the recorder's URL through the authorized object records the headers the
+  credentials add, without sending anything; other requests, such as those
+  that refresh access tokens, are sent with a real Http object.
+  """
+
+  def __init__(self, credentials, url):
+    self._url = url
+    self._lock = threading.Lock()
+    self._headers = {}
+    self._status = http_client.OK
+    self._http = None
+    self._authorized = credentials.authorize(self) if credentials else self
+
+  def request(self, uri, method='GET', body=None, headers=None, *args,
+              **kwargs):
+    if uri != self._url:
+      if self._http is None:
+        self._http = GetNewHttp()
+      return self._http.request(uri, method, body, headers, *args, **kwargs)
+    self._headers = dict(headers or {})
+    status, self._status = self._status, http_client.OK
+    return httplib2.Response({'status': status}), b''
+
+  def GetHeaders(self, refresh=False):
+    """Returns the headers credentials add to requests.
+
+    Args:
+      refresh: If True, the recorded request is answered with a 401, which
+          makes the credentials refresh their access token.
+
+    Returns:
+      Dict of headers.
+    """
+    with self._lock:
+      if refresh:
+        self._status = http_client.UNAUTHORIZED
+      self._authorized.request(self._url, 'GET', headers={})
+      return self._headers
+
+
+class AsyncEngine(object):
+  """Sends JSON API requests for many coroutines over pooled connections.
+
+  Coroutines are run with Run, which may be called only once. The engine's
+  methods mirror those of the GcsJsonApi, and raise the same exceptions.
+  """
+
+  def __init__(self, json_api, api_kwargs, thread_count, max_connections,
+               max_in_flight):
+    """Creates an engine.
+
+    Args:
+      json_api: GcsJsonApi whose settings and credentials requests use.
+      api_kwargs: Dict of the arguments json_api was created with, which are
+          used to create an API instance for each thread.
+      thread_count: Number of threads for tasks the engine can't perform.
+      max_connections: Number of connections to keep open to each host.
+      max_in_flight: Number of tasks to run at once.
+    """
+    self.json_api = json_api
+    self.logger = json_api.logger
+    self.status_queue = json_api.status_queue
+    self.thread_count = thread_count
+    self.max_in_flight = max_in_flight
+    self._api_kwargs = api_kwargs
+    self._max_connections = max_connections
+    self._executor = futures.ThreadPoolExecutor(max_workers=thread_count)
+    self._thread_local = threading.local()
+    self._pools = {}
+    self._ssl_context = None
+    if json_api.http_base == 'https://':
+      self._ssl_context = ssl.create_default_context(
+          cafile=json_api.certs_file)
+      if not config.getbool('Boto', 'https_validate_certificates', True):
+        self._ssl_context.check_hostname = False
+        self._ssl_context.verify_mode = ssl.CERT_NONE
+    self._auth_recorder = _AuthHeaderRecorder(json_api.credentials,
+                                              json_api.url_base)
+    self._auth_lock = None
+    self._auth_headers = None
+    self._auth_headers_time = 0
+
+  def Run(self, coroutine):
+    """Runs coroutine on a new event loop and returns its result."""
+    try:
+      return asyncio.run(self._RunAndClose(coroutine))
+    finally:
+      self._executor.shutdown(wait=True)
+
+  async def _RunAndClose(self, coroutine):
+    self._auth_lock = asyncio.Lock()
+    try:
+      return await coroutine
+    finally:
+      for pool in six.itervalues(self._pools):
+        pool.Close()
+
+  async def RunInThread(self, func, *args):
+    """Calls func(*args) in one of the engine's threads and returns its result.
+    """
+    return await asyncio.get_event_loop().run_in_executor(
+        self._executor, func, *args)
+
+  def GetThreadApi(self):
+    """Returns the calling thread's own GcsJsonApi, for blocking calls."""
+    api = getattr(self._thread_local, 'api', None)
+    if api is None:
+      api = GcsJsonApi(**self._api_kwargs)
+      self._thread_local.api = api
+    return api
+
+  async def GetObjectMetadata(self,
+                              bucket_name,
+                              object_name,
+                              generation=None,
+                              fields=None):
+    """See CloudApi class for function doc strings."""
+    # pylint: disable=protected-access
+    apitools_request = self.json_api._CreateApitoolsObjectMetadataGetRequest(
+        bucket_name, object_name, generation=generation, fields=fields)
+    global_params = self.json_api._GetApitoolsObjectMetadataGlobalParams(
+        fields=fields)
+    object_metadata = await self._Call('Get',
+                                       apitools_request,
+                                       global_params=global_params,
+                                       bucket_name=bucket_name,
+                                       object_name=object_name,
+                                       generation=generation)
+    if not self.json_api._ObjectCSEKEncryptedAndNeedHashes(object_metadata,
+                                                           fields=fields):
+      return object_metadata
+    # pylint: enable=protected-access
+    # Hashes of CSEK-encrypted objects need the object's decryption key, which
+    # the GcsJsonApi finds.
+    return await self.RunInThread(
+        lambda: self.GetThreadApi().GetObjectMetadata(
+            bucket_name, object_name, generation=generation, fields=fields))
+
+  async def GetObjectMedia(self, bucket_name, object_name, generation=None):
+    """Returns the contents of an unencrypted object, as bytes."""
+    if generation:
+      generation = long(generation)
+    apitools_request = apitools_messages.StorageObjectsGetRequest(
+        bucket=bucket_name,
+        object=object_name,
+        generation=generation,
+        userProject=self.json_api.user_project)
+    apitools_download = apitools_transfer.Download.FromStream(
+        six.BytesIO(), auto_transfer=False)
+    return await self._Call('Get',
+                            apitools_request,
+                            download=apitools_download,
+                            bucket_name=bucket_name,
+                            object_name=object_name,
+                            generation=generation)
+
+  async def UploadObject(self,
+                         data,
+                         object_metadata,
+                         preconditions=None,
+                         fields=None):
+    """Uploads bytes in a single request and returns the object's metadata."""
+    ValidateDstObjectMetadata(object_metadata)
+    if not preconditions:
+      preconditions = Preconditions()
+    apitools_request = apitools_messages.StorageObjectsInsertRequest(
+        bucket=object_metadata.bucket,
+        object=object_metadata,
+        ifGenerationMatch=preconditions.gen_match,
+        ifMetagenerationMatch=preconditions.meta_gen_match,
+        userProject=self.json_api.user_project)
+    global_params = apitools_messages.StandardQueryParameters()
+    if fields:
+      global_params.fields = ','.join(set(fields))
+    apitools_upload = apitools_transfer.Upload(
+        six.BytesIO(data),
+        object_metadata.contentType or DEFAULT_CONTENT_TYPE,
+        total_size=len(data),
+        auto_transfer=False)
+    apitools_upload.strategy = apitools_transfer.SIMPLE_UPLOAD
+    return await self._Call(
+        'Insert',
+        apitools_request,
+        global_params=global_params,
+        upload=apitools_upload,
+        bucket_name=object_metadata.bucket,
+        object_name=object_metadata.name,
+        not_found_exception=CreateNotFoundExceptionForObjectWrite(
+            'gs', object_metadata.bucket))
+
+  async def DeleteObject(self,
+                         bucket_name,
+                         object_name,
+                         preconditions=None,
+                         generation=None):
+    """See CloudApi class for function doc strings."""
+    if not preconditions:
+      preconditions = Preconditions()
+    if generation:
+      generation = long(generation)
+    apitools_request = apitools_messages.StorageObjectsDeleteRequest(
+        bucket=bucket_name,
+        object=object_name,
+        generation=generation,
+        ifGenerationMatch=preconditions.gen_match,
+        ifMetagenerationMatch=preconditions.meta_gen_match,
+        userProject=self.json_api.user_project)
+    return await self._Call('Delete',
+                            apitools_request,
+                            bucket_name=bucket_name,
+                            object_name=object_name,
+                            generation=generation)
+
+  async def _Call(self,
+                  method_name,
+                  apitools_request,
+                  global_params=None,
+                  upload=None,
+                  download=None,
+                  bucket_name=None,
+                  object_name=None,
+                  generation=None,
+                  not_found_exception=None):
+    """Calls an objects method of the JSON API, like apitools' _RunMethod."""
+    objects = self.json_api.api_client.objects
+    method_config = objects.GetMethodConfig(method_name)
+    try:
+      http_request = objects.PrepareHttpRequest(
+          method_config,
+          apitools_request,
+          global_params=global_params,
+          upload=upload,
+          upload_config=(objects.GetUploadConfig(method_name)
+                         if upload else None),
+          download=download)
+      if download:
+        # Small objects are downloaded whole, in one request.
+        http_request.headers.pop('Range', None)
+      http_response = await self._MakeRequest(http_request)
+      if download:
+        if http_response.status_code not in (http_client.OK,
+                                             http_client.PARTIAL_CONTENT):
+          raise apitools_exceptions.HttpError.FromResponse(http_response)
+        return http_response.content
+      return objects.ProcessHttpResponse(method_config, http_response,
+                                         apitools_request)
+    except TRANSLATABLE_APITOOLS_EXCEPTIONS as e:
+      # pylint: disable=protected-access
+      self.json_api._TranslateExceptionAndRaise(
+          e,
+          bucket_name=bucket_name,
+          object_name=object_name,
+          generation=generation,
+          not_found_exception=not_found_exception)
+
+  async def _MakeRequest(self, http_request):
+    """Sends an apitools http_wrapper.Request, retrying like MakeRequest."""
+    retry = 0
+    first_request_time = time.time()
+    refreshed = False
+    auth_headers = await self._GetAuthHeaders()
+    while True:
+      headers = dict(http_request.headers)
+      headers.update(auth_headers)
+      try:
+        http_response = await self._GetPool(http_request.url).Request(
+            http_request.http_method, http_request.url, headers,
+            http_request.body)
+        if (http_response.status_code == http_client.UNAUTHORIZED and
+            not refreshed):
+          # Like authorized httplib2 objects, refresh the access token and
+          # try once more.
+          refreshed = True
+          auth_headers = await self._GetAuthHeaders(stale_headers=auth_headers)
+          continue
+        http_wrapper.CheckResponse(http_response)
+        return http_response
+      except _RETRYABLE_EXCEPTIONS as e:
+        retry += 1
+        if retry > self.json_api.num_retries:
+          raise
+        retry_args = http_wrapper.ExceptionRetryArgs(
+            None, http_request, e, retry, self.json_api.max_retry_wait,
+            time.time() - first_request_time)
+        LogRetryableError(retry_args, status_queue=self.status_queue)
+        self.logger.debug('Retrying request to url %s after exception %s',
+                          http_request.url, e)
+        await asyncio.sleep(
+            getattr(e, 'retry_after', None) or
+            CalculateWaitForRetry(retry, max_wait=self.json_api.max_retry_wait))
+
+  async def _GetAuthHeaders(self, stale_headers=None):
+    """Returns the credentials' headers, refreshing stale ones."""
+    async with self._auth_lock:
+      refresh = (stale_headers is not None and
+                 self._auth_headers == stale_headers)
+      if (refresh or self._auth_headers is None or
+          time.time() - self._auth_headers_time >= _AUTH_HEADERS_TTL):
+        self._auth_headers = await self.RunInThread(
+            self._auth_recorder.GetHeaders, refresh)
+        self._auth_headers_time = time.time()
+      return self._auth_headers
+
+  def _GetPool(self, url):
+    parsed_url = urllib.parse.urlsplit(url)
+    pool = self._pools.get(parsed_url.netloc)
+    if pool is None:
+      https = parsed_url.scheme == 'https'
+      pool = _HttpConnectionPool(parsed_url.hostname,
+                                 parsed_url.port or (443 if https else 80),
+                                 self._ssl_context if https else None,
+                                 self._max_connections, SSL_TIMEOUT_SEC)
+      self._pools[parsed_url.netloc] = pool
+    return pool
+
+
+def _ProxyAppliesTo(http, host):
+  proxy_info = http.proxy_info
+  if callable(proxy_info):
+    proxy_info = proxy_info('https')
+  return bool(proxy_info and proxy_info.isgood() and
+              proxy_info.applies_to(host))
+
+
+def CreateAsyncEngine(command_obj, status_queue, thread_count):
+  """Returns an AsyncEngine for a command, or None if it can't use one.
+
+  Args:
+    command_obj: gslib.command.Command object whose tasks the engine runs.
+    status_queue: Queue for relaying status to UI.
+    thread_count: Number of threads for tasks the engine can't perform.
+
+  Returns:
+    An AsyncEngine, if small_object_engine is "async" and the command's
+    requests can be sent by the engine; otherwise None.
+  """
+  if GetSmallObjectEngine() != 'async':
+    return None
+  logger = command_obj.logger
+  if command_obj.gsutil_api.GetApiSelector('gs') != ApiSelector.JSON:
+    logger.debug('Not using the async engine, which needs the JSON API.')
+    return None
+  global_context_config = context_config.get_context_config()
+  if global_context_config and global_context_config.use_client_certificate:
+    logger.debug('Not using the async engine, which doesn\'t support client '
+                 'certificates.')
+    return None
+  api_kwargs = {
+      'bucket_storage_uri_class': command_obj.bucket_storage_uri_class,
+      'logger': logger,
+      'status_queue': status_queue,
+      'debug': command_obj.debug,
+      'http_headers': command_obj.non_metadata_headers,
+      'trace_token': command_obj.trace_token,
+      'perf_trace_token': command_obj.perf_trace_token,
+      'user_project': command_obj.user_project,
+  }
+  json_api = GcsJsonApi(**api_kwargs)
+  if _ProxyAppliesTo(json_api.http, json_api.host_base):
+    logger.debug('Not using the async engine, which doesn\'t support proxies.')
+    return None
+  return AsyncEngine(
+      json_api, api_kwargs, thread_count,
+      config.getint('GSUtil', 'small_object_max_connections',
+                    DEFAULT_SMALL_OBJECT_MAX_CONNECTIONS),
+      config.getint('GSUtil', 'small_object_max_in_flight',
+                    DEFAULT_SMALL_OBJECT_MAX_IN_FLIGHT))
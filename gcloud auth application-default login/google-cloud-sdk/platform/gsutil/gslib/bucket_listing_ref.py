@@ -36,8 +36,12 @@ class BucketListingRef(object):
   fields to reduce the number of server requests.
 
   For filesystem URLs, root_object is not populated.
+
+  Listings can hold many references at once, so these classes use slots.
   """
 
+  __slots__ = ('_url_string', 'storage_url', 'root_object')
+
   class _BucketListingRefType(object):
     """Enum class for describing BucketListingRefs."""
     BUCKET = 'bucket'  # Cloud bucket
@@ -68,6 +72,9 @@ class BucketListingRef(object):
 class BucketListingBucket(BucketListingRef):
   """BucketListingRef subclass for buckets."""
 
+  __slots__ = ()
+  _ref_type = BucketListingRef._BucketListingRefType.BUCKET
+
   def __init__(self, storage_url, root_object=None):
     """Creates a BucketListingRef of type bucket.
 
@@ -76,7 +83,6 @@ class BucketListingBucket(BucketListingRef):
       root_object: Underlying object metadata, if available.
     """
     super(BucketListingBucket, self).__init__()
-    self._ref_type = self._BucketListingRefType.BUCKET
     self._url_string = storage_url.url_string
     self.storage_url = storage_url
     self.root_object = root_object
@@ -85,6 +91,9 @@ class BucketListingBucket(BucketListingRef):
 class BucketListingPrefix(BucketListingRef):
   """BucketListingRef subclass for prefixes."""
 
+  __slots__ = ()
+  _ref_type = BucketListingRef._BucketListingRefType.PREFIX
+
   def __init__(self, storage_url, root_object=None):
     """Creates a BucketListingRef of type prefix.
 
@@ -93,7 +102,6 @@ class BucketListingPrefix(BucketListingRef):
       root_object: Underlying object metadata, if available.
     """
     super(BucketListingPrefix, self).__init__()
-    self._ref_type = self._BucketListingRefType.PREFIX
     self._url_string = storage_url.url_string
     self.storage_url = storage_url
     self.root_object = root_object
@@ -102,15 +110,20 @@ class BucketListingPrefix(BucketListingRef):
 class BucketListingObject(BucketListingRef):
   """BucketListingRef subclass for objects."""
 
-  def __init__(self, storage_url, root_object=None):
+  __slots__ = ('file_stat',)
+  _ref_type = BucketListingRef._BucketListingRefType.OBJECT
+
+  def __init__(self, storage_url, root_object=None, file_stat=None):
     """Creates a BucketListingRef of type object.
 
     Args:
       storage_url: StorageUrl containing an object.
       root_object: Underlying object metadata, if available.
+      file_stat: os.stat_result of the file, if storage_url is a file URL and
+                 it was stat'ed during listing.
     """
     super(BucketListingObject, self).__init__()
-    self._ref_type = self._BucketListingRefType.OBJECT
     self._url_string = storage_url.url_string
     self.storage_url = storage_url
     self.root_object = root_object
+    self.file_stat = file_stat
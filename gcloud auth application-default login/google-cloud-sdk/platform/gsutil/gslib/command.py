@@ -28,6 +28,7 @@ from __future__ import unicode_literals
 
 import codecs
 from collections import namedtuple
+from concurrent import futures
 import copy
 import getopt
 import json
@@ -48,6 +49,11 @@ from gslib.cloud_api import ArgumentException
 from gslib.cloud_api import ServiceException
 from gslib.cloud_api_delegator import CloudApiDelegator
 from gslib.cs_api_map import ApiSelector
+from gslib.concurrency_autotuner import AutotunerGroup
+from gslib.concurrency_autotuner import ConcurrencyAutotuner
+from gslib.concurrency_autotuner import CreateAutotunedLimiter
+from gslib.concurrency_autotuner import DEFAULT_AUTOTUNE_MAX_THREAD_MULTIPLIER
+from gslib.concurrency_autotuner import SetThreadConcurrencyLimiter
 from gslib.cs_api_map import GsutilApiMapFactory
 from gslib.exception import CommandException
 from gslib.help_provider import HelpProvider
@@ -261,6 +267,7 @@ global need_pool_or_done_cond, caller_id_finished_count, new_pool_needed
 global current_max_recursive_level, shared_vars_map, shared_vars_list_map
 global class_map, worker_checking_level_lock, failure_count, thread_stats
 global glob_status_queue, ui_controller, concurrent_compressed_upload_lock
+global thread_pool_autotuners
 
 
 def InitializeMultiprocessingVariables():
@@ -334,7 +341,7 @@ def InitializeMultiprocessingVariables():
   global need_pool_or_done_cond, caller_id_finished_count, new_pool_needed
   global current_max_recursive_level, shared_vars_map, shared_vars_list_map
   global class_map, worker_checking_level_lock, failure_count, glob_status_queue
-  global concurrent_compressed_upload_lock
+  global concurrent_compressed_upload_lock, thread_pool_autotuners
 
   manager = multiprocessing_context.Manager()
 
@@ -345,6 +352,10 @@ def InitializeMultiprocessingVariables():
   # that's appropriate for the given recursive_apply_level.
   task_queues = []
 
+  # Autotuners of the thread pools created in this process, which run while
+  # a top-level Apply call is in progress.
+  thread_pool_autotuners = AutotunerGroup()
+
   # Used to assign a globally unique caller ID to each Apply call.
   caller_id_lock = manager.Lock()
   caller_id_counter = ProcessAndThreadSafeInt(True)
@@ -439,7 +450,7 @@ def InitializeThreadingVariables():
   global need_pool_or_done_cond, call_completed_map, class_map, thread_stats
   global task_queues, caller_id_lock, caller_id_counter, glob_status_queue
   global worker_checking_level_lock, current_max_recursive_level
-  global concurrent_compressed_upload_lock
+  global concurrent_compressed_upload_lock, thread_pool_autotuners
   caller_id_counter = ProcessAndThreadSafeInt(False)
   caller_id_finished_count = AtomicDict()
   caller_id_lock = threading.Lock()
@@ -454,6 +465,7 @@ def InitializeThreadingVariables():
   shared_vars_map = AtomicDict()
   thread_stats = AtomicDict()
   task_queues = []
+  thread_pool_autotuners = AutotunerGroup()
   total_tasks = AtomicDict()
   worker_checking_level_lock = threading.Lock()
   concurrent_compressed_upload_lock = threading.BoundedSemaphore(
@@ -1343,6 +1355,10 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
       (process_count, thread_count): The number of processes and threads to use,
                                      respectively.
     """
+    # Command modules are loaded lazily, and the config command's module
+    # imports this one, so it's imported here rather than at the top.
+    import gslib.commands.config  # pylint: disable=g-import-not-at-top
+
     # Set OS process and python thread count as a function of options
     # and config.
     if self.parallel_operations or parallel_operations_override:
@@ -1387,6 +1403,26 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
     self.logger.debug('thread count: %d', thread_count)
     return (process_count, thread_count)
 
+  def _GetAutotuneMaxThreadCount(self, thread_count):
+    """Determines how many threads per process autotuning may grow to.
+
+    Args:
+      thread_count: The number of threads per process to start with.
+
+    Returns:
+      The maximum number of active threads per process, or None if thread
+      count autotuning is disabled.
+    """
+    if not boto.config.getbool('GSUtil', 'parallel_thread_autotune', False):
+      return None
+    max_thread_count = boto.config.getint(
+        'GSUtil', 'parallel_thread_autotune_max_count',
+        thread_count * DEFAULT_AUTOTUNE_MAX_THREAD_MULTIPLIER)
+    if max_thread_count < 1:
+      raise CommandException(
+          'Invalid parallel_thread_autotune_max_count "%d".' % max_thread_count)
+    return max(thread_count, max_thread_count)
+
   def _SetUpPerCallerState(self):
     """Set up the state for a caller id, corresponding to one Apply call."""
     # pylint: disable=global-variable-undefined,global-variable-not-assigned
@@ -1424,7 +1460,17 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
     global_return_values_map[caller_id] = []
     return caller_id
 
-  def _CreateNewConsumerPool(self, num_processes, num_threads, status_queue):
+  def _CreateConcurrencyLimiter(self, thread_count, autotune_max_thread_count):
+    """Returns an autotuned ConcurrencyLimiter, or None if not autotuning."""
+    if not autotune_max_thread_count:
+      return None
+    return CreateAutotunedLimiter(thread_count, autotune_max_thread_count)
+
+  def _CreateNewConsumerPool(self,
+                             num_processes,
+                             num_threads,
+                             status_queue,
+                             autotune_max_thread_count=None):
     """Create a new pool of processes that call _ApplyThreads."""
     processes = []
     task_queue = _NewMultiprocessingQueue()
@@ -1438,7 +1484,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
       p = multiprocessing_context.Process(target=self._ApplyThreads,
                                           args=(num_threads, num_processes,
                                                 recursive_apply_level,
-                                                status_queue))
+                                                status_queue,
+                                                autotune_max_thread_count))
       p.daemon = True
       processes.append(p)
       _CryptoRandomAtFork()
@@ -1467,7 +1514,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
             thread_count=None,
             should_return_results=False,
             fail_on_error=False,
-            seek_ahead_iterator=None):
+            seek_ahead_iterator=None,
+            async_func=None):
     """Calls _Parallel/SequentialApply based on multiprocessing availability.
 
     Args:
@@ -1497,6 +1545,12 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
           provide an approximation of the total number of tasks and bytes that
           will be iterated by the ProducerThread. Used only if multiple
           processes and/or threads are used.
+      async_func: If present, a coroutine function that performs a task with
+          an async_engine.AsyncEngine, used in place of func when multiple
+          processes and/or threads are used and the small_object_engine config
+          option selects the async engine. It is called with the same
+          arguments as func, except that the engine replaces thread_state, and
+          returns async_engine.RUN_IN_THREAD for tasks func must perform.
 
     Returns:
       Results from spawned threads.
@@ -1515,6 +1569,9 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
         # We'll add it back after all of the tasks have been performed.
         setattr(self, name, 0)
 
+    # Only autotune thread counts that come from config; callers passing an
+    # explicit thread_count depend on it.
+    thread_count_is_configured = thread_count is None
     (process_count, thread_count) = self._GetProcessAndThreadCount(
         process_count, thread_count, parallel_operations_override)
 
@@ -1556,7 +1613,27 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
     # Make all of the requested function calls.
     usable_processes_count = (process_count
                               if self.multiprocessing_is_available else 1)
-    if thread_count * usable_processes_count > 1:
+    engine = None
+    if (async_func and is_main_thread and
+        thread_count * usable_processes_count > 1):
+      # Imported only when needed, since it pulls in asyncio and ssl.
+      from gslib.async_engine import CreateAsyncEngine  # pylint: disable=g-import-not-at-top
+      engine = CreateAsyncEngine(self, glob_status_queue, thread_count)
+    if engine:
+      LogPerformanceSummaryParams(num_processes=1, num_threads=thread_count)
+      self._AsyncApply(func,
+                       async_func,
+                       args_iterator,
+                       exception_handler,
+                       caller_id,
+                       arg_checker,
+                       engine,
+                       should_return_results,
+                       seek_ahead_iterator=seek_ahead_iterator,
+                       parallel_operations_override=parallel_operations_override)
+    elif thread_count * usable_processes_count > 1:
+      autotune_max_thread_count = (self._GetAutotuneMaxThreadCount(thread_count)
+                                   if thread_count_is_configured else None)
       self._ParallelApply(
           func,
           args_iterator,
@@ -1568,7 +1645,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
           should_return_results,
           fail_on_error,
           seek_ahead_iterator=seek_ahead_iterator,
-          parallel_operations_override=parallel_operations_override)
+          parallel_operations_override=parallel_operations_override,
+          autotune_max_thread_count=autotune_max_thread_count)
       if is_main_thread:
         _AggregateThreadStats()
     else:
@@ -1682,7 +1760,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
                      should_return_results,
                      fail_on_error,
                      seek_ahead_iterator=None,
-                     parallel_operations_override=None):
+                     parallel_operations_override=None,
+                     autotune_max_thread_count=None):
     r"""Dispatches input arguments across a thread/process pool.
 
     Pools are composed of parallel OS processes and/or Python threads,
@@ -1719,8 +1798,15 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
       those processes will, upon creation, create a pool of threads to
       execute the tasks.
 
+    If autotune_max_thread_count is set, each new pool of threads starts
+    that many threads but initially lets only thread_count of them run at once;
+    a ConcurrencyAutotuner then adjusts the number allowed to run based on
+    observed throughput and throttling.
+
     Args:
       caller_id: The caller ID unique to this call to command.Apply.
+      autotune_max_thread_count: Maximum number of active threads per process
+          when autotuning, or None to use exactly thread_count threads.
       See command.Apply for description of other arguments.
     """
     # This is initialized in Initialize(Multiprocessing|Threading)Variables
@@ -1751,6 +1837,10 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
                               MultithreadedMainSignalHandler,
                               is_final_handler=True)
 
+    if is_main_thread:
+      # Pools created during this call are autotuned as soon as they exist.
+      thread_pool_autotuners.Start(self.logger)
+
     if not task_queues:
       # The process we create will need to access the next recursive level
       # of task queues if it makes a call to Apply, so we always keep around
@@ -1759,21 +1849,9 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
       if process_count > 1:
         task_queues.append(_NewMultiprocessingQueue())
       else:
-        task_queue = _NewThreadsafeQueue()
-        task_queues.append(task_queue)
         # Create a top-level worker pool since this is the first execution
         # of ParallelApply on the main thread.
-        WorkerPool(thread_count,
-                   self.logger,
-                   task_queue=task_queue,
-                   bucket_storage_uri_class=self.bucket_storage_uri_class,
-                   gsutil_api_map=self.gsutil_api_map,
-                   debug=self.debug,
-                   status_queue=glob_status_queue,
-                   headers=self.non_metadata_headers,
-                   perf_trace_token=self.perf_trace_token,
-                   trace_token=self.trace_token,
-                   user_project=self.user_project)
+        self._CreateWorkerThreadPool(thread_count, autotune_max_thread_count)
 
     if process_count > 1:  # Handle process pool creation.
       # Check whether this call will need a new set of workers.
@@ -1790,7 +1868,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
             # otherwise, we will run into some Python bugs.
             if is_main_thread:
               self._CreateNewConsumerPool(process_count, thread_count,
-                                          glob_status_queue)
+                                          glob_status_queue,
+                                          autotune_max_thread_count)
             else:
               # Notify the main thread that we need a new consumer pool.
               new_pool_needed.Reset(reset_value=1)
@@ -1808,19 +1887,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
             # We don't have a thread pool for this level of recursive apply
             # calls, so create a pool and corresponding task queue.
             _IncrementCurrentMaxRecursiveLevel()
-            task_queue = _NewThreadsafeQueue()
-            task_queues.append(task_queue)
-            WorkerPool(thread_count,
-                       self.logger,
-                       task_queue=task_queue,
-                       bucket_storage_uri_class=self.bucket_storage_uri_class,
-                       gsutil_api_map=self.gsutil_api_map,
-                       debug=self.debug,
-                       status_queue=glob_status_queue,
-                       headers=self.non_metadata_headers,
-                       perf_trace_token=self.perf_trace_token,
-                       trace_token=self.trace_token,
-                       user_project=self.user_project)
+            self._CreateWorkerThreadPool(thread_count,
+                                         autotune_max_thread_count)
         finally:
           worker_checking_level_lock.release()
 
@@ -1874,7 +1942,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
               new_pool_needed.GetValue()):
           new_pool_needed.Reset()
           self._CreateNewConsumerPool(process_count, thread_count,
-                                      glob_status_queue)
+                                      glob_status_queue,
+                                      autotune_max_thread_count)
           need_pool_or_done_cond.notify_all()
 
         # Note that we must check the above conditions before the wait() call;
@@ -1885,6 +1954,7 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
     # We've completed all tasks (or excepted), so signal the UI thread to
     # terminate.
     if is_main_thread:
+      thread_pool_autotuners.Stop()
       PutToQueueWithTimeout(glob_status_queue, ZERO_TASKS_TO_DO_ARGUMENT)
       ui_thread.join(timeout=UI_THREAD_JOIN_TIMEOUT)
       # Now that all the work is done, log the types of source URLs encountered.
@@ -1905,6 +1975,169 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
     if is_main_thread and not parallel_operations_override:
       PutToQueueWithTimeout(glob_status_queue, FinalMessage(time.time()))
 
+  def _CreateWorkerThreadPool(self,
+                              thread_count,
+                              autotune_max_thread_count=None):
+    """Creates the task queue and pool of threads of the next Apply level."""
+    task_queue = _NewThreadsafeQueue()
+    task_queues.append(task_queue)
+    concurrency_limiter = self._CreateConcurrencyLimiter(
+        thread_count, autotune_max_thread_count)
+    if concurrency_limiter:
+      thread_pool_autotuners.Add(concurrency_limiter)
+    WorkerPool(thread_count,
+               self.logger,
+               task_queue=task_queue,
+               bucket_storage_uri_class=self.bucket_storage_uri_class,
+               gsutil_api_map=self.gsutil_api_map,
+               debug=self.debug,
+               status_queue=glob_status_queue,
+               headers=self.non_metadata_headers,
+               perf_trace_token=self.perf_trace_token,
+               trace_token=self.trace_token,
+               user_project=self.user_project,
+               concurrency_limiter=concurrency_limiter)
+
+  def _AsyncApply(self,
+                  func,
+                  async_func,
+                  args_iterator,
+                  exception_handler,
+                  caller_id,
+                  arg_checker,
+                  engine,
+                  should_return_results,
+                  seek_ahead_iterator=None,
+                  parallel_operations_override=None):
+    """Performs all tasks as coroutines on an async_engine.AsyncEngine.
+
+    Used in place of _ParallelApply, from the main thread only. Arguments are
+    iterated in a thread of their own, as the ProducerThread iterates them, and
+    up to the engine's max_in_flight tasks run at once. Tasks async_func
+    returns async_engine.RUN_IN_THREAD for are performed by func in the
+    engine's threads, each of which performs tasks as a WorkerThread does.
+
+    Args:
+      engine: The AsyncEngine to perform tasks with.
+      See command.Apply for description of other arguments.
+    """
+    # This is initialized in Initialize(Multiprocessing|Threading)Variables
+    # pylint: disable=global-variable-not-assigned
+    # pylint: disable=global-variable-undefined
+    global glob_status_queue, ui_controller
+    # pylint: enable=global-variable-not-assigned
+    # pylint: enable=global-variable-undefined
+    if not IS_WINDOWS:
+      # See _ParallelApply for why the main process kills itself on a
+      # terminating signal.
+      for signal_num in (signal.SIGINT, signal.SIGTERM):
+        RegisterSignalHandler(signal_num,
+                              MultithreadedMainSignalHandler,
+                              is_final_handler=True)
+
+    if not task_queues:
+      # Tasks performed by func may call Apply themselves, which needs the
+      # top-level task queue and worker pool to exist, as they do after a
+      # call to _ParallelApply.
+      self._CreateWorkerThreadPool(engine.thread_count)
+
+    producer = _AsyncTaskProducer(copy.copy(self),
+                                  args_iterator,
+                                  caller_id,
+                                  exception_handler,
+                                  arg_checker,
+                                  seek_ahead_iterator=seek_ahead_iterator,
+                                  status_queue=glob_status_queue)
+    ui_thread = UIThread(glob_status_queue, sys.stderr, ui_controller)
+    try:
+      engine.Run(
+          self._PerformAsyncTasks(func, async_func, producer, caller_id,
+                                  exception_handler, engine,
+                                  should_return_results))
+    finally:
+      PutToQueueWithTimeout(glob_status_queue, ZERO_TASKS_TO_DO_ARGUMENT)
+      ui_thread.join(timeout=UI_THREAD_JOIN_TIMEOUT)
+    self._ProcessSourceUrlTypes(args_iterator)
+    if not parallel_operations_override:
+      PutToQueueWithTimeout(glob_status_queue, FinalMessage(time.time()))
+
+  async def _PerformAsyncTasks(self, func, async_func, producer, caller_id,
+                               exception_handler, engine,
+                               should_return_results):
+    """Coroutine that performs the tasks of an _AsyncApply call."""
+    # pylint: disable=g-import-not-at-top
+    import asyncio
+    from gslib.async_engine import RUN_IN_THREAD
+    # All coroutines run in this thread, so they share a copy of the command.
+    cls = copy.copy(class_map[caller_id])
+    cls.logger = CreateOrGetGsutilLogger(cls.command_name)
+    shared_vars_updater = _SharedVariablesUpdater()
+    in_flight = asyncio.Semaphore(engine.max_in_flight)
+    thread_local = threading.local()
+
+    def PerformTaskInThread(task):
+      if not hasattr(thread_local, 'worker_thread'):
+        thread_local.worker_thread = WorkerThread(
+            None,
+            cls.logger,
+            bucket_storage_uri_class=self.bucket_storage_uri_class,
+            gsutil_api_map=self.gsutil_api_map,
+            debug=self.debug,
+            status_queue=glob_status_queue,
+            headers=self.non_metadata_headers,
+            perf_trace_token=self.perf_trace_token,
+            trace_token=self.trace_token,
+            user_project=self.user_project)
+        thread_cls = copy.copy(class_map[caller_id])
+        thread_cls.logger = cls.logger
+        # Only the main thread can create processes, and it is busy running
+        # the event loop, so Apply calls made by func use threads.
+        thread_cls.multiprocessing_is_available = False
+        thread_local.cls = thread_cls
+      thread_local.worker_thread.PerformTask(task, thread_local.cls)
+
+    async def PerformTask(args):
+      try:
+        results = await async_func(cls, args, engine)
+        if results is RUN_IN_THREAD:
+          await engine.RunInThread(
+              PerformTaskInThread,
+              Task(func, args, caller_id, exception_handler,
+                   should_return_results, None, False))
+        elif should_return_results:
+          global_return_values_map.Increment(caller_id, [results],
+                                             default_value=[])
+      except Exception as e:  # pylint: disable=broad-except
+        _IncrementFailureCount()
+        try:
+          exception_handler(cls, e)
+        except Exception as _:  # pylint: disable=broad-except
+          cls.logger.debug(
+              'Caught exception while handling exception for %s:\n%s',
+              async_func, traceback.format_exc())
+      finally:
+        shared_vars_updater.Update(caller_id, cls)
+        in_flight.release()
+
+    loop = asyncio.get_event_loop()
+    # Listing can be slow, so arguments are iterated in a thread of their own.
+    producer_executor = futures.ThreadPoolExecutor(max_workers=1)
+    tasks = set()
+    try:
+      while not producer.finished:
+        batch = await loop.run_in_executor(producer_executor,
+                                           producer.NextBatch)
+        for args in batch:
+          await in_flight.acquire()
+          task = asyncio.ensure_future(PerformTask(args))
+          tasks.add(task)
+          task.add_done_callback(tasks.discard)
+      if tasks:
+        await asyncio.wait(tasks)
+    finally:
+      producer_executor.shutdown(wait=False)
+      producer.Finish()
+
   def _ProcessSourceUrlTypes(self, args_iterator):
     """Logs the URL type information to analytics collection."""
     if not isinstance(args_iterator, CopyObjectsIterator):
@@ -1914,8 +2147,12 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
                                 has_cloud_src=args_iterator.has_cloud_src,
                                 provider_types=args_iterator.provider_types)
 
-  def _ApplyThreads(self, thread_count, process_count, recursive_apply_level,
-                    status_queue):
+  def _ApplyThreads(self,
+                    thread_count,
+                    process_count,
+                    recursive_apply_level,
+                    status_queue,
+                    autotune_max_thread_count=None):
     """Assigns the work from the multi-process global task queue.
 
     Work is assigned to an individual process for later consumption either by
@@ -1929,6 +2166,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
                              of this thread.
       status_queue: Multiprocessing/threading queue for progress reporting and
           performance aggregation.
+      autotune_max_thread_count: Maximum number of active threads when
+          autotuning, or None to use exactly thread_count threads.
     """
     assert process_count > 1, (
         'Invalid state, calling command._ApplyThreads with only one process.')
@@ -1949,8 +2188,16 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
     # Ensure fairness across processes by filling our WorkerPool
     # only with as many tasks as it has WorkerThreads. This semaphore is
     # acquired each time that a task is retrieved from the queue and released
-    # each time a task is completed by a WorkerThread.
-    worker_semaphore = threading.BoundedSemaphore(thread_count)
+    # each time a task is completed by a WorkerThread. When autotuning, the
+    # semaphore's capacity is adjusted while tasks run.
+    concurrency_limiter = self._CreateConcurrencyLimiter(
+        thread_count, autotune_max_thread_count)
+    worker_semaphore = (concurrency_limiter or
+                        threading.BoundedSemaphore(thread_count))
+    if concurrency_limiter:
+      # This process's pool is used until the process is shut down, and so
+      # is its autotuner.
+      ConcurrencyAutotuner(concurrency_limiter, logger=self.logger).start()
 
     # TODO: Presently, this pool gets recreated with each call to Apply. We
     # should be able to do it just once, at process creation time.
@@ -1965,7 +2212,8 @@ class Command(HelpProvider, GcloudStorageCommandMixin):
         headers=self.non_metadata_headers,
         perf_trace_token=self.perf_trace_token,
         trace_token=self.trace_token,
-        user_project=self.user_project)
+        user_project=self.user_project,
+        concurrency_limiter=concurrency_limiter)
 
     num_enqueued = 0
     while True:
@@ -2055,6 +2303,25 @@ def _StartSeekAheadThread(seek_ahead_iterator, seek_ahead_thread_cancel_event):
                          glob_status_queue)
 
 
+def _ArgsHaveProgress(args):
+  """Returns whether the total number of tasks for args is shown to users."""
+  return isinstance(args,
+                    (NameExpansionResult, CopyObjectInfo, RsyncDiffToApply))
+
+
+def _GetArgsSize(args):
+  """Returns the number of bytes the task for args transfers, if known."""
+  if isinstance(args, (NameExpansionResult, CopyObjectInfo)):
+    if args.expanded_result:
+      json_expanded_result = json.loads(args.expanded_result)
+      if 'size' in json_expanded_result:
+        return int(json_expanded_result['size'])
+  elif isinstance(args, RsyncDiffToApply):
+    if args.copy_size:
+      return int(args.copy_size)
+  return 0
+
+
 class ProducerThread(threading.Thread):
   """Thread used to enqueue work for other processes and threads."""
 
@@ -2155,21 +2422,11 @@ class ProducerThread(threading.Thread):
           if self.status_queue:
             if not num_tasks % 100:
               # Time to update the total number of tasks.
-              if (isinstance(args, NameExpansionResult) or
-                  isinstance(args, CopyObjectInfo) or
-                  isinstance(args, RsyncDiffToApply)):
+              if _ArgsHaveProgress(args):
                 PutToQueueWithTimeout(
                     self.status_queue,
                     ProducerThreadMessage(num_tasks, total_size, time.time()))
-            if (isinstance(args, NameExpansionResult) or
-                isinstance(args, CopyObjectInfo)):
-              if args.expanded_result:
-                json_expanded_result = json.loads(args.expanded_result)
-                if 'size' in json_expanded_result:
-                  total_size += int(json_expanded_result['size'])
-            elif isinstance(args, RsyncDiffToApply):
-              if args.copy_size:
-                total_size += int(args.copy_size)
+            total_size += _GetArgsSize(args)
 
           if not seek_ahead_thread_considered:
             if task_estimation_threshold is None:
@@ -2226,9 +2483,7 @@ class ProducerThread(threading.Thread):
         seek_ahead_thread.join(timeout=SEEK_AHEAD_JOIN_TIMEOUT)
       # Send a final ProducerThread message that definitively states
       # the amount of actual work performed.
-      if (self.status_queue and
-          (isinstance(args, NameExpansionResult) or isinstance(
-              args, CopyObjectInfo) or isinstance(args, RsyncDiffToApply))):
+      if self.status_queue and _ArgsHaveProgress(args):
         PutToQueueWithTimeout(
             self.status_queue,
             ProducerThreadMessage(num_tasks,
@@ -2242,6 +2497,100 @@ class ProducerThread(threading.Thread):
                     caller_id_finished_count.get(self.caller_id))
 
 
+class _AsyncTaskProducer(object):
+  """Iterates the arguments of an _AsyncApply call, as ProducerThread does.
+
+  NextBatch is called repeatedly, from a thread other than the event loop's,
+  until finished is set. If iteration stops early, Finish is then called.
+  """
+
+  def __init__(self,
+               cls,
+               args_iterator,
+               caller_id,
+               exception_handler,
+               arg_checker,
+               seek_ahead_iterator=None,
+               status_queue=None,
+               batch_size=100):
+    self.cls = cls
+    self.args_iterator = iter(args_iterator)
+    self.caller_id = caller_id
+    self.exception_handler = exception_handler
+    self.arg_checker = arg_checker
+    self.seek_ahead_iterator = seek_ahead_iterator
+    self.status_queue = status_queue
+    self.batch_size = batch_size
+    self.shared_variables_updater = _SharedVariablesUpdater()
+    self.finished = False
+    self.num_tasks = 0
+    self.total_size = 0
+    self.last_args = None
+    self.task_estimation_threshold = _GetTaskEstimationThreshold()
+    self.seek_ahead_thread = None
+    self.seek_ahead_thread_cancel_event = None
+
+  def NextBatch(self):
+    """Returns a list of up to batch_size arguments to perform tasks for."""
+    batch = []
+    while len(batch) < self.batch_size:
+      try:
+        args = next(self.args_iterator)
+      except StopIteration:
+        # The last batch's tasks haven't started yet, so the UI learns the
+        # final number of tasks before they all finish.
+        self.Finish()
+        break
+      except Exception as e:  # pylint: disable=broad-except
+        _IncrementFailureCount()
+        try:
+          self.exception_handler(self.cls, e)
+        except Exception as _:  # pylint: disable=broad-except
+          self.cls.logger.debug(
+              'Caught exception while handling exception for %s:\n%s',
+              self.args_iterator, traceback.format_exc())
+        self.shared_variables_updater.Update(self.caller_id, self.cls)
+        continue
+
+      if self.arg_checker(self.cls, args):
+        self.num_tasks += 1
+        self.last_args = args
+        if self.status_queue:
+          if not self.num_tasks % 100 and _ArgsHaveProgress(args):
+            PutToQueueWithTimeout(
+                self.status_queue,
+                ProducerThreadMessage(self.num_tasks, self.total_size,
+                                      time.time()))
+          self.total_size += _GetArgsSize(args)
+        if (self.seek_ahead_iterator and self.seek_ahead_thread is None and
+            0 < self.task_estimation_threshold <= self.num_tasks):
+          self.seek_ahead_thread_cancel_event = threading.Event()
+          self.seek_ahead_thread = _StartSeekAheadThread(
+              self.seek_ahead_iterator, self.seek_ahead_thread_cancel_event)
+          # For integration testing only, force estimation to complete prior
+          # to producing further results.
+          if boto.config.get('GSUtil', 'task_estimation_force', None):
+            self.seek_ahead_thread.join(timeout=SEEK_AHEAD_JOIN_TIMEOUT)
+        batch.append(args)
+    return batch
+
+  def Finish(self):
+    """Stops the seek-ahead thread and posts the final number of tasks."""
+    if self.finished:
+      return
+    self.finished = True
+    if self.seek_ahead_thread is not None:
+      self.seek_ahead_thread_cancel_event.set()
+      self.seek_ahead_thread.join(timeout=SEEK_AHEAD_JOIN_TIMEOUT)
+    if self.status_queue and _ArgsHaveProgress(self.last_args):
+      PutToQueueWithTimeout(
+          self.status_queue,
+          ProducerThreadMessage(self.num_tasks,
+                                self.total_size,
+                                time.time(),
+                                finished=True))
+
+
 class WorkerPool(object):
   """Pool of worker threads to which tasks can be added."""
 
@@ -2257,7 +2606,8 @@ class WorkerPool(object):
                headers=None,
                perf_trace_token=None,
                trace_token=None,
-               user_project=None):
+               user_project=None,
+               concurrency_limiter=None):
     # In the multi-process case, a worker sempahore is required to ensure
     # even work distribution.
     #
@@ -2273,13 +2623,22 @@ class WorkerPool(object):
     self.trace_token = trace_token
     self.user_project = user_project
 
+    #
+    # If a concurrency_limiter is provided, enough threads are started to
+    # reach its maximum limit, but only as many as its current limit may work
+    # on tasks at once. In the multi-process case it is also the
+    # worker_semaphore, so tasks are only handed to this pool while it has
+    # capacity; otherwise each thread acquires it before performing a task.
     self.task_queue = task_queue or _NewThreadsafeQueue()
     self.threads = []
+    if concurrency_limiter:
+      thread_count = concurrency_limiter.max_limit
     for _ in range(thread_count):
       worker_thread = WorkerThread(
           self.task_queue,
           logger,
           worker_semaphore=worker_semaphore,
+          concurrency_limiter=concurrency_limiter,
           bucket_storage_uri_class=bucket_storage_uri_class,
           gsutil_api_map=gsutil_api_map,
           debug=debug,
@@ -2324,7 +2683,8 @@ class WorkerThread(threading.Thread):
                headers=None,
                perf_trace_token=None,
                trace_token=None,
-               user_project=None):
+               user_project=None,
+               concurrency_limiter=None):
     """Initializes the worker thread.
 
     Args:
@@ -2341,6 +2701,9 @@ class WorkerThread(threading.Thread):
       debug: debug level for the CloudApiDelegator class.
       status_queue: Queue for reporting status updates.
       user_project: Project to be billed for this request.
+      concurrency_limiter: ConcurrencyLimiter of this thread's pool, or None.
+          Unless it is also the worker_semaphore, it is acquired before
+          performing each task.
     """
     super(WorkerThread, self).__init__()
 
@@ -2348,6 +2711,7 @@ class WorkerThread(threading.Thread):
     self.init_time = time.time()
     self.task_queue = task_queue
     self.worker_semaphore = worker_semaphore
+    self.concurrency_limiter = concurrency_limiter
     self.daemon = True
     self.cached_classes = {}
     self.shared_vars_updater = _SharedVariablesUpdater()
@@ -2430,6 +2794,11 @@ class WorkerThread(threading.Thread):
       _NotifyIfDone(caller_id, num_done)
 
   def run(self):
+    SetThreadConcurrencyLimiter(self.concurrency_limiter)
+    # In the multi-process case, the limiter is the worker semaphore, which is
+    # acquired before the task is handed to this thread.
+    acquire_limiter = (self.concurrency_limiter and
+                       self.concurrency_limiter is not self.worker_semaphore)
     while True:
       self._StartBlockedTime()
       task = self.task_queue.get()
@@ -2447,7 +2816,15 @@ class WorkerThread(threading.Thread):
         cls.logger = CreateOrGetGsutilLogger(cls.command_name)
         self.cached_classes[caller_id] = cls
 
-      self.PerformTask(task, cls)
+      # The permit is taken only once a task is in hand, so that the limiter
+      # measures time spent working rather than waiting for work.
+      if acquire_limiter:
+        self.concurrency_limiter.acquire()
+      try:
+        self.PerformTask(task, cls)
+      finally:
+        if acquire_limiter:
+          self.concurrency_limiter.release()
 
 
 class _ThreadStat(object):
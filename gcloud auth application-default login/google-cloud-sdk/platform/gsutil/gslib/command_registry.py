@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Registry of gsutil command names and the modules that implement them.
+
+Lets CommandRunner import only the module for the command being run, rather
+than every module under gslib.commands along with its help text.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+from collections.abc import Mapping
+import pkgutil
+
+from gslib.command import Command
+import gslib.commands
+
+# Maps each gslib.commands module to the names its command may be run by: the
+# command name followed by its aliases. test_command_runner checks that this
+# matches the commands' CommandSpecs, so update it when adding a command or
+# alias.
+COMMAND_NAMES_BY_MODULE = {
+    'acl': ('acl', 'getacl', 'setacl', 'chacl'),
+    'autoclass': ('autoclass',),
+    'bucketpolicyonly': ('bucketpolicyonly',),
+    'cat': ('cat',),
+    'compose': ('compose', 'concat'),
+    'config': ('config', 'cfg', 'conf', 'configure'),
+    'cors': ('cors', 'getcors', 'setcors'),
+    'cp': ('cp', 'copy'),
+    'daemon': ('daemon',),
+    'defacl': ('defacl', 'setdefacl', 'getdefacl', 'chdefacl'),
+    'defstorageclass': ('defstorageclass',),
+    'du': ('du',),
+    'hash': ('hash',),
+    'help': ('help', '?', 'man'),
+    'hmac': ('hmac',),
+    'iam': ('iam',),
+    'kms': ('kms',),
+    'label': ('label',),
+    'lifecycle': ('lifecycle', 'lifecycleconfig'),
+    'logging': ('logging', 'disablelogging', 'enablelogging', 'getlogging'),
+    'ls': ('ls', 'dir', 'list'),
+    'mb': ('mb', 'makebucket', 'createbucket', 'md', 'mkdir'),
+    'mv': ('mv', 'move', 'ren', 'rename'),
+    'notification':
+        ('notification', 'notify', 'notifyconfig', 'notifications', 'notif'),
+    'pap': ('pap', 'publicaccessprevention'),
+    'perfdiag': ('perfdiag', 'diag', 'diagnostic', 'perf', 'performance'),
+    'rb': ('rb', 'deletebucket', 'removebucket', 'removebuckets', 'rmdir'),
+    'requesterpays': ('requesterpays',),
+    'retention': ('retention',),
+    'rewrite': ('rewrite',),
+    'rm': ('rm', 'del', 'delete', 'remove'),
+    'rpo': ('rpo',),
+    'rsync': ('rsync',),
+    'setmeta': ('setmeta', 'setheader'),
+    'signurl': ('signurl', 'signedurl', 'queryauth'),
+    'stat': ('stat',),
+    'test': ('test',),
+    'ubla': ('ubla', 'uniformbucketlevelaccess'),
+    'update': ('update', 'refresh'),
+    'version': ('version', 'ver'),
+    'versioning': ('versioning', 'setversioning', 'getversioning'),
+    'web': ('web', 'setwebcfg', 'getwebcfg'),
+}
+
+
+class LazyCommandMap(Mapping):
+  """Maps command names and aliases to Command classes, importing on demand.
+
+  Looking up a name imports only the module registered for it. Iterating over
+  the map yields the registered names without importing anything, while
+  looking up an unregistered name, or listing the Command classes themselves,
+  imports every command module, as CommandRunner used to do up front.
+  """
+
+  def __init__(self, names_by_module=None):
+    """Initializes the map.
+
+    Args:
+      names_by_module: Dict in the format of COMMAND_NAMES_BY_MODULE. Settable
+          for testing.
+    """
+    if names_by_module is None:
+      names_by_module = COMMAND_NAMES_BY_MODULE
+    self._module_by_name = {}
+    for module_name, command_names in names_by_module.items():
+      for command_name in command_names:
+        self._module_by_name[command_name] = module_name
+    self._commands = {}
+    self._all_loaded = False
+
+  def _RegisterCommands(self):
+    # Only include Command subclasses in the dict.
+    for command in Command.__subclasses__():
+      self._commands[command.command_spec.command_name] = command
+      for command_name_aliases in command.command_spec.command_name_aliases:
+        self._commands[command_name_aliases] = command
+
+  def _LoadAll(self):
+    if not self._all_loaded:
+      # Import all gslib.commands submodules.
+      for _, module_name, _ in pkgutil.iter_modules(gslib.commands.__path__):
+        __import__('gslib.commands.%s' % module_name)
+      self._RegisterCommands()
+      self._all_loaded = True
+
+  def __getitem__(self, command_name):
+    if command_name not in self._commands:
+      module_name = self._module_by_name.get(command_name)
+      if module_name:
+        __import__('gslib.commands.%s' % module_name)
+        self._RegisterCommands()
+      if command_name not in self._commands:
+        self._LoadAll()
+    return self._commands[command_name]
+
+  def __contains__(self, command_name):
+    if command_name in self._commands or command_name in self._module_by_name:
+      return True
+    self._LoadAll()
+    return command_name in self._commands
+
+  def __iter__(self):
+    names = set(self._module_by_name)
+    names.update(self._commands)
+    return iter(sorted(names))
+
+  def __len__(self):
+    return len(set(self._module_by_name) | set(self._commands))
+
+  def values(self):
+    self._LoadAll()
+    return super(LazyCommandMap, self).values()
+
+  def items(self):
+    self._LoadAll()
+    return super(LazyCommandMap, self).items()
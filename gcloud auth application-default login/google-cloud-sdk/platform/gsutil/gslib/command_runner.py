@@ -22,7 +22,6 @@ from __future__ import unicode_literals
 import difflib
 import logging
 import os
-import pkgutil
 import sys
 import textwrap
 import time
@@ -40,7 +39,7 @@ from gslib.command import CreateOrGetGsutilLogger
 from gslib.command import GetFailureCount
 from gslib.command import OLD_ALIAS_MAP
 from gslib.command import ShutDownGsutil
-import gslib.commands
+from gslib.command_registry import LazyCommandMap
 from gslib.cs_api_map import ApiSelector
 from gslib.cs_api_map import GsutilApiClassMapFactory
 from gslib.cs_api_map import GsutilApiMapFactory
@@ -166,18 +165,11 @@ class CommandRunner(object):
       self.command_map = self._LoadCommandMap()
 
   def _LoadCommandMap(self):
-    """Returns dict mapping each command_name to implementing class."""
-    # Import all gslib.commands submodules.
-    for _, module_name, _ in pkgutil.iter_modules(gslib.commands.__path__):
-      __import__('gslib.commands.%s' % module_name)
-
-    command_map = {}
-    # Only include Command subclasses in the dict.
-    for command in Command.__subclasses__():
-      command_map[command.command_spec.command_name] = command
-      for command_name_aliases in command.command_spec.command_name_aliases:
-        command_map[command_name_aliases] = command
-    return command_map
+    """Returns dict-like map of each command_name to implementing class.
+
+    Command modules are imported when their command is first looked up.
+    """
+    return LazyCommandMap()
 
   def _GetTabCompleteLogger(self):
     """Returns a logger for tab completion."""
@@ -54,6 +54,13 @@ _DETAILED_HELP_TEXT = ("""
 
   (The final '-' causes gsutil to stream the output to stdout.)
 
+  By default each object is streamed over a single connection. To output large
+  objects faster, set the "sliced_object_cat_threshold" option in the
+  "GSUtil" section of your boto config file; objects at least that large are
+  then fetched as several byte ranges over concurrent connections and written
+  out in order. See the comments about the sliced_object_cat options in the
+  boto config file created by "gsutil config" for details.
+
   WARNING: The gsutil cat command does not compute a checksum of the
   downloaded data. Therefore, we recommend that users either perform
   their own validation of the output of gsutil cat or use gsutil cp
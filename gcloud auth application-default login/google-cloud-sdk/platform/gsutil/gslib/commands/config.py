@@ -36,21 +36,39 @@ from six.moves.http_client import ResponseNotReady
 import boto
 from boto.provider import Provider
 import gslib
+from gslib.async_engine import DEFAULT_SMALL_OBJECT_ENGINE
+from gslib.async_engine import DEFAULT_SMALL_OBJECT_MAX_CONNECTIONS
+from gslib.async_engine import DEFAULT_SMALL_OBJECT_MAX_IN_FLIGHT
+from gslib.async_engine import DEFAULT_SMALL_OBJECT_THRESHOLD
 from gslib.command import Command
 from gslib.command import DEFAULT_TASK_ESTIMATION_THRESHOLD
+from gslib.concurrency_autotuner import DEFAULT_AUTOTUNE_MAX_THREAD_MULTIPLIER
+from gslib.daemon import DEFAULT_DAEMON_IDLE_TIMEOUT
 from gslib.commands.compose import MAX_COMPOSE_ARITY
 from gslib.cred_types import CredTypes
 from gslib.exception import AbortException
 from gslib.exception import CommandException
 from gslib.metrics import CheckAndMaybePromptForAnalyticsEnabling
 from gslib.sig_handling import RegisterSignalHandler
+from gslib.tab_complete import TAB_COMPLETE_CACHE_TTL
+from gslib.tracker_file import DEFAULT_RESUMABLE_TRACKER_STORE
+from gslib.tracker_file import DEFAULT_TRACKER_STORE_MAX_AGE_DAYS
 from gslib.utils import constants
 from gslib.utils import system_util
+from gslib.utils.cat_helper import DEFAULT_SLICED_OBJECT_CAT_COMPONENT_SIZE
+from gslib.utils.cat_helper import DEFAULT_SLICED_OBJECT_CAT_MAX_COMPONENTS
+from gslib.utils.cat_helper import DEFAULT_SLICED_OBJECT_CAT_THRESHOLD
 from gslib.utils.hashing_helper import CHECK_HASH_ALWAYS
 from gslib.utils.hashing_helper import CHECK_HASH_IF_FAST_ELSE_FAIL
 from gslib.utils.hashing_helper import CHECK_HASH_IF_FAST_ELSE_SKIP
 from gslib.utils.hashing_helper import CHECK_HASH_NEVER
+from gslib.utils.hashing_helper import DEFAULT_PARALLEL_HASHING_MAX_WORKERS
+from gslib.utils.hashing_helper import DEFAULT_PARALLEL_HASHING_THRESHOLD
+from gslib.utils.hedging_util import DEFAULT_DOWNLOAD_HEDGE_PERCENTILE
 from gslib.utils.parallelism_framework_util import ShouldProhibitMultiprocessing
+from gslib.utils.rsync_util import DEFAULT_RSYNC_LISTING_FORMAT
+from gslib.utils.rsync_util import DEFAULT_RSYNC_WATCH_DELAY
+from gslib.wildcard_iterator import DEFAULT_LOCAL_LISTING_THREAD_COUNT
 from httplib2 import ServerNotFoundError
 from oauth2client.client import HAS_CRYPTO
 
@@ -194,6 +212,8 @@ DEFAULT_PARALLEL_COMPOSITE_UPLOAD_COMPONENT_SIZE = '50M'
 DEFAULT_SLICED_OBJECT_DOWNLOAD_THRESHOLD = '150M'
 DEFAULT_SLICED_OBJECT_DOWNLOAD_COMPONENT_SIZE = '200M'
 DEFAULT_SLICED_OBJECT_DOWNLOAD_MAX_COMPONENTS = 4
+DEFAULT_DAISY_CHAIN_BUFFER_SIZE = '4M'
+DEFAULT_DAISY_CHAIN_DOWNLOAD_STREAMS = 1
 
 # Compressed transport encoded uploads buffer chunks of compressed data. When
 # running many uploads in parallel, compression may consume more memory than
@@ -204,6 +224,9 @@ DEFAULT_MAX_UPLOAD_COMPRESSION_BUFFER_SIZE = '2G'
 # gzip compression level. This is simply making the python stdlib default explicit.
 DEFAULT_GZIP_COMPRESSION_LEVEL = 9
 
+# Number of threads used to compress each file for gzip uploads (cp -z / -Z).
+DEFAULT_PARALLEL_GZIP_THREAD_COUNT = min(multiprocessing.cpu_count(), 4)
+
 CONFIG_BOTO_SECTION_CONTENT = """
 [Boto]
 
@@ -291,11 +314,39 @@ CONFIG_INPUTLESS_GSUTIL_SECTION_CONTENT = """
 # operations.
 #rsync_buffer_lines = 32000
 
+# 'rsync_listing_format' specifies how rsync stores the sorted bucket and
+# directory listings it compares while building the synchronization state.
+# 'binary' (the default) stores each URL and its attributes as a compact
+# binary record, which is cheaper to write, sort and compare. 'text' stores
+# one URL-encoded line per URL, which is slower but can be read with standard
+# tools when debugging.
+#rsync_listing_format = %(rsync_listing_format)s
+
+# 'rsync_watch_delay' specifies how many seconds changes to the source
+# directory of 'gsutil rsync --watch' must settle for before they are
+# synchronized. Lower values synchronize files sooner; higher values copy
+# files that are changed repeatedly fewer times.
+#rsync_watch_delay = %(rsync_watch_delay)s
+
 # 'state_dir' specifies the base location where files that
 # need a static location are stored, such as pointers to credentials,
 # resumable transfer tracker files, and the last software update check.
 # By default these files are stored in ~/.gsutil
 #state_dir = <file_path>
+
+# 'resumable_tracker_store' specifies how gsutil stores resumable transfer
+# tracker data. 'files' (the default) keeps one small tracker file per upload,
+# download, download slice, rewrite, and composite upload. 'sqlite' keeps all
+# of it in a single SQLite database in the tracker directory, which avoids
+# creating and rewriting thousands of files during large sliced downloads and
+# parallel composite uploads. Tracker files left by earlier runs are still
+# honored when 'sqlite' is set.
+#resumable_tracker_store = %(resumable_tracker_store)s
+
+# 'tracker_store_max_age_days' specifies how many days an entry in the SQLite
+# tracker store may go without being updated before it is discarded. It only
+# applies when resumable_tracker_store is 'sqlite'.
+#tracker_store_max_age_days = %(tracker_store_max_age_days)d
 # gsutil periodically checks whether a new version of the gsutil software is
 # available. 'software_update_check_period' specifies the number of days
 # between such checks. The default is 30. Setting the value to 0 disables
@@ -309,6 +360,23 @@ CONFIG_INPUTLESS_GSUTIL_SECTION_CONTENT = """
 # A value of 0 will disable completions that involve remote requests.
 #tab_completion_timeout = 5
 
+# 'tab_completion_cache_ttl' specifies how many seconds listings made for tab
+# completion are reused after they were last used. The cache is shared by all
+# shells of the user.
+#tab_completion_cache_ttl = %(tab_completion_cache_ttl)d
+
+# 'tab_completion_prefetch' controls whether, after a completion, the
+# enclosing bucket or subdirectory and up to a few subdirectories in the
+# results are listed in the background, so that the next completion can be
+# answered from the cache. Prefetching requires a platform that supports
+# os.fork.
+#tab_completion_prefetch = True
+
+# 'daemon_idle_timeout' specifies how many seconds a daemon started with
+# "gsutil daemon start" waits without any commands running before it exits.
+# A value of 0 keeps the daemon running until "gsutil daemon stop".
+#daemon_idle_timeout = %(daemon_idle_timeout)d
+
 # 'parallel_process_count' and 'parallel_thread_count' specify the number
 # of OS processes and Python threads, respectively, to use when executing
 # operations in parallel. The default settings should work well as configured,
@@ -318,6 +386,30 @@ CONFIG_INPUTLESS_GSUTIL_SECTION_CONTENT = """
 #parallel_process_count = %(parallel_process_count)d
 #parallel_thread_count = %(parallel_thread_count)d
 
+# 'parallel_thread_autotune' enables adjusting the number of active threads
+# per process while a parallel (-m) command runs. Each process starts with
+# parallel_thread_count active threads and adds or removes threads depending
+# on whether doing so improves throughput, backing off when the service
+# responds with 429 or 503 errors. 'parallel_thread_autotune_max_count'
+# caps the number of active threads per process; by default it is
+# %(autotune_max_thread_multiplier)d times parallel_thread_count.
+#parallel_thread_autotune = False
+#parallel_thread_autotune_max_count = <integer>
+
+# 'small_object_engine' selects how parallel (-m) cp, rm and stat commands
+# run their tasks. With 'threads', tasks are run in parallel_process_count
+# processes of parallel_thread_count threads each. With 'async', requests for
+# objects no larger than 'small_object_threshold' are made from a single
+# event loop, sharing at most 'small_object_max_connections' keep-alive
+# connections per host, with at most 'small_object_max_in_flight' tasks in
+# progress at once; other tasks are run in parallel_thread_count threads.
+# The 'async' engine is only used with the JSON API, and not through a proxy
+# or with a client certificate.
+#small_object_engine = %(small_object_engine)s
+#small_object_threshold = %(small_object_threshold)s
+#small_object_max_connections = %(small_object_max_connections)d
+#small_object_max_in_flight = %(small_object_max_in_flight)d
+
 # 'parallel_composite_upload_threshold' specifies the maximum size of a file to
 # upload in a single stream. Files larger than this threshold will be
 # partitioned into component parts and uploaded in parallel and then composed
@@ -371,6 +463,47 @@ CONFIG_INPUTLESS_GSUTIL_SECTION_CONTENT = """
 #sliced_object_download_component_size = %(sliced_object_download_component_size)s
 #sliced_object_download_max_components = %(sliced_object_download_max_components)s
 
+# 'download_hedge_percentile', if between 0 and 100, makes gsutil send a
+# second request for any download (or slice of a sliced download) that goes
+# without receiving data for longer than this percentile of the times to first
+# byte seen so far, e.g. 95. Whichever request delivers data first carries on.
+# Hedged requests are limited to about a tenth of all download requests, and
+# are not used for gzip-encoded objects.
+#download_hedge_percentile = %(download_hedge_percentile)s
+
+# 'daisy_chain_buffer_size' is the amount of memory used to buffer each
+# daisy-chain copy (a copy between providers, or one that cannot be done in
+# the cloud, which downloads the source while uploading it).
+# 'daisy_chain_download_streams' is the number of byte ranges of the source
+# downloaded concurrently for each daisy-chain copy; each range is at most
+# daisy_chain_buffer_size / daisy_chain_download_streams bytes, so raise the
+# buffer size along with the number of streams. Objects stored with
+# Content-Encoding:gzip are always downloaded with a single stream.
+#daisy_chain_buffer_size = %(daisy_chain_buffer_size)s
+#daisy_chain_download_streams = %(daisy_chain_download_streams)d
+
+# 'sliced_object_cat_threshold' makes "gsutil cat" (and "gsutil cp" to stdout)
+# fetch objects of at least this size as several byte ranges over concurrent
+# connections, writing the ranges out in order. Objects stored with
+# Content-Encoding:gzip are always streamed over a single connection.
+# 'sliced_object_cat_component_size' is the size of each range, and
+# 'sliced_object_cat_max_components' the number of ranges fetched at once.
+# Up to max_components * component_size bytes are buffered in memory per
+# object. A threshold of 0 (the default) disables sliced cat.
+#sliced_object_cat_threshold = %(sliced_object_cat_threshold)s
+#sliced_object_cat_component_size = %(sliced_object_cat_component_size)s
+#sliced_object_cat_max_components = %(sliced_object_cat_max_components)s
+
+# 'adaptive_component_sizing' makes parallel composite uploads and sliced
+# downloads choose their number of components from the object size, the
+# number of processes and threads available, and the per-stream bandwidth
+# observed so far, instead of from the component size settings alone. Objects
+# are split into several components per worker so that workers which finish
+# early take over remaining components instead of waiting on a slow one. The
+# component size settings above become the largest component size, and the
+# max components settings still apply. Disabled by default.
+#adaptive_component_sizing = False
+
 # Compressed transport encoded uploads buffer chunks of compressed data. When
 # running a composite upload and/or many uploads in parallel, compression may
 # consume more memory than available. This setting restricts the number of
@@ -386,6 +519,16 @@ CONFIG_INPUTLESS_GSUTIL_SECTION_CONTENT = """
 # A good level to try is 6, which is the default used by the gzip tool.
 #gzip_compression_level = %(gzip_compression_level)s
 
+# 'parallel_gzip_thread_count' specifies how many threads in each gsutil
+# process compress files uploaded with the -z or -Z options of cp, mv, and
+# rsync to the JSON API. Concurrent uploads in a process share them. For
+# files of at least resumable_threshold bytes, the compressed data is streamed
+# directly into the upload instead of being written to a temporary file first.
+# Setting this to 0 restores compression to a temporary file, which keeps very
+# large uploads resumable across separate gsutil invocations at the cost of
+# extra disk I/O and temp space.
+#parallel_gzip_thread_count = %(parallel_gzip_thread_count)s
+
 # 'task_estimation_threshold' controls how many files or objects gsutil
 # processes before it attempts to estimate the total work that will be
 # performed by the command. Estimation makes extra directory listing or API
@@ -394,12 +537,20 @@ CONFIG_INPUTLESS_GSUTIL_SECTION_CONTENT = """
 # listing calls; to disable it entirely, set this value to 0.
 #task_estimation_threshold=%(task_estimation_threshold)s
 
-# 'use_magicfile' specifies if the 'file --mime <filename>' command should be
-# used to guess content types instead of the default filename extension-based
-# mechanism. Available on UNIX and macOS (and possibly on Windows, if you're
-# running Cygwin or some other package that provides implementations of
-# UNIX-like commands). When available and enabled use_magicfile should be more
-# robust because it analyzes file contents in addition to extensions.
+# 'local_listing_thread_count' specifies how many threads list directories
+# and read file sizes and times when recursively listing a local directory
+# tree, e.g. for "gsutil cp -r" or "gsutil rsync -r" from local files. The
+# threads are shared by all listings in a process. More threads help most on
+# network filesystems. Set this to 1 to list on a single thread.
+#local_listing_thread_count = %(local_listing_thread_count)s
+
+# 'use_magicfile' specifies if content types should be detected from the
+# contents of uploaded files, instead of the default filename extension-based
+# mechanism. When enabled, gsutil examines the first few KiB of each file for
+# the signatures of common formats and for text, reporting types in the same
+# form as the 'file --mime <filename>' command. Text files with no more
+# specific type in their contents are typed by extension (e.g., text/css).
+# For recursive copies the files are examined while they are listed.
 #use_magicfile = False
 
 # Service account emails for testing the hmac command. If these fields are not
@@ -441,6 +592,19 @@ content_language = en
 # instead (inexpensively) compare the cloud source and destination hashes.
 #check_hashes = if_fast_else_fail
 
+# 'parallel_hashing_threshold' specifies the minimum size of a local file for
+# its CRC32C to be computed over several byte ranges concurrently, as is done
+# when validating downloads and by the "hash" command. The range CRC32Cs are
+# combined into the CRC32C of the whole file, and an MD5, if also needed, is
+# computed in a single pass at the same time. Ranges are hashed in separate
+# processes where possible. Set this to 0 to disable parallel hashing.
+# 'parallel_hashing_max_workers' specifies the maximum number of ranges hashed
+# at the same time.
+# Values can be provided either in bytes or as human-readable values
+# (e.g., "150M" to represent 150 mebibytes)
+#parallel_hashing_threshold = %(parallel_hashing_threshold)s
+#parallel_hashing_max_workers = %(parallel_hashing_max_workers)s
+
 # 'encryption_key' specifies a single customer-supplied encryption key that
 # will be used for all data written to Google Cloud Storage. See
 # "gsutil help encryption" for more information
@@ -475,6 +639,17 @@ content_language = en
 # Disables the prompt asking for opt-in to data collection for analytics.
 #disable_analytics_prompt = True
 
+# 'telemetry_sink' writes performance data about each gsutil command to a local
+# file, whether or not analytics are enabled: the command's options, execution
+# time and errors, the performance summary of cp and rsync commands (objects
+# and bytes transferred, throughput, parallelism, retries) and the latency
+# distributions of their file and component transfers. The value is
+# <type>:<path>, where type is 'jsonl', to append one line of JSON per command
+# to the file, or 'prometheus', to keep the last run of each command in a
+# textfile for the Prometheus node_exporter textfile collector.
+#telemetry_sink = jsonl:~/.gsutil/telemetry.jsonl
+#telemetry_sink = prometheus:/var/lib/node_exporter/textfile_collector/gsutil.prom
+
 # The "test" command runs tests against regional buckets (unless you supply the
 # `-b` option). By default, the region used is us-central1, but you can change
 # the default region using this option.
@@ -503,6 +678,13 @@ content_language = en
     'resumable_threshold': constants.RESUMABLE_THRESHOLD_B,
     'parallel_process_count': DEFAULT_PARALLEL_PROCESS_COUNT,
     'parallel_thread_count': DEFAULT_PARALLEL_THREAD_COUNT,
+    'autotune_max_thread_multiplier': DEFAULT_AUTOTUNE_MAX_THREAD_MULTIPLIER,
+    'daemon_idle_timeout': DEFAULT_DAEMON_IDLE_TIMEOUT,
+    'tab_completion_cache_ttl': TAB_COMPLETE_CACHE_TTL,
+    'small_object_engine': DEFAULT_SMALL_OBJECT_ENGINE,
+    'small_object_threshold': DEFAULT_SMALL_OBJECT_THRESHOLD,
+    'small_object_max_connections': DEFAULT_SMALL_OBJECT_MAX_CONNECTIONS,
+    'small_object_max_in_flight': DEFAULT_SMALL_OBJECT_MAX_IN_FLIGHT,
     'parallel_composite_upload_threshold':
         (DEFAULT_PARALLEL_COMPOSITE_UPLOAD_THRESHOLD),
     'parallel_composite_upload_component_size':
@@ -513,11 +695,27 @@ content_language = en
         (DEFAULT_PARALLEL_COMPOSITE_UPLOAD_COMPONENT_SIZE),
     'sliced_object_download_max_components':
         (DEFAULT_SLICED_OBJECT_DOWNLOAD_MAX_COMPONENTS),
+    'download_hedge_percentile': DEFAULT_DOWNLOAD_HEDGE_PERCENTILE,
+    'daisy_chain_buffer_size': DEFAULT_DAISY_CHAIN_BUFFER_SIZE,
+    'daisy_chain_download_streams': DEFAULT_DAISY_CHAIN_DOWNLOAD_STREAMS,
+    'sliced_object_cat_threshold': DEFAULT_SLICED_OBJECT_CAT_THRESHOLD,
+    'sliced_object_cat_component_size':
+        (DEFAULT_SLICED_OBJECT_CAT_COMPONENT_SIZE),
+    'sliced_object_cat_max_components':
+        (DEFAULT_SLICED_OBJECT_CAT_MAX_COMPONENTS),
     'max_compose_arity': MAX_COMPOSE_ARITY,
     'task_estimation_threshold': DEFAULT_TASK_ESTIMATION_THRESHOLD,
+    'local_listing_thread_count': DEFAULT_LOCAL_LISTING_THREAD_COUNT,
     'max_upload_compression_buffer_size':
         (DEFAULT_MAX_UPLOAD_COMPRESSION_BUFFER_SIZE),
     'gzip_compression_level': DEFAULT_GZIP_COMPRESSION_LEVEL,
+    'parallel_gzip_thread_count': DEFAULT_PARALLEL_GZIP_THREAD_COUNT,
+    'parallel_hashing_threshold': DEFAULT_PARALLEL_HASHING_THRESHOLD,
+    'parallel_hashing_max_workers': DEFAULT_PARALLEL_HASHING_MAX_WORKERS,
+    'resumable_tracker_store': DEFAULT_RESUMABLE_TRACKER_STORE,
+    'tracker_store_max_age_days': DEFAULT_TRACKER_STORE_MAX_AGE_DAYS,
+    'rsync_listing_format': DEFAULT_RSYNC_LISTING_FORMAT,
+    'rsync_watch_delay': DEFAULT_RSYNC_WATCH_DELAY,
 }
 
 CONFIG_OAUTH2_CONFIG_CONTENT = """
@@ -884,8 +1082,11 @@ class ConfigCommand(Command):
         config_file.write(
             '#%s_json_host = <alternate JSON API storage host address>\n'
             '#%s_json_port = <alternate JSON API storage host port>\n'
-            '#%s_json_host_header = <alternate JSON API storage host header>\n\n'
-            % (host_key, host_key, host_key))
+            '#%s_json_host_header = <alternate JSON API storage host header>\n'
+            '# Plain "http" may be used only with a loopback gs_json_host,\n'
+            '# e.g. for a local emulator. The default is "https".\n'
+            '#%s_json_protocol = <https or http>\n\n'
+            % (host_key, host_key, host_key, host_key))
         config_file.write(
             '# To impersonate a service account for "%s://" URIs over\n'
             '# JSON API, edit and uncomment the following line:\n'
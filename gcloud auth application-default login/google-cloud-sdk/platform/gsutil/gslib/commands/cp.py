@@ -474,7 +474,13 @@ _OPTIONS_TEXT = """
                  existing log file as having been successfully copied or
                  skipped are ignored. Objects without entries are
                  copied and ones previously marked as unsuccessful are
-                 retried. This option can be used in conjunction with the ``-c`` option to
+                 retried. To avoid rereading the whole log file on each run,
+                 gsutil keeps an index of the items it records as copied or
+                 skipped in a file next to it, named after the log file with
+                 an added ".index" suffix. The index is rebuilt automatically
+                 if the log file is replaced or truncated.
+
+                 This option can be used in conjunction with the ``-c`` option to
                  build a script that copies a large number of objects reliably,
                  using a bash script like the following:
 
@@ -675,6 +681,10 @@ def _CopyFuncWrapper(cls, args, thread_state=None):
                preserve_posix=cls.preserve_posix_attrs)
 
 
+async def _CopyFuncAsync(cls, args, engine):
+  return await cls.CopyFuncAsync(args, engine)
+
+
 def _CopyExceptionHandler(cls, e):
   """Simple exception handler to allow post-completion status."""
   cls.logger.error(str(e))
@@ -763,7 +773,6 @@ class CpCommand(Command):
       cmd_name = self.command_name
     src_url = copy_object_info.source_storage_url
     exp_src_url = copy_object_info.expanded_storage_url
-    src_url_names_container = copy_object_info.names_container
     have_multiple_srcs = copy_object_info.is_multi_source_request
 
     if src_url.IsCloudUrl() and src_url.IsProvider():
@@ -805,41 +814,9 @@ class CpCommand(Command):
       # all the contained files).
       self.recursion_requested = True
 
-    if (copy_object_info.exp_dst_url.IsFileUrl() and
-        not os.path.exists(copy_object_info.exp_dst_url.object_name) and
-        have_multiple_srcs):
-
-      try:
-        os.makedirs(copy_object_info.exp_dst_url.object_name)
-      except OSError as e:
-        if e.errno != errno.EEXIST:
-          raise
-
-    dst_url = copy_helper.ConstructDstUrl(
-        src_url,
-        exp_src_url,
-        src_url_names_container,
-        have_multiple_srcs,
-        copy_object_info.is_multi_top_level_source_request,
-        copy_object_info.exp_dst_url,
-        copy_object_info.have_existing_dst_container,
-        self.recursion_requested,
-        preserve_posix=preserve_posix)
-    dst_url = copy_helper.FixWindowsNaming(src_url, dst_url)
-
-    copy_helper.CheckForDirFileConflict(exp_src_url, dst_url)
-    if copy_helper.SrcDstSame(exp_src_url, dst_url):
-      raise CommandException('%s: "%s" and "%s" are the same file - '
-                             'abort.' % (cmd_name, exp_src_url, dst_url))
-
-    if dst_url.IsCloudUrl() and dst_url.HasGeneration():
-      raise CommandException('%s: a version-specific URL\n(%s)\ncannot be '
-                             'the destination for gsutil cp - abort.' %
-                             (cmd_name, dst_url))
-
-    if not dst_url.IsCloudUrl() and copy_helper_opts.dest_storage_class:
-      raise CommandException('Cannot specify storage class for a non-cloud '
-                             'destination: %s' % dst_url)
+    dst_url = self._ConstructCopyDstUrl(copy_object_info,
+                                        cmd_name,
+                                        preserve_posix=preserve_posix)
 
     src_obj_metadata = None
     if copy_object_info.expanded_result:
@@ -882,33 +859,17 @@ class CpCommand(Command):
       if copy_helper_opts.use_manifest:
         self.manifest.Initialize(exp_src_url.url_string, dst_url.url_string)
 
-      if (self.recursion_requested and
-          copy_object_info.exp_dst_url.object_name and dst_url.IsFileUrl()):
-
-        # exp_dst_url is the wildcard-expanded path passed by the user:
-        #   exp_dst_url => ~/dir
-        #   container => /usr/name/dir
-        container = os.path.abspath(copy_object_info.exp_dst_url.object_name)
-
-        # dst_url holds the complete path of the object's destination:
-        #   dst_url => /usr/name/dir/../file.txt
-        #   abspath => /usr/name/file.txt
-        #
-        # Taking the common path of this and container yields: /usr/name,
-        # which does not start with container when the inclusion of '..' strings
-        # results in a copy outside of the container.
-        if not os.path.commonpath([
-            container, os.path.abspath(dst_url.object_name)
-        ]).startswith(container):
-          self.logger.warn(
-              'Skipping copy of source URL %s because it would be copied '
-              'outside the expected destination directory: %s.' %
-              (exp_src_url, container))
-          if copy_helper_opts.use_manifest:
-            self.manifest.SetResult(
-                exp_src_url.url_string, 0, 'skip',
-                'Would have copied outside the destination directory.')
-          return
+      container = self._GetContainerCopiedOutsideOf(copy_object_info, dst_url)
+      if container:
+        self.logger.warn(
+            'Skipping copy of source URL %s because it would be copied '
+            'outside the expected destination directory: %s.' %
+            (exp_src_url, container))
+        if copy_helper_opts.use_manifest:
+          self.manifest.SetResult(
+              exp_src_url.url_string, 0, 'skip',
+              'Would have copied outside the destination directory.')
+        return
 
       _, bytes_transferred, result_url, md5 = copy_helper.PerformCopy(
           self.logger,
@@ -984,6 +945,148 @@ class CpCommand(Command):
       # transferred from StatusMessages posted by operations within PerformCopy.
       self.total_bytes_transferred += bytes_transferred
 
+  async def CopyFuncAsync(self, copy_object_info, engine):
+    """Copies a small object on the event loop of an AsyncEngine.
+
+    Copies that copy_helper.CanPerformCopyAsync rejects, and copies that
+    CopyFunc would skip or report specially, are returned to CopyFunc.
+    """
+    from gslib.async_engine import RUN_IN_THREAD  # pylint: disable=g-import-not-at-top
+    copy_helper_opts = copy_helper.GetCopyHelperOpts()
+    src_url = copy_object_info.source_storage_url
+    exp_src_url = copy_object_info.expanded_storage_url
+    if (self.gzip_exts or self.use_stet or
+        self.preserve_posix_attrs or
+        (src_url.IsCloudUrl() and src_url.IsProvider()) or
+        (src_url.IsFileUrl() and src_url.IsStream()) or
+        IsCloudSubdirPlaceholder(exp_src_url)):
+      return RUN_IN_THREAD
+
+    if copy_object_info.is_multi_source_request:
+      copy_helper.InsistDstUrlNamesContainer(
+          copy_object_info.exp_dst_url,
+          copy_object_info.have_existing_dst_container, self.command_name)
+    dst_url = self._ConstructCopyDstUrl(copy_object_info, self.command_name)
+
+    src_obj_metadata = None
+    if copy_object_info.expanded_result:
+      src_obj_metadata = encoding.JsonToMessage(
+          apitools_messages.Object, copy_object_info.expanded_result)
+    if (not copy_helper.CanPerformCopyAsync(
+        exp_src_url, dst_url, src_obj_metadata, headers=self.headers) or
+        self._GetContainerCopiedOutsideOf(copy_object_info, dst_url)):
+      return RUN_IN_THREAD
+
+    bytes_transferred = 0
+    try:
+      _, bytes_transferred, result_url, _ = (
+          await copy_helper.PerformCopyAsync(self.logger,
+                                             exp_src_url,
+                                             dst_url,
+                                             engine,
+                                             src_obj_metadata=src_obj_metadata))
+      if copy_helper_opts.print_ver:
+        self.logger.info('Created: %s', result_url)
+    except copy_helper.FileConcurrencySkipError:
+      self.logger.warn(
+          'Skipping copy of source URL %s because destination URL '
+          '%s is already being copied by another gsutil process '
+          'or thread (did you specify the same source URL twice?) ' %
+          (src_url, dst_url))
+    except Exception as e:  # pylint: disable=broad-except
+      if self.continue_on_error:
+        self.op_failure_count += 1
+        self.logger.error('Error copying %s: %s' % (src_url, str(e)))
+      else:
+        raise
+
+    with self.stats_lock:
+      self.total_bytes_transferred += bytes_transferred
+
+  def _ConstructCopyDstUrl(self,
+                           copy_object_info,
+                           cmd_name,
+                           preserve_posix=False):
+    """Constructs and validates the destination URL of a copy.
+
+    Args:
+      copy_object_info: CopyObjectInfo for the copy.
+      cmd_name: Name of the command, for error messages.
+      preserve_posix: Whether or not to preserve POSIX attributes.
+
+    Returns:
+      The destination StorageUrl.
+
+    Raises:
+      CommandException: if the copy is not allowed.
+    """
+    copy_helper_opts = copy_helper.GetCopyHelperOpts()
+    src_url = copy_object_info.source_storage_url
+    exp_src_url = copy_object_info.expanded_storage_url
+    src_url_names_container = copy_object_info.names_container
+    have_multiple_srcs = copy_object_info.is_multi_source_request
+
+    if (copy_object_info.exp_dst_url.IsFileUrl() and
+        not os.path.exists(copy_object_info.exp_dst_url.object_name) and
+        have_multiple_srcs):
+
+      try:
+        os.makedirs(copy_object_info.exp_dst_url.object_name)
+      except OSError as e:
+        if e.errno != errno.EEXIST:
+          raise
+
+    dst_url = copy_helper.ConstructDstUrl(
+        src_url,
+        exp_src_url,
+        src_url_names_container,
+        have_multiple_srcs,
+        copy_object_info.is_multi_top_level_source_request,
+        copy_object_info.exp_dst_url,
+        copy_object_info.have_existing_dst_container,
+        self.recursion_requested,
+        preserve_posix=preserve_posix)
+    dst_url = copy_helper.FixWindowsNaming(src_url, dst_url)
+
+    copy_helper.CheckForDirFileConflict(exp_src_url, dst_url)
+    if copy_helper.SrcDstSame(exp_src_url, dst_url):
+      raise CommandException('%s: "%s" and "%s" are the same file - '
+                             'abort.' % (cmd_name, exp_src_url, dst_url))
+
+    if dst_url.IsCloudUrl() and dst_url.HasGeneration():
+      raise CommandException('%s: a version-specific URL\n(%s)\ncannot be '
+                             'the destination for gsutil cp - abort.' %
+                             (cmd_name, dst_url))
+
+    if not dst_url.IsCloudUrl() and copy_helper_opts.dest_storage_class:
+      raise CommandException('Cannot specify storage class for a non-cloud '
+                             'destination: %s' % dst_url)
+
+    return dst_url
+
+  def _GetContainerCopiedOutsideOf(self, copy_object_info, dst_url):
+    """Returns the destination directory a download would escape, if any."""
+    if not (self.recursion_requested and
+            copy_object_info.exp_dst_url.object_name and dst_url.IsFileUrl()):
+      return None
+
+    # exp_dst_url is the wildcard-expanded path passed by the user:
+    #   exp_dst_url => ~/dir
+    #   container => /usr/name/dir
+    container = os.path.abspath(copy_object_info.exp_dst_url.object_name)
+
+    # dst_url holds the complete path of the object's destination:
+    #   dst_url => /usr/name/dir/../file.txt
+    #   abspath => /usr/name/file.txt
+    #
+    # Taking the common path of this and container yields: /usr/name,
+    # which does not start with container when the inclusion of '..' strings
+    # results in a copy outside of the container.
+    if not os.path.commonpath([container, os.path.abspath(dst_url.object_name)
+                              ]).startswith(container):
+      return container
+    return None
+
   def _ConstructNameExpansionIteratorDstTupleIterator(self, src_url_strs_iter,
                                                       dst_url_strs):
     copy_helper_opts = copy_helper.GetCopyHelperOpts()
@@ -1133,7 +1236,8 @@ class CpCommand(Command):
                _CopyExceptionHandler,
                shared_attrs,
                fail_on_error=(not self.continue_on_error),
-               seek_ahead_iterator=seek_ahead_iterator)
+               seek_ahead_iterator=seek_ahead_iterator,
+               async_func=_CopyFuncAsync)
     self.logger.debug('total_bytes_transferred: %d',
                       self.total_bytes_transferred)
 
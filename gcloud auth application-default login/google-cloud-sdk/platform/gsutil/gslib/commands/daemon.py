@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Implementation of gsutil daemon command."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import time
+
+from boto import config
+
+from gslib import daemon
+from gslib import metrics
+from gslib.command import Command
+from gslib.exception import CommandException
+from gslib.help_provider import CreateHelpText
+
+_START_SYNOPSIS = """
+  gsutil daemon start
+"""
+
+_STOP_SYNOPSIS = """
+  gsutil daemon stop
+"""
+
+_STATUS_SYNOPSIS = """
+  gsutil daemon status
+"""
+
+_SYNOPSIS = (_START_SYNOPSIS + _STOP_SYNOPSIS.lstrip('\n') +
+             _STATUS_SYNOPSIS.lstrip('\n'))
+
+_START_DESCRIPTION = """
+<B>START</B>
+  The ``start`` sub-command starts a daemon in the background and waits until
+  it is ready to run commands. The daemon exits once no commands have run for
+  the number of seconds set by the "daemon_idle_timeout" option in the
+  "GSUtil" section of your boto config file (one hour by default; 0 keeps it
+  running until stopped).
+"""
+
+_STOP_DESCRIPTION = """
+<B>STOP</B>
+  The ``stop`` sub-command asks the daemon to exit. Commands it is running
+  are allowed to finish.
+"""
+
+_STATUS_DESCRIPTION = """
+<B>STATUS</B>
+  The ``status`` sub-command shows whether a daemon is running, and how many
+  commands it has run.
+"""
+
+_DESCRIPTION = """
+  Starting gsutil takes a noticeable fraction of a second, most of which is
+  spent loading gsutil's code and configuration. Scripts that run gsutil many
+  times, for example once per file, can avoid most of this cost by starting a
+  gsutil daemon, which loads gsutil once and then waits for commands.
+
+  While the daemon is running, gsutil commands run by the same user are
+  passed to it, and it starts each command from its already-loaded state.
+  Commands behave as if run directly: each runs in its own process, reads
+  and writes the invoking terminal or pipes, and is interrupted by Ctrl-C.
+
+  The daemon listens on a socket at ~/.gsutil/daemon.sock, which only your
+  user can access. To use a different path, set the GSUTIL_DAEMON_SOCKET
+  environment variable when starting the daemon and when running commands.
+
+  Commands are run directly, rather than by the daemon, when the environment
+  variables that affect gsutil's configuration (such as BOTO_CONFIG,
+  BOTO_PATH, HOME and proxy settings) differ from those the daemon was
+  started with. If your boto config files or gsutil itself change, the
+  daemon exits when it next receives a command, and should be started again.
+  Top-level options such as -o that are passed to "gsutil daemon start" do
+  not apply to the commands the daemon runs; pass them with each command
+  instead.
+
+  The daemon is not available on Windows.
+
+  This command has three sub-commands, ``start``, ``stop`` and ``status``.
+""" + _START_DESCRIPTION + _STOP_DESCRIPTION + _STATUS_DESCRIPTION
+
+_DETAILED_HELP_TEXT = CreateHelpText(_SYNOPSIS, _DESCRIPTION)
+_start_help_text = CreateHelpText(_START_SYNOPSIS, _START_DESCRIPTION)
+_stop_help_text = CreateHelpText(_STOP_SYNOPSIS, _STOP_DESCRIPTION)
+_status_help_text = CreateHelpText(_STATUS_SYNOPSIS, _STATUS_DESCRIPTION)
+
+# How long "gsutil daemon stop" waits for the daemon to stop listening.
+_STOP_TIMEOUT = 10
+
+
+class DaemonCommand(Command):
+  """Implementation of gsutil daemon command."""
+
+  # Command specification. See base class for documentation.
+  command_spec = Command.CreateCommandSpec(
+      'daemon',
+      command_name_aliases=[],
+      usage_synopsis=_SYNOPSIS,
+      min_args=1,
+      max_args=1,
+      supported_sub_args='',
+      file_url_ok=False,
+      provider_url_ok=False,
+      urls_start_arg=1,
+  )
+  # Help specification. See help_provider.py for documentation.
+  help_spec = Command.HelpSpec(
+      help_name='daemon',
+      help_name_aliases=[],
+      help_type='command_help',
+      help_one_line_summary='Run gsutil commands from a resident process',
+      help_text=_DETAILED_HELP_TEXT,
+      subcommand_help_text={
+          'start': _start_help_text,
+          'stop': _stop_help_text,
+          'status': _status_help_text,
+      },
+  )
+
+  def _Start(self, socket_path):
+    status = daemon.GetDaemonStatus(socket_path)
+    if status:
+      raise CommandException('A gsutil daemon (pid %d) is already running.' %
+                             status['pid'])
+    idle_timeout = config.getint('GSUtil', 'daemon_idle_timeout',
+                                 daemon.DEFAULT_DAEMON_IDLE_TIMEOUT)
+    try:
+      status = daemon.StartDaemon(socket_path, idle_timeout)
+    except EnvironmentError as e:
+      raise CommandException(str(e))
+    self.logger.info('Started gsutil daemon (pid %d) listening on %s.',
+                     status['pid'], socket_path)
+
+  def _Stop(self, socket_path):
+    if not daemon.StopDaemon(socket_path):
+      raise CommandException('No gsutil daemon is running.')
+    deadline = time.time() + _STOP_TIMEOUT
+    while daemon.GetDaemonStatus(socket_path) and time.time() < deadline:
+      time.sleep(0.1)
+    self.logger.info('Stopped gsutil daemon.')
+
+  def _Status(self, socket_path):
+    status = daemon.GetDaemonStatus(socket_path)
+    if not status:
+      print('No gsutil daemon is running.')
+      return 1
+    print('gsutil daemon (pid %d) listening on %s\n'
+          '  Uptime: %d seconds\n'
+          '  Commands run: %d\n'
+          '  Commands running: %d' %
+          (status['pid'], socket_path, status['uptime'],
+           status['commands_run'], status['commands_running']))
+    return 0
+
+  def RunCommand(self):
+    """Command entry point for the daemon command."""
+    if not daemon.DaemonSupported():
+      raise CommandException(
+          'The gsutil daemon is not supported on this platform.')
+    subcommand = self.args[0]
+    subcommand_funcs = {
+        'start': self._Start,
+        'stop': self._Stop,
+        'status': self._Status,
+    }
+    if subcommand not in subcommand_funcs:
+      raise CommandException(
+          ('Invalid subcommand "%s" for the %s command.\n'
+           'See "gsutil help %s".') %
+          (subcommand, self.command_name, self.command_name))
+    metrics.LogCommandParams(subcommands=[subcommand])
+    return subcommand_funcs[subcommand](daemon.GetDaemonSocketPath()) or 0
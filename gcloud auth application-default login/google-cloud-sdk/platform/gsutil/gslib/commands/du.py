@@ -20,7 +20,10 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import locale
+import os
+import sqlite3
 import sys
+import time
 
 import six
 from gslib.bucket_listing_ref import BucketListingObject
@@ -34,14 +37,21 @@ from gslib.utils import ls_helper
 from gslib.utils.constants import NO_MAX
 from gslib.utils.constants import S3_DELETE_MARKER_GUID
 from gslib.utils.constants import UTF8
+from gslib.utils.inventory_util import InventoryReport
+from gslib.utils.prefix_size_index import DirectorySize
+from gslib.utils.prefix_size_index import GetDirectory
+from gslib.utils.prefix_size_index import PrefixSizeIndex
 from gslib.utils.shim_util import GcloudStorageFlag
 from gslib.utils.shim_util import GcloudStorageMap
 from gslib.utils.text_util import print_to_fd
+from gslib.utils.unit_util import DurationToTimeDelta
 from gslib.utils.unit_util import MakeHumanReadable
 from gslib.utils import text_util
 
 _SYNOPSIS = """
   gsutil du url...
+  gsutil du --index=file [--refresh] url...
+  gsutil du --listing-from=report [--verify-recent=duration] url...
 """
 
 _DETAILED_HELP_TEXT = ("""
@@ -82,6 +92,39 @@ _DETAILED_HELP_TEXT = ("""
   -X          Similar to ``-e``, but excludes patterns from the given file. The
               patterns to exclude should be listed one per line.
 
+  --index=file
+              Reports sizes from a local index of the sizes of the objects
+              in each directory, stored in the given file, instead of
+              listing objects. Only the total size of each URL and of the
+              directories under it are reported. URLs must name buckets or
+              directories, without wildcards, and must have been listed into
+              the index with ``--refresh``. The time of the listings the
+              sizes come from is logged. Cannot be combined with ``-e`` or
+              ``-X``. Sizes including noncurrent versions (``-a``) are
+              indexed separately.
+
+  --refresh   With ``--index``, first lists all objects under each URL and
+              replaces what the index records for it. Refreshing only the
+              directories that have changed keeps the index current for a
+              fraction of the cost of listing the whole bucket.
+
+  --listing-from=report
+              Reports sizes from a storage inventory report instead of
+              listing objects, with the same output as ``--index``. With
+              ``--index``, the index is refreshed from the report. The report
+              may be a local file or a cloud URL, and wildcards can name all
+              the files (shards) of a report; this option can be given more
+              than once. Reports must be CSV, or Parquet if the pyarrow
+              package is installed, and must include the bucket, name and
+              size of each object. Buckets that the report lists no objects
+              in are listed as usual. Cannot be combined with ``-a``.
+
+  --verify-recent=duration
+              With ``--listing-from``, lists the directories holding objects
+              that the report shows were created or updated within the given
+              duration (e.g. 2d, 12h or 30m) of now, instead of reading their
+              sizes from the report.
+
 
 <B>EXAMPLES</B>
   To list the size of each object in a bucket:
@@ -116,8 +159,29 @@ _DETAILED_HELP_TEXT = ("""
   project:
 
       gsutil -o GSUtil:default_project_id=project-name du -shc
+
+  To index the sizes of all objects in a bucket once, then refresh the sizes
+  of a directory that has changed and report the size of the bucket from the
+  index:
+
+    gsutil du -s --index=sizes.db --refresh gs://bucketname
+    gsutil du -s --index=sizes.db --refresh gs://bucketname/logs/2024/
+    gsutil du -s --index=sizes.db gs://bucketname
+
+  To report the size of each directory in a bucket from the shards of an
+  inventory report, listing the directories that changed in the last day:
+
+    gsutil du --listing-from='gs://reports/bucketname/2024-06-01/*.csv' \
+      --verify-recent=1d gs://bucketname
 """)
 
+# Sorts after every character that may follow a directory name.
+_DIRECTORY_END = '\U0010ffff'
+
+
+def _FormatTime(seconds):
+  return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(seconds))
+
 
 class DuCommand(Command):
   """Implementation of gsutil du command."""
@@ -130,6 +194,9 @@ class DuCommand(Command):
       min_args=0,
       max_args=NO_MAX,
       supported_sub_args='0ace:hsX:',
+      supported_private_args=[
+          'index=', 'refresh', 'listing-from=', 'verify-recent='
+      ],
       file_url_ok=False,
       provider_url_ok=True,
       urls_start_arg=0,
@@ -204,6 +271,158 @@ class DuCommand(Command):
 
     return (num_objs, num_bytes)
 
+  def _ListObjects(self, bucket_url, prefix, recursive):
+    return self.WildcardIterator(
+        '%s/%s%s' % (bucket_url, prefix, '**' if recursive else '*'),
+        all_versions=self.all_versions).IterObjects(
+            bucket_listing_fields=['size'])
+
+  def _RefreshIndex(self, index, bucket_url, prefix):
+    """Lists the objects under a prefix into the index."""
+    if self.inventory_report:
+      listed_at = self.inventory_report.report_time
+      blrs = self.inventory_report.IterObjects(
+          StorageUrlFromString(bucket_url),
+          prefix,
+          True,
+          lambda prefix, recursive: self._ListObjects(bucket_url, prefix,
+                                                      recursive),
+          self.logger,
+          verify_recent_seconds=self.verify_recent_seconds)
+    else:
+      listed_at = time.time()
+      blrs = self._ListObjects(bucket_url, prefix, True)
+    directory_sizes = {}
+    for blr in blrs:
+      obj = blr.root_object
+      if (obj.metadata and
+          S3_DELETE_MARKER_GUID in obj.metadata.additionalProperties):
+        continue
+      directory = GetDirectory(blr.storage_url.object_name)
+      num_objects, num_bytes = directory_sizes.get(directory, (0, 0))
+      directory_sizes[directory] = (num_objects + 1, num_bytes + obj.size)
+    index.ReplacePrefix(bucket_url, prefix, self.all_versions, {
+        directory: DirectorySize(*size)
+        for directory, size in six.iteritems(directory_sizes)
+    }, listed_at)
+
+  def _PrintFromIndex(self, index, bucket_url, prefix):
+    """Prints the sizes under a prefix recorded in the index.
+
+    Args:
+      index: PrefixSizeIndex to read.
+      bucket_url: Bucket URL string, e.g. 'gs://bucket'.
+      prefix: Prefix; '' for the whole bucket, otherwise ending in '/'.
+
+    Returns:
+      Total size of the objects under the prefix.
+
+    Raises:
+      CommandException: if the prefix is not in the index.
+    """
+    url_string = '%s/%s' % (bucket_url, prefix)
+    listing_times = index.GetListingTimes(bucket_url, prefix,
+                                          self.all_versions)
+    if not listing_times:
+      raise CommandException(
+          '%s has not been listed into the index %s. Use --refresh to list '
+          'it.' % (url_string, index.index_path))
+    if self.summary_only:
+      total_bytes = index.GetTotalSize(bucket_url, prefix,
+                                       self.all_versions).num_bytes
+    else:
+      # Adds the size of the objects directly under each directory to it and
+      # to each enclosing directory up to the prefix.
+      cumulative_bytes = {prefix: 0}
+      for directory, size in index.IterDirectorySizes(bucket_url, prefix,
+                                                      self.all_versions):
+        cumulative_bytes[prefix] += size.num_bytes
+        end = directory.find('/', len(prefix))
+        while end != -1:
+          enclosing = directory[:end + 1]
+          cumulative_bytes[enclosing] = (cumulative_bytes.get(enclosing, 0) +
+                                         size.num_bytes)
+          end = directory.find('/', end + 1)
+      total_bytes = cumulative_bytes.pop(prefix)
+      # Like the Unix du command, print directories after their contents.
+      for directory in sorted(cumulative_bytes,
+                              key=lambda d: d + _DIRECTORY_END):
+        self._PrintSummaryLine(cumulative_bytes[directory],
+                               '%s/%s' % (bucket_url, directory))
+    self._PrintSummaryLine(total_bytes, url_string.rstrip('/'))
+    oldest, newest = listing_times
+    if oldest == newest:
+      self.logger.info('Sizes under %s are from a listing at %s.', url_string,
+                       _FormatTime(oldest))
+    else:
+      self.logger.info('Sizes under %s are from listings between %s and %s.',
+                       url_string, _FormatTime(oldest), _FormatTime(newest))
+    return total_bytes
+
+  def _RunWithIndex(self):
+    """Reports sizes from the index, refreshing it first if requested."""
+    if self.exclude_patterns:
+      raise CommandException('The -e and -X options cannot be used with '
+                             '--index or --listing-from.')
+    if self.listing_from:
+      if self.all_versions:
+        raise CommandException('The -a option cannot be used with '
+                               '--listing-from.')
+      # Sizes read from the report are kept in memory unless an index is
+      # given to keep them in.
+      self.index_path = self.index_path or ':memory:'
+      self.refresh_index = True
+    try:
+      index = PrefixSizeIndex(self.index_path)
+    except sqlite3.Error as e:
+      raise CommandException('Could not open the index %s: %s' %
+                             (self.index_path, e))
+    report_temp_files = []
+    try:
+      if self.listing_from:
+        self.inventory_report = InventoryReport(self.listing_from,
+                                                self.gsutil_api, self.logger,
+                                                report_temp_files)
+      total_bytes = 0
+      for url_arg in self.args:
+        storage_url = StorageUrlFromString(url_arg)
+        if storage_url.IsFileUrl():
+          raise CommandException('Only cloud URLs are supported for %s' %
+                                 self.command_name)
+        if ContainsWildcard(url_arg):
+          raise CommandException('Wildcards are not supported with --index or '
+                                 '--listing-from.')
+        if storage_url.IsProvider():
+          if self.refresh_index:
+            bucket_urls = [
+                blr.url_string.rstrip('/') for blr in self.WildcardIterator(
+                    '%s://*' % storage_url.scheme).IterBuckets(
+                        bucket_fields=['id'])
+            ]
+          else:
+            bucket_urls = index.ListBuckets(storage_url.scheme,
+                                            self.all_versions)
+          prefixes = [(bucket_url, '') for bucket_url in bucket_urls]
+        else:
+          bucket_url = '%s://%s' % (storage_url.scheme,
+                                    storage_url.bucket_name)
+          prefix = ''
+          if storage_url.IsObject():
+            prefix = storage_url.object_name.rstrip('/') + '/'
+          prefixes = [(bucket_url, prefix)]
+        for bucket_url, prefix in prefixes:
+          if self.refresh_index:
+            self._RefreshIndex(index, bucket_url, prefix)
+          total_bytes += self._PrintFromIndex(index, bucket_url, prefix)
+    finally:
+      index.Close()
+      for temp_file in report_temp_files:
+        os.unlink(temp_file.name)
+
+    if self.produce_total:
+      self._PrintSummaryLine(total_bytes, 'total')
+    return 0
+
   def RunCommand(self):
     """Command entry point for the du command."""
     self.line_ending = '\n'
@@ -212,6 +431,11 @@ class DuCommand(Command):
     self.human_readable = False
     self.summary_only = False
     self.exclude_patterns = []
+    self.index_path = None
+    self.refresh_index = False
+    self.listing_from = []
+    self.verify_recent_seconds = None
+    self.inventory_report = None
     if self.sub_opts:
       for o, a in self.sub_opts:
         if o == '-0':
@@ -236,11 +460,27 @@ class DuCommand(Command):
           self.exclude_patterns = [six.ensure_text(line.strip()) for line in f]
           if f_close:
             f.close()
+        elif o == '--index':
+          self.index_path = a
+        elif o == '--refresh':
+          self.refresh_index = True
+        elif o == '--listing-from':
+          self.listing_from.append(a)
+        elif o == '--verify-recent':
+          self.verify_recent_seconds = DurationToTimeDelta(a).total_seconds()
 
     if not self.args:
       # Default to listing all gs buckets.
       self.args = ['gs://']
 
+    if self.verify_recent_seconds is not None and not self.listing_from:
+      raise CommandException(
+          '--verify-recent can only be used with --listing-from.')
+    if self.index_path or self.listing_from:
+      return self._RunWithIndex()
+    if self.refresh_index:
+      raise CommandException('--refresh can only be used with --index.')
+
     total_bytes = 0
     got_nomatch_errors = False
 
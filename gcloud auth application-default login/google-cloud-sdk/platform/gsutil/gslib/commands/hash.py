@@ -233,9 +233,8 @@ class HashCommand(Command):
                                           src_url=StorageUrlFromString(url_str),
                                           operation_name='Hashing').call)
           hash_dict = self._GetHashClassesFromArgs(calc_crc32c, calc_md5)
-          with open(file_name, 'rb') as fp:
-            hashing_helper.CalculateHashesFromContents(
-                fp, hash_dict, callback_processor=callback_processor)
+          hashing_helper.CalculateHashesFromFile(
+              file_name, hash_dict, callback_processor=callback_processor)
           self.gsutil_api.status_queue.put(
               FileMessage(url,
                           None,
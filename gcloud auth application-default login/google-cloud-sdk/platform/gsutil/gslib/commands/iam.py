@@ -720,7 +720,7 @@ class IamCommand(Command):
       try:
         if surl.IsBucket():
           if self.recursion_requested:
-            surl.object = '*'
+            surl.object_name = '*'
             threaded_wildcards.append(surl.url_string)
           else:
             self.PatchIamHelper(surl, patch_bindings_tuples)
@@ -32,6 +32,7 @@ import os
 import random
 import re
 import socket
+import ssl
 import string
 import subprocess
 import tempfile
@@ -57,6 +58,7 @@ from gslib.exception import CommandException
 from gslib.file_part import FilePart
 from gslib.storage_url import StorageUrlFromString
 from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
+from gslib.utils import perfdiag_stats
 from gslib.utils import text_util
 from gslib.utils.boto_util import GetMaxRetryDelay
 from gslib.utils.boto_util import ResumableThreshold
@@ -77,6 +79,7 @@ from gslib.utils.unit_util import Percentile
 
 _SYNOPSIS = """
   gsutil perfdiag [-i in.json]
+  gsutil perfdiag -i in.json --compare=baseline.json [--threshold=percent]
   gsutil perfdiag [-o out.json] [-n objects] [-c processes]
       [-k threads] [-p parallelism type] [-y slices] [-s size] [-d directory]
       [-t tests] [-j ratio] gs://<bucket_name>...
@@ -231,6 +234,22 @@ _DETAILED_HELP_TEXT = ("""
   -i          Reads the JSON output file created using the ``-o`` command and prints
               a formatted description of the results.
 
+  --compare=baseline.json
+              Used with ``-i``. Instead of describing the results, compares
+              them with those in another output file, such as one from an
+              earlier gsutil version or a different host, and exits with
+              status 1 if any metric regressed. The compared metrics are the
+              median and 90th percentile latency of each operation and object
+              size, the median duration of each connection phase, and the
+              throughput of each throughput test, for those measured in both
+              files. Latencies that increased by less than a millisecond are
+              not reported as regressions.
+
+  --threshold=percent
+              Used with ``--compare``. Sets the change, in percent, in the
+              worse direction at which a metric is reported as regressed.
+              Defaults to 10.
+
   -j          Applies gzip transport encoding and sets the target compression
               ratio for the generated test files. This ratio can be an integer
               between 0 and 100 (inclusive), with 0 generating a file with
@@ -241,6 +260,28 @@ _DETAILED_HELP_TEXT = ("""
               for specific semantics.
 
 
+<B>OUTPUT FILE FORMAT</B>
+  The JSON file written with ``-o`` has a "schema_version" key, which is
+  incremented when the meaning of existing keys changes. Besides the raw
+  latency of each trial (under "latency"), it contains:
+
+  + "latency_histograms": for each operation and object size, the count,
+    minimum, maximum, mean, standard deviation and 50th, 90th, 99th and
+    99.9th percentiles of the latency, in seconds, and a histogram of it as
+    [lower bound in seconds, count] pairs. Histogram buckets are spaced
+    logarithmically, so that each bounds its values to within about 1.6%.
+  + "connection_phases" and "connection_phase_histograms": the time taken
+    to resolve the service's host name ("dns"), open a TCP connection
+    ("connect"), complete the TLS handshake ("tls") and receive the first
+    byte of a response ("first_byte"), measured once per latency iteration
+    on a new connection. These are not measured when a proxy is configured.
+  + "samples" in each throughput test: host counters sampled every half
+    second during the test, giving the CPU time used by gsutil, the
+    percentage of the host's CPU time that was busy, and the rates at which
+    bytes were received and sent on the host's network interfaces, where
+    the operating system makes these available.
+
+
 <B>MEASURING AVAILABILITY</B>
   The ``perfdiag`` command ignores the boto num_retries configuration parameter.
   Instead, it always retries on HTTP errors in the 500 range and keeps track of
@@ -253,6 +294,24 @@ _DETAILED_HELP_TEXT = ("""
   availability numbers reported won't include the throughput measurements.
 
 
+<B>MEASURING WITHOUT A NETWORK</B>
+  To compare the performance of gsutil itself, for example before and after a
+  change, without the variability of a real network and service, you can run
+  ``perfdiag`` against the local JSON API emulator in gslib/tests/gcs_emulator.py.
+  The emulator keeps data in memory, and can add a fixed latency to each
+  request, cap the bandwidth of each connection and fail a fraction of
+  requests, for example:
+
+    python gslib/tests/gcs_emulator.py --port 8080 --bucket bench \\
+        --latency 0.02 --bandwidth 50M --error-rate 0.01
+
+  It prints the "Credentials" settings (gs_json_host, gs_json_port and
+  gs_json_protocol) that point gsutil at it. Put them in a separate boto
+  config file without credentials, and run for example:
+
+    BOTO_CONFIG=emulator.boto gsutil perfdiag -t wthru,rthru gs://bench
+
+
 <B>NOTE</B>
   The ``perfdiag`` command runs a series of tests that collects system information,
   such as the following: 
@@ -466,6 +525,7 @@ class PerfDiagCommand(Command):
       min_args=0,
       max_args=1,
       supported_sub_args='n:c:k:p:y:s:d:t:m:i:o:j:',
+      supported_private_args=['compare=', 'threshold='],
       file_url_ok=False,
       provider_url_ok=False,
       urls_start_arg=0,
@@ -804,13 +864,41 @@ class PerfDiagCommand(Command):
           self.connection_breaks += 1
     return return_val
 
+  def _GetConnectionPhaseEndpoint(self):
+    """Returns (host, port, use_tls) of the service, or None if proxied."""
+    if boto.config.get('Boto', 'proxy', None) or os.environ.get(
+        'https_proxy', os.environ.get('HTTPS_PROXY')):
+      return None
+    if self.gsutil_api.GetApiSelector(self.provider) == ApiSelector.JSON:
+      use_tls = boto.config.get('Credentials', 'gs_json_protocol',
+                                'https') == 'https'
+      host = boto.config.get('Credentials', 'gs_json_host',
+                             'storage.googleapis.com')
+      port = boto.config.get('Credentials', 'gs_json_port', None)
+    else:
+      use_tls = True
+      host = self.XML_API_HOST
+      port = boto.config.get('Credentials', 'gs_port', None)
+    return host, int(port or (443 if use_tls else 80)), use_tls
+
   def _RunLatencyTests(self):
     """Runs latency tests."""
     # Stores timing information for each category of operation.
     self.results['latency'] = defaultdict(list)
+    endpoint = self._GetConnectionPhaseEndpoint()
+    if endpoint:
+      self.results['connection_phases'] = defaultdict(list)
 
     for i in range(self.num_objects):
       self.logger.info('\nRunning latency iteration %d...', i + 1)
+      if endpoint:
+        try:
+          phases = perfdiag_stats.MeasureConnectionPhases(*endpoint)
+        except (socket.error, ssl.SSLError) as e:
+          self.logger.info('Could not measure connection phases: %s', e)
+        else:
+          for phase, seconds in six.iteritems(phases):
+            self.results['connection_phases'][phase].append(seconds)
       for fpath in self.latency_files:
         file_data = temp_file_dict[fpath]
         url = self.bucket_url.Clone()
@@ -1110,22 +1198,24 @@ class PerfDiagCommand(Command):
     self.Upload(self.tcp_warmup_file, warmup_obj_name, self.gsutil_api)
     self.Download(warmup_obj_name, self.gsutil_api)
 
+    sampler = perfdiag_stats.HostCounterSampler()
     t0 = time.time()
-    if self.processes == 1 and self.threads == 1:
-      for i in range(self.num_objects):
-        file_name = file_names[i] if use_file else None
-        self.Download(object_names[i], self.gsutil_api, file_name,
-                      serialization_data[i])
-    else:
-      if self.parallel_strategy in (self.FAN, self.BOTH):
-        need_to_slice = (self.parallel_strategy == self.BOTH)
-        self.PerformFannedDownload(need_to_slice, object_names, file_names,
-                                   serialization_data)
-      elif self.parallel_strategy == self.SLICE:
+    with sampler:
+      if self.processes == 1 and self.threads == 1:
         for i in range(self.num_objects):
           file_name = file_names[i] if use_file else None
-          self.PerformSlicedDownload(object_names[i], file_name,
-                                     serialization_data[i])
+          self.Download(object_names[i], self.gsutil_api, file_name,
+                        serialization_data[i])
+      else:
+        if self.parallel_strategy in (self.FAN, self.BOTH):
+          need_to_slice = (self.parallel_strategy == self.BOTH)
+          self.PerformFannedDownload(need_to_slice, object_names, file_names,
+                                     serialization_data)
+        elif self.parallel_strategy == self.SLICE:
+          for i in range(self.num_objects):
+            file_name = file_names[i] if use_file else None
+            self.PerformSlicedDownload(object_names[i], file_name,
+                                       serialization_data[i])
     t1 = time.time()
 
     time_took = t1 - t0
@@ -1135,6 +1225,8 @@ class PerfDiagCommand(Command):
     self.results[test_name]['time_took'] = time_took
     self.results[test_name]['total_bytes_copied'] = total_bytes_copied
     self.results[test_name]['bytes_per_second'] = bytes_per_second
+    self.results[test_name]['sample_interval'] = sampler.interval
+    self.results[test_name]['samples'] = sampler.samples
 
   def _RunWriteThruTests(self, use_file=False):
     """Runs write throughput tests."""
@@ -1175,29 +1267,31 @@ class PerfDiagCommand(Command):
     for object_name in object_names:
       self.temporary_objects.add(object_name)
 
+    sampler = perfdiag_stats.HostCounterSampler()
     t0 = time.time()
-    if self.processes == 1 and self.threads == 1:
-      for i in range(self.num_objects):
-        self.Upload(file_names[i],
-                    object_names[i],
-                    self.gsutil_api,
-                    use_file,
-                    gzip_encoded=self.gzip_encoded_writes)
-    else:
-      if self.parallel_strategy in (self.FAN, self.BOTH):
-        need_to_slice = (self.parallel_strategy == self.BOTH)
-        self.PerformFannedUpload(need_to_slice,
-                                 file_names,
-                                 object_names,
-                                 use_file,
-                                 gzip_encoded=self.gzip_encoded_writes)
-      elif self.parallel_strategy == self.SLICE:
+    with sampler:
+      if self.processes == 1 and self.threads == 1:
         for i in range(self.num_objects):
-          self.PerformSlicedUpload(file_names[i],
-                                   object_names[i],
+          self.Upload(file_names[i],
+                      object_names[i],
+                      self.gsutil_api,
+                      use_file,
+                      gzip_encoded=self.gzip_encoded_writes)
+      else:
+        if self.parallel_strategy in (self.FAN, self.BOTH):
+          need_to_slice = (self.parallel_strategy == self.BOTH)
+          self.PerformFannedUpload(need_to_slice,
+                                   file_names,
+                                   object_names,
                                    use_file,
-                                   self.gsutil_api,
                                    gzip_encoded=self.gzip_encoded_writes)
+        elif self.parallel_strategy == self.SLICE:
+          for i in range(self.num_objects):
+            self.PerformSlicedUpload(file_names[i],
+                                     object_names[i],
+                                     use_file,
+                                     self.gsutil_api,
+                                     gzip_encoded=self.gzip_encoded_writes)
     t1 = time.time()
 
     time_took = t1 - t0
@@ -1207,6 +1301,8 @@ class PerfDiagCommand(Command):
     self.results[test_name]['time_took'] = time_took
     self.results[test_name]['total_bytes_copied'] = total_bytes_copied
     self.results[test_name]['bytes_per_second'] = bytes_per_second
+    self.results[test_name]['sample_interval'] = sampler.interval
+    self.results[test_name]['samples'] = sampler.samples
 
   def _RunListTests(self):
     """Runs eventual consistency listing latency tests."""
@@ -1778,6 +1874,92 @@ class PerfDiagCommand(Command):
 
     self.results['sysinfo'] = sysinfo
 
+  def _AddHistograms(self):
+    """Adds histograms of the latencies measured to the results."""
+    for trials_key, histograms_key in (('latency', 'latency_histograms'),
+                                       ('connection_phases',
+                                        'connection_phase_histograms')):
+      if trials_key in self.results:
+        self.results[histograms_key] = {
+            key: perfdiag_stats.MakeLatencyHistogram(trials)
+            for key, trials in six.iteritems(self.results[trials_key])
+        }
+
+  def _DisplayComparison(self, baseline):
+    """Prints a comparison of the results with baseline results.
+
+    Args:
+      baseline: Results dict read from the --compare file.
+
+    Returns:
+      1 if any metric regressed, otherwise 0.
+    """
+    comparisons = perfdiag_stats.CompareResults(baseline, self.results,
+                                                self.regression_threshold)
+    text_util.print_to_fd()
+    text_util.print_to_fd('=' * 78)
+    text_util.print_to_fd('COMPARISON WITH BASELINE'.center(78))
+    text_util.print_to_fd('=' * 78)
+    text_util.print_to_fd('Baseline: %s (gsutil %s)' %
+                          (self.compare_file,
+                           baseline.get('gsutil_version', 'unknown')))
+    text_util.print_to_fd('Current:  %s (gsutil %s)' %
+                          (self.input_file,
+                           self.results.get('gsutil_version', 'unknown')))
+    text_util.print_to_fd()
+    if not comparisons:
+      text_util.print_to_fd('The files have no metrics in common.')
+      return 0
+    text_util.print_to_fd('Metric                               Baseline         '
+                          'Current   Change')
+    text_util.print_to_fd('===================================  ==============  '
+                          '==============  =======')
+    for comparison in comparisons:
+      if comparison.higher_is_better:
+        values = [
+            '%s/s' % MakeBitsHumanReadable(value * 8)
+            for value in (comparison.baseline, comparison.current)
+        ]
+      else:
+        values = [
+            '%.1f ms' % (value * 1000)
+            for value in (comparison.baseline, comparison.current)
+        ]
+      change = ('%+.1f%%' % (comparison.change * 100)
+                if comparison.change is not None else 'n/a')
+      text_util.print_to_fd(
+          '%s  %s  %s  %s%s' %
+          (comparison.name.ljust(35), values[0].rjust(14), values[1].rjust(14),
+           change.rjust(7), '  REGRESSED' if comparison.regressed else ''))
+    regressions = sum(1 for c in comparisons if c.regressed)
+    text_util.print_to_fd()
+    text_util.print_to_fd(
+        '%d of %d metrics regressed by more than %g%%.' %
+        (regressions, len(comparisons), self.regression_threshold * 100))
+    return 1 if regressions else 0
+
+  def _DisplaySamples(self, thru_results):
+    """Prints a summary of the host counters sampled during a test."""
+    samples = thru_results.get('samples')
+    if not samples:
+      return
+    for key, description, fmt in (
+        ('host_cpu_percent', 'Host CPU busy', '%.0f%%'),
+        ('net_rx_bytes_per_second', 'Host network receive', None),
+        ('net_tx_bytes_per_second', 'Host network send', None)):
+      values = sorted(sample[key] for sample in samples if key in sample)
+      if not values:
+        continue
+      if fmt:
+        formatted = [fmt % v for v in (Percentile(values, 0.5), values[-1])]
+      else:
+        formatted = [
+            '%s/s' % MakeBitsHumanReadable(v * 8)
+            for v in (Percentile(values, 0.5), values[-1])
+        ]
+      text_util.print_to_fd('%s: median %s, peak %s' %
+                            (description, formatted[0], formatted[1]))
+
   def _DisplayStats(self, trials):
     """Prints out mean, standard deviation, median, and 90th percentile."""
     n = len(trials)
@@ -1840,6 +2022,24 @@ class PerfDiagCommand(Command):
                                 end=' ')
           self._DisplayStats(trials)
 
+    if 'connection_phase_histograms' in self.results:
+      text_util.print_to_fd()
+      text_util.print_to_fd('-' * 78)
+      text_util.print_to_fd('Connection Phases'.center(78))
+      text_util.print_to_fd('-' * 78)
+      text_util.print_to_fd(
+          '     Phase  Trials  Median (ms)  90th % (ms)  99th % (ms)')
+      text_util.print_to_fd(
+          '==========  ======  ===========  ===========  ===========')
+      for phase in perfdiag_stats.CONNECTION_PHASES:
+        histogram = self.results['connection_phase_histograms'].get(phase)
+        if histogram:
+          text_util.print_to_fd(
+              '%s  %s  %s' %
+              (phase.rjust(10), str(histogram['count']).rjust(6), '  '.join(
+                  ('%.1f' % (histogram['percentiles'][p] * 1000)).rjust(11)
+                  for p in ('50', '90', '99'))))
+
     if 'write_throughput' in self.results:
       text_util.print_to_fd()
       text_util.print_to_fd('-' * 78)
@@ -1856,6 +2056,7 @@ class PerfDiagCommand(Command):
       if 'parallelism' in write_thru:  # Compatibility with old versions.
         text_util.print_to_fd('Parallelism strategy: %s' %
                               write_thru['parallelism'])
+      self._DisplaySamples(write_thru)
 
     if 'write_throughput_file' in self.results:
       text_util.print_to_fd()
@@ -1873,6 +2074,7 @@ class PerfDiagCommand(Command):
       if 'parallelism' in write_thru_file:  # Compatibility with old versions.
         text_util.print_to_fd('Parallelism strategy: %s' %
                               write_thru_file['parallelism'])
+      self._DisplaySamples(write_thru_file)
 
     if 'read_throughput' in self.results:
       text_util.print_to_fd()
@@ -1890,6 +2092,7 @@ class PerfDiagCommand(Command):
       if 'parallelism' in read_thru:  # Compatibility with old versions.
         text_util.print_to_fd('Parallelism strategy: %s' %
                               read_thru['parallelism'])
+      self._DisplaySamples(read_thru)
 
     if 'read_throughput_file' in self.results:
       text_util.print_to_fd()
@@ -1907,6 +2110,7 @@ class PerfDiagCommand(Command):
       if 'parallelism' in read_thru_file:  # Compatibility with old versions.
         text_util.print_to_fd('Parallelism strategy: %s' %
                               read_thru_file['parallelism'])
+      self._DisplaySamples(read_thru_file)
 
     if 'listing' in self.results:
       text_util.print_to_fd()
@@ -2126,6 +2330,17 @@ class PerfDiagCommand(Command):
     except ValueError:
       raise CommandException(msg)
 
+  def _ReadResultsFile(self, path, option):
+    """Reads a results file written with -o, for the given option."""
+    if not os.path.isfile(path):
+      raise CommandException("Invalid input file (%s): '%s'." % (option, path))
+    try:
+      with open(path, 'r') as f:
+        return perfdiag_stats.UpgradeResults(json.load(f))
+    except ValueError:
+      raise CommandException("Could not decode input file (%s): '%s'." %
+                             (option, path))
+
   def _ParseArgs(self):
     """Parses arguments for perfdiag command."""
     # From -n.
@@ -2150,6 +2365,10 @@ class PerfDiagCommand(Command):
     self.output_file = None
     # From -i.
     self.input_file = None
+    # From --compare.
+    self.compare_file = None
+    # From --threshold.
+    self.regression_threshold = perfdiag_stats.DEFAULT_REGRESSION_THRESHOLD
     # From -m.
     self.metadata_keys = {}
     # From -j.
@@ -2204,16 +2423,18 @@ class PerfDiagCommand(Command):
           self.output_file = os.path.abspath(a)
         if o == '-i':
           self.input_file = os.path.abspath(a)
-          if not os.path.isfile(self.input_file):
-            raise CommandException("Invalid input file (-i): '%s'." % a)
+          self.results = self._ReadResultsFile(self.input_file, '-i')
+          self.logger.info("Read input file: '%s'.", self.input_file)
+        if o == '--compare':
+          self.compare_file = os.path.abspath(a)
+        if o == '--threshold':
           try:
-            with open(self.input_file, 'r') as f:
-              self.results = json.load(f)
-              self.logger.info("Read input file: '%s'.", self.input_file)
+            self.regression_threshold = float(a) / 100
           except ValueError:
-            raise CommandException("Could not decode input file (-i): '%s'." %
-                                   a)
-          return
+            raise CommandException('Invalid --threshold parameter.')
+          if self.regression_threshold < 0:
+            raise CommandException(
+                'The --threshold parameter must not be negative.')
         if o == '-j':
           self.gzip_encoded_writes = True
           try:
@@ -2225,6 +2446,11 @@ class PerfDiagCommand(Command):
             raise CommandException(
                 'The -j parameter must be between 0 and 100 (inclusive).')
 
+    if self.compare_file and not self.input_file:
+      raise CommandException('The --compare option requires -i.')
+    if self.input_file:
+      return
+
     # If parallelism is specified, default parallelism strategy to fan.
     if (self.processes > 1 or self.threads > 1) and not self.parallel_strategy:
       self.parallel_strategy = self.FAN
@@ -2271,6 +2497,9 @@ class PerfDiagCommand(Command):
     """Called by gsutil when the command is being invoked."""
     self._ParseArgs()
 
+    if self.compare_file:
+      return self._DisplayComparison(
+          self._ReadResultsFile(self.compare_file, '--compare'))
     if self.input_file:
       self._DisplayResults()
       return 0
@@ -2337,6 +2566,8 @@ class PerfDiagCommand(Command):
       self.results['connection_breaks'] = self.connection_breaks
       self.results['gsutil_version'] = gslib.VERSION
       self.results['boto_version'] = boto.__version__
+      self.results['schema_version'] = perfdiag_stats.RESULTS_SCHEMA_VERSION
+      self._AddHistograms()
 
       self._TearDown()
       self._DisplayResults()
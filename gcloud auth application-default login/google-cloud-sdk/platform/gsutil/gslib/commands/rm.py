@@ -174,6 +174,10 @@ def _RemoveFuncWrapper(cls, name_expansion_result, thread_state=None):
   cls.RemoveFunc(name_expansion_result, thread_state=thread_state)
 
 
+async def _RemoveFuncAsync(cls, name_expansion_result, engine):
+  return await cls.RemoveFuncAsync(name_expansion_result, engine)
+
+
 def _ExceptionMatchesBucketToDelete(bucket_strings_to_delete, e):
   """Returns True if the exception matches a bucket slated for deletion.
 
@@ -319,7 +323,8 @@ class RmCommand(Command):
                  _RemoveExceptionHandler,
                  fail_on_error=(not self.continue_on_error),
                  shared_attrs=['op_failure_count', 'bucket_not_found_count'],
-                 seek_ahead_iterator=seek_ahead_iterator)
+                 seek_ahead_iterator=seek_ahead_iterator,
+                 async_func=_RemoveFuncAsync)
 
     # Assuming the bucket has versioning enabled, url's that don't map to
     # objects should throw an error even with all_versions, since the prior
@@ -369,7 +374,8 @@ class RmCommand(Command):
           self.Apply(_RemoveFuncWrapper,
                      name_expansion_iterator,
                      _RemoveFoldersExceptionHandler,
-                     fail_on_error=False)
+                     fail_on_error=False,
+                     async_func=_RemoveFuncAsync)
         except CommandException as e:
           # Ignore exception from name expansion due to an absent folder file.
           if not e.reason.startswith(NO_URLS_MATCHED_PREFIX):
@@ -414,3 +420,22 @@ class RmCommand(Command):
       DecrementFailureCount()
     _PutToQueueWithTimeout(gsutil_api.status_queue,
                            MetadataMessage(message_time=time.time()))
+
+  async def RemoveFuncAsync(self, name_expansion_result, engine):
+    """Removes an object with an AsyncEngine; see RemoveFunc."""
+    from gslib.async_engine import RUN_IN_THREAD  # pylint: disable=g-import-not-at-top
+    exp_src_url = name_expansion_result.expanded_storage_url
+    if exp_src_url.scheme != 'gs':
+      return RUN_IN_THREAD
+    self.logger.info('Removing %s...', exp_src_url)
+    try:
+      await engine.DeleteObject(exp_src_url.bucket_name,
+                                exp_src_url.object_name,
+                                preconditions=self.preconditions,
+                                generation=exp_src_url.generation)
+    except NotFoundException:
+      # See RemoveFunc for why this isn't an error.
+      self.logger.info('Cannot find %s', exp_src_url)
+      DecrementFailureCount()
+    _PutToQueueWithTimeout(engine.status_queue,
+                           MetadataMessage(message_time=time.time()))
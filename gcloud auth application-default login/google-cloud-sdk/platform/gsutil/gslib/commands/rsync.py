@@ -27,6 +27,8 @@ from itertools import islice
 import logging
 import os
 import re
+import stat
+import struct
 import tempfile
 import textwrap
 import time
@@ -68,6 +70,8 @@ from gslib.utils.hashing_helper import CalculateB64EncodedCrc32cFromContents
 from gslib.utils.hashing_helper import CalculateB64EncodedMd5FromContents
 from gslib.utils.hashing_helper import SLOW_CRCMOD_RSYNC_WARNING
 from gslib.utils.hashing_helper import SLOW_CRCMOD_WARNING
+from gslib.utils.inotify_util import DirectoryWatcher
+from gslib.utils.inventory_util import InventoryReport
 from gslib.utils.metadata_util import CreateCustomMetadata
 from gslib.utils.metadata_util import GetValueFromObjectCustomMetadata
 from gslib.utils.metadata_util import ObjectIsGzipEncoded
@@ -91,13 +95,18 @@ from gslib.utils.posix_util import ValidateFilePermissionAccess
 from gslib.utils.posix_util import WarnFutureTimestamp
 from gslib.utils.posix_util import WarnInvalidValue
 from gslib.utils.posix_util import WarnNegativeAttribute
+from gslib.utils.rsync_util import DEFAULT_RSYNC_LISTING_FORMAT
+from gslib.utils.rsync_util import DEFAULT_RSYNC_WATCH_DELAY
 from gslib.utils.rsync_util import DiffAction
+from gslib.utils.rsync_util import LISTING_FORMAT_BINARY
+from gslib.utils.rsync_util import LISTING_FORMAT_TEXT
 from gslib.utils.rsync_util import RsyncDiffToApply
 from gslib.utils.shim_util import GcloudStorageFlag
 from gslib.utils.shim_util import GcloudStorageMap
 from gslib.utils.system_util import IS_WINDOWS
 from gslib.utils.translation_helper import CopyCustomMetadata
 from gslib.utils.unit_util import CalculateThroughput
+from gslib.utils.unit_util import DurationToTimeDelta
 from gslib.utils.unit_util import SECONDS_PER_DAY
 from gslib.utils.unit_util import TEN_MIB
 from gslib.wildcard_iterator import CreateWildcardIterator
@@ -523,12 +532,56 @@ _DETAILED_HELP_TEXT = ("""
                  .txt files being included, regardless of whether they appear in
                  subdirectories that end in .txt.
 
+  --listing-from=report
+                 Reads the objects in the source or destination bucket from a
+                 storage inventory report instead of listing them, which for
+                 very large buckets takes a read of the report rather than
+                 hours of listing requests. The report may be a local file or
+                 a cloud URL, and wildcards can name all the files (shards) of
+                 a report; this option can be given more than once. Reports
+                 must be CSV, or Parquet if the pyarrow package is installed,
+                 and must include the bucket, name and size of each object.
+                 Include crc32c or md5Hash to compare objects by checksum.
+                 A bucket that the report lists no objects in is listed as
+                 usual.
+
+                 NOTE: a report doesn't show changes made after it was
+                 generated, or custom metadata such as modification times.
+                 Objects missing from the report are treated as absent, so
+                 be especially careful with -d. See --verify-recent.
+
+  --verify-recent=duration
+                 With --listing-from, lists the directories holding objects
+                 that the report shows were created or updated within the
+                 given duration (e.g. 2d, 12h or 30m) of now, instead of
+                 reading their objects from the report.
+
+  --watch        After synchronizing, keeps running and synchronizes the files
+                 in the local source directory as they change, until
+                 interrupted (Linux only). Changes are noticed through inotify
+                 rather than by listing the directory again, and are
+                 synchronized in batches once they have settled for the number
+                 of seconds given by the rsync_watch_delay boto config option
+                 (1 by default). Files are copied once closed after writing.
+                 If the kernel drops change events, or a directory is removed
+                 with -d, the source and destination are compared in full
+                 again. Can't be combined with -i, -u or --listing-from.
+
 """)
 # pylint: enable=anomalous-backslash-in-string
 
 _NA = '-'
 _OUTPUT_BUFFER_SIZE = 64 * 1024
 _PROGRESS_REPORT_LISTING_COUNT = 10000
+# With --watch, changes are synchronized at most this many times the watch
+# delay after the first of them, even if more keep coming.
+_WATCH_MAX_DELAY_FACTOR = 10
+
+# Binary listing records (see _BuildTmpOutputRecord) start with the lengths of
+# the UTF-8 URL, crc32c and md5 that follow the record's fixed fields: size,
+# time_created, atime, mtime, mode, uid and gid.
+_LISTING_RECORD_HEADER = struct.Struct('<IHH7q')
+_LISTING_RECORD_LENGTHS = struct.Struct('<IHH')
 
 # Tracks files we need to clean up at end or if interrupted. Because some
 # files are passed to rsync's diff iterators, it is difficult to manage when
@@ -572,6 +625,10 @@ def CleanUpTempFiles():
             'Failed to close and delete temp file "%s". Got an error:\n%s',
             fileobj.name, e)
 
+  # rsync --watch compares the directories again after some changes, so the
+  # files of each comparison must not accumulate.
+  del _tmp_files[:]
+
 
 def _DiffToApplyArgChecker(command_instance, diff_to_apply):
   """Arg checker that skips symlinks if -e flag specified."""
@@ -641,20 +698,25 @@ def _ListUrlRootFunc(cls, args_tuple, thread_state=None):
 
   Args:
     cls: Command instance.
-    args_tuple: (base_url_str, out_file_name, desc), where base_url_str is
-                top-level URL string to list; out_filename is name of file to
-                which sorted output should be written; desc is 'source' or
-                'destination'.
+    args_tuple: (base_url_str, out_file_name, desc, listing_format), where
+                base_url_str is top-level URL string to list; out_filename is
+                name of file to which sorted output should be written; desc is
+                'source' or 'destination'; listing_format is
+                LISTING_FORMAT_BINARY or LISTING_FORMAT_TEXT.
     thread_state: gsutil Cloud API instance to use.
   """
   gsutil_api = GetCloudApiInstance(cls, thread_state=thread_state)
-  (base_url_str, out_filename, desc) = args_tuple
+  (base_url_str, out_filename, desc, listing_format) = args_tuple
   # We sort while iterating over base_url_str, allowing parallelism of batched
   # sorting with collecting the listing.
-  out_file = io.open(out_filename, mode='w', encoding=constants.UTF8)
+  if listing_format == LISTING_FORMAT_BINARY:
+    out_file = open(out_filename, 'wb')
+  else:
+    out_file = io.open(out_filename, mode='w', encoding=constants.UTF8)
   try:
-    _BatchSort(_FieldedListingIterator(cls, gsutil_api, base_url_str, desc),
-               out_file)
+    _BatchSort(
+        _FieldedListingIterator(cls, gsutil_api, base_url_str, desc,
+                                listing_format), out_file, listing_format)
   except Exception as e:  # pylint: disable=broad-except
     # Abandon rsync if an exception percolates up to this layer - retryable
     # exceptions are handled in the lower layers, so we got a non-retryable
@@ -685,13 +747,25 @@ def _LocalDirIterator(base_url):
   Yields:
     BucketListingObject for each file in the directory.
   """
-  for filename in os.listdir(base_url.object_name):
-    filename = os.path.join(base_url.object_name, filename)
-    if os.path.isfile(filename):
-      yield BucketListingObject(StorageUrlFromString(filename), None)
+  with os.scandir(base_url.object_name) as it:
+    for entry in it:
+      try:
+        if not entry.is_file():
+          continue
+        file_stat = entry.stat()
+      except OSError:
+        continue
+      filename = os.path.join(base_url.object_name, entry.name)
+      yield BucketListingObject(StorageUrlFromString(filename),
+                                None,
+                                file_stat=file_stat)
 
 
-def _FieldedListingIterator(cls, gsutil_api, base_url_str, desc):
+def _FieldedListingIterator(cls,
+                            gsutil_api,
+                            base_url_str,
+                            desc,
+                            listing_format=LISTING_FORMAT_TEXT):
   """Iterator over base_url_str formatting output per _BuildTmpOutputLine.
 
   Args:
@@ -699,10 +773,17 @@ def _FieldedListingIterator(cls, gsutil_api, base_url_str, desc):
     gsutil_api: gsutil Cloud API instance to use for bucket listing.
     base_url_str: The top-level URL string over which to iterate.
     desc: 'source' or 'destination'.
+    listing_format: LISTING_FORMAT_TEXT to yield lines formatted per
+        _BuildTmpOutputLine, or LISTING_FORMAT_BINARY to yield records
+        formatted per _BuildTmpOutputRecord.
 
   Yields:
-    Output line formatted per _BuildTmpOutputLine.
+    Output line or record for each listed file or object.
   """
+  if listing_format == LISTING_FORMAT_BINARY:
+    build_output = _BuildTmpOutputRecord
+  else:
+    build_output = _BuildTmpOutputLine
   base_url = StorageUrlFromString(base_url_str)
   if base_url.scheme == 'file' and not cls.recursion_requested:
     iterator = _LocalDirIterator(base_url)
@@ -730,15 +811,32 @@ def _FieldedListingIterator(cls, gsutil_api, base_url_str, desc):
         base_url, cls.exclude_dirs,
         cls.exclude_pattern) if cls.exclude_pattern is not None else None
 
-    iterator = CreateWildcardIterator(
-        wildcard,
-        gsutil_api,
-        project_id=cls.project_id,
-        exclude_tuple=exclude_tuple,
-        ignore_symlinks=cls.exclude_symlinks,
-        logger=cls.logger).IterObjects(
-            # Request just the needed fields, to reduce bandwidth usage.
-            bucket_listing_fields=fields)
+    def _ListObjects(wildcard):
+      return CreateWildcardIterator(
+          wildcard,
+          gsutil_api,
+          project_id=cls.project_id,
+          exclude_tuple=exclude_tuple,
+          ignore_symlinks=cls.exclude_symlinks,
+          logger=cls.logger).IterObjects(
+              # Request just the needed fields, to reduce bandwidth usage.
+              bucket_listing_fields=fields)
+
+    if base_url.IsCloudUrl() and cls.inventory_report:
+      bucket_url = StorageUrlFromString(base_url.bucket_url_string)
+      prefix = ''
+      if base_url.IsObject():
+        prefix = base_url.object_name.rstrip('/') + '/'
+      iterator = cls.inventory_report.IterObjects(
+          bucket_url,
+          prefix,
+          cls.recursion_requested,
+          lambda prefix, recursive: _ListObjects('%s%s%s' % (
+              bucket_url.url_string, prefix, '**' if recursive else '*')),
+          cls.logger,
+          verify_recent_seconds=cls.verify_recent_seconds)
+    else:
+      iterator = _ListObjects(wildcard)
   i = 0
   for blr in iterator:
     # Various GUI tools (like the GCS web console) create placeholder objects
@@ -757,32 +855,37 @@ def _FieldedListingIterator(cls, gsutil_api, base_url_str, desc):
     if (cls.exclude_symlinks and url.IsFileUrl() and
         os.path.islink(url.object_name)):
       continue
-    if cls.exclude_pattern:
-      # The wildcard_iterator may optionally use the exclude pattern to exclude
-      # directories while this section excludes individual files.
-      str_to_check = url.url_string[len(base_url.url_string):]
-      if str_to_check.startswith(url.delim):
-        str_to_check = str_to_check[1:]
-      if cls.exclude_pattern.match(str_to_check):
-        continue
+    # The wildcard_iterator may optionally use the exclude pattern to exclude
+    # directories while this excludes individual files.
+    if _IsExcluded(cls, base_url, url):
+      continue
     i += 1
     if i % _PROGRESS_REPORT_LISTING_COUNT == 0:
       cls.logger.info('At %s listing %d...', desc, i)
-    yield _BuildTmpOutputLine(blr)
+    yield build_output(blr)
 
 
-def _BuildTmpOutputLine(blr):
-  """Builds line to output to temp file for given BucketListingRef.
+def _IsExcluded(cls, base_url, url):
+  """Returns True if url is excluded by the -x or -y pattern."""
+  if not cls.exclude_pattern:
+    return False
+  str_to_check = url.url_string[len(base_url.url_string):]
+  if str_to_check.startswith(url.delim):
+    str_to_check = str_to_check[1:]
+  return bool(cls.exclude_pattern.match(str_to_check))
+
+
+def _GetTmpOutputFields(blr):
+  """Gets the fields output to temp files for given BucketListingRef.
 
   Args:
     blr: The BucketListingRef.
 
   Returns:
-    The output line, formatted as
-    _EncodeUrl(URL)<sp>size<sp>time_created<sp>atime<sp>mtime<sp>mode<sp>uid<sp>
-    gid<sp>crc32c<sp>md5 where md5 will only be present for cloud URLs that
-    aren't composite objects. A missing field is populated with '-', or -1 in
-    the case of atime/mtime/time_created.
+    Tuple (URL, size, time_created, atime, mtime, mode, uid, gid, crc32c, md5)
+    where md5 will only be present for cloud URLs that aren't composite
+    objects. A missing field is populated with '-', or -1 in the case of
+    atime/mtime/time_created.
   """
   atime = NA_TIME
   crc32c = _NA
@@ -794,7 +897,9 @@ def _BuildTmpOutputLine(blr):
   uid = NA_ID
   url = blr.storage_url
   if url.IsFileUrl():
-    mode, _, _, _, uid, gid, size, atime, mtime, _ = os.stat(url.object_name)
+    # Reuse the stat from listing the file, if there was one.
+    file_stat = blr.file_stat or os.stat(url.object_name)
+    mode, _, _, _, uid, gid, size, atime, mtime, _ = file_stat
     # atime/mtime can be a float, so it needs to be converted to a long.
     atime = long(atime)
     mtime = long(mtime)
@@ -835,22 +940,134 @@ def _BuildTmpOutputLine(blr):
     md5 = blr.root_object.md5Hash or _NA
   else:
     raise CommandException('Got unexpected URL type (%s)' % url.scheme)
-  attrs = [
-      _EncodeUrl(url.url_string),  # binary str in py2 / unicode str py 3
-      size,  # int
-      time_created,  # int
-      atime,  # long
-      mtime,  # long
-      mode,  # int
-      uid,  # int
-      gid,  # int
-      crc32c,  # unicode
-      md5,  # unicode
-  ]
+  return (url.url_string, size, time_created, atime, mtime, mode, uid, gid,
+          crc32c, md5)
+
+
+def _BuildTmpOutputLine(blr):
+  """Builds line to output to temp file for given BucketListingRef.
+
+  Args:
+    blr: The BucketListingRef.
+
+  Returns:
+    The output line, formatted as
+    _EncodeUrl(URL)<sp>size<sp>time_created<sp>atime<sp>mtime<sp>mode<sp>uid<sp>
+    gid<sp>crc32c<sp>md5, with fields as described in _GetTmpOutputFields.
+  """
+  attrs = list(_GetTmpOutputFields(blr))
+  attrs[0] = _EncodeUrl(attrs[0])
   attrs = [six.ensure_text(str(i)) for i in attrs]
   return ' '.join(attrs) + '\n'
 
 
+def _BuildTmpOutputRecord(blr):
+  """Builds binary record to output to temp file for given BucketListingRef.
+
+  This is the compact equivalent of _BuildTmpOutputLine: the numeric fields
+  are packed per _LISTING_RECORD_HEADER, followed by the URL, crc32c and md5
+  as raw UTF-8, so that nothing needs to be quoted, split or converted from
+  decimal when the record is read back. A missing crc32c or md5 is stored
+  empty.
+
+  Args:
+    blr: The BucketListingRef.
+
+  Returns:
+    The output record, as bytes.
+  """
+  (url_string, size, time_created, atime, mtime, mode, uid, gid, crc32c,
+   md5) = _GetTmpOutputFields(blr)
+  url_bytes = url_string.encode(constants.UTF8)
+  crc32c = b'' if crc32c == _NA else crc32c.encode(constants.UTF8)
+  md5 = b'' if md5 == _NA else md5.encode(constants.UTF8)
+  return b''.join((
+      _LISTING_RECORD_HEADER.pack(len(url_bytes), len(crc32c), len(md5), size,
+                                  time_created, atime, mtime, mode, uid, gid),
+      url_bytes,
+      crc32c,
+      md5,
+  ))
+
+
+def _ReadTmpFileRecords(fp, with_sort_keys=False):
+  """Yields the binary records written by _BuildTmpOutputRecord to fp.
+
+  Args:
+    fp: File opened for reading in binary mode.
+    with_sort_keys: If True, yield (sort key, record) tuples, with sort keys as
+        returned by _GetTmpFileRecordSortKey, so that records can be merged by
+        comparing the tuples.
+
+  Yields:
+    Each record, as bytes.
+
+  Raises:
+    CommandException if the file ends partway through a record.
+  """
+  header_size = _LISTING_RECORD_HEADER.size
+  unpack_lengths = _LISTING_RECORD_LENGTHS.unpack_from
+  read = fp.read
+  while True:
+    header = read(header_size)
+    if not header:
+      return
+    url_len, crc32c_len, md5_len = unpack_lengths(header)
+    record = header + read(url_len + crc32c_len + md5_len)
+    if len(record) != header_size + url_len + crc32c_len + md5_len:
+      raise CommandException('Truncated rsync listing record in %s' % fp.name)
+    if with_sort_keys:
+      yield (record[header_size:header_size + url_len].replace(b'\\', b'/'),
+             record)
+    else:
+      yield record
+
+
+def _GetTmpFileRecordSortKey(record):
+  """Returns the key binary records are sorted by: their URL as UTF-8 bytes.
+
+  Backslashes are sorted as slashes, consistent with how _DiffIterator
+  normalizes URLs before comparing them. UTF-8 byte order is code point
+  order, so this orders records the same as comparing the URL strings.
+
+  Args:
+    record: Record formatted per _BuildTmpOutputRecord.
+
+  Returns:
+    The sort key, as bytes.
+  """
+  header_size = _LISTING_RECORD_HEADER.size
+  url_len = _LISTING_RECORD_LENGTHS.unpack_from(record)[0]
+  return record[header_size:header_size + url_len].replace(b'\\', b'/')
+
+
+def _ParseTmpFileRecord(record):
+  """Parses a record from _BuildTmpOutputRecord.
+
+  Args:
+    record: The record to parse.
+
+  Returns:
+    Parsed tuple as returned by _DiffIterator._ParseTmpFileLine.
+  """
+  (url_len, crc32c_len, md5_len, size, time_created, atime, mtime, mode, uid,
+   gid) = _LISTING_RECORD_HEADER.unpack_from(record)
+  url_end = _LISTING_RECORD_HEADER.size + url_len
+  crc32c_end = url_end + crc32c_len
+  return (
+      record[_LISTING_RECORD_HEADER.size:url_end].decode(constants.UTF8),
+      size,
+      time_created,
+      atime,
+      mtime,
+      mode,
+      uid,
+      gid,
+      record[url_end:crc32c_end].decode(constants.UTF8) or _NA,
+      record[crc32c_end:crc32c_end + md5_len].decode(constants.UTF8) or _NA,
+  )
+
+
 def _EncodeUrl(url_string):
   """Encodes url_str with quote plus encoding and UTF8 character encoding.
 
@@ -887,20 +1104,22 @@ def _DecodeUrl(enc_url_string):
 
 
 # pylint: disable=bare-except
-def _BatchSort(in_iter, out_file):
+def _BatchSort(in_iter, out_file, listing_format=LISTING_FORMAT_TEXT):
   """Sorts input lines from in_iter and outputs to out_file.
 
   Sorts in batches as input arrives, so input file does not need to be loaded
   into memory all at once. Derived from Python Recipe 466302: Sorting big
   files the Python 2.4 way by Nicolas Lehuen.
 
-  Sorted format is per _BuildTmpOutputLine. We're sorting on the entire line
+  Text format is per _BuildTmpOutputLine. We're sorting on the entire line
   when we could just sort on the first record (URL); but the sort order is
-  identical either way.
+  identical either way. Binary format is per _BuildTmpOutputRecord, sorted
+  per _GetTmpFileRecordSortKey.
 
   Args:
     in_iter: Input iterator.
-    out_file: Output file.
+    out_file: Output file, opened in binary mode for LISTING_FORMAT_BINARY.
+    listing_format: LISTING_FORMAT_TEXT or LISTING_FORMAT_BINARY.
   """
   # Note: If chunk_files gets very large we can run out of open FDs. See .boto
   # file comments about rsync_buffer_lines. If increasing rsync_buffer_lines
@@ -908,20 +1127,36 @@ def _BatchSort(in_iter, out_file):
   # bucket), an option would be to make gsutil merge in passes, never
   # opening all chunk files simultaneously.
   buffer_size = config.getint('GSUtil', 'rsync_buffer_lines', 32000)
+  binary = listing_format == LISTING_FORMAT_BINARY
   chunk_files = []
   try:
     while True:
-      current_chunk = sorted(islice(in_iter, buffer_size))
+      if binary:
+        current_chunk = sorted(islice(in_iter, buffer_size),
+                               key=_GetTmpFileRecordSortKey)
+      else:
+        current_chunk = sorted(islice(in_iter, buffer_size))
       if not current_chunk:
         break
-      output_chunk = io.open('%s-%06i' % (out_file.name, len(chunk_files)),
-                             mode='w+',
-                             encoding=constants.UTF8)
-      chunk_files.append(output_chunk)
-      output_chunk.write(six.text_type(''.join(current_chunk)))
+      chunk_file_name = '%s-%06i' % (out_file.name, len(chunk_files))
+      if binary:
+        output_chunk = open(chunk_file_name, 'w+b')
+        chunk_files.append(output_chunk)
+        output_chunk.write(b''.join(current_chunk))
+      else:
+        output_chunk = io.open(chunk_file_name,
+                               mode='w+',
+                               encoding=constants.UTF8)
+        chunk_files.append(output_chunk)
+        output_chunk.write(six.text_type(''.join(current_chunk)))
       output_chunk.flush()
       output_chunk.seek(0)
-    out_file.writelines(heapq.merge(*chunk_files))
+    if binary:
+      out_file.writelines(record for _, record in heapq.merge(*[
+          _ReadTmpFileRecords(f, with_sort_keys=True) for f in chunk_files
+      ]))
+    else:
+      out_file.writelines(heapq.merge(*chunk_files))
   except IOError as e:
     if e.errno == errno.EMFILE:
       raise CommandException('\n'.join(
@@ -956,6 +1191,12 @@ class _DiffIterator(object):
     self.preserve_posix = command_obj.preserve_posix_attrs
     self.skip_old_files = command_obj.skip_old_files
     self.ignore_existing = command_obj.ignore_existing
+    # The text format is kept for debugging, as its listings can be read with
+    # standard tools.
+    self.listing_format = config.get('GSUtil', 'rsync_listing_format',
+                                     DEFAULT_RSYNC_LISTING_FORMAT)
+    if self.listing_format != LISTING_FORMAT_TEXT:
+      self.listing_format = LISTING_FORMAT_BINARY
 
     self.logger.info('Building synchronization state...')
 
@@ -979,18 +1220,21 @@ class _DiffIterator(object):
     temp_dst_file.close()
 
     # Build sorted lists of src and dst URLs in parallel. To do this, pass
-    # args to _ListUrlRootFunc as tuple (base_url_str, out_filename, desc)
-    # where base_url_str is the starting URL string for listing.
+    # args to _ListUrlRootFunc as tuple
+    # (base_url_str, out_filename, desc, listing_format) where base_url_str is
+    # the starting URL string for listing.
     args_iter = iter([
         (
             self.base_src_url.url_string,
             self.sorted_list_src_file_name,
             'source',
+            self.listing_format,
         ),
         (
             self.base_dst_url.url_string,
             self.sorted_list_dst_file_name,
             'destination',
+            self.listing_format,
         ),
     ])
 
@@ -1012,24 +1256,62 @@ class _DiffIterator(object):
     # Note that while this leaves 2 open file handles, we track these in a
     # global list to be closed (if not closed in the calling scope) and deleted
     # at exit time.
-    self.sorted_list_src_file = open(self.sorted_list_src_file_name, 'r')
-    self.sorted_list_dst_file = open(self.sorted_list_dst_file_name, 'r')
-    _tmp_files.append(self.sorted_list_src_file)
-    _tmp_files.append(self.sorted_list_dst_file)
+    self.sorted_list_src_file = self._OpenTmpFile(
+        self.sorted_list_src_file_name)
+    self.sorted_list_dst_file = self._OpenTmpFile(
+        self.sorted_list_dst_file_name)
 
     if (base_src_url.IsCloudUrl() and base_dst_url.IsFileUrl() and
         self.preserve_posix):
       self.sorted_src_urls_it = PluralityCheckableIterator(
-          iter(self.sorted_list_src_file))
+          self._IterTmpFile(self.sorted_list_src_file))
       self._ValidateObjectAccess()
       # Reset our file pointers to the beginning.
       self.sorted_list_src_file.seek(0)
 
     # Wrap iterators in PluralityCheckableIterator so we can check emptiness.
     self.sorted_src_urls_it = PluralityCheckableIterator(
-        iter(self.sorted_list_src_file))
+        self._IterTmpFile(self.sorted_list_src_file))
     self.sorted_dst_urls_it = PluralityCheckableIterator(
-        iter(self.sorted_list_dst_file))
+        self._IterTmpFile(self.sorted_list_dst_file))
+
+  def _OpenTmpFile(self, file_name):
+    """Opens a sorted listing temp file for reading, tracked in _tmp_files."""
+    if self.listing_format == LISTING_FORMAT_BINARY:
+      fp = open(file_name, 'rb')
+    else:
+      fp = open(file_name, 'r')
+    _tmp_files.append(fp)
+    return fp
+
+  def _IterTmpFile(self, fp):
+    """Returns an iterator over the parsed entries of a sorted listing file.
+
+    Args:
+      fp: File returned by _OpenTmpFile.
+
+    Returns:
+      Iterator of tuples as returned by _ParseTmpFileLine.
+    """
+    if self.listing_format == LISTING_FORMAT_BINARY:
+      return map(_ParseTmpFileRecord, _ReadTmpFileRecords(fp))
+    return map(self._ParseTmpFileLine, fp)
+
+  def _GetUrlSortKey(self, url_str):
+    """Returns the key comparing url_str the way listing files are sorted.
+
+    Slashes are normalized so we can compare across clouds/file systems
+    (including Windows).
+
+    Args:
+      url_str: URL string with the base URL already removed.
+
+    Returns:
+      The comparison key.
+    """
+    if self.listing_format == LISTING_FORMAT_BINARY:
+      return url_str.replace('\\', '/')
+    return _EncodeUrl(url_str.replace('\\', '/'))
 
   def _ValidateObjectAccess(self):
     """Validates that the user won't lose access to the files if copied.
@@ -1039,9 +1321,8 @@ class _DiffIterator(object):
     with an exception raised to the user.
     """
     errors = collections.deque()
-    for src_url in self.sorted_src_urls_it:
-      src_url_str, _, _, _, _, src_mode, src_uid, src_gid, _, _ = (
-          self._ParseTmpFileLine(src_url))
+    for (src_url_str, _, _, _, _, src_mode, src_uid, src_gid, _,
+         _) in self.sorted_src_urls_it:
       valid, err = ValidateFilePermissionAccess(src_url_str,
                                                 uid=src_uid,
                                                 gid=src_gid,
@@ -1211,16 +1492,15 @@ class _DiffIterator(object):
         else:
           (src_url_str, src_size, src_time_created, src_atime, src_mtime,
            src_mode, src_uid, src_gid, src_crc32c,
-           src_md5) = (self._ParseTmpFileLine(next(self.sorted_src_urls_it)))
+           src_md5) = next(self.sorted_src_urls_it)
           posix_attrs = POSIXAttributes(atime=src_atime,
                                         mtime=src_mtime,
                                         uid=src_uid,
                                         gid=src_gid,
                                         mode=src_mode)
-          # Skip past base URL and normalize slashes so we can compare across
-          # clouds/file systems (including Windows).
-          src_url_str_to_check = _EncodeUrl(
-              src_url_str[base_src_url_len:].replace('\\', '/'))
+          # Skip past base URL so we can compare across clouds/file systems.
+          src_url_str_to_check = self._GetUrlSortKey(
+              src_url_str[base_src_url_len:])
           dst_url_str_would_copy_to = copy_helper.ConstructDstUrl(
               src_url=self.base_src_url,
               exp_src_url=StorageUrlFromString(src_url_str),
@@ -1235,11 +1515,10 @@ class _DiffIterator(object):
           # We don't need time created at the destination.
           (dst_url_str, dst_size, _, dst_atime, dst_mtime, dst_mode, dst_uid,
            dst_gid, dst_crc32c,
-           dst_md5) = self._ParseTmpFileLine(next(self.sorted_dst_urls_it))
-          # Skip past base URL and normalize slashes so we can compare across
-          # clouds/file systems (including Windows).
-          dst_url_str_to_check = _EncodeUrl(
-              dst_url_str[base_dst_url_len:].replace('\\', '/'))
+           dst_md5) = next(self.sorted_dst_urls_it)
+          # Skip past base URL so we can compare across clouds/file systems.
+          dst_url_str_to_check = self._GetUrlSortKey(
+              dst_url_str[base_dst_url_len:])
       # Only break once we've attempted to populate {str,dst}_url_to_check and
       # we know we're out of src objects.
       if out_of_src_items:
@@ -1297,8 +1576,7 @@ class _DiffIterator(object):
     if dst_url_str:
       yield RsyncDiffToApply(None, dst_url_str, POSIXAttributes(),
                              DiffAction.REMOVE, None)
-    for line in self.sorted_dst_urls_it:
-      (dst_url_str, _, _, _, _, _, _, _, _, _) = self._ParseTmpFileLine(line)
+    for (dst_url_str, _, _, _, _, _, _, _, _, _) in self.sorted_dst_urls_it:
       yield RsyncDiffToApply(None, dst_url_str, POSIXAttributes(),
                              DiffAction.REMOVE, None)
 
@@ -1351,22 +1629,21 @@ class _AvoidChecksumAndListingDiffIterator(_DiffIterator):
     self.base_dst_url = initialized_diff_iterator.base_dst_url
     self.skip_old_files = initialized_diff_iterator.skip_old_files
     self.ignore_existing = initialized_diff_iterator.ignore_existing
+    self.listing_format = initialized_diff_iterator.listing_format
 
     # Note that while this leaves 2 open file handles, we track these in a
     # global list to be closed (if not closed in the calling scope) and deleted
     # at exit time.
-    self.sorted_list_src_file = open(
-        initialized_diff_iterator.sorted_list_src_file_name, 'r')
-    self.sorted_list_dst_file = open(
-        initialized_diff_iterator.sorted_list_dst_file_name, 'r')
-    _tmp_files.append(self.sorted_list_src_file)
-    _tmp_files.append(self.sorted_list_dst_file)
+    self.sorted_list_src_file = self._OpenTmpFile(
+        initialized_diff_iterator.sorted_list_src_file_name)
+    self.sorted_list_dst_file = self._OpenTmpFile(
+        initialized_diff_iterator.sorted_list_dst_file_name)
 
     # Wrap iterators in PluralityCheckableIterator so we can check emptiness.
     self.sorted_src_urls_it = PluralityCheckableIterator(
-        iter(self.sorted_list_src_file))
+        self._IterTmpFile(self.sorted_list_src_file))
     self.sorted_dst_urls_it = PluralityCheckableIterator(
-        iter(self.sorted_list_dst_file))
+        self._IterTmpFile(self.sorted_list_dst_file))
 
   # pylint: enable=super-init-not-called
 
@@ -1590,6 +1867,7 @@ class RsyncCommand(Command):
       min_args=2,
       max_args=2,
       supported_sub_args='a:cCdenpPriRuUx:y:j:J',
+      supported_private_args=['listing-from=', 'verify-recent=', 'watch'],
       file_url_ok=True,
       provider_url_ok=False,
       urls_start_arg=0,
@@ -1694,6 +1972,9 @@ class RsyncCommand(Command):
 
     src_url = self._InsistContainer(self.args[0], False)
     dst_url = self._InsistContainer(self.args[1], True)
+    if self.watch and not src_url.IsFileUrl():
+      raise CommandException(
+          'The --watch option requires a local source directory.')
     is_daisy_chain = (src_url.IsCloudUrl() and dst_url.IsCloudUrl() and
                       src_url.scheme != dst_url.scheme)
     LogPerformanceSummaryParams(has_file_src=src_url.IsFileUrl(),
@@ -1721,6 +2002,14 @@ class RsyncCommand(Command):
     for signal_num in GetCaughtSignals():
       RegisterSignalHandler(signal_num, _HandleSignals)
 
+    # Report files downloaded from the cloud are removed with the other temp
+    # files.
+    self.inventory_report = None
+    if self.listing_from:
+      self.inventory_report = InventoryReport(self.listing_from,
+                                              self.gsutil_api, self.logger,
+                                              _tmp_files)
+
     process_count, thread_count = self._GetProcessAndThreadCount(
         process_count=None,
         thread_count=None,
@@ -1732,6 +2021,44 @@ class RsyncCommand(Command):
         worker_count=process_count * thread_count,
     )
 
+    # The watch is started first so that no change made while the directories
+    # are compared is missed.
+    watcher = None
+    if self.watch:
+      watcher = DirectoryWatcher(src_url.object_name, self.recursion_requested)
+    try:
+      start_time = self._SyncAll(src_url, dst_url, shared_attrs)
+      if watcher:
+        self._SyncChanges(watcher, src_url, dst_url, shared_attrs)
+    finally:
+      if watcher:
+        watcher.Close()
+
+    end_time = time.time()
+    self.total_elapsed_time = end_time - start_time
+    self.total_bytes_per_second = CalculateThroughput(
+        self.total_bytes_transferred, self.total_elapsed_time)
+    LogPerformanceSummaryParams(
+        avg_throughput=self.total_bytes_per_second,
+        total_elapsed_time=self.total_elapsed_time,
+        total_bytes_transferred=self.total_bytes_transferred)
+
+    if self.op_failure_count:
+      plural_str = 's' if self.op_failure_count else ''
+      raise CommandException('%d file%s/object%s could not be copied/removed.' %
+                             (self.op_failure_count, plural_str, plural_str))
+
+  def _SyncAll(self, src_url, dst_url, shared_attrs):
+    """Compares all of src_url and dst_url and applies the differences.
+
+    Args:
+      src_url: StorageUrl of the source.
+      dst_url: StorageUrl of the destination.
+      shared_attrs: Attributes shared by the workers applying diffs.
+
+    Returns:
+      The time at which the differences started to be applied.
+    """
     # Perform sync requests in parallel (-m) mode, if requested, using
     # configured number of parallel processes and threads. Otherwise,
     # perform requests with sequential function calls in current process.
@@ -1755,20 +2082,98 @@ class RsyncCommand(Command):
                  seek_ahead_iterator=seek_ahead_iterator)
     finally:
       CleanUpTempFiles()
+    return start_time
 
-    end_time = time.time()
-    self.total_elapsed_time = end_time - start_time
-    self.total_bytes_per_second = CalculateThroughput(
-        self.total_bytes_transferred, self.total_elapsed_time)
-    LogPerformanceSummaryParams(
-        avg_throughput=self.total_bytes_per_second,
-        total_elapsed_time=self.total_elapsed_time,
-        total_bytes_transferred=self.total_bytes_transferred)
+  def _SyncChanges(self, watcher, src_url, dst_url, shared_attrs):
+    """Synchronizes files as they change under src_url, until interrupted.
 
-    if self.op_failure_count:
-      plural_str = 's' if self.op_failure_count else ''
-      raise CommandException('%d file%s/object%s could not be copied/removed.' %
-                             (self.op_failure_count, plural_str, plural_str))
+    Args:
+      watcher: DirectoryWatcher watching src_url.
+      src_url: StorageUrl of the local source directory.
+      dst_url: StorageUrl of the destination.
+      shared_attrs: Attributes shared by the workers applying diffs.
+    """
+    delay = config.getfloat('GSUtil', 'rsync_watch_delay',
+                            DEFAULT_RSYNC_WATCH_DELAY)
+    while True:
+      self.logger.info('Watching %s for changes...', src_url)
+      changes = watcher.WaitForChanges(delay, delay * _WATCH_MAX_DELAY_FACTOR)
+      if changes.overflowed or (self.delete_extras and changes.removed_dirs):
+        if changes.overflowed:
+          self.logger.warn(
+              'Too many changes to track under %s; comparing it in full.',
+              src_url)
+          # Directories created while events were dropped aren't watched yet.
+          watcher.WatchTree()
+        self._SyncAll(src_url, dst_url, shared_attrs)
+        continue
+      diffs = list(self._IterChangedFileDiffs(changes.paths, src_url,
+                                              dst_url))
+      if not diffs:
+        continue
+      failure_count = self.op_failure_count
+      # A failure is reported but doesn't stop the watch; the file is
+      # synchronized again when it next changes.
+      self.Apply(_RsyncFunc,
+                 iter(diffs),
+                 _RsyncExceptionHandler,
+                 shared_attrs,
+                 arg_checker=_DiffToApplyArgChecker,
+                 fail_on_error=False)
+      if self.op_failure_count > failure_count:
+        self.logger.warn('%d changed files could not be copied/removed.',
+                         self.op_failure_count - failure_count)
+
+  def _IterChangedFileDiffs(self, paths, src_url, dst_url):
+    """Yields a RsyncDiffToApply for each changed file path under src_url.
+
+    Files that exist are copied, without being compared to the destination.
+    Files that no longer exist are removed from the destination if -d was
+    specified. Symbolic links are skipped if -e was specified.
+
+    Args:
+      paths: Iterable of the changed file paths.
+      src_url: StorageUrl of the local source directory.
+      dst_url: StorageUrl of the destination.
+
+    Yields:
+      RsyncDiffToApply.
+    """
+    for path in sorted(paths):
+      url = StorageUrlFromString(path)
+      if _IsExcluded(self, src_url, url):
+        continue
+      if self.exclude_symlinks and os.path.islink(path):
+        continue
+      dst_url_str = copy_helper.ConstructDstUrl(
+          src_url=src_url,
+          exp_src_url=url,
+          src_url_names_container=True,
+          have_multiple_srcs=True,
+          has_multiple_top_level_srcs=False,
+          exp_dst_url=dst_url,
+          have_existing_dest_subdir=False,
+          recursion_requested=self.recursion_requested).url_string
+      # Links are followed, as when listing the directory.
+      try:
+        file_stat = os.stat(path)
+      except OSError:
+        file_stat = None
+      if file_stat is None:
+        if self.delete_extras:
+          yield RsyncDiffToApply(None, dst_url_str, POSIXAttributes(),
+                                 DiffAction.REMOVE, None)
+      elif stat.S_ISREG(file_stat.st_mode):
+        (_, size, _, atime, mtime, mode, uid, gid, _,
+         _) = _GetTmpOutputFields(
+             BucketListingObject(url, None, file_stat=file_stat))
+        posix_attrs = POSIXAttributes(atime=atime,
+                                      mtime=mtime,
+                                      uid=uid,
+                                      gid=gid,
+                                      mode=mode)
+        yield RsyncDiffToApply(url.url_string, dst_url_str, posix_attrs,
+                               DiffAction.COPY, size)
 
   def _ParseOpts(self):
     # exclude_symlinks is handled by Command parent class, so save in Command
@@ -1787,6 +2192,9 @@ class RsyncCommand(Command):
     self.skip_old_files = False
     self.ignore_existing = False
     self.skip_unsupported_objects = False
+    self.listing_from = []
+    self.verify_recent_seconds = None
+    self.watch = False
     # self.recursion_requested is initialized in command.py (so it can be
     # checked in parent class for all commands).
     canned_acl = None
@@ -1847,6 +2255,12 @@ class RsyncCommand(Command):
             self.exclude_pattern = re.compile(a)
           except re.error:
             raise CommandException('Invalid exclude filter (%s)' % a)
+        elif o == '--listing-from':
+          self.listing_from.append(a)
+        elif o == '--verify-recent':
+          self.verify_recent_seconds = DurationToTimeDelta(a).total_seconds()
+        elif o == '--watch':
+          self.watch = True
 
     if self.preserve_acl and canned_acl:
       raise CommandException(
@@ -1854,6 +2268,15 @@ class RsyncCommand(Command):
     if gzip_arg_exts and gzip_arg_all:
       raise CommandException(
           'Specifying both the -j and -J options together is invalid.')
+    if self.verify_recent_seconds is not None and not self.listing_from:
+      raise CommandException(
+          '--verify-recent can only be used with --listing-from.')
+    # Watching copies changed files without comparing them to the destination,
+    # and compares everything again against a report that is out of date.
+    if self.watch and (self.ignore_existing or self.skip_old_files or
+                       self.listing_from):
+      raise CommandException(
+          'The --watch option cannot be used with -i, -u or --listing-from.')
     self.gzip_encoded = gzip_encoded
     self.gzip_exts = gzip_arg_exts or gzip_arg_all
 
@@ -29,7 +29,6 @@ from datetime import timedelta
 from datetime import timezone
 import getpass
 import json
-import re
 import sys
 
 import six
@@ -50,6 +49,7 @@ from gslib.utils import constants
 from gslib.utils.boto_util import GetNewHttp
 from gslib.utils.shim_util import GcloudStorageMap, GcloudStorageFlag
 from gslib.utils.signurl_helper import CreatePayload, GetFinalUrl, to_bytes
+from gslib.utils.unit_util import DurationToTimeDelta
 
 try:
   # Check for openssl.
@@ -218,29 +218,6 @@ def _NowUTC():
   return datetime.now(tz=timezone.utc).replace(tzinfo=None)
 
 
-def _DurationToTimeDelta(duration):
-  r"""Parses the given duration and returns an equivalent timedelta."""
-
-  match = re.match(r'^(\d+)([dDhHmMsS])?$', duration)
-  if not match:
-    raise CommandException('Unable to parse duration string')
-
-  duration, modifier = match.groups('h')
-  duration = int(duration)
-  modifier = modifier.lower()
-
-  if modifier == 'd':
-    ret = timedelta(days=duration)
-  elif modifier == 'h':
-    ret = timedelta(hours=duration)
-  elif modifier == 'm':
-    ret = timedelta(minutes=duration)
-  elif modifier == 's':
-    ret = timedelta(seconds=duration)
-
-  return ret
-
-
 def _GenSignedUrl(key,
                   api,
                   use_service_account,
@@ -454,7 +431,7 @@ class UrlSignCommand(Command):
       # Convert duration to seconds, which gcloud can handle.
       seconds = str(
           int(
-              _DurationToTimeDelta(
+              DurationToTimeDelta(
                   self.sub_opts[duration_arg_idx][1]).total_seconds())) + 's'
       self.sub_opts[duration_arg_idx] = ('-d', seconds)
 
@@ -508,9 +485,9 @@ class UrlSignCommand(Command):
         v = v.decode(sys.stdin.encoding or constants.UTF8)
       if o == '-d':
         if delta is not None:
-          delta += _DurationToTimeDelta(v)
+          delta += DurationToTimeDelta(v)
         else:
-          delta = _DurationToTimeDelta(v)
+          delta = DurationToTimeDelta(v)
       elif o == '-m':
         method = v
       elif o == '-c':
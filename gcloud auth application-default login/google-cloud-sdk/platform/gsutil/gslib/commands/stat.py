@@ -135,9 +135,72 @@ class StatCommand(Command):
       flag_map={},
   )
 
+  def _PrefetchObjectMetadata(self, stat_fields):
+    """Gets the metadata of the objects args name, concurrently.
+
+    Used with the -m option when the small_object_engine config option selects
+    the async engine.
+
+    Args:
+      stat_fields: Metadata fields to request.
+
+    Returns:
+      Dict of the args naming single gs objects to tuples of the object's
+      metadata, or None, and the exception getting it raised, or None.
+    """
+    if not self.parallel_operations:
+      return {}
+    _, thread_count = self._GetProcessAndThreadCount(
+        process_count=None,
+        thread_count=None,
+        parallel_operations_override=None,
+        print_macos_warning=False)
+    urls = {}
+    for url_str in self.args:
+      if not ContainsWildcard(url_str):
+        url = StorageUrlFromString(url_str)
+        if url.IsObject() and url.scheme == 'gs':
+          urls[url_str] = url
+    if len(urls) < 2:
+      return {}
+    # pylint: disable=g-import-not-at-top
+    import asyncio
+    from gslib.async_engine import CreateAsyncEngine
+    engine = CreateAsyncEngine(self, self.gsutil_api.status_queue,
+                               thread_count)
+    if not engine:
+      return {}
+
+    async def GetMetadata(url, in_flight):
+      async with in_flight:
+        try:
+          try:
+            return await engine.GetObjectMetadata(url.bucket_name,
+                                                  url.object_name,
+                                                  generation=url.generation,
+                                                  fields=stat_fields), None
+          except EncryptionException:
+            # Retry without requesting hashes.
+            return await engine.GetObjectMetadata(
+                url.bucket_name,
+                url.object_name,
+                generation=url.generation,
+                fields=UNENCRYPTED_FULL_LISTING_FIELDS), None
+        except Exception as e:  # pylint: disable=broad-except
+          return None, e
+
+    async def GetAllMetadata():
+      in_flight = asyncio.Semaphore(engine.max_in_flight)
+      results = await asyncio.gather(
+          *[GetMetadata(url, in_flight) for url in urls.values()])
+      return dict(zip(urls, results))
+
+    return engine.Run(GetAllMetadata())
+
   def RunCommand(self):
     """Command entry point for stat command."""
     stat_fields = ENCRYPTED_FIELDS + UNENCRYPTED_FULL_LISTING_FIELDS
+    prefetched_metadata = self._PrefetchObjectMetadata(stat_fields)
     found_nonmatching_arg = False
     for url_str in self.args:
       arg_matches = 0
@@ -148,6 +211,11 @@ class StatCommand(Command):
         if ContainsWildcard(url_str):
           blr_iter = self.WildcardIterator(url_str).IterObjects(
               bucket_listing_fields=stat_fields)
+        elif url_str in prefetched_metadata:
+          single_obj, exception = prefetched_metadata[url_str]
+          if exception:
+            raise exception
+          blr_iter = [BucketListingObject(url, root_object=single_obj)]
         else:
           try:
             single_obj = self.gsutil_api.GetObjectMetadata(
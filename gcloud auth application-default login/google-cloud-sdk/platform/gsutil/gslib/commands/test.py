@@ -44,6 +44,8 @@ from gslib.tests.util import GetTestNames
 from gslib.tests.util import InvokedFromParFile
 from gslib.tests.util import unittest
 from gslib.utils.constants import NO_MAX
+from gslib.utils.import_profile import FormatImportProfile
+from gslib.utils.import_profile import ProfileImports
 from gslib.utils.constants import UTF8
 from gslib.utils.system_util import IS_WINDOWS
 
@@ -62,6 +64,7 @@ _SEQUENTIAL_ISOLATION_FLAG = 'sequential_only'
 
 _SYNOPSIS = """
   gsutil test [-l] [-u] [-f] [command command...]
+  gsutil test -i [gsutil_command [args...]]
 """
 
 _DETAILED_HELP_TEXT = ("""
@@ -153,6 +156,13 @@ _DETAILED_HELP_TEXT = ("""
 
   -f          Exit on first sequential test failure.
 
+  -i          Instead of running tests, run the given gsutil command (by
+              default, "version") in a subprocess and report the time spent
+              importing modules during startup, the slowest imports, and
+              which command modules were loaded. For example:
+
+                gsutil test -i stat gs://bucket/object
+
   -l          List available tests.
 
   -p N        Run at most N tests in parallel. The default value is %d.
@@ -367,7 +377,7 @@ class TestCommand(Command):
       usage_synopsis=_SYNOPSIS,
       min_args=0,
       max_args=NO_MAX,
-      supported_sub_args='buflp:sc',
+      supported_sub_args='buflp:sci',
       file_url_ok=True,
       provider_url_ok=False,
       urls_start_arg=0,
@@ -528,6 +538,7 @@ class TestCommand(Command):
     list_tests = False
     max_parallel_tests = _DEFAULT_TEST_PARALLEL_PROCESSES
     perform_coverage = False
+    profile_imports = False
     sequential_only = False
     if self.sub_opts:
       for o, a in self.sub_opts:
@@ -537,6 +548,8 @@ class TestCommand(Command):
           perform_coverage = True
         elif o == '-f':
           failfast = True
+        elif o == '-i':
+          profile_imports = True
         elif o == '-l':
           list_tests = True
         elif o == ('--' + _SEQUENTIAL_ISOLATION_FLAG):
@@ -554,6 +567,10 @@ class TestCommand(Command):
         elif o == '-u':
           tests.util.RUN_INTEGRATION_TESTS = False
 
+    if profile_imports:
+      print(FormatImportProfile(ProfileImports(self.args or ['version'])))
+      return 0
+
     if perform_coverage and not coverage:
       raise CommandException(
           'Coverage has been requested but the coverage module was not found. '
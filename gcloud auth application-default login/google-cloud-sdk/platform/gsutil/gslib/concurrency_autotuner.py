@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Adaptive control of the number of active worker threads in Command.Apply.
+
+When the 'parallel_thread_autotune' boto config option is enabled, each
+WorkerPool starts more threads than it initially lets run, and a
+ConcurrencyAutotuner periodically raises or lowers the number allowed to run
+at once based on the throughput, utilization and throttling observed by the
+pool's threads. Autotuners run only while an Apply call uses their pools.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import logging
+import threading
+import time
+
+# HTTP status codes with which the service asks clients to slow down.
+THROTTLING_STATUS_CODES = frozenset((429, 503))
+
+# Unless configured otherwise, the autotuner may grow a pool to this multiple
+# of its configured thread count.
+DEFAULT_AUTOTUNE_MAX_THREAD_MULTIPLIER = 4
+
+# Seconds between adjustments.
+AUTOTUNE_INTERVAL = 2.0
+
+# Relative throughput change below which two samples are considered equal.
+_THROUGHPUT_TOLERANCE = 0.05
+
+# Below this fraction of the allowed threads being busy, workers are starved
+# for tasks and adding threads cannot help.
+_MIN_UTILIZATION_TO_GROW = 0.8
+
+# Factor applied to the limit when the service throttles requests.
+_THROTTLED_DECREASE_FACTOR = 0.75
+
+# Number of consecutive unchanged samples after which growth is probed again.
+_PLATEAU_SAMPLES_BEFORE_PROBE = 5
+
+
+class _TransferCounters(object):
+  """Counters of bytes processed and throttled requests."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.bytes_processed = 0
+    self.throttled_requests = 0
+
+  def AddBytes(self, num_bytes):
+    with self._lock:
+      self.bytes_processed += num_bytes
+
+  def AddThrottledRequest(self):
+    with self._lock:
+      self.throttled_requests += 1
+
+  def Snapshot(self):
+    with self._lock:
+      return self.bytes_processed, self.throttled_requests
+
+
+# The ConcurrencyLimiter of the pool the current thread works for, if any.
+_thread_local = threading.local()
+
+
+def SetThreadConcurrencyLimiter(limiter):
+  """Attributes the current thread's transfers to limiter's pool.
+
+  Args:
+    limiter: ConcurrencyLimiter of the calling worker thread's pool, or None.
+  """
+  _thread_local.limiter = limiter
+
+
+def _GetThreadCounters():
+  limiter = getattr(_thread_local, 'limiter', None)
+  return limiter.counters if limiter else None
+
+
+def RecordBytesProcessed(num_bytes):
+  """Records bytes transferred by this thread, for throughput measurement."""
+  counters = _GetThreadCounters()
+  if counters:
+    counters.AddBytes(num_bytes)
+
+
+def RecordRetryableError(exception):
+  """Records a retryable error if it indicates the service is throttling us.
+
+  Args:
+    exception: The exception that caused a retry. apitools HttpErrors carry
+        the HTTP status in status_code, boto errors in status.
+  """
+  status = getattr(exception, 'status_code', None)
+  if status is None:
+    status = getattr(exception, 'status', None)
+  counters = _GetThreadCounters()
+  if counters and status in THROTTLING_STATUS_CODES:
+    counters.AddThrottledRequest()
+
+
+class ConcurrencyLimiter(object):
+  """A counting semaphore whose capacity can be changed while in use.
+
+  Supports the acquire/release interface of threading.BoundedSemaphore, so it
+  can stand in for the worker semaphore in multi-process Apply calls. It also
+  tracks how long permits were held, which the autotuner uses to tell whether
+  the allowed threads were kept busy, and holds the counters of the transfers
+  made by its pool's threads.
+  """
+
+  def __init__(self, limit, min_limit, max_limit):
+    """Creates a limiter.
+
+    Args:
+      limit: Initial number of permits.
+      min_limit: Smallest number of permits SetLimit will allow.
+      max_limit: Largest number of permits SetLimit will allow.
+    """
+    self.min_limit = min_limit
+    self.max_limit = max_limit
+    self._limit = max(min_limit, min(limit, max_limit))
+    self._in_use = 0
+    self._cond = threading.Condition()
+    # Permit-seconds held, and number of permits released, since the last
+    # call to TakeUsageSample.
+    self._busy_seconds = 0.0
+    self._releases = 0
+    self._last_change_time = time.time()
+    self._sample_start_time = self._last_change_time
+    self.counters = _TransferCounters()
+
+  @property
+  def limit(self):
+    return self._limit
+
+  def SetLimit(self, limit):
+    """Changes the number of permits, clamped to [min_limit, max_limit]."""
+    with self._cond:
+      self._limit = max(self.min_limit, min(limit, self.max_limit))
+      self._cond.notify_all()
+      return self._limit
+
+  def _AccumulateBusyTime(self):
+    now = time.time()
+    self._busy_seconds += self._in_use * (now - self._last_change_time)
+    self._last_change_time = now
+
+  def acquire(self, blocking=True):  # pylint: disable=invalid-name
+    """Takes a permit, waiting for one if blocking is True.
+
+    Returns:
+      True if a permit was taken, False otherwise.
+    """
+    with self._cond:
+      while self._in_use >= self._limit:
+        if not blocking:
+          return False
+        self._cond.wait()
+      self._AccumulateBusyTime()
+      self._in_use += 1
+      return True
+
+  def release(self):  # pylint: disable=invalid-name
+    """Returns a permit."""
+    with self._cond:
+      self._AccumulateBusyTime()
+      self._in_use -= 1
+      self._releases += 1
+      self._cond.notify()
+
+  def TakeUsageSample(self):
+    """Returns and resets usage accumulated since the previous call.
+
+    Returns:
+      (elapsed_seconds, utilization, releases): the length of the sample,
+      the average fraction of permits in use over it, and the number of
+      permits released (tasks completed) during it.
+    """
+    with self._cond:
+      self._AccumulateBusyTime()
+      elapsed = self._last_change_time - self._sample_start_time
+      utilization = (self._busy_seconds / (elapsed * self._limit)
+                     if elapsed > 0 else 0.0)
+      releases = self._releases
+      self._busy_seconds = 0.0
+      self._releases = 0
+      self._sample_start_time = self._last_change_time
+      return elapsed, utilization, releases
+
+
+AutotuneSample = collections.namedtuple(
+    'AutotuneSample', 'throughput utilization throttled_requests')
+
+
+class ConcurrencyAutotuner(threading.Thread):
+  """Hill-climbs a ConcurrencyLimiter's limit toward peak throughput.
+
+  Every AUTOTUNE_INTERVAL seconds until stopped, the autotuner measures
+  throughput (bytes processed by the limiter's pool, or tasks completed when
+  no bytes were reported), the fraction of allowed threads that were busy, and the number
+  of throttled (429/503) requests. Then:
+
+  - If any requests were throttled, the limit is cut multiplicatively.
+  - If the allowed threads were not kept busy, workers are waiting for tasks
+    rather than for the network, so the limit is left alone.
+  - Otherwise the limit keeps moving in the direction that last improved
+    throughput, reverses when throughput drops, and after a plateau probes
+    upward again.
+  """
+
+  def __init__(self, limiter, logger=None, interval=AUTOTUNE_INTERVAL):
+    super(ConcurrencyAutotuner, self).__init__()
+    self.daemon = True
+    self.limiter = limiter
+    self.logger = logger or logging.getLogger()
+    self.interval = interval
+    self._last_throughput = None
+    self._direction = 1
+    self._plateau_samples = 0
+    self._last_bytes, self._last_throttled = limiter.counters.Snapshot()
+    self._stop_event = threading.Event()
+
+  def run(self):
+    while not self._stop_event.wait(self.interval):
+      sample = self._TakeSample()
+      if sample:
+        self.Adjust(sample)
+
+  def Stop(self):
+    """Stops adjusting the limit and waits for the thread to exit."""
+    self._stop_event.set()
+    if self.is_alive():
+      self.join()
+
+  def _TakeSample(self):
+    """Returns an AutotuneSample for the last interval, or None if idle."""
+    elapsed, utilization, tasks_completed = self.limiter.TakeUsageSample()
+    bytes_processed, throttled = self.limiter.counters.Snapshot()
+    bytes_delta = bytes_processed - self._last_bytes
+    throttled_delta = throttled - self._last_throttled
+    self._last_bytes, self._last_throttled = bytes_processed, throttled
+    if elapsed <= 0 or (utilization == 0 and not throttled_delta):
+      return None
+    throughput = (bytes_delta if bytes_delta else tasks_completed) / elapsed
+    return AutotuneSample(throughput, utilization, throttled_delta)
+
+  def Adjust(self, sample):
+    """Updates the limiter's limit given one sample.
+
+    Args:
+      sample: AutotuneSample for the most recent interval.
+
+    Returns:
+      The new limit.
+    """
+    limit = self.limiter.limit
+    new_limit = limit
+    if sample.throttled_requests:
+      new_limit = int(limit * _THROTTLED_DECREASE_FACTOR)
+      self._direction = -1
+      # Throughput under throttling is not a useful baseline.
+      self._last_throughput = None
+      self._plateau_samples = 0
+    elif sample.utilization < _MIN_UTILIZATION_TO_GROW:
+      self._last_throughput = sample.throughput
+    else:
+      if self._last_throughput is not None:
+        change = ((sample.throughput - self._last_throughput) /
+                  max(self._last_throughput, 1e-9))
+        if change < -_THROUGHPUT_TOLERANCE:
+          self._direction = -self._direction
+          self._plateau_samples = 0
+        elif change <= _THROUGHPUT_TOLERANCE:
+          self._plateau_samples += 1
+        else:
+          self._plateau_samples = 0
+      if self._last_throughput is None or self._plateau_samples == 0:
+        new_limit = limit + self._direction * max(1, limit // 4)
+      elif self._plateau_samples >= _PLATEAU_SAMPLES_BEFORE_PROBE:
+        self._direction = 1
+        self._plateau_samples = 0
+        new_limit = limit + max(1, limit // 4)
+      self._last_throughput = sample.throughput
+
+    new_limit = self.limiter.SetLimit(new_limit)
+    if new_limit != limit:
+      self.logger.debug(
+          'Autotune: adjusted active thread count from %d to %d (throughput '
+          '%.1f/s, utilization %.2f, throttled requests %d).', limit,
+          new_limit, sample.throughput, sample.utilization,
+          sample.throttled_requests)
+    return new_limit
+
+
+def CreateAutotunedLimiter(thread_count, max_thread_count):
+  """Creates a ConcurrencyLimiter for an autotuned pool.
+
+  Args:
+    thread_count: Initial number of threads allowed to run.
+    max_thread_count: Maximum number of threads the autotuner may allow.
+
+  Returns:
+    The ConcurrencyLimiter.
+  """
+  return ConcurrencyLimiter(thread_count, 1, max(thread_count,
+                                                 max_thread_count))
+
+
+class AutotunerGroup(object):
+  """Autotuners for a set of limiters, started and stopped together.
+
+  Thread pools in the main process outlive the Apply calls that use them, so
+  their autotuners run only while a top-level Apply call is in progress.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._limiters = []
+    self._autotuners = []
+    self._running = False
+    self._logger = None
+
+  def Add(self, limiter):
+    """Adds a limiter, which is autotuned at once if the group is running."""
+    with self._lock:
+      self._limiters.append(limiter)
+      if self._running:
+        self._StartAutotuner(limiter)
+
+  def _StartAutotuner(self, limiter):
+    autotuner = ConcurrencyAutotuner(limiter, logger=self._logger)
+    autotuner.start()
+    self._autotuners.append(autotuner)
+
+  def Start(self, logger):
+    """Starts autotuning all of the group's limiters.
+
+    Args:
+      logger: Logger for adjustment messages.
+    """
+    with self._lock:
+      if self._running:
+        return
+      self._running = True
+      self._logger = logger
+      for limiter in self._limiters:
+        self._StartAutotuner(limiter)
+
+  def Stop(self):
+    """Stops the group's autotuners and waits for their threads to exit."""
+    with self._lock:
+      autotuners = self._autotuners
+      self._autotuners = []
+      self._running = False
+    for autotuner in autotuners:
+      autotuner.Stop()
+
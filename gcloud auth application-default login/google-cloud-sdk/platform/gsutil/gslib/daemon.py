@@ -0,0 +1,673 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs gsutil commands in processes forked from a long-lived daemon.
+
+Most of the time gsutil takes to run a quick command is spent importing
+modules and reading configuration. "gsutil daemon start" starts a process that
+does this once and then listens on a Unix domain socket. While it is running,
+each gsutil invocation sends its arguments, environment, working directory and
+standard streams to the daemon, which forks a child from its warm state to run
+the command and reports the child's exit status back.
+
+Each command still runs in its own process, with the invoking process's
+standard streams, and signals received by the invoking process are forwarded
+to it. Invocations whose environment or boto configuration differ from the
+daemon's are run directly instead.
+
+The client side of this module runs before any of gsutil's dependencies are
+imported, so it must only use the standard library.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import array
+import errno
+import importlib
+import io
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Overrides the path of the daemon's socket.
+DAEMON_SOCKET_ENV_VAR = 'GSUTIL_DAEMON_SOCKET'
+DAEMON_SOCKET_FILE_NAME = 'daemon.sock'
+
+# Seconds without any commands running after which the daemon exits.
+DEFAULT_DAEMON_IDLE_TIMEOUT = 3600
+
+# Set, to the idle timeout, in the environment of the process started by
+# "gsutil daemon start" to make it serve requests.
+_SERVE_ENV_VAR = 'GSUTIL_DAEMON_SERVE'
+
+# Environment variables that affect how gsutil is configured. Commands are
+# only run by the daemon if these match the daemon's own environment.
+_CONFIG_ENV_VAR_PREFIXES = ('AWS_', 'BOTO_', 'CLOUDSDK_', 'GOOGLE_', 'GSUTIL_')
+_CONFIG_ENV_VARS = frozenset(
+    ('HOME', 'LANG', 'LC_ALL', 'LC_CTYPE', 'PYTHONIOENCODING', 'http_proxy',
+     'https_proxy', 'HTTPS_PROXY', 'no_proxy', 'NO_PROXY'))
+
+# Modules imported by the daemon before it starts serving, in addition to the
+# command modules. gslib.__main__ itself is imported by each command's
+# process, since it parses the command line when imported.
+_PRELOADED_MODULES = (
+    'apitools.base.py.credentials_lib',
+    'gcs_oauth2_boto_plugin',
+    'google_reauth.reauth_creds',
+    'gslib.boto_translation',
+    'gslib.command',
+    'gslib.command_runner',
+    'gslib.context_config',
+    'gslib.gcs_json_api',
+    'gslib.metrics',
+    'gslib.wildcard_iterator',
+    'httplib2',
+    'oauth2client',
+)
+
+_STORAGE_V1_CLIENT_MODULE = (
+    'gslib.third_party.storage_apitools.storage_v1_client')
+
+# Signals the client forwards to the process running its command.
+_FORWARDED_SIGNALS = tuple(
+    getattr(signal, name)
+    for name in ('SIGHUP', 'SIGINT', 'SIGQUIT', 'SIGTERM')
+    if hasattr(signal, name))
+
+_STANDARD_FDS = (0, 1, 2)
+
+# Seconds to wait for a client to send its request, and for a newly started
+# daemon to begin accepting connections.
+_REQUEST_TIMEOUT = 10
+_START_TIMEOUT = 30
+
+_HEADER = struct.Struct('>I')
+
+# struct ucred returned for SO_PEERCRED on Linux: pid, uid, gid.
+_PEERCRED = struct.Struct('=iII')
+# Leading fields of struct xucred returned for LOCAL_PEERCRED on macOS and
+# the BSDs: cr_version, cr_uid. The whole struct is at most this long.
+_XUCRED = struct.Struct('=II')
+_XUCRED_SIZE = 76
+_SOL_LOCAL = 0
+_LOCAL_PEERCRED = 1
+
+
+def DaemonSupported():
+  """Returns whether commands can be run by a daemon on this platform."""
+  return hasattr(socket, 'AF_UNIX') and hasattr(os, 'fork')
+
+
+def GetDaemonSocketPath():
+  """Returns the path of the daemon's Unix domain socket."""
+  return os.environ.get(DAEMON_SOCKET_ENV_VAR) or os.path.join(
+      os.path.expanduser('~'), '.gsutil', DAEMON_SOCKET_FILE_NAME)
+
+
+def _SendMessage(sock, message, fds=None):
+  """Sends a JSON-serializable message, and optionally file descriptors."""
+  data = json.dumps(message).encode('utf-8')
+  data = _HEADER.pack(len(data)) + data
+  if fds:
+    sent = sock.sendmsg(
+        [data],
+        [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))])
+    data = data[sent:]
+  sock.sendall(data)
+
+
+def _GetPeerUid(sock):
+  """Returns the uid of the process connected to a Unix domain socket.
+
+  Returns:
+    The peer's uid, or None if it cannot be determined on this platform.
+  """
+  try:
+    if hasattr(socket, 'SO_PEERCRED'):
+      creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                              _PEERCRED.size)
+      return _PEERCRED.unpack(creds)[1]
+    if sys.platform == 'darwin' or 'bsd' in sys.platform:
+      creds = sock.getsockopt(_SOL_LOCAL, _LOCAL_PEERCRED, _XUCRED_SIZE)
+      return _XUCRED.unpack(creds[:_XUCRED.size])[1]
+  except (EnvironmentError, struct.error):
+    pass
+  return None
+
+
+def _ReceiveExactly(sock, num_bytes):
+  data = b''
+  while len(data) < num_bytes:
+    chunk = sock.recv(num_bytes - len(data))
+    if not chunk:
+      raise EOFError('Connection closed mid-message.')
+    data += chunk
+  return data
+
+
+def _ReceiveMessage(sock):
+  """Receives a message sent by _SendMessage.
+
+  Returns:
+    (message, fds), or (None, []) if the connection was closed before a
+    message arrived.
+  """
+  fds = array.array('i')
+  header, ancdata, _, _ = sock.recvmsg(
+      _HEADER.size, socket.CMSG_SPACE(len(_STANDARD_FDS) * fds.itemsize))
+  for level, cmsg_type, cmsg_data in ancdata:
+    if level == socket.SOL_SOCKET and cmsg_type == socket.SCM_RIGHTS:
+      fds.frombytes(cmsg_data[:len(cmsg_data) - len(cmsg_data) % fds.itemsize])
+  try:
+    if not header:
+      return None, list(fds)
+    header += _ReceiveExactly(sock, _HEADER.size - len(header))
+    (length,) = _HEADER.unpack(header)
+    return json.loads(_ReceiveExactly(sock, length).decode('utf-8')), list(fds)
+  except:
+    for fd in fds:
+      os.close(fd)
+    raise
+
+
+def _Request(socket_path, message, fds=None):
+  """Connects to the daemon and sends a request.
+
+  Returns:
+    (connected socket, first reply message). The reply is None if the daemon
+    closed the connection without replying.
+
+  Raises:
+    socket.error if the daemon is not running.
+  """
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(socket_path)
+    _SendMessage(sock, message, fds=fds)
+    reply, _ = _ReceiveMessage(sock)
+  except:
+    sock.close()
+    raise
+  return sock, reply
+
+
+def GetDaemonStatus(socket_path):
+  """Returns the status reported by the daemon, or None if it isn't running.
+
+  Args:
+    socket_path: Path of the daemon's socket.
+
+  Returns:
+    Dict with the daemon's pid, uptime in seconds, number of commands run and
+    number of commands running, or None.
+  """
+  try:
+    sock, reply = _Request(socket_path, {'request': 'status'})
+  except (EnvironmentError, EOFError, ValueError):
+    return None
+  sock.close()
+  return reply
+
+
+def StartDaemon(socket_path, idle_timeout):
+  """Starts a daemon in the background and waits until it is serving.
+
+  Args:
+    socket_path: Path of the socket for the daemon to listen on.
+    idle_timeout: Seconds without commands running after which the daemon
+        exits, or 0 to run until stopped.
+
+  Returns:
+    The daemon's status, as returned by GetDaemonStatus.
+
+  Raises:
+    EnvironmentError if the daemon did not start.
+  """
+  # pylint: disable=g-import-not-at-top
+  import subprocess
+  import gslib
+  env = dict(os.environ)
+  env[_SERVE_ENV_VAR] = str(idle_timeout)
+  env[DAEMON_SOCKET_ENV_VAR] = socket_path
+  with open(os.devnull, 'r+') as devnull:
+    process = subprocess.Popen([sys.executable, gslib.GSUTIL_PATH],
+                               stdin=devnull,
+                               stdout=devnull,
+                               stderr=devnull,
+                               cwd='/',
+                               env=env,
+                               start_new_session=True)
+  deadline = time.time() + _START_TIMEOUT
+  while time.time() < deadline:
+    status = GetDaemonStatus(socket_path)
+    if status and status.get('pid') == process.pid:
+      return status
+    if process.poll() is not None:
+      raise EnvironmentError('The gsutil daemon exited with status %d while '
+                             'starting.' % process.returncode)
+    time.sleep(0.1)
+  raise EnvironmentError('The gsutil daemon did not start listening on %s '
+                         'within %d seconds.' % (socket_path, _START_TIMEOUT))
+
+
+def StopDaemon(socket_path):
+  """Asks the daemon to exit once the commands it is running finish.
+
+  Returns:
+    True if a daemon was running, False otherwise.
+  """
+  try:
+    sock, reply = _Request(socket_path, {'request': 'stop'})
+  except (EnvironmentError, EOFError, ValueError):
+    return False
+  sock.close()
+  return reply is not None
+
+
+def RunCommandViaDaemon(argv):
+  """Runs a gsutil command in a daemon's child process, if possible.
+
+  Args:
+    argv: The gsutil command line, starting with the path to gsutil.
+
+  Returns:
+    The command's exit status, or None if the command should be run by the
+    calling process because no daemon is running or the daemon declined it.
+  """
+  if (not DaemonSupported() or 'daemon' in argv[1:] or
+      '_ARGCOMPLETE' in os.environ):
+    return None
+  socket_path = GetDaemonSocketPath()
+  if not os.path.exists(socket_path):
+    return None
+  umask = os.umask(0)
+  os.umask(umask)
+  try:
+    request = {
+        'request': 'run',
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+        'umask': umask,
+        'executable': sys.executable,
+    }
+    sock, reply = _Request(socket_path, request, fds=_STANDARD_FDS)
+  except (EnvironmentError, EOFError, ValueError):
+    return None
+  with sock:
+    if not reply or 'pid' not in reply:
+      return None
+    pid = reply['pid']
+
+    def _ForwardSignal(signal_num, unused_cur_stack_frame):
+      try:
+        os.kill(pid, signal_num)
+      except OSError:
+        pass
+
+    for signal_num in _FORWARDED_SIGNALS:
+      signal.signal(signal_num, _ForwardSignal)
+    try:
+      reply, _ = _ReceiveMessage(sock)
+    except (EnvironmentError, EOFError, ValueError):
+      reply = None
+  if not reply or 'exit_code' not in reply:
+    sys.stderr.write('The gsutil daemon exited before the command finished.\n')
+    return 1
+  return reply['exit_code']
+
+
+def HandleDaemonInvocation(argv):
+  """Serves as the daemon or runs the command via the daemon, if applicable.
+
+  Called by gsutil.py before importing the rest of gsutil.
+
+  Args:
+    argv: The gsutil command line.
+
+  Returns:
+    Exit status, or None if the caller should run the command itself.
+  """
+  idle_timeout = os.environ.pop(_SERVE_ENV_VAR, None)
+  if idle_timeout is not None:
+    return GsutilDaemon(GetDaemonSocketPath(), int(idle_timeout)).Serve()
+  return RunCommandViaDaemon(argv)
+
+
+def _GetConfigEnvironment(environ):
+  """Returns the environment variables that affect gsutil's configuration."""
+  return sorted((name, value)
+                for name, value in environ.items()
+                if ((name.startswith(_CONFIG_ENV_VAR_PREFIXES) or
+                     name in _CONFIG_ENV_VARS) and
+                    name not in (DAEMON_SOCKET_ENV_VAR, _SERVE_ENV_VAR)))
+
+
+def _GetConfigFileState():
+  """Returns the modification times of boto config files and gsutil's VERSION.
+
+  A change means the daemon's configuration or code is out of date.
+  """
+  # pylint: disable=g-import-not-at-top
+  from boto.pyami import config as boto_config
+  import gslib
+  state = []
+  for path in list(boto_config.BotoConfigLocations) + [gslib.VERSION_FILE]:
+    try:
+      state.append((path, os.stat(path).st_mtime))
+    except OSError:
+      state.append((path, None))
+  return state
+
+
+def _ExitStatusFromWaitStatus(status):
+  if os.WIFSIGNALED(status):
+    return 128 + os.WTERMSIG(status)
+  return os.WEXITSTATUS(status)
+
+
+def _ReopenStandardStreams():
+  """Rebinds sys.stdin/stdout/stderr to whatever fds 0, 1 and 2 now refer to.
+
+  Buffering depends on whether a stream is a terminal, which may differ from
+  the daemon's own streams.
+  """
+  for fd, name, mode in ((0, 'stdin', 'r'), (1, 'stdout', 'w'),
+                         (2, 'stderr', 'w')):
+    old_stream = getattr(sys, name)
+    stream = io.TextIOWrapper(io.open(fd, mode + 'b', closefd=False),
+                              encoding=old_stream.encoding,
+                              errors=old_stream.errors,
+                              line_buffering=(name == 'stderr' or
+                                              os.isatty(fd)))
+    setattr(sys, name, stream)
+    setattr(sys, '__%s__' % name, stream)
+
+
+def _PropagateUserAgent(base_user_agent):
+  """Applies the command's user agent to modules imported by the daemon.
+
+  gslib.__main__ appends a suffix describing the command to boto.UserAgent
+  and sets gslib.USER_AGENT, but modules the daemon imported earlier copied
+  the values from before then.
+
+  Args:
+    base_user_agent: boto.UserAgent before gslib.__main__ was imported.
+  """
+  # pylint: disable=g-import-not-at-top
+  import boto
+  import gslib
+  for module in list(sys.modules.values()):
+    module_vars = getattr(module, '__dict__', {})
+    if module_vars.get('UserAgent') == base_user_agent:
+      module.UserAgent = boto.UserAgent
+  storage_v1_client = sys.modules.get(_STORAGE_V1_CLIENT_MODULE)
+  if storage_v1_client:
+    # pylint: disable=protected-access
+    storage_v1_client.StorageV1._USER_AGENT += gslib.USER_AGENT
+
+
+class GsutilDaemon(object):
+  """Accepts commands on a Unix domain socket and runs each in a child."""
+
+  def __init__(self, socket_path, idle_timeout):
+    """Initializes the daemon.
+
+    Args:
+      socket_path: Path of the socket to listen on.
+      idle_timeout: Seconds without commands running after which to exit, or
+          0 to run until stopped.
+    """
+    self.socket_path = socket_path
+    self.idle_timeout = idle_timeout
+    self._listener = None
+    self._lock = threading.Lock()
+    self._start_time = time.time()
+    self._commands_run = 0
+    self._commands_running = 0
+    self._stopping = False
+    self._config_environment = None
+    self._config_file_state = None
+
+  def Serve(self):
+    """Serves requests until stopped or idle.
+
+    Returns:
+      Exit status for the daemon process.
+    """
+    for module_name in _PRELOADED_MODULES:
+      importlib.import_module(module_name)
+    # pylint: disable=g-import-not-at-top
+    from gslib.command_registry import LazyCommandMap
+    LazyCommandMap().values()
+    self._config_environment = _GetConfigEnvironment(os.environ)
+    self._config_file_state = _GetConfigFileState()
+
+    self._listener = self._Listen()
+    try:
+      while not self._stopping:
+        try:
+          conn, _ = self._listener.accept()
+        except socket.timeout:
+          with self._lock:
+            if not self._commands_running:
+              break
+          continue
+        with conn:
+          self._HandleConnection(conn)
+    finally:
+      self._listener.close()
+      try:
+        os.unlink(self.socket_path)
+      except OSError:
+        pass
+    # Commands still running are waited for by their (non-daemon) threads.
+    return 0
+
+  def _Listen(self):
+    """Creates the listening socket, accessible only by the current user."""
+    socket_dir = os.path.dirname(self.socket_path)
+    if socket_dir and not os.path.isdir(socket_dir):
+      os.makedirs(socket_dir, mode=0o700)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+      try:
+        listener.bind(self.socket_path)
+      except socket.error as e:
+        if e.errno != errno.EADDRINUSE:
+          raise
+        # Left behind by a daemon that did not exit cleanly.
+        os.unlink(self.socket_path)
+        listener.bind(self.socket_path)
+    finally:
+      os.umask(old_umask)
+    listener.listen(socket.SOMAXCONN)
+    listener.settimeout(self.idle_timeout or None)
+    return listener
+
+  def _HandleConnection(self, conn):
+    """Handles one request. Runs in the main thread."""
+    if _GetPeerUid(conn) != os.getuid():
+      # The socket's permissions should keep other users out, but don't rely
+      # on them alone. Closing the connection makes the client run locally.
+      return
+    conn.settimeout(_REQUEST_TIMEOUT)
+    fds = []
+    try:
+      try:
+        request, fds = _ReceiveMessage(conn)
+      except (EnvironmentError, EOFError, ValueError):
+        return
+      conn.settimeout(None)
+      if not request:
+        return
+      request_type = request.get('request')
+      if request_type == 'status':
+        with self._lock:
+          status = {
+              'pid': os.getpid(),
+              'uptime': time.time() - self._start_time,
+              'commands_run': self._commands_run,
+              'commands_running': self._commands_running,
+          }
+        _SendMessage(conn, status)
+      elif request_type == 'stop':
+        self._stopping = True
+        _SendMessage(conn, {'stopping': True})
+      elif request_type == 'run':
+        reason = self._GetReasonToDecline(request, fds)
+        if reason:
+          _SendMessage(conn, {'declined': reason})
+        else:
+          self._StartCommand(conn, request, fds)
+    except EnvironmentError:
+      # The client went away.
+      pass
+    finally:
+      for fd in fds:
+        os.close(fd)
+
+  def _GetReasonToDecline(self, request, fds):
+    """Returns why the daemon can't run a command, or None if it can."""
+    if len(fds) != len(_STANDARD_FDS):
+      return 'standard streams not received'
+    if request.get('executable') != sys.executable:
+      return 'different Python interpreter'
+    if (_GetConfigEnvironment(request.get('env', {})) !=
+        self._config_environment):
+      return 'different configuration environment variables'
+    if _GetConfigFileState() != self._config_file_state:
+      # The daemon's configuration or code is out of date, so it won't be able
+      # to run any more commands.
+      self._stopping = True
+      return 'configuration or gsutil changed since the daemon started'
+    return None
+
+  def _StartCommand(self, conn, request, fds):
+    """Forks a child to run the command, and a thread to wait for it."""
+    with self._lock:
+      self._commands_run += 1
+      self._commands_running += 1
+    # Forking from the main thread means the child's main thread is the one
+    # gsutil's signal handling expects.
+    pid = os.fork()
+    if pid == 0:
+      self._RunChild(conn, request, fds)
+    waiter = threading.Thread(target=self._WaitForCommand,
+                              args=(conn.dup(), pid))
+    try:
+      _SendMessage(conn, {'pid': pid})
+    finally:
+      # Started only once the pid is sent, so that it is received before the
+      # exit status.
+      waiter.start()
+
+  def _WaitForCommand(self, conn, pid):
+    with conn:
+      _, status = os.waitpid(pid, 0)
+      with self._lock:
+        self._commands_running -= 1
+      try:
+        _SendMessage(conn, {'exit_code': _ExitStatusFromWaitStatus(status)})
+      except EnvironmentError:
+        pass
+
+  def _RunChild(self, conn, request, fds):
+    """Runs the command in the forked child. Never returns."""
+    exit_code = 1
+    try:
+      self._listener.close()
+      exit_code = _RunCommand(conn, request, fds)
+    except SystemExit as e:
+      exit_code = e.code
+    except:  # pylint: disable=bare-except
+      traceback.print_exc()
+    try:
+      # Running via os._exit skips interpreter shutdown, which would unwind
+      # the daemon's stack in this process, so run exit handlers directly.
+      import atexit  # pylint: disable=g-import-not-at-top
+      atexit._run_exitfuncs()  # pylint: disable=protected-access
+    finally:
+      if exit_code is None:
+        exit_code = 0
+      elif not isinstance(exit_code, int):
+        sys.stderr.write('%s\n' % exit_code)
+        exit_code = 1
+      for stream in (sys.stdout, sys.stderr):
+        try:
+          stream.flush()
+        except (EnvironmentError, ValueError):
+          pass
+      os._exit(exit_code)  # pylint: disable=protected-access
+
+
+def _RunCommand(conn, request, fds):
+  """Sets up the forked child as the client's process and runs the command.
+
+  Returns:
+    The command's exit status.
+  """
+  # pylint: disable=g-import-not-at-top
+  import multiprocessing
+  for target_fd, fd in zip(_STANDARD_FDS, fds):
+    os.dup2(fd, target_fd)
+    os.close(fd)
+  _ReopenStandardStreams()
+  os.chdir(request['cwd'])
+  os.umask(request['umask'])
+  os.environ.clear()
+  os.environ.update(request['env'])
+  tempfile.tempdir = None
+  sys.argv = request['argv']
+  # Processes started by the daemon, such as the multiprocessing manager
+  # created when gsutil's modules were imported, are not this process's
+  # children. multiprocessing does the same for the processes it starts.
+  multiprocessing.process._children = set()  # pylint: disable=protected-access
+  # Maps and locks that copy_helper shares between processes were created with
+  # the daemon's multiprocessing manager, and would otherwise be shared by all
+  # of the daemon's commands.
+  copy_helper = sys.modules.get('gslib.utils.copy_helper')
+  if copy_helper:
+    copy_helper.ReinitializeSharedState()
+
+  def _TerminateIfClientExits():
+    try:
+      data = conn.recv(1)
+    except EnvironmentError:
+      data = b''
+    if not data:
+      # The client exited without waiting for the command. gsutil handles
+      # SIGINT in every mode by cleaning up and exiting.
+      os.kill(os.getpid(), signal.SIGINT)
+
+  watcher = threading.Thread(target=_TerminateIfClientExits)
+  watcher.daemon = True
+  watcher.start()
+
+  import boto
+  base_user_agent = boto.UserAgent
+  import gslib.__main__
+  _PropagateUserAgent(base_user_agent)
+  return gslib.__main__.main()
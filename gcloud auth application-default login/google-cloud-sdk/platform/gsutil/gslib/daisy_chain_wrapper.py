@@ -19,16 +19,12 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import collections
-import contextlib
 import os
 import threading
-import time
 
 from gslib.cloud_api import BadRequestException
 from gslib.cloud_api import CloudApi
 from gslib.utils import constants
-from gslib.utils import parallelism_framework_util
 from gslib.utils.encryption_helper import CryptoKeyWrapperFromKey
 
 # This controls the amount of bytes downloaded per download request.
@@ -37,54 +33,81 @@ from gslib.utils.encryption_helper import CryptoKeyWrapperFromKey
 # be unnecessarily downloaded if there is a break in the resumable upload.
 _DEFAULT_DOWNLOAD_CHUNK_SIZE = 1024 * 1024 * 100
 
+_DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# The upload may seek back over the last read, which stays in the buffer until
+# the next one; leaving room for a full read beyond that keeps the download
+# from waiting on space that only a further read would free.
+_MIN_BUFFER_SIZE = 2 * constants.TRANSFER_BUFFER_SIZE
+
+
+class _DownloadStoppedException(Exception):
+  """Raised in a download thread to abandon its request after a seek."""
+
 
 class BufferWrapper(object):
-  """Wraps the download file pointer to use our in-memory buffer."""
+  """Wraps the download file pointer to use our in-memory buffer.
+
+  Each instance writes one download stream's data into the buffer, starting
+  at a given offset in the source object.
+  """
 
-  def __init__(self, daisy_chain_wrapper, mode='b'):
+  def __init__(self, daisy_chain_wrapper, start_byte, end_byte, mode='b'):
     """Provides a buffered write interface for a file download.
 
     Args:
       daisy_chain_wrapper: DaisyChainWrapper instance to use for buffer and
                            locking.
+      start_byte: Offset in the source object of the first byte written.
+      end_byte: Offset following the last byte to accept; data beyond it is
+                discarded.
     """
     self.daisy_chain_wrapper = daisy_chain_wrapper
+    # Offset in the source object of the next byte to be written. Protected by
+    # daisy_chain_wrapper.lock.
+    self.position = start_byte
+    self.end_byte = end_byte
     if hasattr(daisy_chain_wrapper, 'mode'):
       self.mode = daisy_chain_wrapper.mode
     else:
       self.mode = mode
 
   def write(self, data):  # pylint: disable=invalid-name
-    """Waits for space in the buffer, then writes data to the buffer."""
-    while True:
-      with self.daisy_chain_wrapper.lock:
-        if (self.daisy_chain_wrapper.bytes_buffered
-            < self.daisy_chain_wrapper.max_buffer_size):
-          break
-      # Buffer was full, yield thread priority so the upload can pull from it.
-      time.sleep(0)
-    data_len = len(data)
-    if data_len:
-      with self.daisy_chain_wrapper.lock:
-        self.daisy_chain_wrapper.buffer.append(data)
-        self.daisy_chain_wrapper.bytes_buffered += data_len
-
-
-@contextlib.contextmanager
-def AcquireLockWithTimeout(lock, timeout):  # pylint: disable=invalid-name
-  result = lock.acquire(timeout=timeout)
-  yield result
-  if result:
-    lock.release()
+    """Waits for space in the buffer, then copies data into the buffer."""
+    wrapper = self.daisy_chain_wrapper
+    data = memoryview(data)[:max(self.end_byte - self.position, 0)]
+    while data:
+      with wrapper.lock:
+        while True:
+          if wrapper.stop_download:
+            raise _DownloadStoppedException()
+          space = (wrapper.last_position + wrapper.max_buffer_size -
+                   self.position)
+          if space > 0:
+            break
+          wrapper.buffer_changed.wait()
+        position = self.position
+      # The bytes from position onward are not readable until this writer
+      # advances past them, and space is only freed behind the reader, so the
+      # copy needs no lock.
+      num_bytes = min(len(data), space)
+      wrapper.CopyToBuffer(position, data[:num_bytes])
+      data = data[num_bytes:]
+      with wrapper.lock:
+        self.position = position + num_bytes
+        wrapper.buffer_changed.notify_all()
 
 
 class DaisyChainWrapper(object):
   """Wrapper class for daisy-chaining a cloud download to an upload.
 
-  This class instantiates a BufferWrapper object to buffer the download into
-  memory, consuming a maximum of max_buffer_size. It implements intelligent
-  behavior around read and seek that allow for all of the operations necessary
-  to copy a file.
+  This class downloads the source object into a ring buffer of
+  max_buffer_size bytes, using one or more download threads, and implements
+  read and seek on top of it with the behavior necessary to upload it.
+
+  With several download streams, the object is split into ranges that the
+  streams download concurrently, each writing directly into its place in the
+  buffer. The upload reads bytes only once all preceding ranges have arrived.
 
   This class is coupled with the XML and JSON implementations in that it
   expects that small buffers (maximum of constants.TRANSFER_BUFFER_SIZE) in
@@ -98,7 +121,9 @@ class DaisyChainWrapper(object):
                compressed_encoding=False,
                progress_callback=None,
                download_chunk_size=_DEFAULT_DOWNLOAD_CHUNK_SIZE,
-               decryption_key=None):
+               decryption_key=None,
+               buffer_size=_DEFAULT_BUFFER_SIZE,
+               download_streams=1):
     """Initializes the daisy chain wrapper.
 
     Args:
@@ -114,120 +139,227 @@ class DaisyChainWrapper(object):
           unnecessarily downloaded if there is a break in the resumable upload.
       decryption_key: Base64-encoded decryption key for the source object,
           if any.
+      buffer_size: Maximum number of downloaded bytes held in memory.
+      download_streams: Number of concurrent range requests to download the
+          object with. Each request covers at most buffer_size /
+          download_streams bytes, so that all streams can write into the
+          buffer at once. Objects with compressed_encoding are always
+          downloaded with a single stream.
     Raises:
       Exception: if the download thread doesn't start within 60 seconds
     """
     # Current read position for the upload file pointer.
     self.position = 0
-    self.buffer = collections.deque()
 
-    self.bytes_buffered = 0
     # Maximum amount of bytes in memory at a time.
-    self.max_buffer_size = 1024 * 1024  # 1 MiB
+    self.max_buffer_size = max(buffer_size, _MIN_BUFFER_SIZE)
+    # Byte i of the object is held at index i % max_buffer_size.
+    self._buffer = memoryview(bytearray(self.max_buffer_size))
 
+    self.download_streams = 1
     self._download_chunk_size = download_chunk_size
-
-    # We save one buffer's worth of data as a special case for boto,
-    # which seeks back one buffer and rereads to compute hashes. This is
+    if download_streams > 1 and not compressed_encoding:
+      self.download_streams = download_streams
+      self._download_chunk_size = min(
+          download_chunk_size,
+          max(self.max_buffer_size // download_streams,
+              constants.TRANSFER_BUFFER_SIZE))
+
+    # We keep the previous read's data in the buffer as a special case for
+    # boto, which seeks back one buffer and rereads to compute hashes. This is
     # unnecessary because we can just compare cloud hash digests at the end,
-    # but it allows this to work without modfiying boto.
+    # but it allows this to work without modfiying boto. Bytes before
+    # last_position may be overwritten by the download.
     self.last_position = 0
-    self.last_data = None
-
-    # Protects buffer, position, bytes_buffered, last_position, and last_data.
-    self.lock = parallelism_framework_util.CreateLock()
 
-    # Protects download_exception.
-    self.download_exception_lock = parallelism_framework_util.CreateLock()
+    # Protects position, last_position, the download state below, and the
+    # positions of the BufferWrappers in _writers.
+    self.lock = threading.Lock()
+    # Notified whenever data is added to or consumed from the buffer, and when
+    # a download thread exits.
+    self.buffer_changed = threading.Condition(self.lock)
 
     self.src_obj_size = src_obj_size
     self.src_url = src_url
     self.compressed_encoding = compressed_encoding
     self.decryption_tuple = CryptoKeyWrapperFromKey(decryption_key)
 
-    # This is safe to use the upload and download thread because the download
-    # thread calls only GetObjectMedia, which creates a new HTTP connection
-    # independent of gsutil_api. Thus, it will not share an HTTP connection
-    # with the upload.
+    # This is safe to use the upload and download threads because the
+    # download threads call only GetObjectMedia, which creates a new HTTP
+    # connection independent of gsutil_api. Thus, they will not share an HTTP
+    # connection with the upload or with each other.
     self.gsutil_api = gsutil_api
 
-    # If self.download_thread dies due to an exception, it is saved here so
+    # If a download thread dies due to an exception, it is saved here so
     # that it can also be raised in the upload thread.
     self.download_exception = None
-    self.download_thread = None
+    self.download_threads = []
+    # Number of download threads that have not yet exited.
+    self._running_download_threads = 0
+    # Writers for the ranges currently being downloaded.
+    self._writers = set()
+    # Offset of the first byte not yet assigned to a download stream. When no
+    # ranges are being downloaded, all bytes before it have been downloaded.
+    self._next_range_start = 0
     self.progress_callback = progress_callback
     self.download_started = threading.Event()
-    self.stop_download = threading.Event()
-    self.StartDownloadThread(progress_callback=self.progress_callback)
+    # Set, under lock, to make the download threads exit.
+    self.stop_download = False
+    self.StartDownloadThreads(progress_callback=self.progress_callback)
     if not self.download_started.wait(60):
       raise Exception('Could not start download thread after 60 seconds.')
-    self._unused_data_from_previous_read = b''
 
-  def StartDownloadThread(self, start_byte=0, progress_callback=None):  # pylint: disable=invalid-name
-    """Starts the download thread for the source object (from start_byte)."""
+  def CopyToBuffer(self, start_byte, data):
+    """Copies data for the object bytes from start_byte into the buffer."""
+    index = start_byte % self.max_buffer_size
+    first_len = min(len(data), self.max_buffer_size - index)
+    self._buffer[index:index + first_len] = data[:first_len]
+    if first_len < len(data):
+      self._buffer[:len(data) - first_len] = data[first_len:]
+
+  def _CopyFromBuffer(self, start_byte, num_bytes):
+    """Returns num_bytes of the object from start_byte, out of the buffer."""
+    index = start_byte % self.max_buffer_size
+    first_len = min(num_bytes, self.max_buffer_size - index)
+    data = self._buffer[index:index + first_len].tobytes()
+    if first_len < num_bytes:
+      data += self._buffer[:num_bytes - first_len].tobytes()
+    return data
+
+  def _GetBytesDownloaded(self):
+    """Returns the offset up to which the object is in the buffer.
+
+    Must be called with lock held.
+    """
+    if self._writers:
+      return min(writer.position for writer in self._writers)
+    return self._next_range_start
 
-    def PerformDownload(start_byte, progress_callback):  # pylint: disable=invalid-name
-      """Downloads the source object in chunks.
+  def _AddWriter(self, start_byte, end_byte):
+    with self.lock:
+      writer = BufferWrapper(self, start_byte, end_byte)
+      self._writers.add(writer)
+      return writer
+
+  def _GetObjectMedia(self, download_stream, start_byte, end_byte,
+                      progress_callback):
+    self.gsutil_api.GetObjectMedia(
+        self.src_url.bucket_name,
+        self.src_url.object_name,
+        download_stream,
+        compressed_encoding=self.compressed_encoding,
+        start_byte=start_byte,
+        end_byte=end_byte,
+        generation=self.src_url.generation,
+        object_size=self.src_obj_size,
+        download_strategy=CloudApi.DownloadStrategy.ONE_SHOT,
+        provider=self.src_url.scheme,
+        progress_callback=progress_callback,
+        decryption_tuple=self.decryption_tuple)
+
+  def _PerformDownload(self, start_byte, progress_callback):
+    """Downloads the source object in chunks with a single stream.
 
-      This function checks the stop_download event and exits early if it is set.
-      It should be set when there is an error during the daisy-chain upload,
-      then this function can be called again with the upload's current position
-      as start_byte.
+    Args:
+      start_byte: Byte from which to begin the download.
+      progress_callback: Optional callback function for progress
+          notifications. Receives calls with arguments
+          (bytes_transferred, total_size).
+    """
+    # TODO: Support resumable downloads. This would require the BufferWrapper
+    # object to support seek() and tell() which requires coordination with
+    # the upload.
+    writer = self._AddWriter(start_byte, self.src_obj_size)
+    while start_byte + self._download_chunk_size < self.src_obj_size:
+      self._GetObjectMedia(writer, start_byte,
+                           start_byte + self._download_chunk_size - 1,
+                           progress_callback)
+      start_byte += self._download_chunk_size
+    self._GetObjectMedia(writer, start_byte, None, progress_callback)
+    with self.lock:
+      self._writers.discard(writer)
+      self._next_range_start = writer.position
 
-      Args:
-        start_byte: Byte from which to begin the download.
-        progress_callback: Optional callback function for progress
-            notifications. Receives calls with arguments
-            (bytes_transferred, total_size).
+  def _PerformRangeDownloads(self, progress_callback):
+    """Downloads ranges of the source object until none are left.
+
+    Args:
+      progress_callback: Optional callback function for progress
+          notifications. Receives calls with arguments
+          (bytes_transferred, total_size).
+    """
+    while True:
+      with self.lock:
+        if self.stop_download or self._next_range_start >= self.src_obj_size:
+          return
+        start_byte = self._next_range_start
+        end_byte = min(start_byte + self._download_chunk_size,
+                       self.src_obj_size)
+        self._next_range_start = end_byte
+        writer = BufferWrapper(self, start_byte, end_byte)
+        self._writers.add(writer)
+      self._GetObjectMedia(
+          writer, start_byte,
+          end_byte - 1 if end_byte < self.src_obj_size else None,
+          progress_callback)
+      with self.lock:
+        if writer.position != end_byte:
+          raise BadRequestException(
+              'Invalid download during daisy chain operation, got %s bytes '
+              'of range %s-%s.' %
+              (writer.position - start_byte, start_byte, end_byte - 1))
+        self._writers.discard(writer)
+        self.buffer_changed.notify_all()
+
+  def StartDownloadThreads(self, start_byte=0, progress_callback=None):  # pylint: disable=invalid-name
+    """Starts the download threads for the source object (from start_byte)."""
+
+    def PerformDownload():  # pylint: disable=invalid-name
+      """Runs one download stream, saving any exception for the upload.
+
+      The stream exits early if stop_download is set. It should be set when
+      there is an error during the daisy-chain upload, then the streams can
+      be started again with the upload's current position as start_byte.
       """
-      # TODO: Support resumable downloads. This would require the BufferWrapper
-      # object to support seek() and tell() which requires coordination with
-      # the upload.
       self.download_started.set()
       try:
-        while start_byte + self._download_chunk_size < self.src_obj_size:
-          self.gsutil_api.GetObjectMedia(
-              self.src_url.bucket_name,
-              self.src_url.object_name,
-              BufferWrapper(self),
-              compressed_encoding=self.compressed_encoding,
-              start_byte=start_byte,
-              end_byte=start_byte + self._download_chunk_size - 1,
-              generation=self.src_url.generation,
-              object_size=self.src_obj_size,
-              download_strategy=CloudApi.DownloadStrategy.ONE_SHOT,
-              provider=self.src_url.scheme,
-              progress_callback=progress_callback,
-              decryption_tuple=self.decryption_tuple)
-          if self.stop_download.is_set():
-            # Download thread needs to be restarted, so exit.
-            self.stop_download.clear()
-            return
-          start_byte += self._download_chunk_size
-        self.gsutil_api.GetObjectMedia(
-            self.src_url.bucket_name,
-            self.src_url.object_name,
-            BufferWrapper(self),
-            compressed_encoding=self.compressed_encoding,
-            start_byte=start_byte,
-            generation=self.src_url.generation,
-            object_size=self.src_obj_size,
-            download_strategy=CloudApi.DownloadStrategy.ONE_SHOT,
-            provider=self.src_url.scheme,
-            progress_callback=progress_callback,
-            decryption_tuple=self.decryption_tuple)
+        if self.download_streams > 1:
+          self._PerformRangeDownloads(progress_callback)
+        else:
+          self._PerformDownload(start_byte, progress_callback)
+      except _DownloadStoppedException:
+        pass
       # We catch all exceptions here because we want to store them.
       except Exception as e:  # pylint: disable=broad-except
-        # Save the exception so that it can be seen in the upload thread.
-        with self.download_exception_lock:
-          self.download_exception = e
-          raise
+        # Save the exception so that it can be seen in the upload thread, and
+        # stop the other streams since their data will not be read.
+        with self.lock:
+          if self.download_exception is None:
+            self.download_exception = e
+          self.stop_download = True
+        raise
+      finally:
+        with self.lock:
+          self._running_download_threads -= 1
+          self.buffer_changed.notify_all()
 
+    with self.lock:
+      self._next_range_start = start_byte
+      self._running_download_threads = self.download_streams
     # TODO: If we do gzip encoding transforms mid-transfer, this will fail.
-    self.download_thread = threading.Thread(target=PerformDownload,
-                                            args=(start_byte,
-                                                  progress_callback))
-    self.download_thread.start()
+    self.download_threads = [
+        threading.Thread(target=PerformDownload)
+        for _ in range(self.download_streams)
+    ]
+    for download_thread in self.download_threads:
+      download_thread.start()
+
+  def _StopDownloadThreads(self):
+    with self.lock:
+      self.stop_download = True
+      self.buffer_changed.notify_all()
+    for download_thread in self.download_threads:
+      download_thread.join()
 
   def read(self, amt=None):  # pylint: disable=invalid-name
     """Exposes a stream from the in-memory buffer to the upload."""
@@ -240,52 +372,28 @@ class DaisyChainWrapper(object):
           'Invalid HTTP read size %s during daisy chain operation, '
           'expected <= %s.' % (amt, constants.TRANSFER_BUFFER_SIZE))
 
-    if self._unused_data_from_previous_read:
-      valid_data = self._unused_data_from_previous_read[:amt]
-      self._unused_data_from_previous_read = (
-          self._unused_data_from_previous_read[amt:])
-    else:
-      valid_data = b''
-
-      while True:
-        with self.lock:
-          if self.buffer:
-            break
-          if AcquireLockWithTimeout(self.download_exception_lock, 30):
-            if self.download_exception:
-              # Download thread died, so we will never recover. Raise the
-              # exception that killed it.
-              raise self.download_exception  # pylint: disable=raising-bad-type
-          else:
-            if not self.download_thread.is_alive():
-              raise Exception('Download thread died suddenly.')
-        # Buffer was empty, yield thread priority so the download thread can fill.
-        time.sleep(0)
     with self.lock:
-      # In a rare case where len(valid_data) < amt, and there are
-      # elements in the buffer, e.g let's say valid_data = 'foo' and amt = 5,
-      # and we have 'barbaz' in self.buffer, instead of returning 'fooba'
-      # in the current call, we return 'foo', and in the subsequent calls
-      # we will return 'barba' and 'z'. Given that we set
-      # TRANSFER_BUFFER_SIZE as a multiple of the amt (8KiB),
-      # we can safely assume that this will never happen practically.
-      # This assumption helps us keep the logic simple and avoid
-      # string concatenations and splits ('foo' + 'ba' in the above case).
-      if not valid_data:
-        data = self.buffer.popleft()
-        valid_data = data[:amt]
-        self._unused_data_from_previous_read = data[amt:]
-
-      self.last_position = self.position
-      self.last_data = valid_data
-      data_len = len(valid_data)
-      self.position += data_len
-      self.bytes_buffered -= data_len
-    if data_len > amt:
-      raise BadRequestException(
-          'Invalid read during daisy chain operation, got data of size '
-          '%s, expected size %s.' % (data_len, amt))
-    return valid_data
+      while True:
+        bytes_available = (min(self._GetBytesDownloaded(), self.src_obj_size) -
+                           self.position)
+        if bytes_available > 0:
+          break
+        if self.download_exception:
+          # Download thread died, so we will never recover. Raise the
+          # exception that killed it.
+          raise self.download_exception  # pylint: disable=raising-bad-type
+        if not self._running_download_threads:
+          raise Exception('Download thread died suddenly.')
+        self.buffer_changed.wait()
+      start_byte = self.position
+      num_bytes = min(amt, bytes_available)
+      # Frees the bytes before the previous read for the download.
+      self.last_position = start_byte
+      self.position += num_bytes
+      self.buffer_changed.notify_all()
+    # The bytes from last_position onward are not overwritten until a later
+    # read, so the copy needs no lock.
+    return self._CopyFromBuffer(start_byte, num_bytes)
 
   def tell(self):  # pylint: disable=invalid-name
     with self.lock:
@@ -301,20 +409,17 @@ class DaisyChainWrapper(object):
             'from os.SEEK_END is not supported' % offset)
       with self.lock:
         self.last_position = self.position
-        self.last_data = None
         # Safe because we check position against src_obj_size in read.
         self.position = self.src_obj_size
+        self.buffer_changed.notify_all()
     elif whence == os.SEEK_SET:
       with self.lock:
         if offset == self.position:
           pass
-        elif offset == self.last_position:
-          self.position = self.last_position
-          if self.last_data:
-            # If we seek to end and then back, we won't have last_data; we'll
-            # get it on the next call to read.
-            self.buffer.appendleft(self.last_data)
-            self.bytes_buffered += len(self.last_data)
+        elif self.last_position <= offset <= self._GetBytesDownloaded():
+          # The data from offset on is still in the buffer, or will be added
+          # to it by the running download.
+          self.position = offset
         else:
           # Once a download is complete, boto seeks to 0 and re-reads to
           # compute the hash if an md5 isn't already present (for example a GCS
@@ -325,25 +430,16 @@ class DaisyChainWrapper(object):
           restart_download = True
 
       if restart_download:
-        self.stop_download.set()
-
-        # Consume any remaining bytes in the download thread so that
-        # the thread can exit, then restart the thread at the desired position.
-        while self.download_thread.is_alive():
-          with self.lock:
-            while self.bytes_buffered:
-              self.bytes_buffered -= len(self.buffer.popleft())
-          time.sleep(0)
-
+        # Abandon the current requests, then restart the threads at the
+        # desired position.
+        self._StopDownloadThreads()
         with self.lock:
           self.position = offset
-          self.buffer = collections.deque()
-          self.bytes_buffered = 0
-          self.last_position = 0
-          self.last_data = None
-          self.stop_download.clear()
-        self.StartDownloadThread(start_byte=offset,
-                                 progress_callback=self.progress_callback)
+          self.last_position = offset
+          self._writers = set()
+          self.stop_download = False
+        self.StartDownloadThreads(start_byte=offset,
+                                  progress_callback=self.progress_callback)
     else:
       raise IOError('Daisy-chain download wrapper does not support '
                     'seek mode %s' % whence)
@@ -195,6 +195,9 @@ _INSUFFICIENT_OAUTH2_SCOPE_MESSAGE = (
 DEFAULT_HOST = 'storage.googleapis.com'
 MTLS_HOST = 'storage.mtls.googleapis.com'
 
+# Hosts that may be reached over plain HTTP (see gs_json_protocol).
+_LOOPBACK_HOSTS = ('localhost', '127.0.0.1')
+
 
 class GcsJsonApi(CloudApi):
   """Google Cloud Storage JSON implementation of gsutil Cloud API."""
@@ -260,8 +263,21 @@ class GcsJsonApi(CloudApi):
       WrapDownloadHttpRequest(self.authorized_download_http)
       WrapUploadHttpRequest(self.authorized_upload_http)
 
-    self.http_base = 'https://'
     gs_json_host = config.get('Credentials', 'gs_json_host', None)
+    gs_json_protocol = config.get('Credentials', 'gs_json_protocol', 'https')
+    if gs_json_protocol == 'http':
+      # Plain HTTP is only for local endpoints such as the test emulator, as
+      # it would otherwise expose credentials and data.
+      if gs_json_host not in _LOOPBACK_HOSTS:
+        raise ArgumentException(
+            'gs_json_protocol = http is only allowed when gs_json_host is a '
+            'loopback address (one of %s), but gs_json_host is %s.' %
+            (', '.join(_LOOPBACK_HOSTS), gs_json_host))
+    elif gs_json_protocol != 'https':
+      raise ArgumentException(
+          'Invalid gs_json_protocol "%s"; must be "https" or "http".' %
+          gs_json_protocol)
+    self.http_base = gs_json_protocol + '://'
     if (context_config.get_context_config() and
         context_config.get_context_config().use_client_certificate):
       if gs_json_host:
@@ -1188,12 +1204,15 @@ class GcsJsonApi(CloudApi):
         bytes_downloaded_container,
         total_size=outer_total_size,
         progress_callback=progress_callback,
-        digesters=digesters)
+        digesters=digesters,
+        use_https=self.http_base == 'https://')
     download_http_class = callback_class_factory.GetConnectionClass()
 
     # Point our download HTTP at our download stream.
     self.download_http.stream = download_stream
-    self.download_http.connections = {'https': download_http_class}
+    self.download_http.connections = {
+        self.http_base[:-len('://')]: download_http_class
+    }
 
     if serialization_data:
       # If we have an apiary trace token, add it to the URL.
@@ -1507,7 +1526,8 @@ class GcsJsonApi(CloudApi):
         total_size=total_size,
         progress_callback=progress_callback,
         logger=self.logger,
-        debug=self.debug)
+        debug=self.debug,
+        use_https=self.http_base == 'https://')
 
     upload_http_class = callback_class_factory.GetConnectionClass()
     self.upload_http.connections = {
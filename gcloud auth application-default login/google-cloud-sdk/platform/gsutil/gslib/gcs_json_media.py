@@ -73,6 +73,13 @@ class BytesTransferredContainer(object):
     self.__bytes_transferred = value
 
 
+def _GetBaseConnectionClass(use_https):
+  """Returns the httplib2 connection class that media connections extend."""
+  if use_https:
+    return httplib2.HTTPSConnectionWithTimeout
+  return httplib2.HTTPConnectionWithTimeout
+
+
 class UploadCallbackConnectionClassFactory(object):
   """Creates a class that can override an httplib2 connection.
 
@@ -87,13 +94,16 @@ class UploadCallbackConnectionClassFactory(object):
                total_size=0,
                progress_callback=None,
                logger=None,
-               debug=0):
+               debug=0,
+               use_https=True):
     self.bytes_uploaded_container = bytes_uploaded_container
     self.buffer_size = buffer_size
     self.total_size = total_size
     self.progress_callback = progress_callback
     self.logger = logger
     self.debug = debug
+    # Plain HTTP is used only for local endpoints (see gs_json_protocol).
+    self.use_https = use_https
 
   def GetConnectionClass(self):
     """Returns a connection class that overrides send."""
@@ -103,8 +113,10 @@ class UploadCallbackConnectionClassFactory(object):
     outer_progress_callback = self.progress_callback
     outer_logger = self.logger
     outer_debug = self.debug
+    outer_use_https = self.use_https
+    connection_class = _GetBaseConnectionClass(self.use_https)
 
-    class UploadCallbackConnection(httplib2.HTTPSConnectionWithTimeout):
+    class UploadCallbackConnection(connection_class):
       """Connection class override for uploads."""
       bytes_uploaded_container = outer_bytes_uploaded_container
       # After we instantiate this class, apitools will check with the server
@@ -112,6 +124,7 @@ class UploadCallbackConnectionClassFactory(object):
       # us to update our progress once based on that number.
       processed_initial_bytes = False
       GCS_JSON_BUFFER_SIZE = outer_buffer_size
+      use_https = outer_use_https
       callback_processor = None
       size = outer_total_size
       header_encoding = ''
@@ -121,7 +134,7 @@ class UploadCallbackConnectionClassFactory(object):
 
       def __init__(self, *args, **kwargs):
         kwargs['timeout'] = SSL_TIMEOUT_SEC
-        httplib2.HTTPSConnectionWithTimeout.__init__(self, *args, **kwargs)
+        connection_class.__init__(self, *args, **kwargs)
 
       # Override httplib.HTTPConnection._send_output for debug logging.
       # Because the distinction between headers and message body occurs
@@ -254,12 +267,13 @@ class UploadCallbackConnectionClassFactory(object):
         partial_buffer = full_buffer.read(self.GCS_JSON_BUFFER_SIZE)
         while partial_buffer:
           if six.PY2:
-            httplib2.HTTPSConnectionWithTimeout.send(self, partial_buffer)
+            _GetBaseConnectionClass(self.use_https).send(self, partial_buffer)
           else:
             if isinstance(partial_buffer, bytes):
-              httplib2.HTTPSConnectionWithTimeout.send(self, partial_buffer)
+              _GetBaseConnectionClass(self.use_https).send(
+                  self, partial_buffer)
             else:
-              httplib2.HTTPSConnectionWithTimeout.send(
+              _GetBaseConnectionClass(self.use_https).send(
                   self, partial_buffer.encode(UTF8))
           sent_data_bytes = len(partial_buffer)
           if num_metadata_bytes:
@@ -332,17 +346,21 @@ class DownloadCallbackConnectionClassFactory(object):
                buffer_size=TRANSFER_BUFFER_SIZE,
                total_size=0,
                progress_callback=None,
-               digesters=None):
+               digesters=None,
+               use_https=True):
     self.buffer_size = buffer_size
     self.total_size = total_size
     self.progress_callback = progress_callback
     self.digesters = digesters
     self.bytes_downloaded_container = bytes_downloaded_container
+    # Plain HTTP is used only for local endpoints (see gs_json_protocol).
+    self.use_https = use_https
 
   def GetConnectionClass(self):
     """Returns a connection class that overrides getresponse."""
+    connection_class = _GetBaseConnectionClass(self.use_https)
 
-    class DownloadCallbackConnection(httplib2.HTTPSConnectionWithTimeout):
+    class DownloadCallbackConnection(connection_class):
       """Connection class override for downloads."""
       outer_total_size = self.total_size
       outer_digesters = self.digesters
@@ -353,7 +371,7 @@ class DownloadCallbackConnectionClassFactory(object):
 
       def __init__(self, *args, **kwargs):
         kwargs['timeout'] = SSL_TIMEOUT_SEC
-        httplib2.HTTPSConnectionWithTimeout.__init__(self, *args, **kwargs)
+        connection_class.__init__(self, *args, **kwargs)
 
       def getresponse(self, buffering=False):
         """Wraps an HTTPResponse to perform callbacks and hashing.
@@ -20,6 +20,7 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import atexit
+import bisect
 from collections import defaultdict
 from functools import wraps
 import logging
@@ -41,7 +42,9 @@ from six.moves import urllib
 import boto
 
 from gslib import VERSION
+from gslib import metrics_sink
 from gslib.metrics_tuple import Metric
+from gslib.thread_message import FileMessage
 from gslib.utils import system_util
 from gslib.utils.unit_util import CalculateThroughput
 from gslib.utils.unit_util import HumanReadableToBytes
@@ -107,12 +110,76 @@ _GA_LABEL_MAP = {
     'Slowest Thread Throughput': 'cm12',
     'Fastest Thread Throughput': 'cm13',
     'Disk I/O Time': 'cm14',
+    'Num Hedged Requests': 'cm15',
+    'Hedged Request Wasted Bytes': 'cm16',
 }
 
+# Map from PerformanceSummary values to their descriptive GA labels.
+_PERFSUM_LABELS = (
+    ('num_processes', 'Num Processes'),
+    ('num_threads', 'Num Threads'),
+    ('num_retryable_service_errors', 'Num Retryable Service Errors'),
+    ('num_retryable_network_errors', 'Num Retryable Network Errors'),
+    ('num_hedged_requests', 'Num Hedged Requests'),
+    ('hedge_wasted_bytes', 'Hedged Request Wasted Bytes'),
+    ('avg_throughput', 'Average Overall Throughput'),
+    ('num_objects_transferred', 'Number of Files/Objects Transferred'),
+    ('total_bytes_transferred', 'Size of Files/Objects Transferred'),
+    ('disk_io_time', 'Disk I/O Time'),
+    ('source_url_type', 'Source URL Type'),
+    ('parallelism_strategy', 'Parallelism Strategy'),
+    ('thread_idle_time_percent', 'Thread Idle Time Percent'),
+    ('slowest_thread_throughput', 'Slowest Thread Throughput'),
+    ('fastest_thread_throughput', 'Fastest Thread Throughput'),
+    ('provider_types', 'Provider Types'),
+)
+
+# Names that transfer latencies are recorded under, by FileMessage type.
+_OPERATION_NAMES = {
+    FileMessage.FILE_DOWNLOAD: 'download',
+    FileMessage.FILE_UPLOAD: 'upload',
+    FileMessage.FILE_CLOUD_COPY: 'cloud_copy',
+    FileMessage.FILE_LOCAL_COPY: 'local_copy',
+    FileMessage.FILE_DAISY_COPY: 'daisy_copy',
+    FileMessage.FILE_REWRITE: 'rewrite',
+    FileMessage.FILE_HASH: 'hash',
+    FileMessage.COMPONENT_TO_UPLOAD: 'component_upload',
+    FileMessage.COMPONENT_TO_DOWNLOAD: 'component_download',
+}
+
+
+class _LatencyHistogram(object):
+  """Counts latencies in the buckets of metrics_sink.LATENCY_BUCKETS."""
+
+  def __init__(self):
+    # The last count is of latencies above every bucket's upper bound.
+    self.bucket_counts = [0] * (len(metrics_sink.LATENCY_BUCKETS) + 1)
+    self.count = 0
+    self.sum = 0
+
+  def Add(self, seconds):
+    self.bucket_counts[bisect.bisect_left(metrics_sink.LATENCY_BUCKETS,
+                                          seconds)] += 1
+    self.count += 1
+    self.sum += seconds
+
+  def ToDict(self):
+    """Returns the histogram with cumulative counts, as in Prometheus."""
+    buckets = []
+    cumulative_count = 0
+    for upper_bound, count in zip(metrics_sink.LATENCY_BUCKETS + ('+Inf',),
+                                  self.bucket_counts):
+      cumulative_count += count
+      buckets.append([upper_bound, cumulative_count])
+    return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
 
 class MetricsCollector(object):
   """A singleton class to handle metrics reporting to Google Analytics (GA).
 
+  Collected performance data is also written to the local telemetry sink, if
+  one is configured, whether or not reporting to GA is enabled.
+
   This class is not thread or process-safe, and logging directly to the
   MetricsCollector instance can only be done by a single thread.
   """
@@ -173,9 +240,15 @@ class MetricsCollector(object):
     # PerformanceSummary if the cp or rsync commands are run.
     self.perf_sum_params = None
 
+    # The metrics_sink.TelemetrySink to write performance data to, if any.
+    self.telemetry_sink = MetricsCollector.GetTelemetrySink()
+
   _instance = None
   # Whether analytics collection is disabled or not.
   _disabled_cache = None
+  # The configured TelemetrySink, False if there is none, or None if the config
+  # hasn't been checked yet.
+  _telemetry_sink_cache = None
 
   def _ValidateAndGetConfigValues(self):
     """Parses the user's config file to aggregate non-PII config values.
@@ -291,7 +364,8 @@ class MetricsCollector(object):
   @staticmethod
   def GetCollector(ga_tid=_GA_TID):
     """Returns the singleton MetricsCollector instance or None if disabled."""
-    if MetricsCollector.IsDisabled():
+    if (MetricsCollector.IsDisabled() and
+        not MetricsCollector.GetTelemetrySink()):
       return None
 
     if not MetricsCollector._instance:
@@ -329,6 +403,18 @@ class MetricsCollector(object):
     else:
       cls._disabled_cache = True
 
+  @staticmethod
+  def GetTelemetrySink():
+    """Returns the configured metrics_sink.TelemetrySink, or None."""
+    if MetricsCollector._telemetry_sink_cache is None:
+      # Tests that disable analytics shouldn't write telemetry either.
+      if os.environ.get('GSUTIL_TEST_ANALYTICS') == '1':
+        MetricsCollector._telemetry_sink_cache = False
+      else:
+        MetricsCollector._telemetry_sink_cache = (
+            metrics_sink.GetTelemetrySink() or False)
+    return MetricsCollector._telemetry_sink_cache or None
+
   @classmethod
   def StartTestCollector(cls,
                          endpoint='https://example.com',
@@ -366,6 +452,7 @@ class MetricsCollector(object):
     """
     os.environ['GSUTIL_TEST_ANALYTICS'] = '1'
     cls._disabled_cache = None
+    cls._telemetry_sink_cache = None
     cls._instance = original_instance
 
   @staticmethod
@@ -457,6 +544,8 @@ class MetricsCollector(object):
       self.num_threads = 0
       self.num_retryable_service_errors = 0
       self.num_retryable_network_errors = 0
+      self.num_hedged_requests = 0
+      self.hedge_wasted_bytes = 0
       self.provider_types = set()
 
       # Store the disk stats at the beginning of the command so we can calculate
@@ -477,6 +566,10 @@ class MetricsCollector(object):
       # keeping track of elapsed time and bytes processed.
       self.thread_throughputs = defaultdict(self._ThreadThroughputInformation)
 
+      # This maps operation names from _OPERATION_NAMES to _LatencyHistograms
+      # of the durations of file and component transfers.
+      self.operation_latencies = defaultdict(_LatencyHistogram)
+
       # Data transfer statistics.
       self.avg_throughput = None
       # This is the amount of time spent on the Apply call of cp and rsync.
@@ -504,16 +597,23 @@ class MetricsCollector(object):
         # the beginning of a transfer, but we don't want to count these bytes
         # until the transfer is complete.
         self.task_size = None
+        # The FileMessage type of the current task, if any.
+        self.task_type = None
 
-      def LogTaskStart(self, start_time, bytes_to_transfer):
+      def LogTaskStart(self, start_time, bytes_to_transfer, task_type=None):
         self.task_start_time = start_time
         self.task_size = bytes_to_transfer
+        self.task_type = task_type
 
       def LogTaskEnd(self, end_time):
-        self.total_elapsed_time += end_time - self.task_start_time
+        """Records the end of the current task and returns its duration."""
+        elapsed_time = end_time - self.task_start_time
+        self.total_elapsed_time += elapsed_time
         self.total_bytes_transferred += self.task_size
         self.task_start_time = None
         self.task_size = None
+        self.task_type = None
+        return elapsed_time
 
       def GetThroughput(self):
         return CalculateThroughput(self.total_bytes_transferred,
@@ -542,6 +642,10 @@ class MetricsCollector(object):
                                         service errors that occurred.
         - num_retryable_network_errors: The additional number of retryable
                                         network errors that occurred.
+        - num_hedged_requests: The additional number of download requests
+                               sent to duplicate stalled ones.
+        - hedge_wasted_bytes: The additional number of bytes discarded by
+                              abandoned download requests.
         - num_processes: The number of processes used in a call to Apply.
         - num_threads: The number of threads used in a call to Apply.
         - num_objects_transferred: The total number of objects transferred, as
@@ -576,7 +680,8 @@ class MetricsCollector(object):
       # These parameters need to be incremented.
       if param_name in ('thread_idle_time', 'thread_execution_time',
                         'num_retryable_service_errors',
-                        'num_retryable_network_errors'):
+                        'num_retryable_network_errors',
+                        'num_hedged_requests', 'hedge_wasted_bytes'):
         cur_value = getattr(self.perf_sum_params, param_name)
         setattr(self.perf_sum_params, param_name, cur_value + param)
 
@@ -596,7 +701,8 @@ class MetricsCollector(object):
 
     Update a thread's throughput based on the FileMessage, which marks the start
     or end of a file or component transfer. The FileMessage provides the number
-    of bytes transferred as well as start and end time.
+    of bytes transferred as well as start and end time. The durations of
+    transfers are also recorded, by type of operation.
 
     Args:
       file_message: The FileMessage to process.
@@ -609,9 +715,13 @@ class MetricsCollector(object):
       # ProducerThreadMessages.
       if not (self.perf_sum_params.uses_slice or self.perf_sum_params.uses_fan):
         self.perf_sum_params.num_objects_transferred += 1
-      thread_info.LogTaskEnd(file_message.time)
+      operation = _OPERATION_NAMES.get(thread_info.task_type)
+      elapsed_time = thread_info.LogTaskEnd(file_message.time)
+      if operation:
+        self.perf_sum_params.operation_latencies[operation].Add(elapsed_time)
     else:
-      thread_info.LogTaskStart(file_message.time, file_message.size)
+      thread_info.LogTaskStart(file_message.time, file_message.size,
+                               file_message.message_type)
 
   def _CollectCommandAndErrorMetrics(self):
     """Aggregates command and error info and adds them to the metrics list."""
@@ -637,32 +747,33 @@ class MetricsCollector(object):
       self.CollectGAMetric(category=_GA_ERRORFATAL_CATEGORY,
                            action=fatal_error_type)
 
-  def _CollectPerformanceSummaryMetric(self):
-    """Aggregates PerformanceSummary info and adds the metric to the list."""
+  def _GetPerformanceSummary(self):
+    """Aggregates PerformanceSummary info.
+
+    Returns:
+      A dict of the PerformanceSummary values, keyed as in _PERFSUM_LABELS
+      along with 'transfer_types' and 'apply_time', or None if the command
+      logged no PerformanceSummary info.
+    """
     if self.perf_sum_params is None:
-      return
+      return None
 
-    custom_params = {}
+    summary = {}
 
     # These parameters need no further processing.
-    for attr_name, label in (
-        ('num_processes', 'Num Processes'),
-        ('num_threads', 'Num Threads'),
-        ('num_retryable_service_errors', 'Num Retryable Service Errors'),
-        ('num_retryable_network_errors', 'Num Retryable Network Errors'),
-        ('avg_throughput', 'Average Overall Throughput'),
-        ('num_objects_transferred', 'Number of Files/Objects Transferred'),
-        ('total_bytes_transferred', 'Size of Files/Objects Transferred'),
-    ):
-      custom_params[_GA_LABEL_MAP[label]] = getattr(self.perf_sum_params,
-                                                    attr_name)
+    for attr_name in ('num_processes', 'num_threads',
+                      'num_retryable_service_errors',
+                      'num_retryable_network_errors', 'num_hedged_requests',
+                      'hedge_wasted_bytes', 'avg_throughput',
+                      'num_objects_transferred', 'total_bytes_transferred'):
+      summary[attr_name] = getattr(self.perf_sum_params, attr_name)
 
     # Calculate the disk stats again to calculate deltas of time spent on I/O.
     if system_util.IS_LINUX:
       disk_start = self.perf_sum_params.disk_counters_start
       disk_end = system_util.GetDiskCounters()
       # Read and write time are the 5th and 6th elements of the stat tuple.
-      custom_params[_GA_LABEL_MAP['Disk I/O Time']] = (
+      summary['disk_io_time'] = (
           sum([stat[4] + stat[5] for stat in disk_end.values()]) -
           sum([stat[4] + stat[5] for stat in disk_start.values()]))
 
@@ -671,20 +782,20 @@ class MetricsCollector(object):
       src_url_type = 'both' if self.perf_sum_params.has_file_src else 'cloud'
     else:
       src_url_type = 'file'
-    custom_params[_GA_LABEL_MAP['Source URL Type']] = src_url_type
+    summary['source_url_type'] = src_url_type
 
     # Determine the type of parallelism used, if any.
     if self.perf_sum_params.uses_fan:
       strategy = 'both' if self.perf_sum_params.uses_slice else 'fan'
     else:
       strategy = 'slice' if self.perf_sum_params.uses_slice else 'none'
-    custom_params[_GA_LABEL_MAP['Parallelism Strategy']] = strategy
+    summary['parallelism_strategy'] = strategy
 
     # Determine the percentage of time that threads spent idle.
     total_time = (self.perf_sum_params.thread_idle_time +
                   self.perf_sum_params.thread_execution_time)
     if total_time:
-      custom_params[_GA_LABEL_MAP['Thread Idle Time Percent']] = (
+      summary['thread_idle_time_percent'] = (
           float(self.perf_sum_params.thread_idle_time) / float(total_time))
 
     # Determine the slowest and fastest thread throughputs.
@@ -693,13 +804,11 @@ class MetricsCollector(object):
           thread.GetThroughput()
           for thread in self.perf_sum_params.thread_throughputs.values()
       ]
-      custom_params[_GA_LABEL_MAP['Slowest Thread Throughput']] = min(
-          throughputs)
-      custom_params[_GA_LABEL_MAP['Fastest Thread Throughput']] = max(
-          throughputs)
+      summary['slowest_thread_throughput'] = min(throughputs)
+      summary['fastest_thread_throughput'] = max(throughputs)
 
     # Determine the provider(s) used.
-    custom_params[_GA_LABEL_MAP['Provider Types']] = ','.join(
+    summary['provider_types'] = ','.join(
         sorted(self.perf_sum_params.provider_types))
 
     # Determine the transfer types.
@@ -720,33 +829,85 @@ class MetricsCollector(object):
             self.perf_sum_params.has_file_src
             and self.perf_sum_params.has_file_dst,
     }
-    action = ','.join(
+    summary['transfer_types'] = ','.join(
         sorted([
             transfer_type
             for transfer_type, cond in six.iteritems(transfer_types)
             if cond
         ]))
 
+    # The time in seconds spent on the Apply call of cp or rsync.
+    summary['apply_time'] = self.perf_sum_params.total_elapsed_time
+    return summary
+
+  def _CollectPerformanceSummaryMetric(self, summary=None):
+    """Aggregates PerformanceSummary info and adds the metric to the list.
+
+    Args:
+      summary: The dict returned by _GetPerformanceSummary, if already called.
+    """
+    if summary is None:
+      summary = self._GetPerformanceSummary()
+    if summary is None:
+      return
+
+    custom_params = {}
+    for name, label in _PERFSUM_LABELS:
+      if name in summary:
+        custom_params[_GA_LABEL_MAP[label]] = summary[name]
+
     # Use the time spent on Apply rather than the total command execution time
     # for the execution time metric. This aligns more closely with throughput
     # and bytes transferred, and the corresponding Command event already tells
     # us the total time. If PerformanceSummary events are expanded, this may not
     # reflect one Apply call as commands like rm may call Apply twice. Currently
     # Apply is timed directly in the RunCommand methods of cp and rsync.
-    apply_execution_time = _GetTimeInMillis(
-        self.perf_sum_params.total_elapsed_time)
+    apply_execution_time = _GetTimeInMillis(summary['apply_time'])
 
     self.CollectGAMetric(category=_GA_PERFSUM_CATEGORY,
-                         action=action,
+                         action=summary['transfer_types'],
                          execution_time=apply_execution_time,
                          **custom_params)
 
+  def _WriteTelemetry(self, summary):
+    """Writes the command's performance data to the telemetry sink, if any.
+
+    Args:
+      summary: The dict returned by _GetPerformanceSummary.
+    """
+    if not self.telemetry_sink:
+      return
+    record = {
+        'timestamp': time.time(),
+        'version': VERSION,
+        'command': self.GetGAParam('Command Name'),
+        'command_alias': self.GetGAParam('Command Alias'),
+        'global_options': self.GetGAParam('Global Options'),
+        'command_options': self.GetGAParam('Command-Level Options'),
+        'execution_time': (_GetTimeInMillis() - self.start_time) / 1000.0,
+        'fatal_error': self.GetGAParam('Fatal Error'),
+        'retryable_errors': dict(self.retryable_errors),
+    }
+    if summary is not None:
+      record['performance_summary'] = summary
+      record['operation_latencies'] = dict(
+          (operation, histogram.ToDict()) for operation, histogram in
+          six.iteritems(self.perf_sum_params.operation_latencies))
+    try:
+      self.telemetry_sink.Write(record)
+    except Exception as e:  # pylint: disable=broad-except
+      # Reporting to GA, if enabled, should go ahead regardless.
+      self.logger.warning('Failed to write performance telemetry to %s: %s',
+                          self.telemetry_sink.path, e)
+
   def ReportMetrics(self,
                     wait_for_report=False,
                     log_level=None,
                     log_file_path=None):
     """Reports the collected metrics using a separate async process.
 
+    Performance data is first written to the telemetry sink, if any.
+
     Args:
       wait_for_report: bool, True if the main process should wait for the
         subprocess to exit for testing purposes.
@@ -757,8 +918,13 @@ class MetricsCollector(object):
         use a predetermined default path. This parameter is intended for use
         by tests that need to evaluate the contents of the file at this path.
     """
+    summary = self._GetPerformanceSummary()
+    self._WriteTelemetry(summary)
+    if MetricsCollector.IsDisabled():
+      return
+
     self._CollectCommandAndErrorMetrics()
-    self._CollectPerformanceSummaryMetric()
+    self._CollectPerformanceSummaryMetric(summary)
     if not self._metrics:
       return
 
@@ -944,6 +1110,17 @@ def LogRetryableError(message):
       LogPerformanceSummaryParams(num_retryable_network_errors=1)
 
 
+@CaptureAndLogException
+def LogHedgedRequests(message):
+  """Logs download requests that were hedged for a gsutil command.
+
+  Args:
+    message: The HedgedRequestMessage posted to the global status queue.
+  """
+  LogPerformanceSummaryParams(num_hedged_requests=message.num_hedges,
+                              hedge_wasted_bytes=message.wasted_bytes)
+
+
 @CaptureAndLogException
 def LogFatalError(exception):
   """Logs that a fatal error was caught for a gsutil command.
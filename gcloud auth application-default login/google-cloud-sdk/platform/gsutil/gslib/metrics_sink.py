@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Sinks that write command performance telemetry to local files.
+
+The MetricsCollector hands a sink one record per gsutil command, when the
+command finishes. A record is a dict holding the command's name and options,
+its execution time and errors, the PerformanceSummary values of a cp or rsync
+command, and the latency distributions of its file and component transfers.
+
+Sinks are chosen with the telemetry_sink boto config option, which takes the
+form <type>:<path>, where type is a key of SINK_TYPES.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import json
+import logging
+import os
+import re
+import tempfile
+
+import boto
+import six
+
+from gslib.utils import system_util
+
+# fcntl isn't supported in Windows.
+try:
+  import fcntl  # pylint: disable=g-import-not-at-top
+except ImportError:
+  fcntl = None
+
+# Upper bounds, in seconds, of the buckets transfer latencies are counted in.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50,
+                   100, 250, 500, 1000)
+
+
+class TelemetrySink(object):
+  """Writes telemetry records to a local file."""
+
+  def __init__(self, path):
+    self.path = os.path.expanduser(path)
+
+  def Write(self, record):
+    """Writes one command's telemetry record.
+
+    Args:
+      record: The record dict built by the MetricsCollector.
+    """
+    raise NotImplementedError()
+
+
+class JsonLinesSink(TelemetrySink):
+  """Appends each record to a file as one line of JSON."""
+
+  def Write(self, record):
+    system_util.CreateDirIfNeeded(os.path.dirname(self.path) or '.')
+    line = json.dumps(record, sort_keys=True, separators=(',', ':')) + '\n'
+    # Opened in append mode, so that concurrent commands' lines don't clobber
+    # each other.
+    with open(self.path, 'a') as fp:
+      fp.write(line)
+
+
+# Metric families written by PrometheusTextfileSink, in the order they are
+# written, mapped to their types and help text.
+_PROMETHEUS_FAMILIES = collections.OrderedDict((
+    ('gsutil_last_run_timestamp_seconds',
+     ('gauge', 'Time the last run of the command finished.')),
+    ('gsutil_last_run_duration_seconds',
+     ('gauge', 'Execution time of the last run of the command.')),
+    ('gsutil_last_run_failed',
+     ('gauge', 'Whether the last run of the command failed with an error.')),
+    ('gsutil_last_run_retryable_errors',
+     ('gauge', 'Retryable errors in the last run of the command.')),
+    ('gsutil_last_run_objects_transferred',
+     ('gauge', 'Files or objects transferred by the last run of the command.')),
+    ('gsutil_last_run_bytes_transferred',
+     ('gauge', 'Bytes transferred by the last run of the command.')),
+    ('gsutil_last_run_throughput_bytes_per_second',
+     ('gauge', 'Average throughput of the last run of the command.')),
+    ('gsutil_last_run_hedged_requests',
+     ('gauge', 'Download requests hedged by the last run of the command.')),
+    ('gsutil_last_run_operation_duration_seconds',
+     ('histogram', 'Durations of the file and component transfers of the '
+      'last run of the command.')),
+))
+
+# PerformanceSummary values written as gauges, by metric family.
+_PROMETHEUS_SUMMARY_GAUGES = (
+    ('gsutil_last_run_objects_transferred', 'num_objects_transferred'),
+    ('gsutil_last_run_bytes_transferred', 'total_bytes_transferred'),
+    ('gsutil_last_run_throughput_bytes_per_second', 'avg_throughput'),
+    ('gsutil_last_run_hedged_requests', 'num_hedged_requests'),
+)
+
+_PROMETHEUS_METRIC_NAME_RE = re.compile(r'[a-zA-Z_:][a-zA-Z0-9_:]*')
+
+
+def _EscapeLabelValue(value):
+  return (six.text_type(value).replace('\\', '\\\\').replace('"', '\\"')
+          .replace('\n', '\\n'))
+
+
+def _FormatLabels(labels):
+  return '{%s}' % ','.join(
+      '%s="%s"' % (name, _EscapeLabelValue(value)) for name, value in labels)
+
+
+def _GetPrometheusFamily(sample_line):
+  """Returns the name of the metric family a sample line belongs to."""
+  name = _PROMETHEUS_METRIC_NAME_RE.match(sample_line).group(0)
+  for suffix in ('_bucket', '_sum', '_count'):
+    base_name = name[:-len(suffix)]
+    if (name.endswith(suffix) and
+        _PROMETHEUS_FAMILIES.get(base_name, (None,))[0] == 'histogram'):
+      return base_name
+  return name
+
+
+def _SampleLabels(sample_line):
+  """Returns the label set of a sample line, including its braces."""
+  start = sample_line.find('{')
+  if start == -1:
+    return ''
+  return sample_line[start:sample_line.rfind('}') + 1]
+
+
+class PrometheusTextfileSink(TelemetrySink):
+  """Keeps the metrics of each command's last run in a Prometheus textfile.
+
+  The file is meant for the node_exporter textfile collector. Samples are
+  labeled with the command, and a run replaces only the samples of its own
+  command, so the file holds the last run of every command. The file is
+  replaced atomically, so the collector never reads a partial file.
+  """
+
+  def Write(self, record):
+    command = record.get('command')
+    if not command:
+      return
+    command_label = 'command="%s"' % _EscapeLabelValue(command)
+    dir_name = os.path.dirname(self.path) or '.'
+    system_util.CreateDirIfNeeded(dir_name)
+    with open(self.path + '.lock', 'a') as lock_file:
+      # Serializes concurrent commands, so that none loses another's samples.
+      if fcntl:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+      samples = [
+          line for line in self._ReadSamples()
+          if command_label not in _SampleLabels(line)
+      ]
+      samples.extend(self._MakeSamples(command, record))
+      fd, temp_path = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+      try:
+        with os.fdopen(fd, 'w') as fp:
+          fp.write(self._Format(samples))
+        # mkstemp creates files only their owner can read.
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, self.path)
+      except:  # pylint: disable=bare-except
+        os.unlink(temp_path)
+        raise
+
+  def _ReadSamples(self):
+    try:
+      with open(self.path) as fp:
+        return [
+            line.rstrip('\n')
+            for line in fp
+            if line.strip() and not line.startswith('#')
+        ]
+    except IOError:
+      return []
+
+  def _MakeSamples(self, command, record):
+    """Returns the sample lines for one command's record."""
+    labels = [('command', command)]
+    samples = []
+
+    def AddSample(name, value, extra_labels=()):
+      if value is not None:
+        samples.append('%s%s %s' %
+                       (name, _FormatLabels(labels + list(extra_labels)),
+                        repr(float(value))))
+
+    AddSample('gsutil_last_run_timestamp_seconds', record['timestamp'])
+    AddSample('gsutil_last_run_duration_seconds', record['execution_time'])
+    AddSample('gsutil_last_run_failed', 1 if record.get('fatal_error') else 0)
+    AddSample('gsutil_last_run_retryable_errors',
+              sum(record.get('retryable_errors', {}).values()))
+    summary = record.get('performance_summary') or {}
+    for name, key in _PROMETHEUS_SUMMARY_GAUGES:
+      AddSample(name, summary.get(key))
+    histogram_name = 'gsutil_last_run_operation_duration_seconds'
+    for operation, latencies in sorted(
+        six.iteritems(record.get('operation_latencies', {}))):
+      operation_label = [('operation', operation)]
+      for upper_bound, count in latencies['buckets']:
+        le = upper_bound if upper_bound == '+Inf' else repr(float(upper_bound))
+        AddSample(histogram_name + '_bucket', count,
+                  operation_label + [('le', le)])
+      AddSample(histogram_name + '_sum', latencies['sum'], operation_label)
+      AddSample(histogram_name + '_count', latencies['count'], operation_label)
+    return samples
+
+  def _Format(self, samples):
+    """Groups sample lines by family, with HELP and TYPE lines for each."""
+    samples_by_family = collections.OrderedDict(
+        (name, []) for name in _PROMETHEUS_FAMILIES)
+    for line in samples:
+      samples_by_family.setdefault(_GetPrometheusFamily(line), []).append(line)
+    lines = []
+    for name, family_samples in six.iteritems(samples_by_family):
+      if not family_samples:
+        continue
+      if name in _PROMETHEUS_FAMILIES:
+        metric_type, help_text = _PROMETHEUS_FAMILIES[name]
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+      lines.extend(family_samples)
+    return '\n'.join(lines) + '\n'
+
+
+# Maps the sink types accepted by the telemetry_sink option to their classes.
+SINK_TYPES = {
+    'jsonl': JsonLinesSink,
+    'prometheus': PrometheusTextfileSink,
+}
+
+
+def GetTelemetrySink():
+  """Returns the TelemetrySink configured by telemetry_sink, or None."""
+  spec = boto.config.get('GSUtil', 'telemetry_sink', '')
+  if not spec:
+    return None
+  sink_type, _, path = spec.partition(':')
+  if sink_type not in SINK_TYPES or not path:
+    logging.getLogger().warning(
+        'Ignoring invalid telemetry_sink "%s"; expected <type>:<path>, where '
+        'type is one of %s.', spec, ', '.join(sorted(SINK_TYPES)))
+    return None
+  return SINK_TYPES[sink_type](path)
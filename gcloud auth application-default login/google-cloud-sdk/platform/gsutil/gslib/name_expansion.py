@@ -59,8 +59,16 @@ class NameExpansionResult(object):
   dest URL names than copying multiple URLs to a directory, to be consistent
   with naming rules used by the Unix cp command). For more details see comments
   in _NameExpansionIterator.
+
+  Task queues can hold tens of thousands of these, so the class uses slots,
+  and object metadata is kept in its compact JSON form until a consumer
+  needs the apitools Object.
   """
 
+  __slots__ = ('source_storage_url', 'is_multi_source_request',
+               'is_multi_top_level_source_request', 'names_container',
+               'expanded_storage_url', 'expanded_result')
+
   def __init__(self, source_storage_url, is_multi_source_request,
                is_multi_top_level_source_request, names_container,
                expanded_storage_url, expanded_result):
@@ -86,6 +94,13 @@ class NameExpansionResult(object):
     self.expanded_result = encoding.MessageToJson(
         expanded_result) if expanded_result else None
 
+  def __getstate__(self):
+    return tuple(getattr(self, name) for name in self.__slots__)
+
+  def __setstate__(self, state):
+    for name, value in zip(self.__slots__, state):
+      setattr(self, name, value)
+
   def __repr__(self):
     return '%s' % self.expanded_storage_url
 
@@ -603,8 +618,14 @@ class _ImplicitBucketSubdirIterator(object):
 
 class CopyObjectInfo(object):
   """Represents the information needed for copying a single object.
+
+  Like NameExpansionResult, instances are queued as tasks, so the class uses
+  slots.
   """
 
+  __slots__ = NameExpansionResult.__slots__ + ('exp_dst_url',
+                                               'have_existing_dst_container')
+
   def __init__(self, name_expansion_result, exp_dst_url,
                have_existing_dst_container):
     """Instantiates the object info from name expansion result and destination.
@@ -626,6 +647,9 @@ class CopyObjectInfo(object):
     self.exp_dst_url = exp_dst_url
     self.have_existing_dst_container = have_existing_dst_container
 
+  __getstate__ = NameExpansionResult.__getstate__
+  __setstate__ = NameExpansionResult.__setstate__
+
 
 # Describes the destination information resulted from ExpandUrlToSingleBlr.
 DestinationInfo = collections.namedtuple(
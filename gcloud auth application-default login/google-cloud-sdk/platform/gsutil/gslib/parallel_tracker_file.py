@@ -28,7 +28,7 @@ import six
 
 import gslib
 from gslib.exception import CommandException
-from gslib.tracker_file import (WriteJsonDataToTrackerFile,
+from gslib.tracker_file import (ReadTrackerFile, WriteJsonDataToTrackerFile,
                                 RaiseUnwritableTrackerFileException)
 from gslib.utils.constants import UTF8
 
@@ -69,13 +69,11 @@ def ReadParallelUploadTrackerFile(tracker_file_name, logger):
   enc_key_sha256 = None
   prefix = None
   existing_components = []
-  tracker_file = None
 
   # If we already have a matching tracker file, get the serialization data
   # so that we can resume the upload.
   try:
-    tracker_file = open(tracker_file_name, 'r')
-    tracker_data = tracker_file.read()
+    tracker_data = ReadTrackerFile(tracker_file_name)
     tracker_json = json.loads(tracker_data)
     enc_key_sha256 = tracker_json[_CompositeUploadTrackerEntry.ENC_SHA256]
     prefix = tracker_json[_CompositeUploadTrackerEntry.PREFIX]
@@ -97,9 +95,6 @@ def ReadParallelUploadTrackerFile(tracker_file_name, logger):
     # Legacy format did not support user-supplied encryption.
     enc_key_sha256 = None
     (prefix, existing_components) = _ParseLegacyTrackerData(tracker_data)
-  finally:
-    if tracker_file:
-      tracker_file.close()
 
   return (enc_key_sha256, prefix, existing_components)
 
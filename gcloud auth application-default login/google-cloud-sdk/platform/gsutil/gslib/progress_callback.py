@@ -19,9 +19,15 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import collections
+import os
+import threading
 import time
 
+from gslib.concurrency_autotuner import RecordBytesProcessed
+from gslib.thread_message import ProgressBatchMessage
 from gslib.thread_message import ProgressMessage
+from gslib.ui_controller import MainThreadUIQueue
 from gslib.utils import parallelism_framework_util
 
 # Default upper and lower bounds for progress callback frequency.
@@ -29,6 +35,9 @@ _START_BYTES_PER_CALLBACK = 1024 * 256
 _MAX_BYTES_PER_CALLBACK = 1024 * 1024 * 100
 _TIMEOUT_SECONDS = 1
 
+# Seconds between posts of the progress updates batched by worker threads.
+_PROGRESS_FLUSH_SECONDS = 0.2
+
 # Max width of URL to display in progress indicator. Wide enough to allow
 # 15 chars for x/y display on an 80 char wide terminal.
 MAX_PROGRESS_INDICATOR_COLUMNS = 65
@@ -68,6 +77,7 @@ class ProgressCallbackWithTimeout(object):
 
   def Progress(self, bytes_processed):
     """Tracks byte processing progress, making a callback if necessary."""
+    RecordBytesProcessed(bytes_processed)
     self._bytes_processed_since_callback += bytes_processed
     cur_time = time.time()
     if (self._bytes_processed_since_callback > self._bytes_per_callback or
@@ -89,6 +99,77 @@ class ProgressCallbackWithTimeout(object):
       self._last_time = cur_time
 
 
+class _ProgressMessageBatcher(object):
+  """Coalesces the ProgressMessages a process posts to a status queue.
+
+  Progress is reported as the bytes processed so far, so only the latest
+  message for each file or component matters. Messages are held until the
+  next flush, which happens every _PROGRESS_FLUSH_SECONDS, or as soon as a
+  file or component finishes so that its final progress is posted before the
+  FileMessage that marks it done.
+  """
+
+  def __init__(self, status_queue):
+    self._status_queue = status_queue
+    # Held while posting too, so that batches are posted in order.
+    self._lock = threading.Lock()
+    self._pending = collections.OrderedDict()
+    self._flush_thread = None
+
+  def Post(self, message):
+    """Adds message to the next batch."""
+    key = (message.src_url.url_string, message.dst_url, message.component_num,
+           message.operation_name)
+    with self._lock:
+      self._pending.pop(key, None)
+      self._pending[key] = message
+      if message.finished:
+        self._FlushLocked()
+      elif not self._flush_thread:
+        self._flush_thread = threading.Thread(target=self._FlushPeriodically)
+        self._flush_thread.daemon = True
+        self._flush_thread.start()
+
+  def _FlushPeriodically(self):
+    while True:
+      time.sleep(_PROGRESS_FLUSH_SECONDS)
+      with self._lock:
+        if not self._pending:
+          # Post starts another thread when there is more to post.
+          self._flush_thread = None
+          return
+        self._FlushLocked()
+
+  def _FlushLocked(self):
+    messages = list(self._pending.values())
+    self._pending.clear()
+    if len(messages) == 1:
+      message = messages[0]
+    else:
+      message = ProgressBatchMessage(messages, time.time())
+    parallelism_framework_util.PutToQueueWithTimeout(self._status_queue,
+                                                     message)
+
+
+# _ProgressMessageBatchers by process ID and status queue.
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def _PostProgressMessage(status_queue, message):
+  """Posts a ProgressMessage, batching it if it comes from a worker."""
+  if isinstance(status_queue, MainThreadUIQueue):
+    # Messages are handled as they are posted, so there's nothing to save.
+    status_queue.put(message)
+    return
+  key = (os.getpid(), id(status_queue))
+  with _batchers_lock:
+    batcher = _batchers.get(key)
+    if batcher is None:
+      batcher = _batchers[key] = _ProgressMessageBatcher(status_queue)
+  batcher.Post(message)
+
+
 class FileProgressCallbackHandler(object):
   """Tracks progress info for large operations like file copy or hash.
 
@@ -147,7 +228,7 @@ class FileProgressCallbackHandler(object):
     if self._override_total_size:
       total_size = self._override_total_size
 
-    parallelism_framework_util.PutToQueueWithTimeout(
+    _PostProgressMessage(
         self._status_queue,
         ProgressMessage(total_size,
                         last_byte_processed - self._start_byte,
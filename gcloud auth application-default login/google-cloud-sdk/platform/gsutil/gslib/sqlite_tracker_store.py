@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""SQLite-backed storage for resumable transfer tracker data.
+
+Used by gslib.tracker_file when the 'resumable_tracker_store' boto config
+option is 'sqlite'. All tracker entries live in a single database in the
+tracker directory, keyed by the name the entry's tracker file would have had,
+instead of one small file per upload, download slice, rewrite, or component.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+TRACKER_DB_FILE_NAME = 'trackers.db'
+
+# Deferred writes are committed together once this many are pending, or once
+# this many seconds have passed since the last commit, whichever comes first.
+_MAX_DEFERRED_WRITES = 64
+_DEFERRED_WRITE_INTERVAL = 2.0
+
+# How long to wait for another process to release a write lock, in seconds.
+_BUSY_TIMEOUT = 60
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS trackers ('
+    '  name TEXT PRIMARY KEY,'
+    '  tracker_type TEXT NOT NULL,'
+    '  data TEXT NOT NULL,'
+    '  updated REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS trackers_by_updated ON trackers (updated)',
+)
+
+
+class SqliteTrackerStore(object):
+  """A transactional key-value store of tracker entries.
+
+  Instances are thread-safe but must not be shared across processes; use
+  GetSqliteTrackerStore to get the instance for the current process.
+
+  Writes are committed immediately unless they are marked as deferrable, in
+  which case they are batched with other deferred writes. Deferred writes are
+  visible to reads in this process right away, but may be lost if the process
+  dies before they are committed, so they must only be used for data where
+  resuming from an older value is safe (such as download progress).
+  """
+
+  def __init__(self, db_path):
+    """Opens (creating if necessary) the tracker database.
+
+    Args:
+      db_path: Path of the SQLite database file.
+
+    Raises:
+      sqlite3.Error if the database cannot be opened.
+    """
+    self.db_path = db_path
+    self._lock = threading.Lock()
+    self._deferred = {}
+    self._last_commit_time = time.time()
+    self._conn = sqlite3.connect(db_path,
+                                 timeout=_BUSY_TIMEOUT,
+                                 check_same_thread=False)
+    # Write-ahead logging lets readers proceed while another process writes,
+    # and synchronous=NORMAL avoids an fsync on every commit.
+    self._conn.execute('PRAGMA journal_mode=WAL')
+    self._conn.execute('PRAGMA synchronous=NORMAL')
+    with self._conn:
+      for statement in _SCHEMA:
+        self._conn.execute(statement)
+
+  def Get(self, name):
+    """Returns the data stored for name, or None if there is none."""
+    with self._lock:
+      if name in self._deferred:
+        return self._deferred[name][1]
+      row = self._conn.execute('SELECT data FROM trackers WHERE name = ?',
+                               (name,)).fetchone()
+    return row[0] if row else None
+
+  def Put(self, name, tracker_type, data, deferrable=False):
+    """Stores data for name, replacing any existing entry.
+
+    Args:
+      name: Tracker entry name.
+      tracker_type: TrackerFileType of the entry.
+      data: String data to store.
+      deferrable: If True, the write may be batched with later writes.
+    """
+    with self._lock:
+      if deferrable:
+        self._deferred[name] = (tracker_type, data, time.time())
+        if (len(self._deferred) >= _MAX_DEFERRED_WRITES or
+            time.time() - self._last_commit_time >= _DEFERRED_WRITE_INTERVAL):
+          self._CommitDeferred()
+      else:
+        self._deferred.pop(name, None)
+        with self._conn:
+          self._conn.execute(
+              'INSERT OR REPLACE INTO trackers VALUES (?, ?, ?, ?)',
+              (name, tracker_type, data, time.time()))
+
+  def Delete(self, name):
+    """Deletes the entry for name, if any."""
+    with self._lock:
+      self._deferred.pop(name, None)
+      with self._conn:
+        self._conn.execute('DELETE FROM trackers WHERE name = ?', (name,))
+
+  def Flush(self):
+    """Commits any deferred writes."""
+    with self._lock:
+      self._CommitDeferred()
+
+  def DeleteEntriesOlderThan(self, max_age_seconds):
+    """Garbage-collects entries that have not been updated recently.
+
+    Args:
+      max_age_seconds: Entries last written more than this many seconds ago
+          are deleted.
+
+    Returns:
+      The number of entries deleted.
+    """
+    with self._lock:
+      with self._conn:
+        cursor = self._conn.execute('DELETE FROM trackers WHERE updated < ?',
+                                    (time.time() - max_age_seconds,))
+    return cursor.rowcount
+
+  def _CommitDeferred(self):
+    """Commits deferred writes in one transaction. Caller holds self._lock."""
+    if self._deferred:
+      with self._conn:
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO trackers VALUES (?, ?, ?, ?)',
+            [(name, tracker_type, data, updated)
+             for name, (tracker_type, data,
+                        updated) in self._deferred.items()])
+      self._deferred.clear()
+    self._last_commit_time = time.time()
+
+
+_store_lock = threading.Lock()
+_store = None
+_store_pid = None
+
+
+def GetSqliteTrackerStore(tracker_dir, max_age_seconds=None):
+  """Returns the SqliteTrackerStore for this process, opening it if needed.
+
+  Args:
+    tracker_dir: Directory containing the tracker database.
+    max_age_seconds: If set, entries older than this are garbage-collected
+        when the store is first opened by this process.
+
+  Returns:
+    SqliteTrackerStore instance.
+  """
+  global _store, _store_pid  # pylint: disable=global-statement
+  db_path = os.path.join(tracker_dir, TRACKER_DB_FILE_NAME)
+  with _store_lock:
+    # A connection inherited from a parent process must not be used.
+    if _store is None or _store_pid != os.getpid() or _store.db_path != db_path:
+      _store = SqliteTrackerStore(db_path)
+      _store_pid = os.getpid()
+      if max_age_seconds:
+        _store.DeleteEntriesOlderThan(max_age_seconds)
+    return _store
+
+
+@atexit.register
+def _FlushStoreOnExit():
+  if _store is not None and _store_pid == os.getpid():
+    try:
+      _store.Flush()
+    except sqlite3.Error:
+      pass
@@ -24,6 +24,8 @@ import re
 import stat
 import sys
 
+from six.moves import intern
+
 from gslib.exception import CommandException
 from gslib.exception import InvalidUrlError
 from gslib.utils import system_util
@@ -49,7 +51,14 @@ RELATIVE_PATH_SYMBOLS = frozenset(['.', '..'])
 
 
 class StorageUrl(object):
-  """Abstract base class for file and Cloud Storage URLs."""
+  """Abstract base class for file and Cloud Storage URLs.
+
+  Large recursive operations hold many URLs at once, so subclasses use slots
+  rather than per-instance dicts, and intern their scheme and bucket names so
+  that URLs for the same bucket share those strings.
+  """
+
+  __slots__ = ()
 
   def Clone(self):
     raise NotImplementedError('Clone not overridden')
@@ -138,6 +147,18 @@ class StorageUrl(object):
   def __eq__(self, other):
     return isinstance(other, StorageUrl) and self.url_string == other.url_string
 
+  def __getstate__(self):
+    # Slot values alone pickle smaller than a dict of them.
+    return tuple(getattr(self, name) for name in self.__slots__)
+
+  def __setstate__(self, state):
+    for name, value in zip(self.__slots__, state):
+      setattr(self, name, value)
+    # Unpickled strings are copies, so intern them again.
+    self.scheme = intern(self.scheme)
+    if self.bucket_name:
+      self.bucket_name = intern(self.bucket_name)
+
   def __hash__(self):
     return hash(self.url_string)
 
@@ -153,6 +174,9 @@ class _FileUrl(StorageUrl):
     and object_name contains the file/directory path.
   """
 
+  __slots__ = ('scheme', 'delim', 'bucket_name', 'object_name', 'generation',
+               'is_stream', 'is_fifo')
+
   def __init__(self, url_string, is_stream=False, is_fifo=False):
     self.scheme = 'file'
     self.delim = os.sep
@@ -220,6 +244,8 @@ class _CloudUrl(StorageUrl):
     made from this class.
   """
 
+  __slots__ = ('scheme', 'delim', 'bucket_name', 'object_name', 'generation')
+
   def __init__(self, url_string):
     self.scheme = None
     self.delim = '/'
@@ -229,15 +255,15 @@ class _CloudUrl(StorageUrl):
     provider_match = PROVIDER_REGEX.match(url_string)
     bucket_match = BUCKET_REGEX.match(url_string)
     if provider_match:
-      self.scheme = provider_match.group('provider')
+      self.scheme = intern(provider_match.group('provider'))
     elif bucket_match:
-      self.scheme = bucket_match.group('provider')
-      self.bucket_name = bucket_match.group('bucket')
+      self.scheme = intern(bucket_match.group('provider'))
+      self.bucket_name = intern(bucket_match.group('bucket'))
     else:
       object_match = OBJECT_REGEX.match(url_string)
       if object_match:
-        self.scheme = object_match.group('provider')
-        self.bucket_name = object_match.group('bucket')
+        self.scheme = intern(object_match.group('provider'))
+        self.bucket_name = intern(object_match.group('bucket'))
         self.object_name = object_match.group('object')
         if self.object_name == '.' or self.object_name == '..':
           raise InvalidUrlError('%s is an invalid root-level object name' %
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Helper class for streaming gzip compression of uploads."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+from concurrent import futures
+import os
+import struct
+import threading
+import zlib
+
+import six
+
+from gslib.exception import CommandException
+from gslib.utils.constants import UTF8
+
+# Uncompressed bytes handed to each compression task. Larger blocks compress
+# slightly better; smaller blocks reduce buffering per in-flight upload.
+DEFAULT_GZIP_BLOCK_SIZE = 128 * 1024
+
+# Size of the deflate window. Each block is primed with this much of the
+# preceding uncompressed data so that back-references can span blocks.
+_DEFLATE_WINDOW_SIZE = 32 * 1024
+
+# Fixed gzip member header: magic, CM=deflate, no flags, mtime=0. The mtime
+# is left unset so that compressing the same file twice yields the same bytes.
+_GZIP_MAGIC_AND_FLAGS = b'\x1f\x8b\x08\x00\x00\x00\x00\x00'
+_GZIP_OS_UNKNOWN = b'\xff'
+
+# Compression thread pools by process ID. All streamed uploads in a process
+# share one pool, so parallel copies don't each start their own threads.
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _GetExecutor(num_threads):
+  """Returns this process's compression thread pool, creating it if needed.
+
+  Args:
+    num_threads: Number of threads in the pool, if it has to be created.
+
+  Returns:
+    A futures.ThreadPoolExecutor.
+  """
+  pid = os.getpid()
+  with _executors_lock:
+    executor = _executors.get(pid)
+    if executor is None:
+      executor = _executors[pid] = futures.ThreadPoolExecutor(
+          max_workers=num_threads)
+  return executor
+
+
+def _DeflateBlock(data, zdict, compression_level):
+  """Compresses one block into a byte-aligned raw deflate fragment.
+
+  The fragment ends with a sync flush rather than a final block, so fragments
+  produced for consecutive blocks may be concatenated into one deflate stream.
+
+  Args:
+    data: Uncompressed bytes for this block.
+    zdict: Uncompressed bytes preceding this block (up to the deflate window
+        size), or None for the first block.
+    compression_level: zlib compression level, 0-9.
+
+  Returns:
+    Compressed bytes for the block.
+  """
+  if zdict:
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED,
+                                  -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+                                  zlib.Z_DEFAULT_STRATEGY, zdict)
+  else:
+    compressor = zlib.compressobj(compression_level, zlib.DEFLATED,
+                                  -zlib.MAX_WBITS)
+  return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _GzipHeader(compression_level):
+  if compression_level == 9:
+    extra_flags = b'\x02'
+  elif compression_level == 1:
+    extra_flags = b'\x04'
+  else:
+    extra_flags = b'\x00'
+  return _GZIP_MAGIC_AND_FLAGS + extra_flags + _GZIP_OS_UNKNOWN
+
+
+class StreamingGzipUploadWrapper(object):
+  """Wraps an input stream and exposes its gzip-compressed contents.
+
+  The input is split into blocks which are deflated concurrently by a pool of
+  worker threads (zlib releases the GIL while compressing) and emitted in
+  order, so compression overlaps with the upload and no temporary file is
+  needed. The pool is shared by all wrappers in the process, so the number of
+  compression threads doesn't grow with the number of parallel uploads. The
+  output is a single, standard gzip member.
+
+  The compressed size is not known in advance, so the wrapper is not seekable;
+  it is intended to be used beneath a ResumableStreamingJsonUploadWrapper.
+  """
+
+  def __init__(self,
+               stream,
+               compression_level,
+               num_threads,
+               block_size=DEFAULT_GZIP_BLOCK_SIZE):
+    """Initializes the wrapper.
+
+    Args:
+      stream: Input stream of uncompressed bytes. Closed by close().
+      compression_level: zlib compression level, 0-9.
+      num_threads: Number of threads used to compress blocks. Sizes the
+          process's compression pool when the first wrapper creates it.
+      block_size: Number of uncompressed bytes per compression task.
+    """
+    if num_threads < 1:
+      raise CommandException(
+          'StreamingGzipUploadWrapper requires at least one thread.')
+    self._orig_fp = stream
+    self._compression_level = compression_level
+    self._block_size = block_size
+    # Keep a couple of blocks queued per thread so workers never idle while
+    # the consumer drains finished blocks.
+    self._max_pending = num_threads * 2
+    self._executor = _GetExecutor(num_threads)
+    self._pending = collections.deque()
+    self._buffer = bytearray(_GzipHeader(compression_level))
+    self._position = 0
+    self._crc = 0
+    self._uncompressed_size = 0
+    self._zdict = None
+    self._input_exhausted = False
+    self._finished = False
+
+  @property
+  def mode(self):
+    """Returns the mode of the underlying file descriptor, or None."""
+    return getattr(self._orig_fp, 'mode', None)
+
+  def _SubmitBlocks(self):
+    """Reads input blocks and queues them for compression."""
+    while not self._input_exhausted and len(self._pending) < self._max_pending:
+      data = self._orig_fp.read(self._block_size)
+      if isinstance(data, six.text_type):
+        data = data.encode(UTF8)
+      if not data:
+        self._input_exhausted = True
+        break
+      self._crc = zlib.crc32(data, self._crc)
+      self._uncompressed_size += len(data)
+      self._pending.append(
+          self._executor.submit(_DeflateBlock, data, self._zdict,
+                                self._compression_level))
+      self._zdict = data[-_DEFLATE_WINDOW_SIZE:]
+
+  def _FillBuffer(self, size):
+    """Buffers compressed output until at least size bytes or end of stream.
+
+    Args:
+      size: Number of bytes wanted, or a negative value for all of them.
+    """
+    while not self._finished and (size < 0 or len(self._buffer) < size):
+      self._SubmitBlocks()
+      if self._pending:
+        self._buffer += self._pending.popleft().result()
+      else:
+        # An empty final block terminates the deflate stream, followed by the
+        # gzip trailer (CRC32 and length of the uncompressed data, mod 2^32).
+        self._buffer += zlib.compressobj(
+            self._compression_level, zlib.DEFLATED,
+            -zlib.MAX_WBITS).flush(zlib.Z_FINISH)
+        self._buffer += struct.pack('<II', self._crc & 0xffffffff,
+                                    self._uncompressed_size & 0xffffffff)
+        self._finished = True
+
+  def read(self, size=-1):  # pylint: disable=invalid-name
+    """Reads compressed bytes.
+
+    Args:
+      size: The amount of bytes to read. If omitted or negative, the entire
+          remaining compressed stream will be read and returned.
+
+    Returns:
+      Compressed bytes, or b'' at the end of the stream.
+    """
+    if size is None:
+      size = -1
+    self._FillBuffer(size)
+    if size < 0 or size >= len(self._buffer):
+      data = bytes(self._buffer)
+      self._buffer = bytearray()
+    else:
+      data = bytes(self._buffer[:size])
+      del self._buffer[:size]
+    self._position += len(data)
+    return data
+
+  def tell(self):  # pylint: disable=invalid-name
+    """Returns the number of compressed bytes read so far."""
+    return self._position
+
+  def seekable(self):  # pylint: disable=invalid-name
+    """Returns false; the compressed stream can only be read forward."""
+    return False
+
+  def close(self):  # pylint: disable=invalid-name
+    """Cancels queued compression tasks and closes the wrapped stream."""
+    for pending in self._pending:
+      pending.cancel()
+    # Wait for any tasks that were already running.
+    futures.wait(self._pending)
+    self._pending.clear()
+    return self._orig_fp.close()
@@ -19,8 +19,13 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import bisect
+import hashlib
 import itertools
 import json
+import os
+import stat
+import tempfile
 import threading
 import time
 
@@ -30,14 +35,21 @@ from boto.gs.acl import CannedACLStrings
 from gslib.storage_url import IsFileUrlString
 from gslib.storage_url import StorageUrlFromString
 from gslib.storage_url import StripOneSlash
-from gslib.utils.boto_util import GetTabCompletionCacheFilename
+from gslib.utils.boto_util import GetTabCompletionCacheDir
 from gslib.utils.boto_util import GetTabCompletionLogFilename
+from gslib.utils.constants import UTF8
 from gslib.wildcard_iterator import CreateWildcardIterator
 
 TAB_COMPLETE_CACHE_TTL = 15
 
 _TAB_COMPLETE_MAX_RESULTS = 1000
 
+# Number of listings kept in the tab completion cache.
+_TAB_COMPLETE_CACHE_MAX_ENTRIES = 64
+
+# Maximum number of prefixes listed in the background after a completion.
+_TAB_COMPLETE_MAX_PREFETCHES = 4
+
 _TIMEOUT_WARNING = """
 Tab completion aborted (took >%ss), you may complete the command manually.
 The timeout can be adjusted in the gsutil configuration file.
@@ -83,85 +95,145 @@ class LocalObjectOrCannedACLCompleter(object):
 
 
 class TabCompletionCache(object):
-  """Cache for tab completion results."""
+  """Cache for tab completion results, shared by all shells.
+
+  Each cached listing is stored in its own file in cache_dir, named by a hash
+  of the prefix that was listed. A file holds the listing's results in sorted
+  order, so the results for a longer prefix in the same bucket or
+  subdirectory are found with a binary search. A file's modification time is
+  the time its entry was last used: entries expire ttl seconds after that,
+  and the least recently used entries are removed when there are more than
+  max_entries of them. Files are replaced atomically, so shells completing at
+  the same time only ever see whole entries.
+  """
 
-  def __init__(self, prefix, results, timestamp, partial_results):
-    self.prefix = prefix
-    self.results = results
-    self.timestamp = timestamp
-    self.partial_results = partial_results
+  def __init__(self,
+               cache_dir,
+               ttl=TAB_COMPLETE_CACHE_TTL,
+               max_entries=_TAB_COMPLETE_CACHE_MAX_ENTRIES):
+    self.cache_dir = cache_dir
+    self.ttl = ttl
+    self.max_entries = max_entries
+
+  def _GetEntryPath(self, prefix):
+    return os.path.join(self.cache_dir,
+                        hashlib.sha1(prefix.encode(UTF8)).hexdigest())
+
+  def _LoadEntry(self, prefix):
+    """Returns the unexpired entry for prefix and its path, or (None, None)."""
+    path = self._GetEntryPath(prefix)
+    try:
+      if time.time() - os.path.getmtime(path) >= self.ttl:
+        return None, None
+      with open(path, 'r') as fp:
+        entry = json.loads(fp.read())
+      if entry['prefix'] != prefix:
+        return None, None
+      return entry, path
+    except Exception:  # pylint: disable=broad-except
+      # Guarding against missing or partially written entries and
+      # incompatible format changes. Erring on the side of not breaking
+      # tab-completion in case of cache issues.
+      return None, None
 
-  @staticmethod
-  def LoadFromFile(filename):
-    """Instantiates the cache from a file.
+  def _FindCachedResults(self, prefix):
+    """Returns the cached results for prefix and their entry's path.
 
-    Args:
-      filename: The file to load.
-    Returns:
-      TabCompletionCache instance with loaded data or an empty cache
-          if the file cannot be loaded
+    Returns (None, None) if prefix is not in cache.
     """
-    try:
-      with open(filename, 'r') as fp:
-        cache_dict = json.loads(fp.read())
-        prefix = cache_dict['prefix']
-        results = cache_dict['results']
-        timestamp = cache_dict['timestamp']
-        partial_results = cache_dict['partial-results']
-    except Exception:  # pylint: disable=broad-except
-      # Guarding against incompatible format changes in the cache file.
-      # Erring on the side of not breaking tab-completion in case of cache
-      # issues.
-      prefix = None
+    # Listings of the prefixes of prefix that are in the same bucket or
+    # subdirectory contain all of its results, unless they are partial.
+    # Prefixes are tried from the longest since they have the fewest results.
+    dir_end = prefix.rfind('/') + 1
+    for end in range(len(prefix), dir_end - 1, -1):
+      cached_prefix = prefix[:end]
+      entry, path = self._LoadEntry(cached_prefix)
+      if entry is None:
+        continue
+      if cached_prefix == prefix:
+        return entry['results'], path
+      if entry['partial-results']:
+        continue
+      sorted_results = entry['results']
+      start = bisect.bisect_left(sorted_results, prefix)
       results = []
-      timestamp = 0
-      partial_results = False
-
-    return TabCompletionCache(prefix, results, timestamp, partial_results)
+      for result in itertools.islice(sorted_results, start, None):
+        if not result.startswith(prefix):
+          break
+        results.append(result)
+      return results, path
+    return None, None
 
   def GetCachedResults(self, prefix):
     """Returns the cached results for prefix or None if not in cache."""
-    current_time = time.time()
-    if current_time - self.timestamp >= TAB_COMPLETE_CACHE_TTL:
+    results, path = self._FindCachedResults(prefix)
+    if results is None:
       return None
+    # Update the entry's timestamp to make sure it does not expire if the
+    # user is performing multiple completions in a single
+    # bucket/subdirectory since we can answer these requests from the cache.
+    # e.g. gs://prefix<tab> -> gs://prefix-mid<tab> -> gs://prefix-mid-suffix
+    try:
+      os.utime(path, None)
+    except OSError:
+      pass
+    return results
+
+  def HasCachedResults(self, prefix):
+    """Returns whether prefix is in cache, without renewing its entry."""
+    return self._FindCachedResults(prefix)[0] is not None
 
-    results = None
-
-    if prefix == self.prefix:
-      results = self.results
-    elif (not self.partial_results and prefix.startswith(self.prefix) and
-          prefix.count('/') == self.prefix.count('/')):
-      results = [x for x in self.results if x.startswith(prefix)]
-
-    if results is not None:
-      # Update cache timestamp to make sure the cache entry does not expire if
-      # the user is performing multiple completions in a single
-      # bucket/subdirectory since we can answer these requests from the cache.
-      # e.g. gs://prefix<tab> -> gs://prefix-mid<tab> -> gs://prefix-mid-suffix
-      self.timestamp = time.time()
-      return results
-
-  def UpdateCache(self, prefix, results, partial_results):
-    """Updates the in-memory cache with the results for the given prefix."""
-    self.prefix = prefix
-    self.results = results
-    self.partial_results = partial_results
-    self.timestamp = time.time()
-
-  def WriteToFile(self, filename):
-    """Writes out the cache to the given file."""
+  def UpdateCache(self, prefix, results, partial_results, timestamp=None):
+    """Stores the results for the given prefix.
+
+    Args:
+      prefix: The prefix that was listed.
+      results: The listing's results.
+      partial_results: Whether the listing was cut short.
+      timestamp: Time the entry was last used, if not now.
+    """
     json_str = json.dumps({
-        'prefix': self.prefix,
-        'results': self.results,
-        'partial-results': self.partial_results,
-        'timestamp': self.timestamp,
+        'prefix': prefix,
+        'results': sorted(results),
+        'partial-results': partial_results,
     })
-
+    path = self._GetEntryPath(prefix)
+    try:
+      fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+    except (IOError, OSError):
+      return
     try:
-      with open(filename, 'w') as fp:
+      with os.fdopen(fd, 'w') as fp:
         fp.write(json_str)
-    except IOError:
-      pass
+      if timestamp is not None:
+        os.utime(temp_path, (timestamp, timestamp))
+      os.replace(temp_path, path)
+    except (IOError, OSError):
+      try:
+        os.unlink(temp_path)
+      except OSError:
+        pass
+      return
+    self._RemoveLeastRecentlyUsed()
+
+  def _RemoveLeastRecentlyUsed(self):
+    """Removes the least recently used entries beyond max_entries."""
+    entries = []
+    try:
+      for name in os.listdir(self.cache_dir):
+        path = os.path.join(self.cache_dir, name)
+        entries.append((os.path.getmtime(path), path))
+    except OSError:
+      # Another shell removed an entry while we were listing them.
+      return
+    if len(entries) <= self.max_entries:
+      return
+    entries.sort()
+    for _, path in entries[:len(entries) - self.max_entries]:
+      try:
+        os.unlink(path)
+      except OSError:
+        pass
 
 
 class CloudListingRequestThread(threading.Thread):
@@ -250,7 +322,7 @@ class CloudObjectCompleter(object):
 
     start_time = time.time()
 
-    cache = TabCompletionCache.LoadFromFile(GetTabCompletionCacheFilename())
+    cache = _GetTabCompletionCache()
     cached_results = cache.GetCachedResults(prefix)
 
     timing_log_entry_type = ''
@@ -260,15 +332,21 @@ class CloudObjectCompleter(object):
     else:
       try:
         results = self._PerformCloudListing(wildcard_url, timeout)
-        if self._bucket_only and len(results) == 1:
-          results = [StripOneSlash(results[0])]
         partial_results = (len(results) == _TAB_COMPLETE_MAX_RESULTS)
         cache.UpdateCache(prefix, results, partial_results)
       except TimeoutError:
         timing_log_entry_type = ' (request timeout)'
         results = []
 
-    cache.WriteToFile(GetTabCompletionCacheFilename())
+    if boto.config.getbool('GSUtil', 'tab_completion_prefetch', True):
+      prefixes = self._GetPrefixesToPrefetch(prefix, results, cache)
+      if prefixes:
+        _RunInBackgroundProcess(self._Prefetch, prefixes, cache, timeout)
+
+    # The cache is shared with completers that aren't bucket-only, so it holds
+    # listings as they were returned.
+    if self._bucket_only and len(results) == 1:
+      results = [StripOneSlash(results[0])]
 
     end_time = time.time()
     num_results = len(results)
@@ -280,6 +358,47 @@ class CloudObjectCompleter(object):
 
     return results
 
+  def _GetPrefixesToPrefetch(self, prefix, results, cache):
+    """Returns the uncached prefixes the user is likely to complete next.
+
+    These are the bucket or subdirectory that prefix is in, whose listing
+    answers completions of any other name in it, and, if there are only a
+    few, the subdirectories in results, which the user may complete into.
+
+    Args:
+      prefix: The prefix being completed.
+      results: The completion results for prefix.
+      cache: The TabCompletionCache to check for the prefixes.
+    Returns:
+      List of prefixes to list.
+    """
+    prefixes = []
+    dir_prefix = prefix[:prefix.rfind('/') + 1]
+    if dir_prefix != prefix:
+      prefixes.append(dir_prefix)
+    if not self._bucket_only:
+      subdir_prefixes = [result for result in results if result.endswith('/')]
+      if len(subdir_prefixes) <= _TAB_COMPLETE_MAX_PREFETCHES:
+        prefixes.extend(subdir_prefixes)
+    return [
+        p for p in prefixes[:_TAB_COMPLETE_MAX_PREFETCHES]
+        if not cache.HasCachedResults(p)
+    ]
+
+  def _Prefetch(self, prefixes, cache, timeout):
+    """Lists each prefix and stores the results in cache."""
+    for prefix in prefixes:
+      request_thread = CloudListingRequestThread(prefix + '*',
+                                                 self._gsutil_api)
+      request_thread.start()
+      request_thread.join(timeout)
+      # A prefetch is only an optimization, so listings that fail or time out
+      # are skipped.
+      results = request_thread.results
+      if results is not None:
+        cache.UpdateCache(prefix, results,
+                          len(results) == _TAB_COMPLETE_MAX_RESULTS)
+
 
 class CloudOrLocalObjectCompleter(object):
   """Completer object for Cloud URLs or local files.
@@ -334,6 +453,65 @@ def MakeCompleter(completer_type, gsutil_api):
     raise RuntimeError('Unknown completer "%s"' % completer_type)
 
 
+def _GetTabCompletionCache():
+  return TabCompletionCache(
+      GetTabCompletionCacheDir(),
+      ttl=boto.config.getint('GSUtil', 'tab_completion_cache_ttl',
+                             TAB_COMPLETE_CACHE_TTL))
+
+
+def _CloseInheritedPipes():
+  """Closes this process's file descriptors that refer to pipes.
+
+  The shell reads completions from a pipe until every process holding its
+  write end has exited or closed it.
+  """
+  fds = range(3, 256)
+  for fd_dir in ('/proc/self/fd', '/dev/fd'):
+    if os.path.isdir(fd_dir):
+      fds = [int(fd) for fd in os.listdir(fd_dir)]
+      break
+  for fd in fds:
+    if fd <= 2:
+      continue
+    try:
+      if stat.S_ISFIFO(os.fstat(fd).st_mode):
+        os.close(fd)
+    except OSError:
+      pass
+
+
+def _RunInBackgroundProcess(func, *args):
+  """Calls func(*args) in a detached process that outlives this one.
+
+  Completions are computed by a short-lived process, so work that should
+  continue after it has printed its results is done by a grandchild process,
+  which doesn't hold on to the shell's pipe or terminal. Does nothing where
+  processes can't be forked.
+  """
+  if not hasattr(os, 'fork'):
+    return
+  try:
+    pid = os.fork()
+  except OSError:
+    return
+  if pid:
+    # Reap the child, which exits as soon as it has forked the grandchild.
+    os.waitpid(pid, 0)
+    return
+  try:
+    os.setsid()
+    if os.fork():
+      os._exit(0)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+      os.dup2(devnull, fd)
+    _CloseInheritedPipes()
+    func(*args)
+  finally:
+    os._exit(0)
+
+
 def _WriteTimingLog(message):
   """Write an entry to the tab completion timing log, if it's enabled."""
   if boto.config.getbool('GSUtil', 'tab_completion_time_logs', False):
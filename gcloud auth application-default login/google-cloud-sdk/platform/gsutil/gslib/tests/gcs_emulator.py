@@ -0,0 +1,947 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A local stand-in for the Cloud Storage JSON API, for tests and benchmarks.
+
+The emulator serves a subset of the JSON API over plain HTTP on a loopback
+address, keeping buckets and objects in memory:
+
+  - buckets: insert, get, list and delete;
+  - objects: insert (media, multipart and resumable uploads), get (metadata,
+    and media with Range requests), list (with prefix, delimiter and paging),
+    patch, compose, rewrite, copy and delete.
+
+Only live object versions are kept, and access control, authentication and
+most bucket configuration are not modeled. Objects carry MD5 and CRC32C
+hashes as in Cloud Storage, except that composite objects have only a CRC32C.
+
+To make benchmarks reproducible, the emulator can add a fixed latency to each
+request, cap the bandwidth of each connection, and fail a given fraction of
+requests with 503 errors, using a seeded random number generator.
+
+gsutil is pointed at the emulator with these boto config options, which are
+also returned by GcsEmulator.boto_config, and must be run without
+credentials and with the JSON API:
+
+  [Credentials]
+  gs_json_host = 127.0.0.1
+  gs_json_port = <port>
+  gs_json_protocol = http
+
+The emulator may be run in-process, as in:
+
+  with GcsEmulator() as emulator:
+    with SetBotoConfigForTest(emulator.boto_config):
+      ...
+
+or standalone, for example to benchmark a gsutil command:
+
+  python gcs_emulator.py --port 8080 --latency 0.02 --bandwidth 50M
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import argparse
+import base64
+import hashlib
+from http import server as BaseHTTPServer
+import itertools
+import json
+import random
+import re
+import socketserver
+import struct
+import threading
+import time
+from urllib import parse as urllib_parse
+
+# The emulator otherwise uses only the standard library, so that it can also be
+# run standalone, outside gsutil's environment.
+try:
+  import crcmod.predefined  # pylint: disable=g-import-not-at-top
+except ImportError:
+  crcmod = None
+
+_CRC32C_POLYNOMIAL = 0x82F63B78
+_CRC32C_TABLE = None
+
+# Size of the pieces in which request and response bodies are transferred,
+# and over which the bandwidth cap is enforced.
+_TRANSFER_PIECE_SIZE = 64 * 1024
+
+_DEFAULT_MAX_RESULTS = 1000
+
+_BYTE_RANGE_REGEX = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CONTENT_RANGE_REGEX = re.compile(r'^bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)$')
+_HUMAN_BYTES_REGEX = re.compile(r'^(\d+(?:\.\d+)?)([kmgt]?)i?b?$', re.I)
+
+# Object metadata fields that uploads, patches and rewrites may set.
+_WRITABLE_OBJECT_FIELDS = ('cacheControl', 'contentDisposition',
+                           'contentEncoding', 'contentLanguage', 'contentType',
+                           'customTime', 'metadata', 'storageClass')
+
+
+class _Crc32c(object):
+  """Incremental CRC32C, using crcmod if available."""
+
+  def __init__(self):
+    if crcmod:
+      self._crc = crcmod.predefined.Crc('crc-32c')
+    else:
+      self._crc = None
+      self._value = 0xFFFFFFFF
+      global _CRC32C_TABLE
+      if _CRC32C_TABLE is None:
+        table = []
+        for i in range(256):
+          value = i
+          for _ in range(8):
+            value = (value >> 1) ^ (_CRC32C_POLYNOMIAL if value & 1 else 0)
+          table.append(value)
+        _CRC32C_TABLE = table
+
+  def update(self, data):  # pylint: disable=invalid-name
+    if self._crc:
+      self._crc.update(data)
+      return
+    value = self._value
+    table = _CRC32C_TABLE
+    for byte in bytearray(data):
+      value = table[(value ^ byte) & 0xFF] ^ (value >> 8)
+    self._value = value
+
+  def digest(self):  # pylint: disable=invalid-name
+    if self._crc:
+      return self._crc.digest()
+    return struct.pack('>I', self._value ^ 0xFFFFFFFF)
+
+
+class _Hasher(object):
+  """Computes the hashes of object data as it is received."""
+
+  def __init__(self, compute_crc32c):
+    self._md5 = hashlib.md5()
+    self._crc32c = _Crc32c() if compute_crc32c else None
+
+  def update(self, data):  # pylint: disable=invalid-name
+    self._md5.update(data)
+    if self._crc32c:
+      self._crc32c.update(data)
+
+  def GetHashes(self):
+    hashes = {'md5Hash': _B64(self._md5.digest())}
+    if self._crc32c:
+      hashes['crc32c'] = _B64(self._crc32c.digest())
+    return hashes
+
+
+class _EmulatorError(Exception):
+  """An error to return to the client as a JSON API error response."""
+
+  def __init__(self, status, reason, message):
+    super(_EmulatorError, self).__init__(message)
+    self.status = status
+    self.reason = reason
+    self.message = message
+
+
+def _B64(data):
+  return base64.b64encode(data).decode('ascii')
+
+
+def _FormatTime(seconds):
+  return '%s.%03dZ' % (time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(
+      seconds)), int(seconds * 1000) % 1000)
+
+
+def ParseBandwidth(value):
+  """Parses a bandwidth such as '10M' (bytes per second) into an int."""
+  match = _HUMAN_BYTES_REGEX.match(value.strip())
+  if not match:
+    raise ValueError('Invalid bandwidth: %s' % value)
+  return int(float(match.group(1)) * 1024**'_kmgt'.index(
+      (match.group(2) or '_').lower()))
+
+
+class _Object(object):
+  """An object's metadata (as a JSON API resource dict) and data."""
+
+  def __init__(self, metadata, data):
+    self.metadata = metadata
+    self.data = data
+
+
+class _ResumableUpload(object):
+  """State of a resumable upload session."""
+
+  def __init__(self, bucket, metadata, preconditions, compute_crc32c):
+    self.bucket = bucket
+    self.metadata = metadata
+    self.preconditions = preconditions
+    self.chunks = []
+    self.received = 0
+    self.hasher = _Hasher(compute_crc32c)
+    # Object resource, once the upload has completed.
+    self.result = None
+
+
+class _EmulatorState(object):
+  """Buckets, objects and upload sessions, shared by request handlers."""
+
+  def __init__(self, compute_crc32c):
+    self.compute_crc32c = compute_crc32c
+    self.lock = threading.Lock()
+    # Bucket name to (bucket resource, dict of object name to _Object).
+    self.buckets = {}
+    self.uploads = {}
+    self._upload_ids = itertools.count(1)
+    self._last_generation = 0
+
+  def NewGeneration(self):
+    """Returns a generation number greater than any returned before."""
+    with self.lock:
+      self._last_generation = max(self._last_generation + 1,
+                                  int(time.time() * 1000000))
+      return self._last_generation
+
+  def NewUploadId(self):
+    return 'emulator-upload-%d' % next(self._upload_ids)
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Handles one JSON API connection."""
+
+  protocol_version = 'HTTP/1.1'
+
+  # pylint: disable=invalid-name
+  def do_GET(self):
+    self._HandleRequest()
+
+  def do_POST(self):
+    self._HandleRequest()
+
+  def do_PUT(self):
+    self._HandleRequest()
+
+  def do_PATCH(self):
+    self._HandleRequest()
+
+  def do_DELETE(self):
+    self._HandleRequest()
+
+  # pylint: enable=invalid-name
+
+  def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+    if self.server.verbose:
+      BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+  @property
+  def _state(self):
+    return self.server.state
+
+  def _HandleRequest(self):
+    """Dispatches the request after applying injected latency and errors."""
+    self._transfer_start = time.time()
+    self._bytes_transferred = 0
+    parsed_url = urllib_parse.urlsplit(self.path)
+    self._query = dict(urllib_parse.parse_qsl(parsed_url.query))
+    self._base_url = 'http://%s' % self.headers.get(
+        'Host', '%s:%d' % self.server.server_address[:2])
+    try:
+      body = self._ReadBody()
+      if self.server.latency:
+        time.sleep(self.server.latency)
+      if self.server.ShouldInjectError():
+        raise _EmulatorError(503, 'backendError',
+                             'Error injected by the emulator.')
+      segments = [
+          urllib_parse.unquote(segment)
+          for segment in parsed_url.path.strip('/').split('/')
+      ]
+      self._Dispatch(segments, body)
+    except _EmulatorError as e:
+      self._SendJson(
+          {
+              'error': {
+                  'code': e.status,
+                  'message': e.message,
+                  'errors': [{
+                      'reason': e.reason,
+                      'message': e.message,
+                  }],
+              }
+          },
+          status=e.status)
+
+  def _Dispatch(self, segments, body):
+    """Routes a request by its method and path segments."""
+    method = self.command
+    if segments[0] == 'resumable':
+      # The client library sends resumable uploads to /resumable/upload/....
+      segments = segments[1:]
+    prefix = segments[:2]
+    if prefix == ['upload', 'storage'] and segments[3:4] == ['b']:
+      if len(segments) == 6 and segments[5] == 'o':
+        return self._Upload(segments[4], body)
+    elif prefix == ['download', 'storage'] and segments[3:4] == ['b']:
+      if len(segments) == 7 and segments[5] == 'o' and method == 'GET':
+        return self._GetObjectMedia(segments[4], segments[6])
+    elif prefix == ['storage', segments[1]] and segments[2:3] == ['b']:
+      path = segments[3:]
+      if not path:
+        if method == 'GET':
+          return self._ListBuckets()
+        if method == 'POST':
+          return self._InsertBucket(json.loads(body or '{}'))
+      elif len(path) == 1:
+        if method in ('GET', 'PATCH'):
+          return self._SendJson(self._GetBucket(path[0])[0])
+        if method == 'DELETE':
+          return self._DeleteBucket(path[0])
+      elif path[1:] == ['o'] and method == 'GET':
+        return self._ListObjects(path[0])
+      elif len(path) == 3 and path[1] == 'o':
+        if method == 'GET':
+          if self._query.get('alt') == 'media':
+            return self._GetObjectMedia(path[0], path[2])
+          return self._SendJson(self._GetObject(path[0], path[2]).metadata)
+        if method == 'PATCH':
+          return self._PatchObject(path[0], path[2], json.loads(body or '{}'))
+        if method == 'DELETE':
+          return self._DeleteObject(path[0], path[2])
+      elif len(path) == 4 and path[3] == 'compose' and method == 'POST':
+        return self._ComposeObject(path[0], path[2], json.loads(body or '{}'))
+      elif (len(path) == 8 and path[3] in ('rewriteTo', 'copyTo') and
+            path[4] == 'b' and path[6] == 'o' and method == 'POST'):
+        return self._RewriteObject(path[0], path[2], path[5], path[7],
+                                   json.loads(body or '{}'),
+                                   path[3] == 'rewriteTo')
+    raise _EmulatorError(404, 'notFound',
+                         'Not supported by the emulator: %s %s' %
+                         (method, self.path))
+
+  # Transfer helpers.
+
+  def _Throttle(self, num_bytes):
+    """Sleeps as needed to keep the connection within the bandwidth cap."""
+    bandwidth = self.server.bandwidth
+    if bandwidth:
+      self._bytes_transferred += num_bytes
+      delay = (self._transfer_start + self._bytes_transferred / bandwidth -
+               time.time())
+      if delay > 0:
+        time.sleep(delay)
+
+  def _ReadBody(self):
+    if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+      pieces = []
+      while True:
+        chunk_size = int(self.rfile.readline().split(b';')[0], 16)
+        if not chunk_size:
+          self.rfile.readline()
+          break
+        pieces.append(self._ReadBytes(chunk_size))
+        self.rfile.readline()
+      return b''.join(pieces)
+    return self._ReadBytes(int(self.headers.get('Content-Length') or 0))
+
+  def _ReadBytes(self, length):
+    pieces = []
+    while length:
+      piece = self.rfile.read(min(length, _TRANSFER_PIECE_SIZE))
+      if not piece:
+        break
+      pieces.append(piece)
+      length -= len(piece)
+      self._Throttle(len(piece))
+    return b''.join(pieces)
+
+  def _SendResponse(self, status, body=b'', headers=None):
+    self.send_response(status)
+    for name, value in (headers or {}).items():
+      self.send_header(name, value)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    for start in range(0, len(body), _TRANSFER_PIECE_SIZE):
+      piece = body[start:start + _TRANSFER_PIECE_SIZE]
+      self.wfile.write(piece)
+      self._Throttle(len(piece))
+
+  def _SendJson(self, resource, status=200, headers=None):
+    headers = dict(headers or {})
+    headers['Content-Type'] = 'application/json; charset=UTF-8'
+    self._SendResponse(status,
+                       json.dumps(resource).encode('utf-8'),
+                       headers=headers)
+
+  # Buckets.
+
+  def _GetBucket(self, bucket_name):
+    """Returns (bucket resource, objects dict); state.lock need not be held."""
+    try:
+      return self._state.buckets[bucket_name]
+    except KeyError:
+      raise _EmulatorError(404, 'notFound',
+                           'The specified bucket does not exist.')
+
+  def _InsertBucket(self, resource):
+    name = resource.get('name') or self._query.get('name')
+    if not name:
+      raise _EmulatorError(400, 'required', 'Bucket name is required.')
+    now = _FormatTime(time.time())
+    bucket = {
+        'kind': 'storage#bucket',
+        'id': name,
+        'name': name,
+        'selfLink': '%s/storage/v1/b/%s' % (self._base_url, name),
+        'projectNumber': '0',
+        'metageneration': '1',
+        'location': resource.get('location', 'US').upper(),
+        'locationType': 'multi-region',
+        'storageClass': resource.get('storageClass', 'STANDARD'),
+        'timeCreated': now,
+        'updated': now,
+        'etag': 'CAE=',
+    }
+    with self._state.lock:
+      if name in self._state.buckets:
+        raise _EmulatorError(
+            409, 'conflict',
+            'Your previous request to create the named bucket succeeded and '
+            'you already own it.')
+      self._state.buckets[name] = (bucket, {})
+    self._SendJson(bucket)
+
+  def _ListBuckets(self):
+    with self._state.lock:
+      buckets = [
+          self._state.buckets[name][0] for name in sorted(self._state.buckets)
+      ]
+    self._SendJson({'kind': 'storage#buckets', 'items': buckets})
+
+  def _DeleteBucket(self, bucket_name):
+    with self._state.lock:
+      if self._GetBucket(bucket_name)[1]:
+        raise _EmulatorError(409, 'conflict',
+                             'The bucket you tried to delete is not empty.')
+      del self._state.buckets[bucket_name]
+    self._SendResponse(204)
+
+  # Objects.
+
+  def _GetObject(self, bucket_name, object_name, generation=None):
+    """Returns the live _Object, checking the generation if one is given."""
+    obj = self._GetBucket(bucket_name)[1].get(object_name)
+    if generation is None:
+      generation = self._query.get('generation')
+    if not obj or (generation and
+                   generation != obj.metadata['generation']):
+      raise _EmulatorError(404, 'notFound', 'No such object: %s/%s' %
+                           (bucket_name, object_name))
+    return obj
+
+  def _CheckPreconditions(self, existing, preconditions):
+    """Raises a 412 error if existing (an _Object or None) fails them."""
+    generation = existing.metadata['generation'] if existing else '0'
+    metageneration = existing.metadata['metageneration'] if existing else None
+    for param, value, matches in (
+        ('ifGenerationMatch', generation, True),
+        ('ifGenerationNotMatch', generation, False),
+        ('ifMetagenerationMatch', metageneration, True),
+        ('ifMetagenerationNotMatch', metageneration, False)):
+      expected = preconditions.get(param)
+      if expected is not None and (expected == value) != matches:
+        raise _EmulatorError(412, 'conditionNotMet',
+                             'At least one of the pre-conditions you '
+                             'specified did not hold.')
+
+  def _GetPreconditions(self):
+    return {
+        param: self._query[param]
+        for param in ('ifGenerationMatch', 'ifGenerationNotMatch',
+                      'ifMetagenerationMatch', 'ifMetagenerationNotMatch')
+        if param in self._query
+    }
+
+  def _StoreObject(self, bucket_name, object_name, resource, data, hashes,
+                   preconditions, extra_metadata=None):
+    """Creates a new live generation of an object and returns its resource."""
+    if not object_name:
+      raise _EmulatorError(400, 'required', 'Object name is required.')
+    generation = self._state.NewGeneration()
+    now = _FormatTime(time.time())
+    quoted_name = urllib_parse.quote(object_name, safe='')
+    metadata = {
+        'contentType': 'application/octet-stream',
+        'storageClass': 'STANDARD',
+    }
+    for field in _WRITABLE_OBJECT_FIELDS:
+      if resource.get(field) is not None:
+        metadata[field] = resource[field]
+    metadata.update(extra_metadata or {})
+    metadata.update(hashes)
+    metadata.update({
+        'kind': 'storage#object',
+        'id': '%s/%s/%d' % (bucket_name, object_name, generation),
+        'selfLink': '%s/storage/v1/b/%s/o/%s' % (self._base_url, bucket_name,
+                                                 quoted_name),
+        'mediaLink': '%s/download/storage/v1/b/%s/o/%s?generation=%d&alt=media'
+                     % (self._base_url, bucket_name, quoted_name, generation),
+        'name': object_name,
+        'bucket': bucket_name,
+        'generation': str(generation),
+        'metageneration': '1',
+        'size': str(len(data)),
+        'etag': _B64(struct.pack('>Q', generation)),
+        'timeCreated': now,
+        'updated': now,
+        'timeStorageClassUpdated': now,
+    })
+    with self._state.lock:
+      objects = self._GetBucket(bucket_name)[1]
+      self._CheckPreconditions(objects.get(object_name), preconditions)
+      objects[object_name] = _Object(metadata, data)
+    return metadata
+
+  def _Upload(self, bucket_name, body):
+    """Handles media, multipart and resumable uploads."""
+    upload_type = self._query.get('uploadType', 'media')
+    if upload_type == 'resumable':
+      if 'upload_id' in self._query:
+        return self._ContinueResumableUpload(self._query['upload_id'], body)
+      return self._StartResumableUpload(bucket_name, body)
+    if self.command != 'POST':
+      raise _EmulatorError(405, 'invalid', 'Uploads must use POST.')
+    if upload_type == 'multipart':
+      resource, data = self._ParseMultipart(body)
+    elif upload_type == 'media':
+      resource = {'contentType': self.headers.get('Content-Type')}
+      data = body
+    else:
+      raise _EmulatorError(400, 'invalid',
+                           'Unsupported uploadType: %s' % upload_type)
+    hasher = _Hasher(self._state.compute_crc32c)
+    hasher.update(data)
+    self._SendJson(
+        self._StoreObject(bucket_name,
+                          self._query.get('name') or resource.get('name'),
+                          resource, data, hasher.GetHashes(),
+                          self._GetPreconditions()))
+
+  def _ParseMultipart(self, body):
+    """Returns (resource dict, media bytes) from a multipart/related body."""
+    match = re.search(r'boundary=["\']?([^"\';]+)',
+                      self.headers.get('Content-Type', ''))
+    if not match:
+      raise _EmulatorError(400, 'invalid', 'Missing multipart boundary.')
+    delimiter = b'--' + match.group(1).encode('ascii')
+    parts = []
+    for part in body.split(delimiter)[1:]:
+      if part.startswith(b'--'):
+        break
+      # Headers end at the first blank line; the media may contain either
+      # kind of line ending.
+      separator = min((b'\r\n\r\n', b'\n\n'),
+                      key=lambda sep: part.find(sep) % (len(part) + 1))
+      headers, _, content = part.partition(separator)
+      # The part ends with a line ending of the same kind as its headers.
+      line_ending = separator[:len(separator) // 2]
+      if content.endswith(line_ending):
+        content = content[:-len(line_ending)]
+      parts.append((headers, content))
+    if len(parts) != 2:
+      raise _EmulatorError(400, 'invalid',
+                           'Expected metadata and media parts.')
+    resource = json.loads(parts[0][1].decode('utf-8'))
+    content_type = re.search(br'(?im)^content-type:\s*(\S+)', parts[1][0])
+    if content_type and not resource.get('contentType'):
+      resource['contentType'] = content_type.group(1).decode('ascii')
+    return resource, parts[1][1]
+
+  def _StartResumableUpload(self, bucket_name, body):
+    resource = json.loads(body or '{}')
+    if self._query.get('name'):
+      resource['name'] = self._query['name']
+    if not resource.get('contentType'):
+      resource['contentType'] = self.headers.get('X-Upload-Content-Type')
+    self._GetBucket(bucket_name)
+    upload_id = self._state.NewUploadId()
+    with self._state.lock:
+      self._state.uploads[upload_id] = _ResumableUpload(
+          bucket_name, resource, self._GetPreconditions(),
+          self._state.compute_crc32c)
+    self._SendResponse(
+        200,
+        headers={
+            'Location':
+                '%s/upload/storage/v1/b/%s/o?uploadType=resumable&upload_id=%s'
+                % (self._base_url, urllib_parse.quote(bucket_name), upload_id)
+        })
+
+  def _ContinueResumableUpload(self, upload_id, body):
+    """Handles a PUT of data to, or a status query of, an upload session."""
+    with self._state.lock:
+      upload = self._state.uploads.get(upload_id)
+    if not upload:
+      raise _EmulatorError(404, 'notFound', 'No such upload session.')
+    content_range = self.headers.get('Content-Range')
+    if content_range:
+      match = _CONTENT_RANGE_REGEX.match(content_range.strip())
+      if not match:
+        raise _EmulatorError(400, 'invalid',
+                             'Invalid Content-Range: %s' % content_range)
+      start, total = match.group(1), match.group(3)
+    else:
+      start, total = '0', str(len(body))
+    if upload.result:
+      return self._SendJson(upload.result)
+    if start is not None:
+      start = int(start)
+      if start > upload.received:
+        raise _EmulatorError(
+            400, 'invalid', 'Upload data starts at %d, but only %d bytes '
+            'have been received.' % (start, upload.received))
+      data = body[upload.received - start:]
+      upload.chunks.append(data)
+      upload.hasher.update(data)
+      upload.received += len(data)
+    if total != '*' and upload.received == int(total):
+      upload.result = self._StoreObject(upload.bucket,
+                                        upload.metadata.get('name'),
+                                        upload.metadata,
+                                        b''.join(upload.chunks),
+                                        upload.hasher.GetHashes(),
+                                        upload.preconditions)
+      upload.chunks = []
+      return self._SendJson(upload.result)
+    headers = {}
+    if upload.received:
+      headers['Range'] = 'bytes=0-%d' % (upload.received - 1)
+    self._SendResponse(308, headers=headers)
+
+  def _GetObjectMedia(self, bucket_name, object_name):
+    with self._state.lock:
+      obj = self._GetObject(bucket_name, object_name)
+    data = obj.data
+    headers = {
+        'Content-Type': obj.metadata['contentType'],
+        'X-Goog-Generation': obj.metadata['generation'],
+        'X-Goog-Hash': ','.join(
+            '%s=%s' % (name, obj.metadata[field])
+            for name, field in (('crc32c', 'crc32c'), ('md5', 'md5Hash'))
+            if field in obj.metadata),
+    }
+    if 'contentEncoding' in obj.metadata:
+      headers['Content-Encoding'] = obj.metadata['contentEncoding']
+    byte_range = self.headers.get('Range')
+    match = byte_range and _BYTE_RANGE_REGEX.match(byte_range.strip())
+    if not match or not (match.group(1) or match.group(2)):
+      return self._SendResponse(200, data, headers=headers)
+    size = len(data)
+    if match.group(1):
+      start = int(match.group(1))
+      end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    else:
+      start = max(size - int(match.group(2)), 0)
+      end = size - 1
+    if start >= size or start > end:
+      raise _EmulatorError(416, 'requestedRangeNotSatisfiable',
+                           'Request range not satisfiable')
+    headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+    self._SendResponse(206, data[start:end + 1], headers=headers)
+
+  def _ListObjects(self, bucket_name):
+    """Lists objects in name order, rolling names up by delimiter."""
+    prefix = self._query.get('prefix', '')
+    delimiter = self._query.get('delimiter')
+    max_results = int(self._query.get('maxResults', _DEFAULT_MAX_RESULTS))
+    page_token = self._query.get('pageToken')
+    marker = (base64.urlsafe_b64decode(page_token.encode('ascii')).decode(
+        'utf-8') if page_token else None)
+    with self._state.lock:
+      objects = self._GetBucket(bucket_name)[1]
+      names = sorted(name for name in objects if name.startswith(prefix) and
+                     (marker is None or name > marker))
+      items = []
+      prefixes = []
+      next_marker = None
+      for name in names:
+        if prefixes and name.startswith(prefixes[-1]):
+          continue
+        if len(items) + len(prefixes) == max_results:
+          next_marker = last_marker
+          break
+        rolled_up = None
+        if delimiter:
+          end = name.find(delimiter, len(prefix))
+          if end != -1:
+            rolled_up = name[:end + len(delimiter)]
+        if rolled_up:
+          prefixes.append(rolled_up)
+          # Continue after every name under the rolled up prefix.
+          last_marker = rolled_up + '\U0010ffff'
+        else:
+          items.append(objects[name].metadata)
+          last_marker = name
+    response = {'kind': 'storage#objects', 'items': items}
+    if prefixes:
+      response['prefixes'] = prefixes
+    if next_marker is not None:
+      response['nextPageToken'] = base64.urlsafe_b64encode(
+          next_marker.encode('utf-8')).decode('ascii')
+    self._SendJson(response)
+
+  def _PatchObject(self, bucket_name, object_name, resource):
+    with self._state.lock:
+      obj = self._GetObject(bucket_name, object_name)
+      self._CheckPreconditions(obj, self._GetPreconditions())
+      metadata = dict(obj.metadata)
+      for field in _WRITABLE_OBJECT_FIELDS:
+        if field not in resource:
+          continue
+        value = resource[field]
+        if field == 'metadata' and value is not None:
+          # Custom metadata is merged, with null values removing keys.
+          value = dict(metadata.get('metadata', {}), **value)
+          value = {k: v for k, v in value.items() if v is not None}
+        if value is None:
+          metadata.pop(field, None)
+        else:
+          metadata[field] = value
+      metadata['metageneration'] = str(int(metadata['metageneration']) + 1)
+      metadata['updated'] = _FormatTime(time.time())
+      obj.metadata = metadata
+    self._SendJson(metadata)
+
+  def _DeleteObject(self, bucket_name, object_name):
+    with self._state.lock:
+      obj = self._GetObject(bucket_name, object_name)
+      self._CheckPreconditions(obj, self._GetPreconditions())
+      del self._state.buckets[bucket_name][1][object_name]
+    self._SendResponse(204)
+
+  def _ComposeObject(self, bucket_name, object_name, request):
+    sources = request.get('sourceObjects') or []
+    if not sources:
+      raise _EmulatorError(400, 'required', 'Source objects are required.')
+    pieces = []
+    component_count = 0
+    with self._state.lock:
+      for source in sources:
+        obj = self._GetObject(bucket_name, source['name'],
+                              generation=source.get('generation'))
+        pieces.append(obj.data)
+        component_count += obj.metadata.get('componentCount', 1)
+    data = b''.join(pieces)
+    hasher = _Hasher(self._state.compute_crc32c)
+    hasher.update(data)
+    # Like Cloud Storage, composite objects have no MD5 hash.
+    hashes = hasher.GetHashes()
+    del hashes['md5Hash']
+    self._SendJson(
+        self._StoreObject(bucket_name,
+                          object_name,
+                          request.get('destination') or {},
+                          data,
+                          hashes,
+                          self._GetPreconditions(),
+                          extra_metadata={'componentCount': component_count}))
+
+  def _RewriteObject(self, src_bucket_name, src_object_name, dst_bucket_name,
+                     dst_object_name, resource, is_rewrite):
+    with self._state.lock:
+      src = self._GetObject(src_bucket_name,
+                            src_object_name,
+                            generation=self._query.get('sourceGeneration'))
+    # Metadata is copied from the source unless given in the request.
+    metadata = {
+        field: src.metadata[field]
+        for field in _WRITABLE_OBJECT_FIELDS
+        if field in src.metadata
+    }
+    metadata.update(
+        {field: value for field, value in resource.items() if value is not None})
+    hashes = {
+        field: src.metadata[field]
+        for field in ('md5Hash', 'crc32c')
+        if field in src.metadata
+    }
+    extra_metadata = {}
+    if 'componentCount' in src.metadata:
+      extra_metadata['componentCount'] = src.metadata['componentCount']
+    result = self._StoreObject(dst_bucket_name,
+                               dst_object_name,
+                               metadata,
+                               src.data,
+                               hashes,
+                               self._GetPreconditions(),
+                               extra_metadata=extra_metadata)
+    if not is_rewrite:
+      return self._SendJson(result)
+    self._SendJson({
+        'kind': 'storage#rewriteResponse',
+        'totalBytesRewritten': result['size'],
+        'objectSize': result['size'],
+        'done': True,
+        'resource': result,
+    })
+
+
+class _EmulatorServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """HTTP server holding the emulator's state and fault injection settings."""
+
+  daemon_threads = True
+
+  def __init__(self, server_address, state, latency, bandwidth, error_rate,
+               seed, verbose):
+    BaseHTTPServer.HTTPServer.__init__(self, server_address, _RequestHandler)
+    self.state = state
+    self.latency = latency
+    self.bandwidth = bandwidth
+    self.error_rate = error_rate
+    self.verbose = verbose
+    self._random = random.Random(seed)
+    self._random_lock = threading.Lock()
+
+  def ShouldInjectError(self):
+    if not self.error_rate:
+      return False
+    with self._random_lock:
+      return self._random.random() < self.error_rate
+
+
+class GcsEmulator(object):
+  """Runs the emulator on a background thread."""
+
+  def __init__(self,
+               host='127.0.0.1',
+               port=0,
+               latency=0,
+               bandwidth=None,
+               error_rate=0,
+               seed=0,
+               compute_crc32c=True,
+               verbose=False):
+    """Creates the emulator, listening but not yet serving requests.
+
+    Args:
+      host: Loopback address to listen on.
+      port: Port to listen on; 0 picks a free port.
+      latency: Seconds to wait before handling each request.
+      bandwidth: Maximum bytes per second transferred over each connection,
+          in each direction, or None for no limit.
+      error_rate: Fraction of requests to fail with a 503 error.
+      seed: Seed for choosing which requests fail.
+      compute_crc32c: If False, objects are given only MD5 hashes. Computing
+          CRC32C hashes is slow if crcmod's C extension is not installed.
+      verbose: If True, each request is logged to stderr.
+    """
+    self.state = _EmulatorState(compute_crc32c)
+    self._server = _EmulatorServer((host, port), self.state, latency,
+                                   bandwidth, error_rate, seed, verbose)
+    self._thread = None
+
+  @property
+  def host(self):
+    return self._server.server_address[0]
+
+  @property
+  def port(self):
+    return self._server.server_address[1]
+
+  @property
+  def boto_config(self):
+    """(section, option, value) tuples that point gsutil at the emulator."""
+    return [
+        ('Credentials', 'gs_json_host', self.host),
+        ('Credentials', 'gs_json_port', str(self.port)),
+        ('Credentials', 'gs_json_protocol', 'http'),
+    ]
+
+  def Start(self):
+    self._thread = threading.Thread(target=self._server.serve_forever)
+    self._thread.daemon = True
+    self._thread.start()
+
+  def Stop(self):
+    self._server.shutdown()
+    self._server.server_close()
+    self._thread.join()
+
+  def __enter__(self):
+    self.Start()
+    return self
+
+  def __exit__(self, *unused_exc_info):
+    self.Stop()
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description='Serves a local stand-in for the Cloud Storage JSON API.')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8080)
+  parser.add_argument('--latency',
+                      type=float,
+                      default=0,
+                      help='Seconds to wait before handling each request.')
+  parser.add_argument('--bandwidth',
+                      type=ParseBandwidth,
+                      help='Maximum bytes per second per connection, e.g. 10M.')
+  parser.add_argument('--error-rate',
+                      type=float,
+                      default=0,
+                      help='Fraction of requests to fail with a 503 error.')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--no-crc32c',
+                      action='store_true',
+                      help='Give objects only MD5 hashes.')
+  parser.add_argument('--bucket',
+                      action='append',
+                      default=[],
+                      help='Bucket to create at startup; may be repeated.')
+  parser.add_argument('-v', '--verbose', action='store_true')
+  args = parser.parse_args()
+  emulator = GcsEmulator(host=args.host,
+                         port=args.port,
+                         latency=args.latency,
+                         bandwidth=args.bandwidth,
+                         error_rate=args.error_rate,
+                         seed=args.seed,
+                         compute_crc32c=not args.no_crc32c,
+                         verbose=args.verbose)
+  for bucket_name in args.bucket:
+    emulator.state.buckets[bucket_name] = ({
+        'kind': 'storage#bucket',
+        'id': bucket_name,
+        'name': bucket_name,
+        'location': 'US',
+        'storageClass': 'STANDARD',
+    }, {})
+  print('Serving on %s:%d. Add this to your boto config file:\n' %
+        (emulator.host, emulator.port))
+  print('[Credentials]')
+  for _, option, value in emulator.boto_config:
+    print('%s = %s' % (option, value))
+  try:
+    emulator._server.serve_forever()  # pylint: disable=protected-access
+  except KeyboardInterrupt:
+    pass
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for the async_engine module, against the local emulator."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import asyncio
+import logging
+import os
+
+import six
+
+from gslib import async_engine
+from gslib import gcs_json_credentials
+from gslib.cloud_api import NotFoundException
+from gslib.cloud_api import PreconditionException
+from gslib.cloud_api import Preconditions
+from gslib.cloud_api import ServiceException
+from gslib.command import ResetFailureCount
+from gslib.command_runner import CommandRunner
+from gslib.exception import CommandException
+from gslib.gcs_json_api import GcsJsonApi
+from gslib.no_op_credentials import NoOpCredentials
+from gslib.tests import gcs_emulator
+import gslib.tests.testcase as testcase
+from gslib.tests.util import SetBotoConfigForTest
+from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
+from gslib.utils import copy_helper
+
+from unittest import mock
+
+_BUCKET = 'async-bucket'
+
+
+class TestAsyncEngine(testcase.GsUtilUnitTestCase):
+  """Tests that the engine's requests are served like the GcsJsonApi's."""
+
+  def _CreateEngine(self,
+                    emulator,
+                    max_connections=4,
+                    create_bucket=True,
+                    num_retries=2):
+    """Returns an AsyncEngine pointed at the emulator, with a bucket in it."""
+    boto_config = emulator.boto_config + [('Boto', 'num_retries',
+                                           str(num_retries)),
+                                          ('Boto', 'max_retry_delay', '1')]
+    api_kwargs = {
+        'bucket_storage_uri_class': None,
+        'logger': logging.getLogger('test-async-engine'),
+        'status_queue': None,
+        'credentials': NoOpCredentials(),
+    }
+    with SetBotoConfigForTest(boto_config):
+      json_api = GcsJsonApi(**api_kwargs)
+      engine = async_engine.AsyncEngine(json_api,
+                                        api_kwargs,
+                                        2,
+                                        max_connections,
+                                        max_in_flight=100)
+    if create_bucket:
+      json_api.CreateBucket(_BUCKET,
+                            metadata=apitools_messages.Bucket(name=_BUCKET))
+    return engine
+
+  def _Metadata(self, name):
+    return apitools_messages.Object(bucket=_BUCKET,
+                                    name=name,
+                                    contentType='text/plain')
+
+  def test_object_round_trip(self):
+    with gcs_emulator.GcsEmulator() as emulator:
+      engine = self._CreateEngine(emulator)
+
+      async def RoundTrip():
+        obj = await engine.UploadObject(b'0123456789',
+                                        self._Metadata('dir/obj'),
+                                        fields=['generation', 'md5Hash'])
+        self.assertEqual('eB5eJF1ptWaXm4bijSPyxw==', obj.md5Hash)
+        self.assertEqual(b'0123456789', await engine.GetObjectMedia(
+            _BUCKET, 'dir/obj'))
+        metadata = await engine.GetObjectMetadata(_BUCKET, 'dir/obj')
+        self.assertEqual(obj.generation, metadata.generation)
+        self.assertEqual(10, metadata.size)
+
+        with self.assertRaises(PreconditionException):
+          await engine.UploadObject(b'x',
+                                    self._Metadata('dir/obj'),
+                                    preconditions=Preconditions(gen_match=0))
+        await engine.DeleteObject(_BUCKET, 'dir/obj')
+        with self.assertRaises(NotFoundException):
+          await engine.GetObjectMetadata(_BUCKET, 'dir/obj')
+
+      engine.Run(RoundTrip())
+
+  def test_requests_share_bounded_connections(self):
+    opened = []
+    open_connection = asyncio.open_connection
+
+    async def CountingOpenConnection(*args, **kwargs):
+      opened.append(args)
+      return await open_connection(*args, **kwargs)
+
+    with gcs_emulator.GcsEmulator(latency=0.01) as emulator:
+      engine = self._CreateEngine(emulator, max_connections=3)
+
+      async def UploadAndDownload(i):
+        name = 'obj%d' % i
+        await engine.UploadObject(b'%d' % i, self._Metadata(name))
+        return await engine.GetObjectMedia(_BUCKET, name)
+
+      async def Transfer():
+        return await asyncio.gather(*[UploadAndDownload(i) for i in range(40)])
+
+      with mock.patch.object(async_engine.asyncio, 'open_connection',
+                             CountingOpenConnection):
+        contents = engine.Run(Transfer())
+    self.assertEqual([b'%d' % i for i in range(40)], contents)
+    self.assertLessEqual(len(opened), 3)
+
+  def test_retries_then_raises_service_errors(self):
+    request = async_engine._HttpConnectionPool.Request
+    for num_retries in (0, 2):
+      requests = []
+
+      async def CountingRequest(pool, *args):
+        requests.append(args)
+        return await request(pool, *args)
+
+      with gcs_emulator.GcsEmulator(error_rate=1) as emulator:
+        engine = self._CreateEngine(emulator,
+                                    create_bucket=False,
+                                    num_retries=num_retries)
+        with mock.patch.object(async_engine,
+                               'CalculateWaitForRetry',
+                               return_value=0):
+          with mock.patch.object(async_engine._HttpConnectionPool, 'Request',
+                                 CountingRequest):
+            with mock.patch.object(async_engine,
+                                   'LogRetryableError') as log_retryable_error:
+              with self.assertRaises(ServiceException):
+                engine.Run(engine.GetObjectMetadata(_BUCKET, 'obj'))
+      # Like GcsJsonApi, the first request is retried num_retries times.
+      self.assertEqual(num_retries + 1, len(requests))
+      self.assertEqual(num_retries, log_retryable_error.call_count)
+
+  def test_get_small_object_engine(self):
+    with SetBotoConfigForTest([('GSUtil', 'small_object_engine', 'Async')]):
+      self.assertEqual('async', async_engine.GetSmallObjectEngine())
+    with SetBotoConfigForTest([('GSUtil', 'small_object_engine', 'fibers')]):
+      with self.assertRaisesRegex(CommandException, 'small_object_engine'):
+        async_engine.GetSmallObjectEngine()
+    with SetBotoConfigForTest([('GSUtil', 'small_object_threshold', '1K')]):
+      self.assertEqual(1024, async_engine.GetSmallObjectThreshold())
+
+
+class TestAsyncCommands(testcase.GsUtilUnitTestCase):
+  """Tests cp, rm and stat -m with the async engine, against the emulator."""
+
+  def setUp(self):
+    super(TestAsyncCommands, self).setUp()
+    emulator = gcs_emulator.GcsEmulator()
+    emulator.Start()
+    self.addCleanup(emulator.Stop)
+    # Failed tasks are counted per process, and would fail later commands.
+    self.addCleanup(ResetFailureCount)
+    self.boto_config = emulator.boto_config + [
+        ('Boto', 'num_retries', '2'),
+        ('Boto', 'max_retry_delay', '1'),
+        ('GSUtil', 'prefer_api', 'json'),
+        ('GSUtil', 'small_object_engine', 'async'),
+        ('GSUtil', 'small_object_threshold', '1K'),
+        ('GSUtil', 'parallel_process_count', '1'),
+        ('GSUtil', 'parallel_thread_count', '4'),
+        ('GSUtil', 'parallel_composite_upload_threshold', '0'),
+        ('GSUtil', 'sliced_object_download_threshold', '0'),
+    ]
+    # Commands use no credentials, as the emulator expects.
+    patcher = mock.patch.object(gcs_json_credentials,
+                                '_CheckAndGetCredentials',
+                                return_value=None)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    with SetBotoConfigForTest(self.boto_config):
+      self.json_api = GcsJsonApi(None,
+                                 logging.getLogger('test-async-commands'),
+                                 None,
+                                 credentials=NoOpCredentials())
+    self.json_api.CreateBucket(_BUCKET,
+                               metadata=apitools_messages.Bucket(name=_BUCKET))
+    self.async_copies = self._Spy(copy_helper, 'PerformCopyAsync')
+    self.threaded_copies = self._Spy(copy_helper, 'PerformCopy')
+    self.async_deletes = self._Spy(async_engine.AsyncEngine, 'DeleteObject')
+    self.async_gets = self._Spy(async_engine.AsyncEngine, 'GetObjectMetadata')
+
+  def _Spy(self, obj, name):
+    """Records the calls made to a function, and returns the list of them."""
+    calls = []
+    original = getattr(obj, name)
+    if asyncio.iscoroutinefunction(original):
+
+      async def Wrapper(*args, **kwargs):
+        calls.append(args)
+        return await original(*args, **kwargs)
+    else:
+
+      def Wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    patcher = mock.patch.object(obj, name, Wrapper)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    return calls
+
+  def _RunCommand(self, command_name, args):
+    """Runs a command with -m, and returns its exit status."""
+    with SetBotoConfigForTest(self.boto_config):
+      return CommandRunner().RunNamedCommand(command_name,
+                                             args,
+                                             parallel_operations=True,
+                                             do_shutdown=False)
+
+  def _Upload(self, name, data):
+    with SetBotoConfigForTest(self.boto_config):
+      self.json_api.UploadObject(
+          six.BytesIO(data),
+          apitools_messages.Object(bucket=_BUCKET, name=name),
+          size=len(data))
+
+  def _Download(self, name):
+    stream = six.BytesIO()
+    with SetBotoConfigForTest(self.boto_config):
+      self.json_api.GetObjectMedia(_BUCKET, name, stream)
+    return stream.getvalue()
+
+  def _ObjectNames(self):
+    with SetBotoConfigForTest(self.boto_config):
+      return sorted(
+          result.data.name for result in self.json_api.ListObjects(_BUCKET))
+
+  def test_cp_copies_small_files_asynchronously(self):
+    tmpdir = self.CreateTempDir()
+    for name, contents in (('a', b'a' * 10), ('b', b'b' * 20),
+                           ('big', b'c' * 2048)):
+      self.CreateTempFile(tmpdir=tmpdir, file_name=name, contents=contents)
+    self.assertEqual(
+        0,
+        self._RunCommand('cp', [
+            os.path.join(tmpdir, name) for name in ('a', 'b', 'big')
+        ] + ['gs://%s/' % _BUCKET]))
+    # The file above small_object_threshold is copied in a thread.
+    self.assertEqual(2, len(self.async_copies))
+    self.assertEqual(1, len(self.threaded_copies))
+    self.assertEqual(b'a' * 10, self._Download('a'))
+    self.assertEqual(b'b' * 20, self._Download('b'))
+    self.assertEqual(b'c' * 2048, self._Download('big'))
+
+    download_dir = self.CreateTempDir()
+    self.assertEqual(
+        0,
+        self._RunCommand('cp', ['gs://%s/a' % _BUCKET,
+                                'gs://%s/b' % _BUCKET, download_dir]))
+    self.assertEqual(4, len(self.async_copies))
+    with open(os.path.join(download_dir, 'b'), 'rb') as f:
+      self.assertEqual(b'b' * 20, f.read())
+
+  def test_cp_options_that_change_copies_run_in_threads(self):
+    tmpdir = self.CreateTempDir(test_files=['a.txt', 'b.txt'])
+    srcs = [os.path.join(tmpdir, 'a.txt'), os.path.join(tmpdir, 'b.txt')]
+    self.assertEqual(
+        0, self._RunCommand('cp', ['-z', 'txt'] + srcs + ['gs://%s/' % _BUCKET]))
+    self.assertEqual(0, len(self.async_copies))
+    self.assertEqual(2, len(self.threaded_copies))
+
+    self._Upload('a.txt', b'existing')
+    self.assertEqual(
+        0, self._RunCommand('cp', ['-n'] + srcs + ['gs://%s/' % _BUCKET]))
+    self.assertEqual(0, len(self.async_copies))
+    self.assertEqual(b'existing', self._Download('a.txt'))
+
+  def test_cp_continues_after_errors(self):
+    tmpdir = self.CreateTempDir(test_files=['a', 'b', 'c'])
+    upload_object = async_engine.AsyncEngine.UploadObject
+
+    async def FailingUploadObject(engine, data, object_metadata, **kwargs):
+      if object_metadata.name == 'b':
+        raise ServiceException('Injected failure', status=500)
+      return await upload_object(engine, data, object_metadata, **kwargs)
+
+    with mock.patch.object(async_engine.AsyncEngine, 'UploadObject',
+                           FailingUploadObject):
+      with self.assertRaisesRegex(CommandException,
+                                  '1 file/object could not be transferred'):
+        self._RunCommand('cp', ['-c'] + [
+            os.path.join(tmpdir, name) for name in ('a', 'b', 'c')
+        ] + ['gs://%s/' % _BUCKET])
+    self.assertEqual(['a', 'c'], self._ObjectNames())
+
+  def test_cp_counts_sources_that_match_nothing(self):
+    tmpdir = self.CreateTempDir(test_files=['a'])
+    with self.assertRaisesRegex(CommandException, 'could not be transferred'):
+      self._RunCommand('cp', [
+          '-c',
+          os.path.join(tmpdir, 'a'),
+          os.path.join(tmpdir, 'missing'),
+          'gs://%s/' % _BUCKET,
+      ])
+    self.assertEqual(1, len(self.async_copies))
+    self.assertEqual(['a'], self._ObjectNames())
+
+  def test_rm_deletes_objects_asynchronously(self):
+    for name in ('a', 'b', 'c'):
+      self._Upload(name, b'x')
+    self.assertEqual(
+        0,
+        self._RunCommand('rm',
+                         ['gs://%s/a' % _BUCKET,
+                          'gs://%s/b' % _BUCKET]))
+    self.assertEqual(2, len(self.async_deletes))
+    self.assertEqual(['c'], self._ObjectNames())
+
+  def test_rm_of_missing_object_fails(self):
+    self._Upload('a', b'x')
+    with self.assertRaisesRegex(CommandException, 'could not be removed'):
+      self._RunCommand('rm', ['gs://%s/a' % _BUCKET, 'gs://%s/missing' % _BUCKET])
+    self.assertEqual([], self._ObjectNames())
+
+  def test_stat_prefetches_metadata_asynchronously(self):
+    self._Upload('a', b'x')
+    self._Upload('b', b'yy')
+    self.assertEqual(
+        0, self._RunCommand('stat', ['gs://%s/a' % _BUCKET, 'gs://%s/b' % _BUCKET]))
+    self.assertEqual(2, len(self.async_gets))
+    self.assertEqual(
+        1,
+        self._RunCommand('stat',
+                         ['gs://%s/a' % _BUCKET,
+                          'gs://%s/missing' % _BUCKET]))
+    self.assertEqual(4, len(self.async_gets))
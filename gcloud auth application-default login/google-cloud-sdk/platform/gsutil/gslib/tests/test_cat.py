@@ -22,6 +22,8 @@ from __future__ import unicode_literals
 import os
 import sys
 
+import six
+
 from gslib.cs_api_map import ApiSelector
 from gslib.exception import NO_URLS_MATCHED_TARGET
 import gslib.tests.testcase as testcase
@@ -292,3 +294,47 @@ class TestCatHelper(testcase.GsUtilUnitTestCase):
                   [mock_part_one, mock_part_two])
     self.assertIn(write_flush_collector_mock.call_args_list[2:4],
                   [mock_part_one, mock_part_two])
+
+  def test_sliced_cat_writes_ranges_in_order(self):
+    contents = b''.join(b'%04d' % i for i in range(250))
+    bucket_uri = self.CreateBucket(bucket_name='sliced-cat-bucket',
+                                   provider=self.default_provider)
+    self.CreateObject(bucket_uri=bucket_uri,
+                      object_name='foo',
+                      contents=contents)
+    cat_command_mock = mock.Mock(user_project=None)
+    requested_ranges = []
+
+    def _FakeGetObjectMedia(unused_bucket_name, unused_object_name,
+                            download_stream, start_byte=0, end_byte=None,
+                            **unused_kwargs):
+      requested_ranges.append((start_byte, end_byte))
+      download_stream.write(contents[start_byte:end_byte + 1])
+
+    cat_command_mock.gsutil_api.GetObjectMedia.side_effect = (
+        _FakeGetObjectMedia)
+    boto_config = [
+        ('GSUtil', 'sliced_object_cat_threshold', '1'),
+        ('GSUtil', 'sliced_object_cat_component_size', '64'),
+        ('GSUtil', 'sliced_object_cat_max_components', '3'),
+    ]
+    with SetBotoConfigForTest(boto_config), mock.patch.object(
+        cat_helper,
+        'CloudApiDelegator',
+        return_value=cat_command_mock.gsutil_api):
+      for start_byte, end_byte, expected in ((0, None, contents),
+                                             (100, 599, contents[100:600]),
+                                             (900, None, contents[900:]),
+                                             (-130, None, contents[-130:])):
+        cat_command_mock.WildcardIterator.return_value = (
+            self._test_wildcard_iterator('gs://sliced-cat-bucket/foo'))
+        del requested_ranges[:]
+        out = six.BytesIO()
+        cat_helper.CatHelper(cat_command_mock).CatUrlStrings(
+            ['gs://sliced-cat-bucket/foo'],
+            start_byte=start_byte,
+            end_byte=end_byte,
+            cat_out_fd=out)
+        self.assertEqual(expected, out.getvalue())
+        self.assertEqual(
+            (len(expected) + 63) // 64, len(requested_ranges))
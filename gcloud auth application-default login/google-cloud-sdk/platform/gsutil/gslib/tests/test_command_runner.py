@@ -21,6 +21,7 @@ from __future__ import unicode_literals
 
 import logging
 import os
+import pkgutil
 import time
 
 import six
@@ -32,9 +33,12 @@ import gslib
 from gslib import command_runner
 from gslib.command import Command
 from gslib.command_argument import CommandArgument
+from gslib.command_registry import COMMAND_NAMES_BY_MODULE
+from gslib.command_registry import LazyCommandMap
 from gslib.command_runner import CommandRunner
 from gslib.command_runner import HandleArgCoding
 from gslib.command_runner import HandleHeaderCoding
+import gslib.commands
 from gslib.exception import CommandException
 from gslib.tab_complete import CloudObjectCompleter
 from gslib.tab_complete import CloudOrLocalObjectCompleter
@@ -44,10 +48,15 @@ from gslib.tab_complete import NoOpCompleter
 import gslib.tests.testcase as testcase
 import gslib.tests.util as util
 from gslib.tests.util import ARGCOMPLETE_AVAILABLE
+from gslib.tests.util import ObjectToURI as suri
 from gslib.tests.util import SetBotoConfigForTest
 from gslib.tests.util import unittest
 from gslib.utils import system_util
 from gslib.utils.constants import GSUTIL_PUB_TARBALL
+from gslib.utils.import_profile import FormatImportProfile
+from gslib.utils.import_profile import ImportTiming
+from gslib.utils.import_profile import ParseImportTimes
+from gslib.utils.import_profile import ProfileImports
 from gslib.utils.text_util import InsistAscii
 from gslib.utils.unit_util import SECONDS_PER_DAY
 
@@ -482,6 +491,92 @@ class TestCommandRunnerUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
       HandleHeaderCoding(headers)
 
 
+class TestLazyCommandMap(testcase.unit_testcase.GsUtilUnitTestCase):
+  """Unit tests for lazy loading of command modules."""
+
+  def test_registry_matches_command_specs(self):
+    for _, module_name, _ in pkgutil.iter_modules(gslib.commands.__path__):
+      __import__('gslib.commands.%s' % module_name)
+    names_by_module = {}
+    for command in Command.__subclasses__():
+      if command.__module__.startswith('gslib.commands.'):
+        names_by_module[command.__module__[len('gslib.commands.'):]] = (
+            (command.command_spec.command_name,) +
+            tuple(command.command_spec.command_name_aliases))
+    self.assertEqual(names_by_module, COMMAND_NAMES_BY_MODULE)
+
+  def test_lookup_by_alias(self):
+    command_map = LazyCommandMap()
+    self.assertIn('copy', command_map)
+    self.assertEqual('cp', command_map['copy'].command_spec.command_name)
+    self.assertIs(command_map['copy'], command_map['cp'])
+
+  def test_unregistered_command_loads_all_modules(self):
+    command_map = LazyCommandMap({'stat': ('stat',)})
+    self.assertEqual(['stat'], list(command_map))
+    self.assertIn('ls', command_map)
+    self.assertEqual('ls', command_map['ls'].command_spec.command_name)
+    self.assertNotIn('notacommand', command_map)
+    with self.assertRaises(KeyError):
+      command_map['notacommand']  # pylint: disable=pointless-statement
+
+  def test_parallel_command_without_config_module_imported(self):
+    """Tests -m with a command whose module doesn't import the config module.
+
+    Default process and thread counts are defined in gslib.commands.config,
+    which is only imported as a side effect of loading some commands.
+    """
+    bucket_uri = self.CreateBucket(test_objects=['f0', 'f1'])
+    # Like a gsutil process running rm, the runner only knows about rm.
+    command_runner = CommandRunner(
+        bucket_storage_uri_class=self.mock_bucket_storage_uri,
+        gsutil_api_class_map_factory=self.mock_gsutil_api_class_map_factory,
+        command_map={'rm': self.command_runner.command_map['rm']})
+    config_module = sys.modules.pop('gslib.commands.config', None)
+    if config_module:
+      delattr(gslib.commands, 'config')
+    try:
+      with SetBotoConfigForTest([('GSUtil', 'parallel_process_count', '1'),
+                                 ('GSUtil', 'parallel_thread_count', '2')]):
+        command_runner.RunNamedCommand(
+            'rm', [suri(bucket_uri, 'f0'),
+                   suri(bucket_uri, 'f1')],
+            skip_update_check=True,
+            parallel_operations=True,
+            do_shutdown=False)
+    finally:
+      if config_module:
+        sys.modules['gslib.commands.config'] = config_module
+        gslib.commands.config = config_module
+    self.assertEqual([], list(bucket_uri.list_bucket()))
+
+  def test_only_invoked_command_module_is_imported(self):
+    timings = ProfileImports(['version'])
+    self.assertIn('gslib.__main__', [timing.module for timing in timings])
+    self.assertIn('Command modules imported: version\n',
+                  FormatImportProfile(timings) + '\n')
+
+  def test_format_import_profile(self):
+    timings = ParseImportTimes('\n'.join([
+        'import time: self [us] | cumulative | imported package',
+        'import time:       100 |        100 |     gslib.commands.b',
+        'import time:       200 |        300 |   gslib.commands.a',
+        'import time:      1000 |       1300 | gslib.__main__',
+        'import time:        50 |         50 | re',
+        'unrelated output',
+    ]))
+    self.assertEqual(
+        ImportTiming('gslib.commands.b', 100, 100, 2), timings[0])
+    self.assertEqual(ImportTiming('re', 50, 50, 0), timings[3])
+    report = FormatImportProfile(timings, num_modules=1)
+    self.assertIn('Imported 4 modules in 1.4 ms.', report)
+    self.assertIn('Slowest top-level imports, including the modules they '
+                  'import:\n        1.3 ms  gslib.__main__\n\n', report)
+    self.assertIn('Slowest modules, excluding the modules they import:\n'
+                  '        1.0 ms  gslib.__main__\n\n', report)
+    self.assertIn('Command modules imported: a, b', report)
+
+
 class TestCommandRunnerIntegrationTests(testcase.GsUtilIntegrationTestCase):
   """Integration tests for gsutil update check in command_runner module."""
 
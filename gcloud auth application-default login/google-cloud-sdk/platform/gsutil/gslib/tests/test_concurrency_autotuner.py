@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for gslib.concurrency_autotuner."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import threading
+import time
+
+from apitools.base.py import exceptions as apitools_exceptions
+
+from gslib import concurrency_autotuner
+from gslib.concurrency_autotuner import AutotunerGroup
+from gslib.concurrency_autotuner import AutotuneSample
+from gslib.concurrency_autotuner import ConcurrencyAutotuner
+from gslib.concurrency_autotuner import ConcurrencyLimiter
+from gslib.concurrency_autotuner import RecordBytesProcessed
+from gslib.concurrency_autotuner import RecordRetryableError
+from gslib.concurrency_autotuner import SetThreadConcurrencyLimiter
+import gslib.tests.testcase as testcase
+
+
+def _HttpError(status):
+  return apitools_exceptions.HttpError({'status': status}, b'', 'url')
+
+
+class TestConcurrencyLimiter(testcase.GsUtilUnitTestCase):
+  """Unit tests for ConcurrencyLimiter."""
+
+  def testAcquireRespectsLimit(self):
+    limiter = ConcurrencyLimiter(2, 1, 4)
+    self.assertTrue(limiter.acquire(blocking=False))
+    self.assertTrue(limiter.acquire(blocking=False))
+    self.assertFalse(limiter.acquire(blocking=False))
+    limiter.release()
+    self.assertTrue(limiter.acquire(blocking=False))
+
+  def testSetLimitClamps(self):
+    limiter = ConcurrencyLimiter(10, 1, 4)
+    self.assertEqual(4, limiter.limit)
+    self.assertEqual(1, limiter.SetLimit(0))
+    self.assertEqual(4, limiter.SetLimit(100))
+    self.assertEqual(3, limiter.SetLimit(3))
+
+  def testRaisingLimitWakesWaiters(self):
+    limiter = ConcurrencyLimiter(1, 1, 2)
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def _Acquire():
+      limiter.acquire()
+      acquired.set()
+
+    thread = threading.Thread(target=_Acquire)
+    thread.daemon = True
+    thread.start()
+    self.assertFalse(acquired.wait(0.1))
+    limiter.SetLimit(2)
+    self.assertTrue(acquired.wait(5))
+
+  def testTakeUsageSample(self):
+    limiter = ConcurrencyLimiter(2, 1, 2)
+    limiter.acquire()
+    time.sleep(0.05)
+    limiter.release()
+    elapsed, utilization, releases = limiter.TakeUsageSample()
+    self.assertGreater(elapsed, 0)
+    # One of two permits was held for nearly the whole sample.
+    self.assertGreater(utilization, 0.25)
+    self.assertLessEqual(utilization, 0.5 + 1e-6)
+    self.assertEqual(1, releases)
+    # Counters reset after each sample.
+    _, utilization, releases = limiter.TakeUsageSample()
+    self.assertEqual(0, utilization)
+    self.assertEqual(0, releases)
+
+
+class TestConcurrencyAutotuner(testcase.GsUtilUnitTestCase):
+  """Unit tests for ConcurrencyAutotuner's adjustment policy."""
+
+  def _Autotuner(self, limit, max_limit=32):
+    return ConcurrencyAutotuner(ConcurrencyLimiter(limit, 1, max_limit))
+
+  def testGrowsWhileThroughputImproves(self):
+    autotuner = self._Autotuner(8)
+    self.assertEqual(10, autotuner.Adjust(AutotuneSample(100, 1.0, 0)))
+    self.assertEqual(12, autotuner.Adjust(AutotuneSample(150, 1.0, 0)))
+    self.assertEqual(15, autotuner.Adjust(AutotuneSample(200, 1.0, 0)))
+
+  def testReversesWhenThroughputDrops(self):
+    autotuner = self._Autotuner(8)
+    autotuner.Adjust(AutotuneSample(100, 1.0, 0))
+    self.assertEqual(8, autotuner.Adjust(AutotuneSample(50, 1.0, 0)))
+
+  def testHoldsOnPlateauThenProbes(self):
+    autotuner = self._Autotuner(8)
+    limit = autotuner.Adjust(AutotuneSample(100, 1.0, 0))
+    for _ in range(concurrency_autotuner._PLATEAU_SAMPLES_BEFORE_PROBE - 1):
+      self.assertEqual(limit, autotuner.Adjust(AutotuneSample(100, 1.0, 0)))
+    self.assertGreater(autotuner.Adjust(AutotuneSample(100, 1.0, 0)), limit)
+
+  def testHoldsWhenStarvedForTasks(self):
+    autotuner = self._Autotuner(8)
+    self.assertEqual(8, autotuner.Adjust(AutotuneSample(100, 0.3, 0)))
+    self.assertEqual(8, autotuner.Adjust(AutotuneSample(200, 0.3, 0)))
+
+  def testBacksOffWhenThrottled(self):
+    autotuner = self._Autotuner(8)
+    self.assertEqual(6, autotuner.Adjust(AutotuneSample(100, 1.0, 3)))
+    self.assertEqual(4, autotuner.Adjust(AutotuneSample(100, 1.0, 1)))
+    # After throttling stops, the autotuner continues probing downward until
+    # throughput drops.
+    self.assertEqual(3, autotuner.Adjust(AutotuneSample(100, 1.0, 0)))
+    self.assertEqual(2, autotuner.Adjust(AutotuneSample(120, 1.0, 0)))
+    self.assertEqual(3, autotuner.Adjust(AutotuneSample(60, 1.0, 0)))
+
+  def testNeverLeavesBounds(self):
+    autotuner = self._Autotuner(2, max_limit=3)
+    for throughput in range(1, 10):
+      self.assertLessEqual(
+          autotuner.Adjust(AutotuneSample(throughput * 100, 1.0, 0)), 3)
+    for _ in range(10):
+      self.assertGreaterEqual(autotuner.Adjust(AutotuneSample(100, 1.0, 5)),
+                              1)
+
+  def testRecordRetryableErrorCountsThrottling(self):
+    autotuner = self._Autotuner(8)
+    SetThreadConcurrencyLimiter(autotuner.limiter)
+    try:
+      RecordRetryableError(_HttpError(429))
+      RecordRetryableError(_HttpError(503))
+      RecordRetryableError(_HttpError(500))
+      RecordRetryableError(IOError('not an HTTP error'))
+    finally:
+      SetThreadConcurrencyLimiter(None)
+    autotuner.limiter.acquire()
+    autotuner.limiter.release()
+    sample = autotuner._TakeSample()
+    self.assertEqual(2, sample.throttled_requests)
+
+  def testTransfersAreCountedPerPool(self):
+    autotuners = [self._Autotuner(8), self._Autotuner(8)]
+
+    def _Transfer(limiter, num_bytes):
+      SetThreadConcurrencyLimiter(limiter)
+      RecordBytesProcessed(num_bytes)
+      RecordRetryableError(_HttpError(429))
+
+    for autotuner, num_bytes in zip(autotuners, (100, 5000)):
+      thread = threading.Thread(target=_Transfer,
+                                args=(autotuner.limiter, num_bytes))
+      thread.start()
+      thread.join()
+    # Transfers by threads outside of any pool aren't counted.
+    RecordBytesProcessed(7)
+    self.assertEqual((100, 1), autotuners[0].limiter.counters.Snapshot())
+    self.assertEqual((5000, 1), autotuners[1].limiter.counters.Snapshot())
+
+  def testStop(self):
+    autotuner = ConcurrencyAutotuner(ConcurrencyLimiter(2, 1, 4),
+                                     interval=0.01)
+    autotuner.start()
+    autotuner.Stop()
+    self.assertFalse(autotuner.is_alive())
+
+
+class TestAutotunerGroup(testcase.GsUtilUnitTestCase):
+  """Unit tests for AutotunerGroup."""
+
+  def _RunningAutotuners(self):
+    return [
+        thread for thread in threading.enumerate()
+        if isinstance(thread, ConcurrencyAutotuner)
+    ]
+
+  def testStartAndStop(self):
+    group = AutotunerGroup()
+    running_before = len(self._RunningAutotuners())
+    group.Add(ConcurrencyLimiter(2, 1, 4))
+    self.assertEqual(running_before, len(self._RunningAutotuners()))
+    group.Start(None)
+    # Limiters added while the group is running are autotuned at once.
+    group.Add(ConcurrencyLimiter(2, 1, 4))
+    self.assertEqual(running_before + 2, len(self._RunningAutotuners()))
+    group.Stop()
+    self.assertEqual(running_before, len(self._RunningAutotuners()))
+    # Stopped autotuners are replaced when the group is started again.
+    group.Start(None)
+    self.assertEqual(running_before + 2, len(self._RunningAutotuners()))
+    group.Stop()
+    self.assertEqual(running_before, len(self._RunningAutotuners()))
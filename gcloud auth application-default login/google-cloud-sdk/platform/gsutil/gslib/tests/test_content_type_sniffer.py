@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for content_type_sniffer module."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import gzip
+import os
+
+import gslib.tests.testcase as testcase
+from gslib.utils.content_type_sniffer import EMPTY_CONTENT_TYPE
+from gslib.utils.content_type_sniffer import SNIFF_HEADER_SIZE
+from gslib.utils.content_type_sniffer import SniffContentType
+from gslib.utils.content_type_sniffer import SniffFileContentType
+
+
+class TestContentTypeSniffer(testcase.GsUtilUnitTestCase):
+  """Unit tests for content type detection."""
+
+  def testBinarySignatures(self):
+    cases = [
+        (b'\x89PNG\r\n\x1a\n\x00\x00', 'a', 'image/png'),
+        (b'GIF89a\x01\x00', 'a.txt', 'image/gif'),
+        (b'\xff\xd8\xff\xe0\x00\x10JFIF', 'a', 'image/jpeg'),
+        (b'RIFF\x00\x00\x00\x00WEBPVP8 ', 'a', 'image/webp'),
+        (b'\x00\x00\x00\x1cftypisom', 'a', 'video/mp4'),
+        (b'\x00\x00\x00\x1cftypM4A ', 'a', 'audio/x-m4a'),
+        (gzip.compress(b'x'), 'a.tgz', 'application/gzip'),
+        (b'PK\x03\x04\x14\x00', 'a.zip', 'application/zip'),
+        (b'PK\x03\x04\x14\x00', 'a.jar', 'application/java-archive'),
+        (b'\x7fELF\x02\x01\x01' + b'\x00' * 9 + b'\x03\x00', 'a',
+         'application/x-sharedlib'),
+        (b'\x00' * 257 + b'ustar\x0000', 'a', 'application/x-tar'),
+    ]
+    for header, name, content_type in cases:
+      self.assertEqual('%s; charset=binary' % content_type,
+                       SniffContentType(header, name))
+
+  def testText(self):
+    cases = [
+        (b'just some text\n', 'a', 'text/plain; charset=us-ascii'),
+        ('caf\xe9\n'.encode('utf-8'), 'a', 'text/plain; charset=utf-8'),
+        ('caf\xe9\n'.encode('latin-1'), 'a', 'text/plain; charset=iso-8859-1'),
+        (b'  <!DOCTYPE html><p>hi', 'a.txt', 'text/html; charset=us-ascii'),
+        (b'<html><body>hi</body></html>', 'a', 'text/html; charset=us-ascii'),
+        (b'<?xml version="1.0"?><svg xmlns="x"/>', 'a',
+         'image/svg+xml; charset=us-ascii'),
+        (b'<?xml version="1.0"?><feed/>', 'a', 'text/xml; charset=us-ascii'),
+        (b'{"a": [1, 2]}\n', 'a', 'application/json; charset=us-ascii'),
+        (b'#!/usr/bin/env python3\n', 'a',
+         'text/x-script.python; charset=us-ascii'),
+        # Text with no type in its contents is typed by a text extension.
+        (b'body { color: red; }\n', 'a.css', 'text/css; charset=us-ascii'),
+        (b'body { color: red; }\n', 'a.bin', 'text/plain; charset=us-ascii'),
+    ]
+    for header, name, content_type in cases:
+      self.assertEqual(content_type, SniffContentType(header, name))
+
+  def testBinaryData(self):
+    self.assertEqual('application/octet-stream; charset=binary',
+                     SniffContentType(b'\x00\x01\x02\x03text', 'a.txt'))
+    self.assertEqual('image/bmp; charset=binary',
+                     SniffContentType(b'BM\x00\x00\x01', 'a'))
+    # Weak signatures don't apply to text.
+    self.assertEqual('text/plain; charset=us-ascii',
+                     SniffContentType(b'BMW\n', 'a'))
+    self.assertEqual(EMPTY_CONTENT_TYPE, SniffContentType(b'', 'a'))
+
+  def testTruncatedText(self):
+    # A multi-byte character cut off at the end of the header is still text.
+    header = b'a' * (SNIFF_HEADER_SIZE - 1) + '\xe9'.encode('utf-8')[:1]
+    self.assertEqual('text/plain; charset=utf-8',
+                     SniffContentType(header, 'a'))
+    # So is ASCII text that might continue with other characters.
+    self.assertEqual('text/plain; charset=utf-8',
+                     SniffContentType(b'a' * SNIFF_HEADER_SIZE, 'a'))
+
+  def testSniffFileContentTypeRestoresPosition(self):
+    path = self.CreateTempFile(file_name='page',
+                               contents=b'<html><body></body></html>')
+    self.assertEqual('text/html; charset=us-ascii', SniffFileContentType(path))
+    with open(path, 'rb') as fp:
+      fp.seek(3)
+      self.assertEqual('text/html; charset=us-ascii',
+                       SniffFileContentType(path, fp=fp))
+      self.assertEqual(3, fp.tell())
+
+  def testMatchesTestData(self):
+    test_data = os.path.join(os.path.dirname(__file__), 'test_data')
+    for name, content_type in (
+        ('test.gif', 'image/gif; charset=binary'),
+        ('test.mp3', 'audio/mpeg; charset=binary'),
+        ('favicon.ico.gz', 'application/gzip; charset=binary'),
+        ('test.json', 'application/json; charset=us-ascii'),
+        ('test.p12', 'application/octet-stream; charset=binary'),
+    ):
+      self.assertEqual(content_type,
+                       SniffFileContentType(os.path.join(test_data, name)))
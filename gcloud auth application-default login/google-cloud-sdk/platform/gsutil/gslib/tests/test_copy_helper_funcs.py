@@ -20,10 +20,15 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import collections
+import csv
 import datetime
+import gzip
+import io
 import logging
 import os
+import pickle
 import pyu2f
+import threading
 from apitools.base.py import exceptions as apitools_exceptions
 
 from gslib.bucket_listing_ref import BucketListingObject
@@ -50,13 +55,21 @@ from gslib.utils import parallelism_framework_util
 from gslib.utils import posix_util
 from gslib.utils import system_util
 from gslib.utils import hashing_helper
+from gslib.utils.boto_util import ResumableThreshold
 from gslib.utils.copy_helper import _CheckCloudHashes
 from gslib.utils.copy_helper import _DelegateUploadFileToObject
+from gslib.utils.copy_helper import _GetAdaptivePartitionInfo
 from gslib.utils.copy_helper import _GetPartitionInfo
 from gslib.utils.copy_helper import _SelectUploadCompressionStrategy
 from gslib.utils.copy_helper import _SetContentTypeFromFile
+from gslib.utils.copy_helper import _ShouldStreamZippedUploadCompression
+from gslib.utils.copy_helper import ADAPTIVE_COMPONENTS_PER_WORKER
+from gslib.utils.copy_helper import ADAPTIVE_MIN_COMPONENT_SECONDS
+from gslib.utils.copy_helper import ADAPTIVE_MIN_COMPONENT_SIZE
 from gslib.utils.copy_helper import ExpandUrlToSingleBlr
+from gslib.utils.copy_helper import Manifest
 from gslib.utils.copy_helper import FilterExistingComponents
+from gslib.utils.copy_helper import GunzipDownloadFileWrapper
 from gslib.utils.copy_helper import GZIP_ALL_FILES
 from gslib.utils.copy_helper import PerformParallelUploadFileToObjectArgs
 from gslib.utils.copy_helper import WarnIfMvEarlyDeletionChargeApplies
@@ -111,6 +124,52 @@ class TestCpFuncs(GsUtilUnitTestCase):
     self.assertEqual(2, num_components)
     self.assertEqual(50, component_size)
 
+  def testGetAdaptivePartitionInfo(self):
+    """Tests the _GetAdaptivePartitionInfo function."""
+    mib = 1024 * 1024
+    # Components per worker take precedence over the default component size.
+    (num_components, component_size) = _GetAdaptivePartitionInfo(
+        1024 * mib, 1000, 512 * mib, 8)
+    self.assertEqual(8 * ADAPTIVE_COMPONENTS_PER_WORKER, num_components)
+    self.assertEqual(32 * mib, component_size)
+
+    # Components are never larger than the default component size.
+    (num_components, component_size) = _GetAdaptivePartitionInfo(
+        1024 * mib, 1000, 16 * mib, 1)
+    self.assertEqual(64, num_components)
+    self.assertEqual(16 * mib, component_size)
+    # Including when the file size is not a multiple of the component size
+    # and the minimum component size is the default component size.
+    (num_components, component_size) = _GetAdaptivePartitionInfo(
+        100, 1000, 30, 8)
+    self.assertEqual(4, num_components)
+    self.assertEqual(25, component_size)
+
+    # Components are never smaller than the minimum component size.
+    (num_components, component_size) = _GetAdaptivePartitionInfo(
+        64 * mib, 1000, 512 * mib, 100)
+    self.assertEqual(64 * mib // ADAPTIVE_MIN_COMPONENT_SIZE, num_components)
+    self.assertEqual(ADAPTIVE_MIN_COMPONENT_SIZE, component_size)
+
+    # Observed bandwidth raises the minimum component size.
+    (num_components, component_size) = _GetAdaptivePartitionInfo(
+        1024 * mib,
+        1000,
+        512 * mib,
+        100,
+        stream_bandwidth=64 * mib / ADAPTIVE_MIN_COMPONENT_SECONDS)
+    self.assertEqual(16, num_components)
+    self.assertEqual(64 * mib, component_size)
+
+    # The maximum number of components still applies, as does the minimum of 2.
+    (num_components, _) = _GetAdaptivePartitionInfo(1024 * mib, 4, 512 * mib,
+                                                    8)
+    self.assertEqual(4, num_components)
+    (num_components, component_size) = _GetAdaptivePartitionInfo(
+        mib, 1000, 512 * mib, 8)
+    self.assertEqual(2, num_components)
+    self.assertEqual(mib // 2, component_size)
+
   def testFilterExistingComponentsNonVersioned(self):
     """Tests upload with a variety of component states."""
     mock_api = MockCloudApi()
@@ -502,6 +561,33 @@ class TestCpFuncs(GsUtilUnitTestCase):
       _SetContentTypeFromFile(src_url_stub, dst_obj_metadata_mock)
     self.assertEqual('text/plain', dst_obj_metadata_mock.contentType)
 
+  def testSetContentTypeFromFileUsesListingAndOpenStream(self):
+    """Tests that content detection reuses listing results and open files."""
+    file_path = self.CreateTempFile(file_name='page', contents=b'<html></html>')
+    src_url_stub = mock.MagicMock(object_name=file_path)
+    src_url_stub.IsFileUrl.return_value = True
+    src_url_stub.IsStream.return_value = False
+    src_url_stub.IsFifo.return_value = False
+
+    with SetBotoConfigForTest([('GSUtil', 'use_magicfile', 'True')]):
+      # A content type detected while listing is used as is.
+      dst_obj_metadata_mock = mock.MagicMock(contentType=None)
+      _SetContentTypeFromFile(
+          src_url_stub,
+          dst_obj_metadata_mock,
+          src_obj_metadata=apitools_messages.Object(contentType='image/png'))
+      self.assertEqual('image/png', dst_obj_metadata_mock.contentType)
+
+      # Otherwise the open stream is read and left where it was.
+      dst_obj_metadata_mock = mock.MagicMock(contentType=None)
+      with open(file_path, 'rb') as fp:
+        _SetContentTypeFromFile(src_url_stub,
+                                dst_obj_metadata_mock,
+                                src_obj_filestream=fp)
+        self.assertEqual(0, fp.tell())
+      self.assertEqual('text/html; charset=us-ascii',
+                       dst_obj_metadata_mock.contentType)
+
   def testSetsContentTypesForCommonFileExtensionsCorrectly(self):
     extension_rules = copy_helper.COMMON_EXTENSION_RULES.items()
     for extension, expected_content_type in extension_rules:
@@ -627,6 +713,59 @@ class TestCpFuncs(GsUtilUnitTestCase):
     self.assertFalse(zipped)
     self.assertTrue(gzip_encoded)
 
+  def testShouldStreamZippedUploadCompression(self):
+    src_url = StorageUrlFromString(self.CreateTempFile())
+    dst_url = StorageUrlFromString('gs://bucket/obj')
+    size = ResumableThreshold()
+    json_api = mock.Mock()
+    json_api.GetApiSelector.return_value = 'JSON'
+    xml_api = mock.Mock()
+    xml_api.GetApiSelector.return_value = 'XML'
+    self.assertTrue(
+        _ShouldStreamZippedUploadCompression(src_url, dst_url, size, json_api,
+                                             False))
+    # Small files are sent in a single request, which needs a known size.
+    self.assertFalse(
+        _ShouldStreamZippedUploadCompression(src_url, dst_url, size - 1,
+                                             json_api, False))
+    # The compressed stream cannot be split into components.
+    self.assertFalse(
+        _ShouldStreamZippedUploadCompression(src_url, dst_url, size, json_api,
+                                             True))
+    # Streaming uploads of unknown size are only resumable via JSON.
+    self.assertFalse(
+        _ShouldStreamZippedUploadCompression(src_url, dst_url, size, xml_api,
+                                             False))
+    with SetBotoConfigForTest([('GSUtil', 'parallel_gzip_thread_count', '0')
+                              ]):
+      self.assertFalse(
+          _ShouldStreamZippedUploadCompression(src_url, dst_url, size,
+                                               json_api, False))
+
+  def testGunzipDownloadFileWrapper(self):
+    contents = os.urandom(1000) + b'x' * (3 * 1024 * 1024)
+    compressed = gzip.compress(contents[:500]) + gzip.compress(contents[500:])
+    out = io.BytesIO()
+    wrapper = GunzipDownloadFileWrapper(out, 'file')
+    for i in range(0, len(compressed), 7):
+      wrapper.write(compressed[i:i + 7])
+      # Positions are in the compressed stream, for resuming downloads.
+      self.assertEqual(min(i + 7, len(compressed)), wrapper.tell())
+    # Zero padding after the last member is ignored, as by gzip.open.
+    wrapper.write(b'\0' * 4)
+    wrapper.Finish()
+    self.assertEqual(contents, out.getvalue())
+
+  def testGunzipDownloadFileWrapperRaisesOnBadStream(self):
+    compressed = gzip.compress(b'abc' * 1000)
+    wrapper = GunzipDownloadFileWrapper(io.BytesIO(), 'file')
+    wrapper.write(compressed[:-10])
+    with self.assertRaisesRegex(CommandException, 'truncated'):
+      wrapper.Finish()
+    wrapper = GunzipDownloadFileWrapper(io.BytesIO(), 'file')
+    with self.assertRaisesRegex(CommandException, 'could not be uncompressed'):
+      wrapper.write(b'not gzip')
+
   def testDelegateUploadFileToObjectNormal(self):
     mock_stream = mock.Mock()
     mock_stream.close = mock.Mock()
@@ -871,3 +1010,128 @@ class TestExpandUrlToSingleBlr(GsUtilUnitTestCase):
                         dst_url=None,
                         src_obj_metadata=FakeObject(md5Hash='a'),
                         dst_obj_metadata=FakeObject(md5Hash='b'))
+
+
+class TestManifest(GsUtilUnitTestCase):
+  """Unit tests for the cp -L manifest."""
+
+  def _ReadRows(self, manifest_path):
+    with open(manifest_path, 'r', newline='') as f:
+      return list(csv.reader(f))
+
+  def _Record(self, manifest, source, result):
+    manifest.Initialize(source, source + '-dst')
+    manifest.SetResult(source, 3, result)
+
+  def testResumesFromCompletedSources(self):
+    manifest_path = os.path.join(self.CreateTempDir(), 'manifest.csv')
+    manifest = Manifest(manifest_path)
+    self._Record(manifest, 'file://a', 'OK')
+    self._Record(manifest, 'file://b', 'error')
+    self._Record(manifest, 'file://c', 'skip')
+
+    rows = self._ReadRows(manifest_path)
+    self.assertEqual(4, len(rows))
+    self.assertEqual(['Source', 'Destination'], rows[0][:2])
+    self.assertEqual(['file://b', 'file://b-dst'], rows[2][:2])
+    self.assertEqual('error', rows[2][8])
+
+    manifest = Manifest(manifest_path)
+    self.assertTrue(manifest.WasSuccessful('file://a'))
+    self.assertFalse(manifest.WasSuccessful('file://b'))
+    self.assertTrue(manifest.WasSuccessful('file://c'))
+    self.assertFalse(manifest.WasSuccessful('file://d'))
+
+  def testIndexesOnlyAppendedRows(self):
+    manifest_path = os.path.join(self.CreateTempDir(), 'manifest.csv')
+    self._Record(Manifest(manifest_path), 'file://a', 'OK')
+    manifest = Manifest(manifest_path)
+    self.assertEqual(
+        (os.stat(manifest_path).st_ino, os.path.getsize(manifest_path)),
+        manifest.index.GetState()[:2])
+    self._Record(manifest, 'file://b', 'OK')
+    # Results of this run are only indexed by the next one.
+    self.assertFalse(manifest.WasSuccessful('file://b'))
+
+    manifest = Manifest(manifest_path)
+    self.assertTrue(manifest.WasSuccessful('file://a'))
+    self.assertTrue(manifest.WasSuccessful('file://b'))
+    self.assertEqual(os.path.getsize(manifest_path),
+                     manifest.index.GetState()[1])
+
+  def testRebuildsIndexForReplacedManifest(self):
+    tmpdir = self.CreateTempDir()
+    manifest_path = os.path.join(tmpdir, 'manifest.csv')
+    self._Record(Manifest(manifest_path), 'file://a', 'OK')
+    replacement = os.path.join(tmpdir, 'replacement.csv')
+    with open(replacement, 'w', newline='') as f:
+      writer = csv.writer(f)
+      writer.writerow(['Source', 'Result'])
+      writer.writerow(['file://b', 'OK'])
+    os.rename(replacement, manifest_path)
+
+    manifest = Manifest(manifest_path)
+    self.assertFalse(manifest.WasSuccessful('file://a'))
+    self.assertTrue(manifest.WasSuccessful('file://b'))
+
+  def testRebuildsIndexForManifestRewrittenInPlace(self):
+    manifest_path = os.path.join(self.CreateTempDir(), 'manifest.csv')
+    self._Record(Manifest(manifest_path), 'file://a', 'OK')
+    self.assertTrue(Manifest(manifest_path).WasSuccessful('file://a'))
+    with open(manifest_path, 'r+', newline='') as f:
+      contents = f.read()
+      f.seek(0)
+      f.write(contents.replace('file://a', 'file://x'))
+    inode = os.stat(manifest_path).st_ino
+
+    manifest = Manifest(manifest_path)
+    self.assertEqual(inode, manifest.index.GetState()[0])
+    self.assertFalse(manifest.WasSuccessful('file://a'))
+    self.assertTrue(manifest.WasSuccessful('file://x'))
+
+  def testIgnoresIncompleteLastRow(self):
+    manifest_path = os.path.join(self.CreateTempDir(), 'manifest.csv')
+    with open(manifest_path, 'w', newline='') as f:
+      f.write('Source,Result\r\nfile://a,OK\r\nfile://b,OK')
+    manifest = Manifest(manifest_path)
+    self.assertTrue(manifest.WasSuccessful('file://a'))
+    self.assertFalse(manifest.WasSuccessful('file://b'))
+
+  def testCanBePickled(self):
+    # Command instances, including their manifest, are pickled when they are
+    # shared with other processes.
+    manifest_path = os.path.join(self.CreateTempDir(), 'manifest.csv')
+    self._Record(Manifest(manifest_path), 'file://a', 'OK')
+    original = Manifest(manifest_path)
+    manifest = pickle.loads(pickle.dumps(original))
+    self.assertTrue(manifest.WasSuccessful('file://a'))
+    self._Record(manifest, 'file://b', 'OK')
+    self.assertEqual(3, len(self._ReadRows(manifest_path)))
+
+  def testMissingHeadersRaises(self):
+    manifest_path = self.CreateTempFile(contents=b'file://a,OK\r\n')
+    with self.assertRaisesRegex(CommandException, 'Missing headers'):
+      Manifest(manifest_path)
+
+  def testConcurrentResultsAreWrittenWhole(self):
+    manifest_path = os.path.join(self.CreateTempDir(), 'manifest.csv')
+    manifest = Manifest(manifest_path)
+
+    def _RecordMany(thread_num):
+      for i in range(50):
+        self._Record(manifest, 'file://%d-%d' % (thread_num, i), 'OK')
+
+    threads = [
+        threading.Thread(target=_RecordMany, args=(n,)) for n in range(8)
+    ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    rows = self._ReadRows(manifest_path)[1:]
+    self.assertEqual(400, len(rows))
+    self.assertEqual(400, len(set(row[0] for row in rows)))
+    for row in rows:
+      self.assertEqual(10, len(row))
+      self.assertEqual(row[0] + '-dst', row[1])
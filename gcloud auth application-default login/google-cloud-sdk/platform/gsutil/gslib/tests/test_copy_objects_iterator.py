@@ -19,7 +19,10 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import pickle
+
 from gslib.commands.cp import DestinationInfo
+from gslib.name_expansion import CopyObjectInfo
 from gslib.name_expansion import CopyObjectsIterator
 from gslib.name_expansion import NameExpansionIteratorDestinationTuple
 from gslib.name_expansion import NameExpansionResult
@@ -53,6 +56,16 @@ class TestCopyObjectsIterator(testcase.GsUtilUnitTestCase):
   def setUp(self):
     super(TestCopyObjectsIterator, self).setUp()
 
+  def test_copy_object_info_pickles_compactly(self):
+    name_expansion_result = next(_ConstructNameExpansionIterator(['gs://b/o']))
+    copy_object_info = CopyObjectInfo(name_expansion_result,
+                                      StorageUrlFromString('dir/o'), True)
+    for task in (name_expansion_result, copy_object_info):
+      self.assertFalse(hasattr(task, '__dict__'))
+      unpickled = pickle.loads(pickle.dumps(task))
+      for name in type(task).__slots__:
+        self.assertEqual(getattr(task, name), getattr(unpickled, name))
+
   def test_iterator(self):
     src_strings_array = [
         ['src_{}_{}'.format(i, j) for j in range(4)] for i in range(3)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for running gsutil commands via a daemon."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import socket
+import subprocess
+import sys
+import unittest
+
+import six
+
+import gslib
+from gslib import daemon
+import gslib.tests.testcase as testcase
+from gslib.utils import copy_helper
+from gslib.utils import parallelism_framework_util
+from gslib.utils.constants import UTF8
+
+from six import add_move, MovedModule
+
+add_move(MovedModule('mock', 'mock', 'unittest.mock'))
+from six.moves import mock
+
+
+@unittest.skipUnless(daemon.DaemonSupported(),
+                     'The gsutil daemon is not supported on this platform.')
+class TestDaemon(testcase.GsUtilUnitTestCase):
+  """Unit tests for gslib.daemon."""
+
+  def _RunGsutil(self, args, env):
+    process = subprocess.Popen([sys.executable, gslib.GSUTIL_PATH] + args,
+                               stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               env=env)
+    stdout, stderr = process.communicate()
+    return (process.returncode, six.ensure_text(stdout, UTF8),
+            six.ensure_text(stderr, UTF8))
+
+  def test_config_environment_ignores_unrelated_variables(self):
+    self.assertEqual(
+        [('BOTO_CONFIG', '/a'), ('HOME', '/home/a')],
+        daemon._GetConfigEnvironment({
+            'BOTO_CONFIG': '/a',
+            'HOME': '/home/a',
+            'PWD': '/tmp',
+            daemon.DAEMON_SOCKET_ENV_VAR: '/tmp/socket',
+        }))
+
+  def test_message_round_trip_with_fds(self):
+    sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    read_fd, write_fd = os.pipe()
+    try:
+      daemon._SendMessage(sender, {'argv': ['gsutil', 'é']},
+                          fds=[read_fd, write_fd, write_fd])
+      message, fds = daemon._ReceiveMessage(receiver)
+      self.assertEqual({'argv': ['gsutil', 'é']}, message)
+      self.assertEqual(3, len(fds))
+      os.write(fds[1], b'x')
+      self.assertEqual(b'x', os.read(read_fd, 1))
+      for fd in fds:
+        os.close(fd)
+      sender.close()
+      self.assertEqual((None, []), daemon._ReceiveMessage(receiver))
+    finally:
+      receiver.close()
+      os.close(read_fd)
+      os.close(write_fd)
+
+  def test_peer_uid(self):
+    first, second = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    with first, second:
+      uid = daemon._GetPeerUid(first)
+    if uid is None:
+      self.skipTest('Peer credentials are not available on this platform.')
+    self.assertEqual(os.getuid(), uid)
+
+  def test_rejects_other_users(self):
+    client, server = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    gsutil_daemon = daemon.GsutilDaemon('unused', 0)
+    with client, server:
+      daemon._SendMessage(client, {'request': 'stop'})
+      with mock.patch.object(daemon,
+                             '_GetPeerUid',
+                             return_value=os.getuid() + 1):
+        gsutil_daemon._HandleConnection(server)
+      server.shutdown(socket.SHUT_WR)
+      self.assertEqual((None, []), daemon._ReceiveMessage(client))
+    self.assertFalse(gsutil_daemon._stopping)
+
+  def test_forked_commands_get_their_own_copy_state(self):
+    if not parallelism_framework_util.CheckMultiprocessingAvailableAndInit(
+    ).is_available:
+      self.skipTest('Multiprocessing is not available.')
+    names = ('open_files_map', 'open_files_lock', 'suggested_sliced_transfers',
+             'suggested_sliced_transfers_lock')
+    old_state = [getattr(copy_helper, name) for name in names]
+    old_manager = parallelism_framework_util.top_level_manager
+    copy_helper.open_files_map['file'] = True
+    try:
+      copy_helper.ReinitializeSharedState()
+      new_manager = parallelism_framework_util.top_level_manager
+      self.assertIsNot(old_manager, new_manager)
+      for name, old_value in zip(names, old_state):
+        self.assertIsNot(old_value, getattr(copy_helper, name))
+      self.assertIsNone(copy_helper.open_files_map.get('file'))
+      new_manager.shutdown()
+    finally:
+      parallelism_framework_util.top_level_manager = old_manager
+      for name, old_value in zip(names, old_state):
+        setattr(copy_helper, name, old_value)
+      copy_helper.open_files_map.delete('file')
+
+  def test_runs_locally_without_daemon(self):
+    socket_path = os.path.join(self.CreateTempDir(), 'daemon.sock')
+    with mock.patch.dict(os.environ,
+                         {daemon.DAEMON_SOCKET_ENV_VAR: socket_path}):
+      self.assertIsNone(daemon.RunCommandViaDaemon(['gsutil', 'version']))
+      self.assertIsNone(daemon.GetDaemonStatus(socket_path))
+      self.assertFalse(daemon.StopDaemon(socket_path))
+
+  def test_runs_commands_in_daemon(self):
+    socket_path = os.path.join(self.CreateTempDir(), 'daemon.sock')
+    env = dict(os.environ)
+    env[daemon.DAEMON_SOCKET_ENV_VAR] = socket_path
+    _, local_stdout, _ = self._RunGsutil(['version'], env)
+
+    self.assertEqual(0, self._RunGsutil(['daemon', 'start'], env)[0])
+    try:
+      self.assertEqual(
+          (0, local_stdout, ''), self._RunGsutil(['version'], env))
+      # A different configuration environment runs the command locally.
+      self.assertEqual((0, local_stdout, ''),
+                       self._RunGsutil(['version'],
+                                       dict(env, GSUTIL_DAEMON_TEST='1')))
+      self.assertEqual(1, daemon.GetDaemonStatus(socket_path)['commands_run'])
+      self.assertEqual(1, self._RunGsutil(['stat', 'nonexistent'], env)[0])
+      self.assertEqual(2, daemon.GetDaemonStatus(socket_path)['commands_run'])
+    finally:
+      self._RunGsutil(['daemon', 'stop'], env)
+    self.assertIsNone(daemon.GetDaemonStatus(socket_path))
+    self.assertFalse(os.path.exists(socket_path))
@@ -91,6 +91,27 @@ class TestDaisyChainWrapper(testcase.GsUtilUnitTestCase):
         download_stream.write(write_value)
         bytes_read += len(write_value)
 
+  class MockRangeDownloadCloudApi(gslib.cloud_api.CloudApi):
+    """Mock CloudApi that serves byte ranges of an object."""
+
+    def __init__(self, contents, write_size):
+      self._contents = contents
+      self._write_size = write_size
+      self.requested_ranges = []
+
+    def GetObjectMedia(self,
+                       unused_bucket_name,
+                       unused_object_name,
+                       download_stream,
+                       start_byte=0,
+                       end_byte=None,
+                       **kwargs):
+      self.requested_ranges.append((start_byte, end_byte))
+      end = len(self._contents) if end_byte is None else end_byte + 1
+      for offset in range(start_byte, end, self._write_size):
+        download_stream.write(
+            self._contents[offset:min(offset + self._write_size, end)])
+
   def _WriteFromWrapperToFile(self, daisy_chain_wrapper, file_path):
     """Writes all contents from the DaisyChainWrapper to the named file."""
     with open(file_path, 'wb') as upload_stream:
@@ -351,3 +372,45 @@ class TestDaisyChainWrapper(testcase.GsUtilUnitTestCase):
       self.fail('Expected exception')
     except IOError as e:
       self.assertIn('Invalid seek during daisy chain', str(e))
+
+  def testDownloadMultiStream(self):
+    """Tests downloading ranges concurrently through a small ring buffer."""
+    with open(self.test_data_file, 'rb') as stream:
+      contents = stream.read()
+    upload_file = self.CreateTempFile()
+    buffer_size = TRANSFER_BUFFER_SIZE * 3
+    for download_streams in (2, 3, 5):
+      mock_api = self.MockRangeDownloadCloudApi(contents,
+                                                TRANSFER_BUFFER_SIZE // 3)
+      daisy_chain_wrapper = DaisyChainWrapper(self._dummy_url,
+                                              len(contents),
+                                              mock_api,
+                                              buffer_size=buffer_size,
+                                              download_streams=download_streams)
+      self._WriteFromWrapperToFile(daisy_chain_wrapper, upload_file)
+      range_size = max(buffer_size // download_streams, TRANSFER_BUFFER_SIZE)
+      self.assertEqual(
+          sorted(mock_api.requested_ranges),
+          [(start, start + range_size - 1 if start + range_size < len(contents)
+            else None) for start in range(0, len(contents), range_size)])
+      with open(upload_file, 'rb') as upload_stream:
+        self.assertEqual(upload_stream.read(), contents)
+
+  def testRestartMultiStream(self):
+    """Tests seeking back past the buffer with concurrent range downloads."""
+    with open(self.test_data_file, 'rb') as stream:
+      contents = stream.read()
+    upload_file = self.CreateTempFile()
+    mock_api = self.MockRangeDownloadCloudApi(contents, TRANSFER_BUFFER_SIZE)
+    daisy_chain_wrapper = DaisyChainWrapper(
+        self._dummy_url,
+        len(contents),
+        mock_api,
+        buffer_size=TRANSFER_BUFFER_SIZE * 4,
+        download_streams=2)
+    for _ in range(5):
+      daisy_chain_wrapper.read(TRANSFER_BUFFER_SIZE)
+    daisy_chain_wrapper.seek(TRANSFER_BUFFER_SIZE)
+    self._WriteFromWrapperToFile(daisy_chain_wrapper, upload_file)
+    with open(upload_file, 'rb') as upload_stream:
+      self.assertEqual(upload_stream.read(), contents[TRANSFER_BUFFER_SIZE:])
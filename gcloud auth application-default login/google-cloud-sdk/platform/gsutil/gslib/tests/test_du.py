@@ -20,14 +20,22 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import os
+import time
 
+from gslib.bucket_listing_ref import BucketListingObject
+from gslib.commands.du import DuCommand
+from gslib.exception import CommandException
+from gslib.storage_url import StorageUrlFromString
 import gslib.tests.testcase as testcase
 from gslib.tests.testcase.integration_testcase import SkipForS3
 from gslib.tests.util import GenerationFromURI as urigen
 from gslib.tests.util import ObjectToURI as suri
+from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
 from gslib.utils.constants import UTF8
 from gslib.utils.retry_util import Retry
 
+from unittest import mock
+
 
 class TestDu(testcase.GsUtilIntegrationTestCase):
   """Integration tests for du command."""
@@ -292,3 +300,113 @@ class TestDu(testcase.GsUtilIntegrationTestCase):
           ]))
 
     _Check()
+
+
+class TestDuIndexUnit(testcase.GsUtilUnitTestCase):
+  """Unit tests for du with a prefix-size index."""
+
+  def setUp(self):
+    super(TestDuIndexUnit, self).setUp()
+    self.index_arg = '--index=%s' % os.path.join(self.CreateTempDir(),
+                                                 'sizes.db')
+    # Sizes of the objects in gs://bucket, by name.
+    self.object_sizes = {'a': 1, 'd1/b': 2, 'd1/d2/c': 3, 'd3/d': 4}
+
+  def _MockWildcardIterator(self, url_string, all_versions=False):
+    """Lists the objects in self.object_sizes under gs://bucket/prefix* or **."""
+    self.assertTrue(url_string.endswith('*'))
+    recursive = url_string.endswith('**')
+    prefix = StorageUrlFromString(url_string).object_name.rstrip('*')
+    iterator = mock.Mock()
+    iterator.IterObjects.return_value = [
+        BucketListingObject(StorageUrlFromString('gs://bucket/' + name),
+                            root_object=apitools_messages.Object(
+                                bucket='bucket', name=name, size=size))
+        for name, size in sorted(self.object_sizes.items())
+        if name.startswith(prefix) and (recursive or
+                                        '/' not in name[len(prefix):])
+    ]
+    return iterator
+
+  def _RunDu(self, args):
+    with mock.patch.object(DuCommand,
+                           'WildcardIterator',
+                           side_effect=self._MockWildcardIterator):
+      stdout, log_handler = self.RunCommand('du',
+                                            args,
+                                            return_stdout=True,
+                                            return_log_handler=True)
+    return stdout.splitlines(), '\n'.join(log_handler.messages['info'])
+
+  def test_index_refresh_and_query(self):
+    # URLs must be listed into the index before they can be reported.
+    with self.assertRaisesRegex(CommandException, 'has not been listed'):
+      self._RunDu(['-s', self.index_arg, 'gs://bucket'])
+    stdout, _ = self._RunDu([self.index_arg, '--refresh', 'gs://bucket'])
+    self.assertEqual([
+        '3            gs://bucket/d1/d2/',
+        '5            gs://bucket/d1/',
+        '4            gs://bucket/d3/',
+        '10           gs://bucket',
+    ], stdout)
+
+    # Changes are only seen once the changed prefix is refreshed.
+    self.object_sizes.update({'d1/d2/e': 5, 'd3/f': 6})
+    stdout, info = self._RunDu(['-s', self.index_arg, 'gs://bucket'])
+    self.assertEqual(['10           gs://bucket'], stdout)
+    self.assertIn('from a listing at', info)
+    stdout, _ = self._RunDu(
+        ['-sc', self.index_arg, '--refresh', 'gs://bucket/d1'])
+    self.assertEqual(['10           gs://bucket/d1', '10           total'],
+                     stdout)
+    stdout, info = self._RunDu(['-s', self.index_arg, 'gs://bucket'])
+    self.assertEqual(['15           gs://bucket'], stdout)
+    self.assertIn('from listings between', info)
+    stdout, _ = self._RunDu(['-s', self.index_arg, 'gs://bucket/d1/d2/'])
+    self.assertEqual(['8            gs://bucket/d1/d2'], stdout)
+
+  def test_index_rejects_unsupported_arguments(self):
+    with self.assertRaisesRegex(CommandException, 'cannot be used'):
+      self._RunDu(['-e', '*.o', self.index_arg, 'gs://bucket'])
+    with self.assertRaisesRegex(CommandException, 'Wildcards'):
+      self._RunDu([self.index_arg, 'gs://bucket/d*'])
+    with self.assertRaisesRegex(CommandException, 'only be used with'):
+      self._RunDu(['--refresh', 'gs://bucket'])
+
+  def test_listing_from_report(self):
+    now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    report = self.CreateTempFile(
+        file_name='report.csv',
+        contents=('bucket,name,size,updated\n'
+                  'bucket,a,1,2000-01-01T00:00:00Z\n'
+                  'bucket,d1/b,2,2000-01-01T00:00:00Z\n'
+                  'bucket,d1/d2/c,3,%s\n'
+                  'other,d1/e,100,2000-01-01T00:00:00Z\n' % now).encode(UTF8))
+    listing_from_arg = '--listing-from=%s' % report
+    # The objects have changed since the report was generated.
+    self.object_sizes = {'a': 1, 'd1/b': 2, 'd1/d2/c': 30, 'd1/d2/f': 5}
+
+    stdout, info = self._RunDu([listing_from_arg, 'gs://bucket'])
+    self.assertEqual([
+        '3            gs://bucket/d1/d2/',
+        '5            gs://bucket/d1/',
+        '6            gs://bucket',
+    ], stdout)
+    self.assertIn('from a listing at', info)
+
+    # Directories with recently changed objects are listed instead.
+    stdout, _ = self._RunDu(
+        ['-s', listing_from_arg, '--verify-recent=1d', 'gs://bucket/d1'])
+    self.assertEqual(['37           gs://bucket/d1'], stdout)
+
+    # Sizes read from the report can be kept in an index.
+    self._RunDu([self.index_arg, listing_from_arg, 'gs://bucket'])
+    stdout, _ = self._RunDu(['-s', self.index_arg, 'gs://bucket'])
+    self.assertEqual(['6            gs://bucket'], stdout)
+
+  def test_listing_from_rejects_unsupported_arguments(self):
+    report = self.CreateTempFile(contents=b'bucket,name,size\n')
+    with self.assertRaisesRegex(CommandException, '-a option cannot be used'):
+      self._RunDu(['-a', '--listing-from=%s' % report, 'gs://bucket'])
+    with self.assertRaisesRegex(CommandException, 'only be used with'):
+      self._RunDu(['--verify-recent=1d', 'gs://bucket'])
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the local JSON API emulator, through gsutil's JSON API client."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import io
+import logging
+import time
+
+from gslib.cloud_api import NotFoundException
+from gslib.cloud_api import PreconditionException
+from gslib.cloud_api import Preconditions
+from gslib.cloud_api import ServiceException
+from gslib import gcs_json_api
+from gslib.no_op_credentials import NoOpCredentials
+from gslib.tests import gcs_emulator
+import gslib.tests.testcase as testcase
+from gslib.tests.util import SetBotoConfigForTest
+from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
+from gslib.utils.constants import TRANSFER_BUFFER_SIZE
+
+from six import add_move, MovedModule
+
+add_move(MovedModule('mock', 'mock', 'unittest.mock'))
+from six.moves import mock
+
+_BUCKET = 'emulator-bucket'
+
+
+class TestGcsEmulator(testcase.GsUtilUnitTestCase):
+  """Tests that the emulator serves the requests gsutil makes."""
+
+  def _CreateApi(self, emulator):
+    """Returns a GcsJsonApi pointed at the emulator, with a bucket in it."""
+    boto_config = emulator.boto_config + [('Boto', 'num_retries', '2'),
+                                          ('Boto', 'max_retry_delay', '1')]
+    with SetBotoConfigForTest(boto_config):
+      api = gcs_json_api.GcsJsonApi(None,
+                                    logging.getLogger('test-gcs-emulator'),
+                                    None,
+                                    credentials=NoOpCredentials())
+    api.CreateBucket(_BUCKET, metadata=apitools_messages.Bucket(name=_BUCKET))
+    return api
+
+  def _Upload(self, api, name, data, size=None, **kwargs):
+    return api.UploadObject(io.BytesIO(data),
+                            apitools_messages.Object(bucket=_BUCKET,
+                                                     name=name,
+                                                     contentType='text/plain'),
+                            size=len(data) if size is None else size,
+                            **kwargs)
+
+  def _Download(self, api, name, start_byte=0, end_byte=None):
+    stream = io.BytesIO()
+    api.GetObjectMedia(_BUCKET,
+                       name,
+                       stream,
+                       start_byte=start_byte,
+                       end_byte=end_byte)
+    return stream.getvalue()
+
+  def test_object_round_trip(self):
+    with gcs_emulator.GcsEmulator() as emulator:
+      api = self._CreateApi(emulator)
+      obj = self._Upload(api, 'dir/obj', b'0123456789')
+      self.assertEqual(10, obj.size)
+      self.assertEqual('text/plain', obj.contentType)
+      self.assertEqual('eB5eJF1ptWaXm4bijSPyxw==', obj.md5Hash)
+      self.assertEqual('KAwGng==', obj.crc32c)
+
+      self.assertEqual(b'0123456789', self._Download(api, 'dir/obj'))
+      self.assertEqual(b'2345', self._Download(api, 'dir/obj', 2, 5))
+      self.assertEqual(b'789', self._Download(api, 'dir/obj', -3))
+      metadata = api.GetObjectMetadata(_BUCKET, 'dir/obj')
+      self.assertEqual(obj.generation, metadata.generation)
+
+      with self.assertRaises(PreconditionException):
+        self._Upload(api,
+                     'dir/obj',
+                     b'x',
+                     preconditions=Preconditions(gen_match=0))
+      api.DeleteObject(_BUCKET, 'dir/obj')
+      with self.assertRaises(NotFoundException):
+        api.GetObjectMetadata(_BUCKET, 'dir/obj')
+
+  def test_upload_of_data_with_line_endings(self):
+    with gcs_emulator.GcsEmulator() as emulator:
+      api = self._CreateApi(emulator)
+      for data in (b'\n\nabc\r', b'abc\r\n', b'\r\n\r\nabc\n'):
+        self._Upload(api, 'obj', data)
+        self.assertEqual(data, self._Download(api, 'obj'))
+
+  def test_resumable_upload(self):
+    data = b'abc' * TRANSFER_BUFFER_SIZE
+    with gcs_emulator.GcsEmulator() as emulator:
+      api = self._CreateApi(emulator)
+      obj = api.UploadObjectResumable(
+          io.BytesIO(data),
+          apitools_messages.Object(bucket=_BUCKET, name='big'),
+          size=len(data))
+      self.assertEqual(len(data), obj.size)
+      self.assertEqual(data, self._Download(api, 'big'))
+
+  def test_list_with_delimiter_and_paging(self):
+    with gcs_emulator.GcsEmulator() as emulator:
+      api = self._CreateApi(emulator)
+      for name in ('a', 'b/1', 'b/2', 'c/1', 'd'):
+        self._Upload(api, name, b'x')
+      # A small page size makes the listing span several pages. Each page's
+      # objects are returned before its prefixes.
+      with mock.patch.object(gcs_json_api, 'NUM_OBJECTS_PER_LIST_PAGE', 2):
+        results = [(result.datatype, result.data if result.datatype
+                    == 'prefix' else result.data.name)
+                   for result in api.ListObjects(_BUCKET, delimiter='/')]
+      self.assertEqual([('object', 'a'), ('prefix', 'b/'), ('object', 'd'),
+                        ('prefix', 'c/')], results)
+
+  def test_compose_and_rewrite(self):
+    with gcs_emulator.GcsEmulator() as emulator:
+      api = self._CreateApi(emulator)
+      self._Upload(api, 'part1', b'abc')
+      self._Upload(api, 'part2', b'def')
+      composite = api.ComposeObject(
+          [
+              apitools_messages.ComposeRequest.SourceObjectsValueListEntry(
+                  name=name) for name in ('part1', 'part2')
+          ],
+          apitools_messages.Object(bucket=_BUCKET, name='whole'))
+      self.assertEqual(2, composite.componentCount)
+      self.assertIsNone(composite.md5Hash)
+      self.assertEqual(b'abcdef', self._Download(api, 'whole'))
+
+      copy = api.CopyObject(
+          composite, apitools_messages.Object(bucket=_BUCKET, name='copy'))
+      self.assertEqual(composite.crc32c, copy.crc32c)
+      self.assertEqual(b'abcdef', self._Download(api, 'copy'))
+
+  def test_injected_latency_and_errors(self):
+    with gcs_emulator.GcsEmulator(latency=0.05) as emulator:
+      api = self._CreateApi(emulator)
+      start = time.time()
+      api.GetBucket(_BUCKET)
+      self.assertGreaterEqual(time.time() - start, 0.05)
+    with gcs_emulator.GcsEmulator(error_rate=1) as emulator:
+      with self.assertRaises(ServiceException):
+        self._CreateApi(emulator)
+
+  def test_parse_bandwidth(self):
+    self.assertEqual(1500, gcs_emulator.ParseBandwidth('1500'))
+    self.assertEqual(10 * 1024 * 1024, gcs_emulator.ParseBandwidth('10M'))
+    self.assertEqual(512 * 1024, gcs_emulator.ParseBandwidth('0.5MiB'))
+    with self.assertRaises(ValueError):
+      gcs_emulator.ParseBandwidth('fast')
@@ -69,3 +69,16 @@ class TestGcsJsonApi(testcase.GsUtilUnitTestCase):
                                ('Credentials', 'gs_host', None)]):
       client = gcs_json_api.GcsJsonApi(None, None, None, None)
       self.assertEqual(client.host_base, gcs_json_api.DEFAULT_HOST)
+
+  def testUsesHttpForLoopbackHost(self):
+    with SetBotoConfigForTest([('Credentials', 'gs_json_host', '127.0.0.1'),
+                               ('Credentials', 'gs_json_port', '8080'),
+                               ('Credentials', 'gs_json_protocol', 'http')]):
+      client = gcs_json_api.GcsJsonApi(None, None, None, None)
+      self.assertEqual(client.url_base, 'http://127.0.0.1:8080/storage/v1/')
+
+  def testRaisesErrorIfHttpForRemoteHost(self):
+    with SetBotoConfigForTest([('Credentials', 'gs_json_host', 'host'),
+                               ('Credentials', 'gs_json_protocol', 'http')]):
+      with self.assertRaises(cloud_api.ArgumentException):
+        gcs_json_api.GcsJsonApi(None, None, None, None)
@@ -19,15 +19,22 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+from concurrent import futures
 import hashlib
 import os
 import pkgutil
 from unittest import mock
 
+import crcmod
+
 from gslib.exception import CommandException
 from gslib.storage_url import StorageUrlFromString
 import gslib.tests.testcase as testcase
+from gslib.tests.util import SetBotoConfigForTest
 from gslib.utils.constants import TRANSFER_BUFFER_SIZE
+from gslib.utils import hashing_helper
+from gslib.utils.hashing_helper import CalculateHashesFromContents
+from gslib.utils.hashing_helper import CalculateHashesFromFile
 from gslib.utils.hashing_helper import CalculateMd5FromContents
 from gslib.utils.hashing_helper import GetMd5
 from gslib.utils.hashing_helper import HashingFileUploadWrapper
@@ -58,6 +65,76 @@ class TestGetMd5(testcase.GsUtilUnitTestCase):
         [mock.call(b''), mock.call(b'', usedforsecurity=False)])
 
 
+class TestCalculateHashesFromFile(testcase.GsUtilUnitTestCase):
+  """Unit tests for the CalculateHashesFromFile function."""
+
+  def _GetHashDicts(self, algs):
+    hash_dicts = []
+    for _ in range(2):
+      hash_dict = {}
+      if 'crc32c' in algs:
+        hash_dict['crc32c'] = crcmod.predefined.Crc('crc-32c')
+      if 'md5' in algs:
+        hash_dict['md5'] = GetMd5()
+      hash_dicts.append(hash_dict)
+    return hash_dicts
+
+  def _AssertMatchesSequentialHashes(self, contents, algs, max_workers):
+    tmp_file = self.CreateTempFile(contents=contents)
+    expected, actual = self._GetHashDicts(algs)
+    with open(tmp_file, 'rb') as fp:
+      CalculateHashesFromContents(fp, expected)
+    callback_processor = mock.Mock()
+    with SetBotoConfigForTest([
+        ('GSUtil', 'parallel_hashing_threshold', '1'),
+        ('GSUtil', 'parallel_hashing_max_workers', str(max_workers))
+    ]):
+      CalculateHashesFromFile(tmp_file,
+                              actual,
+                              callback_processor=callback_processor)
+    for alg in algs:
+      self.assertEqual(expected[alg].hexdigest(), actual[alg].hexdigest())
+    self.assertEqual(
+        len(contents),
+        sum(call[0][0] for call in callback_processor.Progress.call_args_list))
+
+  def testParallelCrc32cMatchesSequential(self):
+    contents = os.urandom(TRANSFER_BUFFER_SIZE * 3 + 17)
+    for max_workers in (2, 3, 7):
+      self._AssertMatchesSequentialHashes(contents, ['crc32c'], max_workers)
+
+  def testParallelCrc32cAndMd5MatchSequential(self):
+    contents = os.urandom(TRANSFER_BUFFER_SIZE * 2 + 5)
+    self._AssertMatchesSequentialHashes(contents, ['crc32c', 'md5'], 4)
+
+  def testMoreWorkersThanBytes(self):
+    self._AssertMatchesSequentialHashes(b'abc', ['crc32c'], 8)
+
+  @mock.patch.object(hashing_helper, '_GetParallelHashingExecutor')
+  def testParallelCrc32cWithThreads(self, mock_get_executor):
+    mock_get_executor.side_effect = (
+        lambda num_workers: futures.ThreadPoolExecutor(num_workers))
+    self._AssertMatchesSequentialHashes(os.urandom(10000), ['crc32c'], 3)
+    self.assertTrue(mock_get_executor.called)
+
+  @mock.patch.object(hashing_helper, '_GetParallelHashingExecutor')
+  def testSmallFilesAreHashedSequentially(self, mock_get_executor):
+    tmp_file = self.CreateTempFile(contents=b'small file')
+    hash_dict = self._GetHashDicts(['crc32c'])[0]
+    CalculateHashesFromFile(tmp_file, hash_dict)
+    self.assertFalse(mock_get_executor.called)
+
+  @mock.patch.object(hashing_helper, '_parallel_hashing_executors', {})
+  @mock.patch.object(futures, 'ProcessPoolExecutor')
+  def testExecutorIsReusedAndNotForked(self, mock_process_pool_executor):
+    executor = hashing_helper._GetParallelHashingExecutor(4)
+    self.assertIs(executor, hashing_helper._GetParallelHashingExecutor(2))
+    mock_process_pool_executor.assert_called_once_with(
+        max_workers=4, mp_context=mock.ANY)
+    context = mock_process_pool_executor.call_args[1]['mp_context']
+    self.assertIn(context.get_start_method(), ('forkserver', 'spawn'))
+
+
 class TestHashingFileUploadWrapper(testcase.GsUtilUnitTestCase):
   """Unit tests for the HashingFileUploadWrapper class."""
 
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for hedging_util module."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import threading
+
+from six.moves import queue as Queue
+
+from gslib.cloud_api import ResumableDownloadException
+import gslib.tests.testcase as testcase
+from gslib.tests.util import SetBotoConfigForTest
+from gslib.thread_message import HedgedRequestMessage
+from gslib.utils import hedging_util
+from gslib.utils.hedging_util import GetHedgePolicy
+from gslib.utils.hedging_util import HedgedGetObjectMedia
+
+from unittest import mock
+
+_DATA = b'0123456789' * 10
+
+
+class TestHedgedGetObjectMedia(testcase.GsUtilUnitTestCase):
+  """Unit tests for hedging stalled download requests."""
+
+  def setUp(self):
+    super(TestHedgedGetObjectMedia, self).setUp()
+    self.status_queue = Queue.Queue()
+    self.gsutil_api = mock.Mock(status_queue=self.status_queue)
+    self.policy = hedging_util._HedgePolicy(95)
+    # Lets stalled requests finish once a test is done with them.
+    self.unstall = threading.Event()
+    self.addCleanup(self.unstall.set)
+    self.requests = []
+    self.requests_lock = threading.Lock()
+    for name, value in (('_AcquireApi', lambda gsutil_api: mock.Mock()),
+                        ('_ReleaseApi', lambda gsutil_api, api: None),
+                        ('_INITIAL_DEADLINE', 0.05)):
+      patcher = mock.patch.object(hedging_util, name, value)
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+  def _MakeGetMedia(self, *behaviors):
+    """Returns a get_media_func whose nth request follows behaviors[n].
+
+    Each behavior is a (stop_at, error) tuple: the request writes its range
+    in chunks of 10 bytes until byte stop_at (if not None), where it raises
+    error if there is one, and otherwise stalls until the test is done with it.
+    A stop_at of len(_DATA) stalls after the whole range is written.
+    """
+
+    def _GetMedia(unused_api, stream, start_byte):
+      with self.requests_lock:
+        stop_at, error = behaviors[len(self.requests)]
+        self.requests.append(start_byte)
+      for offset in range(start_byte, len(_DATA) + 1, 10):
+        if offset == stop_at:
+          if error:
+            raise error
+          self.unstall.wait()
+        if offset < len(_DATA):
+          stream.write(_DATA[offset:offset + 10])
+      return 'encoding'
+
+    return _GetMedia
+
+  def _Download(self, get_media_func, start_byte=0):
+    fp = io.BytesIO()
+    digesters = {'md5': hashlib.md5()}
+    progress = []
+    result = HedgedGetObjectMedia(self.gsutil_api, self.policy, fp, start_byte,
+                                  len(_DATA) - 1, digesters,
+                                  lambda done, total: progress.append(done),
+                                  get_media_func)
+    self.assertEqual('encoding', result)
+    self.assertEqual(_DATA[start_byte:], fp.getvalue())
+    self.assertEqual(
+        hashlib.md5(_DATA[start_byte:]).hexdigest(),
+        digesters['md5'].hexdigest())
+    self.assertEqual(len(_DATA), progress[-1])
+
+  def _GetMessages(self):
+    messages = []
+    while not self.status_queue.empty():
+      messages.append(self.status_queue.get())
+    return messages
+
+  def testDoesNotHedgeFastRequests(self):
+    self._Download(self._MakeGetMedia((None, None)), start_byte=30)
+    self.assertEqual([30], self.requests)
+    self.assertEqual([], self._GetMessages())
+
+  def testHedgesStalledRequests(self):
+    # The first request stalls before any data, the second partway through.
+    self._Download(self._MakeGetMedia((0, None), (50, None), (None, None)))
+    self.assertEqual([0, 0, 50], self.requests)
+    messages = self._GetMessages()
+    self.assertEqual(1, len(messages))
+    self.assertIsInstance(messages[0], HedgedRequestMessage)
+    self.assertEqual(2, messages[0].num_hedges)
+
+    # Abandoned requests report the data they discard.
+    self.unstall.set()
+    for _ in range(2):
+      message = self.status_queue.get(timeout=5)
+      self.assertEqual((0, 10), (message.num_hedges, message.wasted_bytes))
+
+  def testLimitsHedges(self):
+    with mock.patch.object(hedging_util, '_HEDGE_BURST', 0):
+      threading.Timer(0.3, self.unstall.set).start()
+      self._Download(self._MakeGetMedia((0, None)))
+      self.assertFalse(self.policy.TryHedge())
+    self.assertEqual([0], self.requests)
+
+  def testRaisesErrors(self):
+    with self.assertRaises(ValueError):
+      self._Download(self._MakeGetMedia((50, ValueError()),))
+
+  def testHedgeCarriesOnAfterError(self):
+    # The first request stalls, and its hedge fails, so it is hedged again.
+    self._Download(
+        self._MakeGetMedia((20, None), (20, ValueError()), (None, None)))
+    self.assertEqual([0, 20, 20], self.requests)
+
+  def testDoesNotHedgeAfterLastByte(self):
+    # The request writes the whole range, but returns only after the deadline.
+    threading.Timer(0.3, self.unstall.set).start()
+    self._Download(self._MakeGetMedia((len(_DATA), None)))
+    self.assertEqual([0], self.requests)
+    self.assertEqual([], self._GetMessages())
+
+  def testCompletesWhenHedgedRequestReturnsLast(self):
+    # The first request stalls, and its hedge writes the rest of the range
+    # but returns only after the deadline.
+    threading.Timer(0.3, self.unstall.set).start()
+    self._Download(self._MakeGetMedia((50, None), (len(_DATA), None)))
+    self.assertEqual([0, 50], self.requests)
+
+  def testRaisesIfRequestsEndEarly(self):
+
+    def _GetMedia(unused_api, stream, start_byte):
+      self.requests.append(start_byte)
+      stream.write(_DATA[start_byte:50])
+      return 'encoding'
+
+    with self.assertRaises(ResumableDownloadException):
+      self._Download(_GetMedia)
+    self.assertEqual([0], self.requests)
+
+  def testGetHedgePolicy(self):
+    self.assertIsNone(GetHedgePolicy())
+    with SetBotoConfigForTest([('GSUtil', 'download_hedge_percentile', '100')
+                              ]):
+      self.assertIsNone(GetHedgePolicy())
+    with SetBotoConfigForTest([('GSUtil', 'download_hedge_percentile', '90')]):
+      policy = GetHedgePolicy()
+      self.assertEqual(90, policy.percentile)
+      self.assertIs(policy, GetHedgePolicy())
+      for latency in range(hedging_util._MIN_LATENCY_SAMPLES):
+        policy.AddLatency(latency)
+      self.assertEqual(18, policy.StartRequest())
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for inotify_util module."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import os
+import shutil
+
+import gslib.tests.testcase as testcase
+from gslib.tests.util import unittest
+from gslib.utils import inotify_util
+from gslib.utils.inotify_util import DirectoryWatcher
+from gslib.utils.system_util import IS_LINUX
+
+from unittest import mock
+
+
+@unittest.skipUnless(IS_LINUX, 'inotify is only available on Linux.')
+class TestDirectoryWatcher(testcase.GsUtilUnitTestCase):
+  """Unit tests for watching directories for changes."""
+
+  def setUp(self):
+    super(TestDirectoryWatcher, self).setUp()
+    self.root = self.CreateTempDir()
+    os.mkdir(os.path.join(self.root, 'sub'))
+    self.watchers = []
+
+  def tearDown(self):
+    for watcher in self.watchers:
+      watcher.Close()
+    super(TestDirectoryWatcher, self).tearDown()
+
+  def _MakeWatcher(self, recursive=True):
+    watcher = DirectoryWatcher(self.root, recursive)
+    self.watchers.append(watcher)
+    return watcher
+
+  def _Path(self, *parts):
+    return os.path.join(self.root, *parts)
+
+  def _Write(self, *parts):
+    with open(self._Path(*parts), 'w') as fp:
+      fp.write('data')
+
+  def _WaitForChanges(self, watcher):
+    return watcher.WaitForChanges(0.1, 1)
+
+  def testReportsChangedFiles(self):
+    self._Write('sub', 'old')
+    watcher = self._MakeWatcher()
+    self._Write('new')
+    self._Write('sub', 'nested')
+    os.remove(self._Path('sub', 'old'))
+    os.symlink('new', self._Path('link'))
+    changes = self._WaitForChanges(watcher)
+    self.assertEqual(
+        {
+            self._Path('new'),
+            self._Path('sub', 'nested'),
+            self._Path('sub', 'old'),
+            self._Path('link')
+        }, changes.paths)
+    self.assertFalse(changes.removed_dirs)
+    self.assertFalse(changes.overflowed)
+
+  def testReportsFilesInNewAndMovedDirectories(self):
+    outside = self.CreateTempDir()
+    os.mkdir(os.path.join(outside, 'moved'))
+    with open(os.path.join(outside, 'moved', 'f'), 'w') as fp:
+      fp.write('data')
+    watcher = self._MakeWatcher()
+    os.mkdir(self._Path('new'))
+    shutil.move(os.path.join(outside, 'moved'), self._Path('moved'))
+    os.rename(self._Path('sub'), self._Path('renamed'))
+    changes = self._WaitForChanges(watcher)
+    self.assertEqual({self._Path('moved', 'f')}, changes.paths)
+    self.assertEqual({self._Path('sub')}, changes.removed_dirs)
+
+    # New and renamed directories are watched too.
+    self._Write('new', 'f')
+    self._Write('renamed', 'f')
+    self.assertEqual({self._Path('new', 'f'),
+                      self._Path('renamed', 'f')},
+                     self._WaitForChanges(watcher).paths)
+
+  def testNonRecursiveIgnoresSubdirectories(self):
+    watcher = self._MakeWatcher(recursive=False)
+    self._Write('sub', 'f')
+    os.mkdir(self._Path('new'))
+    self._Write('f')
+    changes = self._WaitForChanges(watcher)
+    self.assertEqual({self._Path('f')}, changes.paths)
+    self.assertFalse(changes.removed_dirs)
+
+  def testReportsOverflow(self):
+    watcher = self._MakeWatcher()
+    self._Write('f')
+    overflow = inotify_util._EVENT_HEADER.pack(-1, inotify_util.IN_Q_OVERFLOW,
+                                               0, 0)
+    real_read = os.read
+    reads = []
+
+    def _Read(fd, size):
+      data = real_read(fd, size)
+      if not reads:
+        reads.append(data)
+        data += overflow
+      return data
+
+    with mock.patch.object(inotify_util.os, 'read', _Read):
+      changes = self._WaitForChanges(watcher)
+    self.assertTrue(changes.overflowed)
+    self.assertEqual({self._Path('f')}, changes.paths)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for inventory_util module."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import logging
+import os
+import pickle
+
+from gslib.exception import CommandException
+from gslib.storage_url import StorageUrlFromString
+import gslib.tests.testcase as testcase
+from gslib.utils import inventory_util
+from gslib.utils.inventory_util import InventoryReport
+from gslib.utils.posix_util import ConvertDatetimeToPOSIX
+
+from unittest import mock
+
+_HEADER = 'bucket,name,size,timeCreated,crc32c,md5Hash\n'
+
+
+class TestInventoryReport(testcase.GsUtilUnitTestCase):
+  """Unit tests for reading objects from inventory reports."""
+
+  def setUp(self):
+    super(TestInventoryReport, self).setUp()
+    self.logger = logging.getLogger()
+    self.gsutil_api = self.MakeGsUtilApi()
+    self.report_dir = self.CreateTempDir()
+    # Two shards of one report.
+    self.CreateTempFile(tmpdir=self.report_dir,
+                        file_name='shard0.csv',
+                        contents=(_HEADER + 'bkt,a,1,2020-01-02T03:04:05Z,'
+                                  'AAAAAA==,\nbkt,d/b,2,,,\n').encode('utf-8'))
+    self.CreateTempFile(tmpdir=self.report_dir,
+                        file_name='shard1.csv',
+                        contents=(_HEADER + 'other,c,3,,,\n'
+                                  'bkt,d/e/f,4,,,md5==\n').encode('utf-8'))
+    self.report = InventoryReport([os.path.join(self.report_dir, '*.csv')],
+                                  self.gsutil_api, self.logger, [])
+    self.listed = []
+
+  def _ListObjects(self, prefix, recursive):
+    self.listed.append((prefix, recursive))
+    return []
+
+  def _IterNames(self, bucket_url_str, prefix, recursive, **kwargs):
+    return [
+        blr.url_string for blr in self.report.IterObjects(
+            StorageUrlFromString(bucket_url_str), prefix, recursive,
+            self._ListObjects, self.logger, **kwargs)
+    ]
+
+  def testIterObjects(self):
+    self.assertEqual(2, len(self.report.paths))
+    self.assertEqual(['gs://bkt/a', 'gs://bkt/d/b', 'gs://bkt/d/e/f'],
+                     self._IterNames('gs://bkt', '', True))
+    self.assertEqual(['gs://bkt/d/b'], self._IterNames('gs://bkt', 'd/', False))
+    self.assertEqual([], self.listed)
+
+    objs = [
+        blr.root_object for blr in self.report.IterObjects(
+            StorageUrlFromString('gs://bkt'), '', False, self._ListObjects,
+            self.logger)
+    ]
+    self.assertEqual(1, objs[0].size)
+    self.assertEqual('AAAAAA==', objs[0].crc32c)
+    self.assertIsNone(objs[0].md5Hash)
+    self.assertEqual(1577934245, ConvertDatetimeToPOSIX(objs[0].timeCreated))
+    # Reports can be passed to other processes.
+    self.assertEqual(self.report.paths,
+                     pickle.loads(pickle.dumps(self.report)).paths)
+
+  def testIterObjectsListsBucketsNotInReport(self):
+    self.assertEqual([], self._IterNames('gs://missing', 'd/', True))
+    self.assertEqual([('d/', True)], self.listed)
+
+  def testVerifyRecentListsChangedDirectories(self):
+    # Objects without times are treated as recently changed.
+    self.assertEqual(['gs://bkt/a'],
+                     self._IterNames('gs://bkt',
+                                     '',
+                                     True,
+                                     verify_recent_seconds=60))
+    self.assertEqual([('d/', False), ('d/e/', False)], self.listed)
+
+  def testRejectsBadReports(self):
+    path = self.CreateTempFile(contents=b'bucket,size\nbkt,1\n')
+    report = InventoryReport([path], self.gsutil_api, self.logger, [])
+    with self.assertRaisesRegex(CommandException, 'missing the name column'):
+      list(
+          report.IterObjects(StorageUrlFromString('gs://bkt'), '', True,
+                             self._ListObjects, self.logger))
+    with self.assertRaisesRegex(CommandException, 'No inventory report'):
+      InventoryReport([os.path.join(self.report_dir, '*.parquet')],
+                      self.gsutil_api, self.logger, [])
+    path = self.CreateTempFile(file_name='report.parquet', contents=b'PAR1')
+    report = InventoryReport([path], self.gsutil_api, self.logger, [])
+    with mock.patch.object(inventory_util, 'parquet', None):
+      with self.assertRaisesRegex(CommandException, 'requires the pyarrow'):
+        list(
+            report.IterObjects(StorageUrlFromString('gs://bkt'), '', True,
+                               self._ListObjects, self.logger))
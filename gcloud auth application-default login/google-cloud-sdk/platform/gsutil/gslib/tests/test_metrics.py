@@ -20,6 +20,7 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import json
 import logging
 import os
 import pickle
@@ -36,6 +37,7 @@ from apitools.base.py import http_wrapper
 from boto.storage_uri import BucketStorageUri
 
 from gslib import metrics
+from gslib import metrics_sink
 from gslib import VERSION
 from gslib.cs_api_map import ApiSelector
 import gslib.exception
@@ -52,6 +54,7 @@ from gslib.tests.util import SkipForParFile
 from gslib.tests.util import unittest
 from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
 from gslib.thread_message import FileMessage
+from gslib.thread_message import HedgedRequestMessage
 from gslib.thread_message import RetryableErrorMessage
 from gslib.utils.constants import START_CALLBACK_PER_BYTES
 from gslib.utils.retry_util import LogAndHandleRetries
@@ -412,6 +415,10 @@ class TestMetricsUnitTests(testcase.GsUtilUnitTestCase):
     metrics.LogRetryableError(network_retry_msg)
     metrics.LogRetryableError(network_retry_msg)
 
+    # Log two hedged requests, one of which was abandoned after some data.
+    metrics.LogHedgedRequests(HedgedRequestMessage(2, 0, 0))
+    metrics.LogHedgedRequests(HedgedRequestMessage(0, 5, 0))
+
     # Log some thread throughput.
     start_file_msg = FileMessage('src', 'dst', 0, size=100)
     end_file_msg = FileMessage('src', 'dst', 10, finished=True)
@@ -445,6 +452,8 @@ class TestMetricsUnitTests(testcase.GsUtilUnitTestCase):
         ('Average Overall Throughput', '10'),
         ('Num Retryable Service Errors', '1'),
         ('Num Retryable Network Errors', '2'),
+        ('Num Hedged Requests', '2'),
+        ('Hedged Request Wasted Bytes', '5'),
         ('Thread Idle Time Percent', '0.8'),
         ('Slowest Thread Throughput', '10'),
         ('Fastest Thread Throughput', '10'),
@@ -455,6 +464,102 @@ class TestMetricsUnitTests(testcase.GsUtilUnitTestCase):
       self.assertIn('{0}={1}'.format(metrics._GA_LABEL_MAP[label], exp_value),
                     metric_body)
 
+  def _LogTestTransfers(self):
+    """Logs a cp command with uploads taking 0.05 and 3 seconds."""
+    metrics.LogCommandParams(command_name='cp', sub_opts=[('-r', '')])
+    with mock.patch('gslib.metrics.system_util.GetDiskCounters',
+                    return_value={}):
+      metrics.LogPerformanceSummaryParams(total_bytes_transferred=300,
+                                          num_objects_transferred=2)
+      for start_time, end_time in ((0, 0.05), (1, 4)):
+        for message_time, finished in ((start_time, False), (end_time, True)):
+          metrics.LogPerformanceSummaryParams(file_message=FileMessage(
+              'src',
+              'dst',
+              message_time,
+              size=150,
+              finished=finished,
+              message_type=FileMessage.FILE_UPLOAD,
+              process_id=1,
+              thread_id=1))
+      return self.collector._GetPerformanceSummary()
+
+  def testJsonLinesTelemetrySink(self):
+    """Tests writing performance telemetry as JSON lines."""
+    path = os.path.join(self.CreateTempDir(), 'telemetry', 'gsutil.jsonl')
+    with SetBotoConfigForTest([('GSUtil', 'telemetry_sink', 'jsonl:' + path)]):
+      self.assertIsInstance(metrics_sink.GetTelemetrySink(),
+                            metrics_sink.JsonLinesSink)
+    self.collector.telemetry_sink = metrics_sink.JsonLinesSink(path)
+    summary = self._LogTestTransfers()
+    self.collector._WriteTelemetry(summary)
+    self.collector._WriteTelemetry(summary)
+
+    with open(path) as f:
+      records = [json.loads(line) for line in f]
+    self.assertEqual(2, len(records))
+    record = records[0]
+    self.assertEqual('cp', record['command'])
+    self.assertEqual('r', record['command_options'])
+    self.assertEqual(300,
+                     record['performance_summary']['total_bytes_transferred'])
+    latencies = record['operation_latencies']['upload']
+    self.assertEqual(2, latencies['count'])
+    self.assertAlmostEqual(3.05, latencies['sum'])
+    buckets = dict((str(upper_bound), count)
+                   for upper_bound, count in latencies['buckets'])
+    self.assertEqual(0, buckets['0.025'])
+    self.assertEqual(1, buckets['0.05'])
+    self.assertEqual(1, buckets['2.5'])
+    self.assertEqual(2, buckets['5'])
+    self.assertEqual(2, buckets['+Inf'])
+
+  def testPrometheusTelemetrySink(self):
+    """Tests keeping the last run of each command in a Prometheus textfile."""
+    path = os.path.join(self.CreateTempDir(), 'gsutil.prom')
+    sink = metrics_sink.PrometheusTextfileSink(path)
+    self.collector.telemetry_sink = sink
+    self.collector._WriteTelemetry(self._LogTestTransfers())
+    sink.Write({'command': 'ls', 'timestamp': 5, 'execution_time': 1})
+    sink.Write({'command': 'ls', 'timestamp': 6, 'execution_time': 2})
+
+    with open(path) as f:
+      lines = f.read().splitlines()
+    self.assertIn(
+        '# TYPE gsutil_last_run_operation_duration_seconds histogram', lines)
+    self.assertIn(
+        'gsutil_last_run_operation_duration_seconds_bucket'
+        '{command="cp",operation="upload",le="0.05"} 1.0', lines)
+    self.assertIn(
+        'gsutil_last_run_operation_duration_seconds_count'
+        '{command="cp",operation="upload"} 2.0', lines)
+    self.assertIn('gsutil_last_run_bytes_transferred{command="cp"} 300.0',
+                  lines)
+    # Each run replaces the samples of the previous run of its command.
+    self.assertIn('gsutil_last_run_duration_seconds{command="ls"} 2.0', lines)
+    self.assertNotIn('gsutil_last_run_duration_seconds{command="ls"} 1.0',
+                     lines)
+    self.assertEqual(
+        1, lines.count('# TYPE gsutil_last_run_duration_seconds gauge'))
+    self.assertEqual(['gsutil.prom', 'gsutil.prom.lock'],
+                     sorted(os.listdir(os.path.dirname(path))))
+
+  def testTelemetrySinkWithoutAnalytics(self):
+    """Tests that a telemetry sink enables collection without GA reporting."""
+    MetricsCollector._disabled_cache = True
+    self.assertEqual(None, MetricsCollector.GetCollector())
+    sink = mock.Mock()
+    self.collector.telemetry_sink = sink
+    with mock.patch.object(MetricsCollector, '_telemetry_sink_cache', sink):
+      self.assertEqual(self.collector, MetricsCollector.GetCollector())
+      metrics.LogCommandParams(command_name='ls')
+      self.collector.ReportMetrics()
+    self.assertEqual('ls', sink.Write.call_args[0][0]['command'])
+    self.assertEqual([], self.collector._metrics)
+
+    with SetBotoConfigForTest([('GSUtil', 'telemetry_sink', 'csv:/tmp/x')]):
+      self.assertEqual(None, metrics_sink.GetTelemetrySink())
+
   def testCommandCollection(self):
     """Tests the collection of command parameters."""
     _TryExceptAndPass(self.command_runner.RunNamedCommand,
@@ -43,10 +43,12 @@ from gslib import command
 from gslib.command import Command
 from gslib.command import CreateOrGetGsutilLogger
 from gslib.command import DummyArgChecker
+from gslib.concurrency_autotuner import ConcurrencyAutotuner
 from gslib.tests.mock_cloud_api import MockCloudApi
 from gslib.tests.mock_logging_handler import MockLoggingHandler
 import gslib.tests.testcase as testcase
 from gslib.tests.testcase.base import RequiresIsolation
+from gslib.tests.util import SetBotoConfigForTest
 from gslib.tests.util import unittest
 from gslib.utils.parallelism_framework_util import CheckMultiprocessingAvailableAndInit
 from gslib.utils.parallelism_framework_util import multiprocessing_context
@@ -320,6 +322,40 @@ class TestParallelismFramework(testcase.GsUtilUnitTestCase):
     results = self._RunApply(_ReturnOneValue, args, process_count, thread_count)
     self.assertEqual(len(args), len(results))
 
+  @RequiresIsolation
+  def testAutotunedApplySingleProcessMultiThread(self):
+    self._TestAutotunedApply(1, 3)
+
+  @RequiresIsolation
+  @unittest.skipIf(IS_WINDOWS, 'Multiprocessing is not supported on Windows')
+  def testAutotunedApplyMultiProcessMultiThread(self):
+    self._TestAutotunedApply(3, 3)
+
+  @Timeout
+  def _TestAutotunedApply(self, process_count, thread_count):
+    """Tests Apply with thread counts taken from config and autotuned."""
+    max_thread_count = thread_count * 2
+    args = [()] * (17 * process_count * thread_count + 1)
+    with SetBotoConfigForTest([
+        ('GSUtil', 'parallel_process_count', str(process_count)),
+        ('GSUtil', 'parallel_thread_count', str(thread_count)),
+        ('GSUtil', 'parallel_thread_autotune', 'True'),
+        ('GSUtil', 'parallel_thread_autotune_max_count',
+         str(max_thread_count)),
+    ]):
+      results = self._RunApply(_ReturnProcAndThreadId, args, None, None)
+    self.assertEqual(len(args), len(results))
+    threads_per_process = {}
+    for (process_id, thread_id) in results:
+      threads_per_process.setdefault(process_id, set()).add(thread_id)
+    for thread_ids in threads_per_process.values():
+      self.assertLessEqual(len(thread_ids), max_thread_count)
+    # This process's autotuners only run while Apply does.
+    self.assertFalse([
+        thread for thread in threading.enumerate()
+        if isinstance(thread, ConcurrencyAutotuner)
+    ])
+
   @RequiresIsolation
   def testNoTasksSingleProcessSingleThread(self):
     self._TestApplyWithNoTasks(1, 1)
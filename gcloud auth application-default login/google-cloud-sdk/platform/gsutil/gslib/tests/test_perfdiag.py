@@ -19,6 +19,7 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import json
 import os
 import socket
 import sys
@@ -32,6 +33,7 @@ from gslib.tests.testcase.integration_testcase import SkipForXML
 from gslib.tests.util import ObjectToURI as suri
 from gslib.tests.util import RUN_S3_TESTS
 from gslib.tests.util import unittest
+from gslib.utils import perfdiag_stats
 from gslib.utils.system_util import IS_WINDOWS
 
 from six import add_move, MovedModule
@@ -309,3 +311,79 @@ class TestPerfDiagUnitTests(testcase.GsUtilUnitTestCase):
     _GenerateFileData(fp, 8, 50, 4)
     self.assertEqual(b'aaxxaaxx', fp.getvalue())
     self.assertEqual(8, fp.tell())
+
+  def test_latency_histogram(self):
+    histogram = perfdiag_stats.MakeLatencyHistogram(
+        [0.000050, 0.000051, 0.2, 0.1])
+    self.assertEqual(4, histogram['count'])
+    self.assertEqual(0.000050, histogram['min'])
+    self.assertEqual(0.2, histogram['max'])
+    self.assertAlmostEqual(0.0500255, histogram['percentiles']['50'])
+    self.assertEqual(['50', '90', '99', '99.9'],
+                     sorted(histogram['percentiles'], key=float))
+    # Values below 128us have exact buckets; larger ones are bounded to within
+    # 1/64 of the value.
+    self.assertEqual([[0.00005, 1], [0.000051, 1], [0.099328, 1],
+                      [0.198656, 1]], histogram['buckets'])
+    self.assertIsNone(perfdiag_stats.MakeLatencyHistogram([]))
+
+  def test_compare_results(self):
+    baseline = {
+        'latency': {
+            'UPLOAD_0': [0.1, 0.1],
+            'DELETE_0': [0.0001],
+        },
+        'read_throughput': {
+            'bytes_per_second': 1000.0
+        },
+    }
+    current = {
+        'schema_version': perfdiag_stats.RESULTS_SCHEMA_VERSION,
+        'latency_histograms': {
+            'UPLOAD_0': perfdiag_stats.MakeLatencyHistogram([0.2, 0.2]),
+            'DELETE_0': perfdiag_stats.MakeLatencyHistogram([0.0005]),
+        },
+        'read_throughput': {
+            'bytes_per_second': 950.0
+        },
+        'write_throughput': {
+            'bytes_per_second': 10.0
+        },
+    }
+    comparisons = {
+        c.name: c for c in perfdiag_stats.CompareResults(baseline, current)
+    }
+    self.assertEqual([
+        'latency DELETE_0 p50', 'latency DELETE_0 p90', 'latency UPLOAD_0 p50',
+        'latency UPLOAD_0 p90', 'read_throughput bytes/s'
+    ], sorted(comparisons))
+    self.assertAlmostEqual(1.0, comparisons['latency UPLOAD_0 p50'].change)
+    self.assertTrue(comparisons['latency UPLOAD_0 p50'].regressed)
+    # Increases of less than a millisecond are not regressions.
+    self.assertFalse(comparisons['latency DELETE_0 p50'].regressed)
+    self.assertFalse(comparisons['read_throughput bytes/s'].regressed)
+    self.assertTrue(
+        perfdiag_stats.CompareResults(baseline, current, threshold=0.01)[-1]
+        .regressed)
+
+  def test_compare_files(self):
+    baseline_path = self.CreateTempFile(contents=json.dumps({
+        'read_throughput': {
+            'bytes_per_second': 1000.0
+        }
+    }).encode('ascii'))
+    current_path = self.CreateTempFile(contents=json.dumps({
+        'read_throughput': {
+            'bytes_per_second': 500.0
+        }
+    }).encode('ascii'))
+    stdout = self.RunCommand(
+        'perfdiag', ['-i', current_path, '--compare=' + baseline_path],
+        return_stdout=True)
+    self.assertRegex(stdout, r'read_throughput bytes/s .* -50.0%  REGRESSED')
+    self.assertIn('1 of 1 metrics regressed by more than 10%.', stdout)
+    stdout = self.RunCommand(
+        'perfdiag',
+        ['-i', current_path, '--compare=' + baseline_path, '--threshold=60'],
+        return_stdout=True)
+    self.assertIn('0 of 1 metrics regressed by more than 60%.', stdout)
@@ -19,15 +19,36 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import datetime
 import logging
 import os
+import unittest
 
+from gslib.bucket_listing_ref import BucketListingObject
+from gslib.commands import rsync
+from gslib.commands.rsync import _BatchSort
+from gslib.commands.rsync import _BuildTmpOutputLine
+from gslib.commands.rsync import _BuildTmpOutputRecord
 from gslib.commands.rsync import _ComputeNeededFileChecksums
+from gslib.commands.rsync import _DiffIterator
 from gslib.commands.rsync import _NA
+from gslib.commands.rsync import _ParseTmpFileRecord
+from gslib.commands.rsync import _ReadTmpFileRecords
+from gslib.exception import CommandException
+from gslib.storage_url import StorageUrlFromString
 from gslib.tests.testcase.unit_testcase import GsUtilUnitTestCase
+from gslib.tests.util import SetBotoConfigForTest
+from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
+from gslib.utils.rsync_util import DiffAction
+from gslib.utils.rsync_util import LISTING_FORMAT_BINARY
 from gslib.utils.hashing_helper import CalculateB64EncodedCrc32cFromContents
 from gslib.utils.hashing_helper import CalculateB64EncodedMd5FromContents
 
+from six import add_move, MovedModule
+
+add_move(MovedModule('mock', 'mock', 'unittest.mock'))
+from six.moves import mock
+
 
 class TestRsyncFuncs(GsUtilUnitTestCase):
 
@@ -80,3 +101,96 @@ class TestRsyncFuncs(GsUtilUnitTestCase):
     self.assertEqual(md5, src_md5)
     self.assertEqual(_NA, src_crc32c)
     self.assertEqual(md5, src_md5)
+
+  def _MakeCloudBlr(self, url_str, crc32c=None, md5=None):
+    return BucketListingObject(
+        StorageUrlFromString(url_str),
+        root_object=apitools_messages.Object(
+            size=12,
+            timeCreated=datetime.datetime(2020, 1, 2, 3, 4, 5),
+            crc32c=crc32c,
+            md5Hash=md5))
+
+  def test_tmp_output_record_matches_line(self):
+    """Tests that binary listing records parse the same as text lines."""
+    tmpdir = self.CreateTempDir()
+    file_path = self.CreateTempFile(tmpdir=tmpdir,
+                                    file_name='f \u00e8+%2F',
+                                    contents=b'data')
+    blrs = [
+        BucketListingObject(StorageUrlFromString(file_path)),
+        self._MakeCloudBlr('gs://bucket/obj \u00e8+%2F', crc32c='AAAAAA=='),
+        self._MakeCloudBlr('gs://bucket/obj', md5='1B2M2Y8AsgTpgAmY7PhCfg=='),
+    ]
+    for blr in blrs:
+      parsed_line = _DiffIterator._ParseTmpFileLine(None,
+                                                    _BuildTmpOutputLine(blr))
+      self.assertEqual(parsed_line,
+                       _ParseTmpFileRecord(_BuildTmpOutputRecord(blr)))
+      self.assertEqual(blr.storage_url.url_string, parsed_line[0])
+
+  def test_batch_sort_binary_records(self):
+    """Tests sorting binary records across several chunk files."""
+    names = ['b', 'a/c', 'a-c', 'a\\b', '\u00e8', 'a+b', 'a c', 'z', 'a']
+    records = [
+        _BuildTmpOutputRecord(self._MakeCloudBlr('gs://bucket/' + name))
+        for name in names
+    ]
+    out_path = os.path.join(self.CreateTempDir(), 'sorted')
+    with SetBotoConfigForTest([('GSUtil', 'rsync_buffer_lines', '2')]):
+      with open(out_path, 'wb') as out_file:
+        _BatchSort(iter(records), out_file, LISTING_FORMAT_BINARY)
+    with open(out_path, 'rb') as fp:
+      sorted_names = [
+          _ParseTmpFileRecord(record)[0][len('gs://bucket/'):]
+          for record in _ReadTmpFileRecords(fp)
+      ]
+    # Records are in the order _DiffIterator compares URLs in.
+    self.assertEqual(sorted(names, key=lambda name: name.replace('\\', '/')),
+                     sorted_names)
+    # Chunk files are removed once merged.
+    self.assertEqual(['sorted'], os.listdir(os.path.dirname(out_path)))
+
+  def test_read_tmp_file_records_raises_on_truncated_record(self):
+    """Tests that a truncated binary listing file is reported."""
+    record = _BuildTmpOutputRecord(self._MakeCloudBlr('gs://bucket/obj'))
+    path = self.CreateTempFile(contents=record + record[:-1])
+    with open(path, 'rb') as fp:
+      records = _ReadTmpFileRecords(fp)
+      self.assertEqual(record, next(records))
+      with self.assertRaisesRegex(CommandException, 'Truncated'):
+        next(records)
+
+  @unittest.skipUnless(hasattr(os, 'symlink'), 'Symlinks are not supported.')
+  def test_changed_file_diffs_skip_symlinks_with_exclude_symlinks(self):
+    """Tests that rsync --watch honors -e for changed paths."""
+    tmpdir = self.CreateTempDir(test_files=['file'])
+    os.symlink(os.path.join(tmpdir, 'file'), os.path.join(tmpdir, 'link'))
+    os.symlink(os.path.join(tmpdir, 'missing'),
+               os.path.join(tmpdir, 'dangling'))
+    paths = [os.path.join(tmpdir, name) for name in ('file', 'link', 'dangling')]
+    src_url = StorageUrlFromString(tmpdir)
+    dst_url = StorageUrlFromString('gs://bucket')
+
+    def _GetDiffs(exclude_symlinks):
+      command = mock.Mock(exclude_symlinks=exclude_symlinks,
+                          exclude_pattern=None,
+                          delete_extras=True,
+                          recursion_requested=True)
+      return [(diff.dst_url_str, diff.diff_action)
+              for diff in rsync.RsyncCommand._IterChangedFileDiffs(
+                  command, paths, src_url, dst_url)]
+
+    self.assertEqual([('gs://bucket/dangling', DiffAction.REMOVE),
+                      ('gs://bucket/file', DiffAction.COPY),
+                      ('gs://bucket/link', DiffAction.COPY)],
+                     _GetDiffs(False))
+    self.assertEqual([('gs://bucket/file', DiffAction.COPY)], _GetDiffs(True))
+
+  def test_clean_up_temp_files_forgets_removed_files(self):
+    """Tests that temp files don't accumulate across comparisons."""
+    path = self.CreateTempFile()
+    with mock.patch.object(rsync, '_tmp_files', [open(path, 'rb')]):
+      rsync.CleanUpTempFiles()
+      self.assertEqual([], rsync._tmp_files)
+    self.assertFalse(os.path.exists(path))
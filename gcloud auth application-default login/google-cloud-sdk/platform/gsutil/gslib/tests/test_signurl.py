@@ -39,6 +39,7 @@ from gslib.tests.util import ObjectToURI as suri
 from gslib.tests.util import SetBotoConfigForTest
 from gslib.tests.util import SetEnvironmentForTest
 from gslib.tests.util import unittest
+from gslib.utils.unit_util import DurationToTimeDelta
 import gslib.tests.signurl_signatures as sigs
 from oauth2client import client
 from oauth2client.service_account import ServiceAccountCredentials
@@ -287,7 +288,7 @@ class UnitTestSignUrl(testcase.GsUtilUnitTestCase):
 
     for inp, expected in tests:
       try:
-        td = gslib.commands.signurl._DurationToTimeDelta(inp)
+        td = DurationToTimeDelta(inp)
         self.assertEqual(td, expected)
       except CommandException:
         if expected is not None:
@@ -20,6 +20,7 @@ from __future__ import division
 from __future__ import unicode_literals
 
 import os
+import pickle
 import sys
 
 from gslib.exception import CommandException
@@ -70,6 +71,19 @@ class TestStorageUrl(base.GsUtilTestCase):
     self.assertEqual('abc', url.bucket_name)
     self.assertEqual('123/456', url.object_name)
 
+  def test_urls_are_slotted_and_pickle_with_interned_names(self):
+    for url_string in ('gs://bucket/obj#123', 's3://bucket', 'file://dir/f'):
+      url = storage_url.StorageUrlFromString(url_string)
+      self.assertFalse(hasattr(url, '__dict__'))
+      unpickled = pickle.loads(pickle.dumps(url))
+      self.assertEqual(url, unpickled)
+      self.assertEqual(url.generation, unpickled.generation)
+      self.assertIs(url.scheme, unpickled.scheme)
+      self.assertIs(url.bucket_name, unpickled.bucket_name)
+    self.assertIs(
+        storage_url.StorageUrlFromString('gs://bucket/a').bucket_name,
+        storage_url.StorageUrlFromString('gs://bucket/b').bucket_name)
+
   def test_raises_error_for_too_many_slashes_after_scheme(self):
     with self.assertRaises(InvalidUrlError):
       storage_url.StorageUrlFromString('gs:///')
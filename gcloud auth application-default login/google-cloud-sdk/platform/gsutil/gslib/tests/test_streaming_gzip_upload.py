@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Unit tests for streaming gzip upload compression."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import gzip
+import io
+import os
+
+from gslib.exception import CommandException
+from gslib.streaming_gzip_upload import StreamingGzipUploadWrapper
+import gslib.tests.testcase as testcase
+from gslib.utils.hashing_helper import CalculateHashesFromContents
+from gslib.utils.hashing_helper import GetMd5
+
+_BLOCK_SIZE = 16 * 1024
+
+
+class TestStreamingGzipUploadWrapper(testcase.GsUtilUnitTestCase):
+  """Unit tests for the StreamingGzipUploadWrapper class."""
+
+  def _Compress(self, contents, read_size, compression_level=9, num_threads=3):
+    wrapper = StreamingGzipUploadWrapper(io.BytesIO(contents),
+                                         compression_level,
+                                         num_threads,
+                                         block_size=_BLOCK_SIZE)
+    chunks = []
+    while True:
+      data = wrapper.read(read_size)
+      if not data:
+        break
+      chunks.append(data)
+    compressed = b''.join(chunks)
+    self.assertEqual(len(compressed), wrapper.tell())
+    wrapper.close()
+    return compressed
+
+  def testRoundTripAcrossBlockBoundaries(self):
+    # Repetitive data exercises back-references into the previous block.
+    contents = b'gsutil streaming gzip ' * 5000 + os.urandom(_BLOCK_SIZE * 3)
+    for read_size in (1, 1000, _BLOCK_SIZE, _BLOCK_SIZE * 2 + 1, -1):
+      compressed = self._Compress(contents, read_size)
+      self.assertEqual(contents, gzip.decompress(compressed))
+
+  def testRoundTripAllCompressionLevels(self):
+    contents = b'abcdefgh' * (_BLOCK_SIZE // 2)
+    for compression_level in range(10):
+      compressed = self._Compress(contents, 4096, compression_level)
+      self.assertEqual(contents, gzip.decompress(compressed))
+
+  def testEmptyStream(self):
+    compressed = self._Compress(b'', 4096)
+    self.assertEqual(b'', gzip.decompress(compressed))
+
+  def testOutputIsIndependentOfThreadCount(self):
+    contents = b'0123456789' * _BLOCK_SIZE
+    self.assertEqual(self._Compress(contents, 4096, num_threads=1),
+                     self._Compress(contents, 4096, num_threads=4))
+
+  def testCompressesRepetitiveData(self):
+    contents = b'a' * (_BLOCK_SIZE * 8)
+    self.assertLess(len(self._Compress(contents, 4096)), len(contents) // 10)
+
+  def testHashesCompressedBytes(self):
+    contents = b'hash me ' * _BLOCK_SIZE
+    expected = GetMd5(self._Compress(contents, -1)).hexdigest()
+    wrapper = StreamingGzipUploadWrapper(io.BytesIO(contents),
+                                         9,
+                                         2,
+                                         block_size=_BLOCK_SIZE)
+    hash_dict = {'md5': GetMd5()}
+    CalculateHashesFromContents(wrapper, hash_dict)
+    wrapper.close()
+    self.assertEqual(expected, hash_dict['md5'].hexdigest())
+
+  def testCloseClosesWrappedStream(self):
+    stream = io.BytesIO(b'x' * (_BLOCK_SIZE * 4))
+    wrapper = StreamingGzipUploadWrapper(stream, 9, 2, block_size=_BLOCK_SIZE)
+    wrapper.read(10)
+    wrapper.close()
+    self.assertTrue(stream.closed)
+    self.assertFalse(wrapper.seekable())
+
+  def testWrappersShareThreads(self):
+    contents = b'shared ' * _BLOCK_SIZE
+    wrappers = [
+        StreamingGzipUploadWrapper(io.BytesIO(contents),
+                                   9,
+                                   2,
+                                   block_size=_BLOCK_SIZE) for _ in range(3)
+    ]
+    self.assertIs(wrappers[0]._executor, wrappers[2]._executor)
+    # Closing one wrapper leaves the pool usable for the others.
+    wrappers[0].read(10)
+    wrappers[0].close()
+    for wrapper in wrappers[1:]:
+      self.assertEqual(contents, gzip.decompress(wrapper.read()))
+      wrapper.close()
+
+  def testRequiresAThread(self):
+    with self.assertRaises(CommandException):
+      StreamingGzipUploadWrapper(io.BytesIO(b''), 9, 0)
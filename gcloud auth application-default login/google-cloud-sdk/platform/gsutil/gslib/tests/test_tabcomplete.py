@@ -24,6 +24,7 @@ import time
 import sys
 
 from gslib.command import CreateOrGetGsutilLogger
+from gslib import tab_complete
 from gslib.tab_complete import CloudObjectCompleter
 from gslib.tab_complete import TAB_COMPLETE_CACHE_TTL
 from gslib.tab_complete import TabCompletionCache
@@ -32,7 +33,9 @@ from gslib.tests.util import ARGCOMPLETE_AVAILABLE
 from gslib.tests.util import SetBotoConfigForTest
 from gslib.tests.util import unittest
 from gslib.tests.util import WorkingDirectory
-from gslib.utils.boto_util import GetTabCompletionCacheFilename
+from gslib.utils.boto_util import GetTabCompletionCacheDir
+
+from unittest import mock
 
 
 @unittest.skipUnless(ARGCOMPLETE_AVAILABLE,
@@ -226,10 +229,8 @@ def _WriteTabCompletionCache(prefix,
                              results,
                              timestamp=None,
                              partial_results=False):
-  if timestamp is None:
-    timestamp = time.time()
-  cache = TabCompletionCache(prefix, results, timestamp, partial_results)
-  cache.WriteToFile(GetTabCompletionCacheFilename())
+  cache = TabCompletionCache(GetTabCompletionCacheDir())
+  cache.UpdateCache(prefix, results, partial_results, timestamp=timestamp)
 
 
 @unittest.skipUnless(ARGCOMPLETE_AVAILABLE,
@@ -237,10 +238,15 @@ def _WriteTabCompletionCache(prefix,
 class TestTabCompleteUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
   """Unit tests for tab completion."""
 
+  def _BotoConfig(self):
+    # Prefetching would fork the test process.
+    return [('GSUtil', 'state_dir', self.CreateTempDir()),
+            ('GSUtil', 'tab_completion_prefetch', 'False')]
+
   def test_cached_results(self):
     """Tests tab completion results returned from cache."""
 
-    with SetBotoConfigForTest([('GSUtil', 'state_dir', self.CreateTempDir())]):
+    with SetBotoConfigForTest(self._BotoConfig()):
       request = 'gs://prefix'
       cached_results = ['gs://prefix1', 'gs://prefix2']
 
@@ -254,7 +260,7 @@ class TestTabCompleteUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
   def test_expired_cached_results(self):
     """Tests tab completion results not returned from cache when too old."""
 
-    with SetBotoConfigForTest([('GSUtil', 'state_dir', self.CreateTempDir())]):
+    with SetBotoConfigForTest(self._BotoConfig()):
       bucket_base_name = self.MakeTempName('bucket')
       bucket_name = bucket_base_name + '-suffix'
       self.CreateBucket(bucket_name)
@@ -279,7 +285,7 @@ class TestTabCompleteUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
     completion should return results from the cache that start with the prefix.
     """
 
-    with SetBotoConfigForTest([('GSUtil', 'state_dir', self.CreateTempDir())]):
+    with SetBotoConfigForTest(self._BotoConfig()):
       cached_prefix = 'gs://prefix'
       cached_results = ['gs://prefix-first', 'gs://prefix-second']
       _WriteTabCompletionCache(cached_prefix, cached_results)
@@ -298,7 +304,7 @@ class TestTabCompleteUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
     be used.
     """
 
-    with SetBotoConfigForTest([('GSUtil', 'state_dir', self.CreateTempDir())]):
+    with SetBotoConfigForTest(self._BotoConfig()):
       object_uri = self.CreateObject(object_name='subdir/subobj',
                                      contents=b'test data')
 
@@ -327,7 +333,7 @@ class TestTabCompleteUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
     and an empty result set should be returned.
     """
 
-    with SetBotoConfigForTest([('GSUtil', 'state_dir', self.CreateTempDir())]):
+    with SetBotoConfigForTest(self._BotoConfig()):
       object_uri = self.CreateObject(object_name='obj', contents=b'test data')
 
       cached_prefix = '%s://%s/' % (self.default_provider,
@@ -350,7 +356,7 @@ class TestTabCompleteUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
     the matching results for the prefix may be incomplete.
     """
 
-    with SetBotoConfigForTest([('GSUtil', 'state_dir', self.CreateTempDir())]):
+    with SetBotoConfigForTest(self._BotoConfig()):
       object_uri = self.CreateObject(object_name='obj', contents=b'test data')
 
       cached_prefix = '%s://%s/' % (self.default_provider,
@@ -366,3 +372,80 @@ class TestTabCompleteUnitTests(testcase.unit_testcase.GsUtilUnitTestCase):
       results = completer(request)
 
       self.assertEqual([str(object_uri)], results)
+
+  def test_cached_listings_of_several_prefixes(self):
+    """Tests that listings of different prefixes are all cached."""
+
+    with SetBotoConfigForTest(self._BotoConfig()):
+      _WriteTabCompletionCache('gs://bucket1/', ['gs://bucket1/a'])
+      _WriteTabCompletionCache('gs://bucket2/', ['gs://bucket2/b'])
+
+      completer = CloudObjectCompleter(self.MakeGsUtilApi())
+      self.assertEqual(['gs://bucket1/a'], completer('gs://bucket1/'))
+      self.assertEqual(['gs://bucket2/b'], completer('gs://bucket2/'))
+
+  def test_least_recently_used_listings_removed(self):
+    """Tests that the cache keeps only its most recently used listings."""
+
+    with SetBotoConfigForTest(self._BotoConfig()):
+      cache = TabCompletionCache(GetTabCompletionCacheDir(), max_entries=2)
+      now = time.time()
+      cache.UpdateCache('gs://b1/', ['gs://b1/o'], False, timestamp=now - 3)
+      cache.UpdateCache('gs://b2/', ['gs://b2/o'], False, timestamp=now - 2)
+      # Using the oldest listing makes the second one the least recently used.
+      self.assertEqual(['gs://b1/o'], cache.GetCachedResults('gs://b1/'))
+      cache.UpdateCache('gs://b3/', ['gs://b3/o'], False)
+
+      self.assertEqual(['gs://b1/o'], cache.GetCachedResults('gs://b1/o'))
+      self.assertIsNone(cache.GetCachedResults('gs://b2/'))
+      self.assertEqual(['gs://b3/o'], cache.GetCachedResults('gs://b3/'))
+
+  def test_checking_for_prefetches_does_not_renew_listings(self):
+    """Tests that checking which prefixes to prefetch leaves the cache as is."""
+
+    with SetBotoConfigForTest(self._BotoConfig()):
+      cache = TabCompletionCache(GetTabCompletionCacheDir())
+      timestamp = time.time() - TAB_COMPLETE_CACHE_TTL / 2
+      cache.UpdateCache('gs://b/', ['gs://b/dir/', 'gs://b/obj'],
+                        False,
+                        timestamp=timestamp)
+      entry_path = cache._GetEntryPath('gs://b/')
+
+      self.assertTrue(cache.HasCachedResults('gs://b/o'))
+      self.assertFalse(cache.HasCachedResults('gs://c/'))
+      completer = CloudObjectCompleter(self.MakeGsUtilApi())
+      self.assertEqual(['gs://b/dir/'],
+                       completer._GetPrefixesToPrefetch(
+                           'gs://b/o', ['gs://b/dir/', 'gs://b/obj'], cache))
+      self.assertAlmostEqual(timestamp, os.path.getmtime(entry_path), places=2)
+
+  def test_prefetch(self):
+    """Tests that completion listings likely to be completed next are cached."""
+
+    with SetBotoConfigForTest(self._BotoConfig() +
+                              [('GSUtil', 'tab_completion_prefetch', 'True')]):
+      bucket_uri = self.CreateBucket()
+      self.CreateObject(bucket_uri=bucket_uri,
+                        object_name='dir/obj',
+                        contents=b'test data')
+      self.CreateObject(bucket_uri=bucket_uri,
+                        object_name='dir-obj',
+                        contents=b'test data')
+      bucket_prefix = '%s://%s/' % (self.default_provider,
+                                    bucket_uri.bucket_name)
+
+      completer = CloudObjectCompleter(self.MakeGsUtilApi())
+      # Run the prefetch in this process rather than in a forked one.
+      with mock.patch.object(tab_complete, '_RunInBackgroundProcess',
+                             lambda func, *args: func(*args)):
+        results = completer(bucket_prefix + 'di')
+
+      self.assertEqual(
+          sorted([bucket_prefix + 'dir-obj', bucket_prefix + 'dir/']),
+          sorted(results))
+      cache = TabCompletionCache(GetTabCompletionCacheDir())
+      self.assertEqual(
+          sorted([bucket_prefix + 'dir-obj', bucket_prefix + 'dir/']),
+          cache.GetCachedResults(bucket_prefix))
+      self.assertEqual([bucket_prefix + 'dir/obj'],
+                       cache.GetCachedResults(bucket_prefix + 'dir/'))
@@ -28,14 +28,20 @@ from gslib.parallel_tracker_file import ReadParallelUploadTrackerFile
 from gslib.parallel_tracker_file import ValidateParallelCompositeTrackerData
 from gslib.parallel_tracker_file import WriteComponentToParallelUploadTrackerFile
 from gslib.parallel_tracker_file import WriteParallelUploadTrackerFile
+from gslib.sqlite_tracker_store import SqliteTrackerStore
+from gslib.sqlite_tracker_store import TRACKER_DB_FILE_NAME
 from gslib.storage_url import StorageUrlFromString
 from gslib.tests.testcase.unit_testcase import GsUtilUnitTestCase
+from gslib.tests.util import SetBotoConfigForTest
 from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
 from gslib.tracker_file import _HashFilename
 from gslib.tracker_file import DeleteTrackerFile
 from gslib.tracker_file import GetRewriteTrackerFilePath
 from gslib.tracker_file import HashRewriteParameters
 from gslib.tracker_file import ReadRewriteTrackerFile
+from gslib.tracker_file import ReadTrackerFile
+from gslib.tracker_file import TrackerFileType
+from gslib.tracker_file import WriteDownloadComponentTrackerFile
 from gslib.tracker_file import WriteRewriteTrackerFile
 from gslib.utils import parallelism_framework_util
 from gslib.utils.constants import UTF8
@@ -235,3 +241,113 @@ class TestTrackerFile(GsUtilUnitTestCase):
     self.assertEqual(True, command_obj.delete_called)
     self.assertEqual(None, actual_prefix)
     self.assertEqual([], actual_objects)
+
+
+class TestSqliteTrackerStore(GsUtilUnitTestCase):
+  """Unit tests for tracker functions backed by the SQLite tracker store."""
+
+  def setUp(self):
+    super(TestSqliteTrackerStore, self).setUp()
+    self.tracker_dir = self.CreateTempDir()
+    self.boto_config = [
+        ('GSUtil', 'resumable_tracker_store', 'sqlite'),
+        ('GSUtil', 'resumable_tracker_dir', self.tracker_dir),
+    ]
+
+  def _TrackerDirFiles(self):
+    return [
+        f for f in os.listdir(self.tracker_dir)
+        if not f.startswith(TRACKER_DB_FILE_NAME)
+    ]
+
+  def testRewriteTrackerFileUsesStore(self):
+    with SetBotoConfigForTest(self.boto_config):
+      tracker_file_name = GetRewriteTrackerFilePath('bk1', 'obj1', 'bk2',
+                                                    'obj2', self.test_api)
+      WriteRewriteTrackerFile(tracker_file_name, 'hash1', 'token1')
+      self.assertEqual(ReadRewriteTrackerFile(tracker_file_name, 'hash1'),
+                       'token1')
+      self.assertIsNone(ReadRewriteTrackerFile(tracker_file_name, 'hash2'))
+      self.assertFalse(os.path.exists(tracker_file_name))
+      self.assertEqual([], self._TrackerDirFiles())
+      DeleteTrackerFile(tracker_file_name)
+      self.assertIsNone(ReadRewriteTrackerFile(tracker_file_name, 'hash1'))
+
+  def testReadsLegacyTrackerFile(self):
+    with SetBotoConfigForTest(self.boto_config):
+      tracker_file_name = GetRewriteTrackerFilePath('bk1', 'obj1', 'bk2',
+                                                    'obj2', self.test_api)
+      with open(tracker_file_name, 'w') as f:
+        f.write('hash1\ntoken1\n')
+      self.assertEqual(ReadRewriteTrackerFile(tracker_file_name, 'hash1'),
+                       'token1')
+      # Deleting removes both the store entry and the legacy file.
+      DeleteTrackerFile(tracker_file_name)
+      self.assertFalse(os.path.exists(tracker_file_name))
+      with self.assertRaises(IOError):
+        ReadTrackerFile(tracker_file_name)
+
+  def testParallelUploadTrackerFileUsesStore(self):
+    with SetBotoConfigForTest(self.boto_config):
+      fpath = os.path.join(self.tracker_dir,
+                           '%s_TRACKER_foo' % TrackerFileType.PARALLEL_UPLOAD)
+      objects = [ObjectFromTracker('obj1', '42')]
+      WriteParallelUploadTrackerFile(fpath,
+                                     '123',
+                                     objects,
+                                     encryption_key_sha256='456')
+      WriteComponentToParallelUploadTrackerFile(
+          fpath,
+          parallelism_framework_util.CreateLock(),
+          ObjectFromTracker('obj2', '43'),
+          self.logger,
+          encryption_key_sha256='456')
+      (actual_key, actual_prefix,
+       actual_objects) = ReadParallelUploadTrackerFile(fpath, self.logger)
+      self.assertEqual('456', actual_key)
+      self.assertEqual('123', actual_prefix)
+      self.assertEqual(objects + [ObjectFromTracker('obj2', '43')],
+                       actual_objects)
+      self.assertEqual([], self._TrackerDirFiles())
+
+  def testDeferredDownloadComponentWrites(self):
+    src_obj_metadata = apitools_messages.Object(etag='etag1', generation=1)
+    fpath = os.path.join(self.tracker_dir,
+                         '%s_TRACKER_foo' % TrackerFileType.DOWNLOAD_COMPONENT)
+    with SetBotoConfigForTest(self.boto_config):
+      WriteDownloadComponentTrackerFile(fpath, src_obj_metadata, 0)
+      WriteDownloadComponentTrackerFile(fpath,
+                                        src_obj_metadata,
+                                        100,
+                                        deferrable=True)
+      # Deferred writes are visible within this process immediately.
+      self.assertIn('"download_start_byte": 100', ReadTrackerFile(fpath))
+
+  def testStoreGetPutDelete(self):
+    store = SqliteTrackerStore(
+        os.path.join(self.CreateTempDir(), TRACKER_DB_FILE_NAME))
+    self.assertIsNone(store.Get('a'))
+    store.Put('a', TrackerFileType.UPLOAD, 'data1')
+    store.Put('b', TrackerFileType.DOWNLOAD, 'data2', deferrable=True)
+    self.assertEqual('data1', store.Get('a'))
+    self.assertEqual('data2', store.Get('b'))
+    store.Flush()
+    self.assertEqual('data2', store.Get('b'))
+    store.Delete('a')
+    self.assertIsNone(store.Get('a'))
+
+  def testStoreDeferredWritesSurviveReopen(self):
+    db_path = os.path.join(self.CreateTempDir(), TRACKER_DB_FILE_NAME)
+    store = SqliteTrackerStore(db_path)
+    store.Put('a', TrackerFileType.DOWNLOAD_COMPONENT, 'data1', deferrable=True)
+    self.assertIsNone(SqliteTrackerStore(db_path).Get('a'))
+    store.Flush()
+    self.assertEqual('data1', SqliteTrackerStore(db_path).Get('a'))
+
+  def testStoreDeleteEntriesOlderThan(self):
+    store = SqliteTrackerStore(
+        os.path.join(self.CreateTempDir(), TRACKER_DB_FILE_NAME))
+    store.Put('a', TrackerFileType.UPLOAD, 'data1')
+    self.assertEqual(0, store.DeleteEntriesOlderThan(60))
+    self.assertEqual(1, store.DeleteEntriesOlderThan(-60))
+    self.assertIsNone(store.Get('a'))
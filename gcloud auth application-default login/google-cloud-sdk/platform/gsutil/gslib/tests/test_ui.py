@@ -33,9 +33,11 @@ import crcmod
 import six
 from six.moves import queue as Queue
 
+from gslib import progress_callback
 from gslib.cs_api_map import ApiSelector
 from gslib.parallel_tracker_file import ObjectFromTracker
 from gslib.parallel_tracker_file import WriteParallelUploadTrackerFile
+from gslib.progress_callback import FileProgressCallbackHandler
 from gslib.storage_url import StorageUrlFromString
 import gslib.tests.testcase as testcase
 from gslib.tests.testcase.integration_testcase import SkipForS3
@@ -51,6 +53,7 @@ from gslib.thread_message import FileMessage
 from gslib.thread_message import FinalMessage
 from gslib.thread_message import MetadataMessage
 from gslib.thread_message import ProducerThreadMessage
+from gslib.thread_message import ProgressBatchMessage
 from gslib.thread_message import ProgressMessage
 from gslib.thread_message import SeekAheadMessage
 from gslib.tracker_file import DeleteTrackerFile
@@ -76,6 +79,8 @@ from gslib.utils.unit_util import HumanReadableWithDecimalPlaces
 from gslib.utils.unit_util import MakeHumanReadable
 from gslib.utils.unit_util import ONE_KIB
 
+from unittest import mock
+
 DOWNLOAD_SIZE = 300
 UPLOAD_SIZE = 400
 # Ensures at least one progress callback is made
@@ -1502,6 +1507,66 @@ class TestUiUnitTests(testcase.GsUtilUnitTestCase):
     # MetadataManager.
     self.assertIsInstance(ui_controller.manager, DataManager)
 
+  def test_ui_progress_batching(self):
+    """Tests that progress updates from workers are posted in batches."""
+    start_time = self.start_time
+    src_url1 = StorageUrlFromString('gs://bucket/obj1')
+    src_url2 = StorageUrlFromString('gs://bucket/obj2')
+
+    # Pending updates are posted periodically, keeping only the latest.
+    status_queue = Queue.Queue()
+    with mock.patch.object(progress_callback, '_PROGRESS_FLUSH_SECONDS', 0.01):
+      callback = FileProgressCallbackHandler(status_queue,
+                                             src_url=src_url1).call
+      callback(10, 100)
+      callback(20, 100)
+      message = status_queue.get(timeout=5)
+    self.assertIsInstance(message, ProgressMessage)
+    self.assertEqual(20, message.processed_bytes)
+
+    # A finished file or component flushes the batch at once.
+    status_queue = Queue.Queue()
+    with mock.patch.object(progress_callback, '_PROGRESS_FLUSH_SECONDS', 60):
+      callback1 = FileProgressCallbackHandler(status_queue,
+                                              src_url=src_url1).call
+      callback2 = FileProgressCallbackHandler(status_queue,
+                                              src_url=src_url2).call
+      for i in range(1, 10):
+        callback1(i, 100)
+        callback2(i, 100)
+      self.assertTrue(status_queue.empty())
+      callback1(100, 100)
+    batch = status_queue.get_nowait()
+    self.assertTrue(status_queue.empty())
+    self.assertIsInstance(batch, ProgressBatchMessage)
+    self.assertEqual([(src_url2, 9), (src_url1, 100)],
+                     [(message.src_url, message.processed_bytes)
+                      for message in batch.messages])
+
+    # The UI handles each message in the batch.
+    ui_controller = UIController(custom_time=start_time)
+    stream = six.StringIO()
+    for src_url in (src_url1, src_url2):
+      ui_controller.Call(
+          FileMessage(src_url,
+                      None,
+                      start_time,
+                      size=100,
+                      message_type=FileMessage.FILE_DOWNLOAD), stream)
+    ui_controller.Call(batch, stream)
+    self.assertEqual(109, ui_controller.manager.total_progress)
+    ui_controller.Call(
+        FileMessage(src_url1,
+                    None,
+                    start_time + 1,
+                    size=100,
+                    finished=True,
+                    message_type=FileMessage.FILE_DOWNLOAD), stream)
+    # Superseded updates arriving after a file finished are ignored.
+    ui_controller.Call(ProgressMessage(100, 50, src_url1, start_time + 2),
+                       stream)
+    self.assertEqual(109, ui_controller.manager.total_progress)
+
   def test_ui_BytesToFixedWidthString(self):
     """Tests the correctness of BytesToFixedWidthString."""
     self.assertEqual('    0.0 B', BytesToFixedWidthString(0, decimal_places=1))
@@ -26,6 +26,8 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+from concurrent import futures
+import os
 import re
 import six
 import tempfile
@@ -36,8 +38,14 @@ from gslib.storage_url import ContainsWildcard
 from gslib.storage_url import StorageUrlFromString
 import gslib.tests.testcase as testcase
 from gslib.tests.util import ObjectToURI as suri
+from gslib.tests.util import SetBotoConfigForTest
 from gslib.tests.util import SetDummyProjectForUnitTest
 
+from six import add_move, MovedModule
+
+add_move(MovedModule('mock', 'mock', 'unittest.mock'))
+from six.moves import mock
+
 
 class CloudWildcardIteratorTests(testcase.GsUtilUnitTestCase):
   """Unit tests for CloudWildcardIterator."""
@@ -525,3 +533,84 @@ class FileIteratorTests(testcase.GsUtilUnitTestCase):
         for u in self._test_wildcard_iterator(uri, exclude_tuple=exclude_tuple).
         IterAll(expand_top_level_buckets=True))
     self.assertEqual(exp_uri_strs, actual_uri_strs)
+
+  def testRecursiveListingOrderAndStats(self):
+    """Tests that recursive listing is ordered and carries stat results."""
+    test_dir = self.CreateTempDir(test_files=[
+        'b', ('a', 'y'), ('a', 'x'), ('a', 'sub', 'z'), ('c', 'w'), 'a0'
+    ])
+    expected = [
+        suri(test_dir, *path.split('/'))
+        for path in ('a0', 'b', 'a/x', 'a/y', 'a/sub/z', 'c/w')
+    ]
+    uri = self._test_storage_uri(suri(test_dir, '**'))
+    for thread_count in ('1', '4'):
+      with SetBotoConfigForTest([('GSUtil', 'local_listing_thread_count',
+                                  thread_count)]):
+        blrs = list(
+            self._test_wildcard_iterator(uri).IterAll(
+                bucket_listing_fields=['size']))
+      self.assertEqual(expected, [str(blr) for blr in blrs])
+      for blr in blrs:
+        self.assertEqual(os.stat(blr.storage_url.object_name).st_ino,
+                         blr.file_stat.st_ino)
+        self.assertEqual(blr.file_stat.st_size, blr.root_object.size)
+
+  def testRecursiveListingStopsEarly(self):
+    """Tests that abandoning a recursive listing part way through is clean."""
+    test_dir = self.CreateTempDir(test_files=[('d%d' % i, 'f')
+                                              for i in range(20)])
+    iterator = self._test_wildcard_iterator(
+        self._test_storage_uri(suri(test_dir, '**'))).IterAll()
+    self.assertEqual(suri(test_dir, 'd0', 'f'), str(next(iterator)))
+    iterator.close()
+
+  def testRecursiveListingBoundsOutstandingScans(self):
+    """Tests that a wide tree is not scanned far ahead of iteration."""
+    test_dir = self.CreateTempDir(test_files=[('d%02d' % i, 'f')
+                                              for i in range(40)])
+    submitted = []
+
+    class RecordingExecutor(futures.ThreadPoolExecutor):
+
+      def submit(self, fn, dirpath, *args):
+        submitted.append(dirpath)
+        return super(RecordingExecutor, self).submit(fn, dirpath, *args)
+
+    executor = RecordingExecutor(max_workers=2)
+    self.addCleanup(executor.shutdown)
+    uri = self._test_storage_uri(suri(test_dir, '**'))
+    with SetBotoConfigForTest([('GSUtil', 'local_listing_thread_count', '2')
+                              ]), mock.patch.object(wildcard_iterator,
+                                                    '_GetListingExecutor',
+                                                    return_value=executor):
+      iterator = self._test_wildcard_iterator(uri).IterAll()
+      self.assertEqual(suri(test_dir, 'd00', 'f'), str(next(iterator)))
+      # The root, the 2 * 2 scans started when it was listed, and one more
+      # once d00's scan was consumed.
+      self.assertEqual(6, len(submitted))
+      self.assertEqual(40, len(list(iterator)) + 1)
+    self.assertEqual(41, len(submitted))
+
+  def testListingThreadPoolIsShared(self):
+    """Tests that listings in a process share one thread pool."""
+    self.assertIs(wildcard_iterator._GetListingExecutor(2),
+                  wildcard_iterator._GetListingExecutor(4))
+
+  def testRecursiveListingDetectsContentTypes(self):
+    """Tests that content types are detected while listing if requested."""
+    test_dir = self.CreateTempDir(test_files=[('sub', 'page')])
+    with open(os.path.join(test_dir, 'sub', 'page'), 'wb') as f:
+      f.write(b'<html><body></body></html>')
+    uri = self._test_storage_uri(suri(test_dir, '**'))
+    for use_magicfile in ('False', 'True'):
+      with SetBotoConfigForTest([('GSUtil', 'use_magicfile', use_magicfile)]):
+        blrs = list(
+            self._test_wildcard_iterator(uri).IterAll(
+                bucket_listing_fields=['contentType']))
+      self.assertEqual(1, len(blrs))
+      if use_magicfile == 'True':
+        self.assertEqual('text/html; charset=us-ascii',
+                         blrs[0].root_object.contentType)
+      else:
+        self.assertIsNone(blrs[0].root_object)
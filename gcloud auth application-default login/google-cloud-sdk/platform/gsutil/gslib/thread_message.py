@@ -281,6 +281,32 @@ class ProgressMessage(StatusMessage):
              operation_name_string, self.process_id, self.thread_id))
 
 
+class ProgressBatchMessage(StatusMessage):
+  """Message class for a batch of ProgressMessages.
+
+  Worker processes and threads coalesce their progress updates and post them
+  in batches, so that frequent updates don't each cost a round trip through
+  the status queue.
+  """
+
+  def __init__(self, messages, message_time):
+    """Creates a ProgressBatchMessage.
+
+    Args:
+      messages: List of ProgressMessages, in the order they were created.
+      message_time: Float representing when message was created (seconds since
+          Epoch).
+    """
+    super(ProgressBatchMessage, self).__init__(message_time)
+    self.messages = messages
+
+  def __str__(self):
+    """Returns a string with a valid constructor for this message."""
+    return ('%s([%s], %s)' %
+            (self.__class__.__name__, ', '.join(
+                str(message) for message in self.messages), self.time))
+
+
 class SeekAheadMessage(StatusMessage):
   """Message class for results obtained by SeekAheadThread().
 
@@ -368,3 +394,41 @@ class PerformanceSummaryMessage(StatusMessage):
     """Returns a string with a valid constructor for this message."""
     return ('%s(%s, %s)' %
             (self.__class__.__name__, self.time, self.uses_slice))
+
+
+class HedgedRequestMessage(StatusMessage):
+  """Message class for hedged download requests.
+
+  This class reports requests that were duplicated because they stalled, and
+  the bytes discarded by the requests that were abandoned as a result.
+  """
+
+  def __init__(self,
+               num_hedges,
+               wasted_bytes,
+               message_time,
+               process_id=None,
+               thread_id=None):
+    """Creates a HedgedRequestMessage.
+
+    Args:
+      num_hedges: Number of requests sent to duplicate stalled ones.
+      wasted_bytes: Number of bytes received and discarded by abandoned
+          requests.
+      message_time: Float representing when message was created (seconds since
+          Epoch).
+      process_id: Process ID that produced this message (overridable for
+          testing).
+      thread_id: Thread ID that produced this message (overridable for testing).
+    """
+    super(HedgedRequestMessage, self).__init__(message_time,
+                                               process_id=process_id,
+                                               thread_id=thread_id)
+    self.num_hedges = num_hedges
+    self.wasted_bytes = wasted_bytes
+
+  def __str__(self):
+    """Returns a string with a valid constructor for this message."""
+    return ('%s(%s, %s, %s, process_id=%s, thread_id=%s)' %
+            (self.__class__.__name__, self.num_hedges, self.wasted_bytes,
+             self.time, self.process_id, self.thread_id))
@@ -24,11 +24,13 @@ import hashlib
 import json
 import os
 import re
+import sqlite3
 import sys
 import six
 
 from boto import config
 from gslib.exception import CommandException
+from gslib.sqlite_tracker_store import GetSqliteTrackerStore
 from gslib.utils.boto_util import GetGsutilStateDir
 from gslib.utils.boto_util import ResumableThreshold
 from gslib.utils.constants import UTF8
@@ -44,6 +46,15 @@ TRACKER_FILE_UNWRITABLE_EXCEPTION_TEXT = (
     'Couldn\'t write tracker file (%s): %s. This can happen if gsutil is '
     'configured to save tracker files to an unwritable directory)')
 
+# Values for the resumable_tracker_store boto config option.
+TRACKER_STORE_FILES = 'files'
+TRACKER_STORE_SQLITE = 'sqlite'
+DEFAULT_RESUMABLE_TRACKER_STORE = TRACKER_STORE_FILES
+
+# Entries in the SQLite tracker store that have not been updated for this
+# many days are discarded.
+DEFAULT_TRACKER_STORE_MAX_AGE_DAYS = 30
+
 # Format for upload tracker files.
 ENCRYPTION_UPLOAD_TRACKER_ENTRY = 'encryption_key_sha256'
 SERIALIZATION_UPLOAD_TRACKER_ENTRY = 'serialization_data'
@@ -216,15 +227,11 @@ def GetSlicedDownloadTrackerFilePaths(dst_url,
 
   # If we don't know the number of components, check the tracker file.
   if num_components is None:
-    tracker_file = None
     try:
-      tracker_file = open(parallel_tracker_file_path, 'r')
-      num_components = json.load(tracker_file)['num_components']
+      num_components = json.loads(
+          ReadTrackerFile(parallel_tracker_file_path))['num_components']
     except (IOError, ValueError):
       return tracker_file_paths
-    finally:
-      if tracker_file:
-        tracker_file.close()
 
   for i in range(num_components):
     tracker_file_paths.append(
@@ -256,8 +263,66 @@ def _HashAndReturnPath(res_tracker_file_name, tracker_file_type):
   return tracker_file_path
 
 
+def _GetTrackerStore():
+  """Returns the SqliteTrackerStore if one is configured, else None."""
+  store_type = config.get('GSUtil', 'resumable_tracker_store',
+                          DEFAULT_RESUMABLE_TRACKER_STORE)
+  if store_type != TRACKER_STORE_SQLITE:
+    return None
+  tracker_dir = CreateTrackerDirIfNeeded()
+  max_age_days = config.getint('GSUtil', 'tracker_store_max_age_days',
+                               DEFAULT_TRACKER_STORE_MAX_AGE_DAYS)
+  try:
+    return GetSqliteTrackerStore(tracker_dir,
+                                 max_age_seconds=max_age_days * 24 * 60 * 60)
+  except sqlite3.Error as e:
+    RaiseUnwritableTrackerFileException(tracker_dir, str(e))
+
+
+def _TrackerStoreKey(tracker_file_name):
+  """Returns the tracker store key for a tracker file path."""
+  return os.path.basename(tracker_file_name)
+
+
+def ReadTrackerFile(tracker_file_name):
+  """Reads the contents of a tracker file.
+
+  If a tracker store is configured, the contents are read from it, falling back
+  to a tracker file on disk (such as one left by an earlier gsutil version) if
+  the store has no entry.
+
+  Args:
+    tracker_file_name: Tracker file path string.
+
+  Returns:
+    String contents of the tracker file.
+
+  Raises:
+    IOError if the tracker file could not be read; errno is ENOENT if it does
+    not exist.
+  """
+  store = _GetTrackerStore()
+  if store:
+    try:
+      data = store.Get(_TrackerStoreKey(tracker_file_name))
+    except sqlite3.Error as e:
+      raise IOError(errno.EIO, str(e), tracker_file_name)
+    if data is not None:
+      return data
+  with open(tracker_file_name, 'r') as tracker_file:
+    return tracker_file.read()
+
+
 def DeleteTrackerFile(tracker_file_name):
-  if tracker_file_name and os.path.exists(tracker_file_name):
+  if not tracker_file_name:
+    return
+  store = _GetTrackerStore()
+  if store:
+    try:
+      store.Delete(_TrackerStoreKey(tracker_file_name))
+    except sqlite3.Error as e:
+      RaiseUnwritableTrackerFileException(tracker_file_name, str(e))
+  if os.path.exists(tracker_file_name):
     os.unlink(tracker_file_name)
 
 
@@ -341,24 +406,20 @@ def ReadRewriteTrackerFile(tracker_file_name, rewrite_params_hash):
     file exists, None otherwise (which will result in starting a new rewrite).
   """
   # Check to see if we already have a matching tracker file.
-  tracker_file = None
   if not rewrite_params_hash:
     return
   try:
-    tracker_file = open(tracker_file_name, 'r')
-    existing_hash = tracker_file.readline().rstrip('\n')
+    tracker_lines = ReadTrackerFile(tracker_file_name).split('\n')
+    existing_hash = tracker_lines[0]
     if existing_hash == rewrite_params_hash:
       # Next line is the rewrite token.
-      return tracker_file.readline().rstrip('\n')
+      return tracker_lines[1] if len(tracker_lines) > 1 else ''
   except IOError as e:
     # Ignore non-existent file (happens first time a rewrite is attempted.
     if e.errno != errno.ENOENT:
       sys.stderr.write(
           ('Couldn\'t read Copy tracker file (%s): %s. Restarting copy '
            'from scratch.' % (tracker_file_name, e.strerror)))
-  finally:
-    if tracker_file:
-      tracker_file.close()
 
 
 def WriteRewriteTrackerFile(tracker_file_name, rewrite_params_hash,
@@ -427,16 +488,15 @@ def ReadOrCreateDownloadTrackerFile(src_obj_metadata,
                                          tracker_file_type,
                                          api_selector,
                                          component_num=component_num)
-  tracker_file = None
   # Check to see if we already have a matching tracker file.
   try:
-    tracker_file = open(tracker_file_name, 'r')
+    tracker_data = ReadTrackerFile(tracker_file_name)
     if tracker_file_type is TrackerFileType.DOWNLOAD:
-      etag_value = tracker_file.readline().rstrip('\n')
+      etag_value = tracker_data.split('\n', 1)[0]
       if etag_value == src_obj_metadata.etag:
         return tracker_file_name, existing_file_size
     elif tracker_file_type is TrackerFileType.DOWNLOAD_COMPONENT:
-      component_data = json.loads(tracker_file.read())
+      component_data = json.loads(tracker_data)
       if (component_data['etag'] == src_obj_metadata.etag and
           component_data['generation'] == src_obj_metadata.generation):
         return tracker_file_name, component_data['download_start_byte']
@@ -450,9 +510,6 @@ def ReadOrCreateDownloadTrackerFile(src_obj_metadata,
     if isinstance(e, ValueError) or e.errno != errno.ENOENT:
       logger.warn('Couldn\'t read download tracker file (%s): %s. Restarting '
                   'download from scratch.' % (tracker_file_name, str(e)))
-  finally:
-    if tracker_file:
-      tracker_file.close()
 
   # There wasn't a matching tracker file, so create one and then start the
   # download from scratch.
@@ -507,16 +564,15 @@ def GetDownloadStartByte(src_obj_metadata,
                                          tracker_file_type,
                                          api_selector,
                                          component_num=component_num)
-  tracker_file = None
   # Check to see if we already have a matching tracker file.
   try:
-    tracker_file = open(tracker_file_name, 'r')
+    tracker_data = ReadTrackerFile(tracker_file_name)
     if tracker_file_type is TrackerFileType.DOWNLOAD:
-      etag_value = tracker_file.readline().rstrip('\n')
+      etag_value = tracker_data.split('\n', 1)[0]
       if etag_value == src_obj_metadata.etag:
         return existing_file_size
     elif tracker_file_type is TrackerFileType.DOWNLOAD_COMPONENT:
-      component_data = json.loads(tracker_file.read())
+      component_data = json.loads(tracker_data)
       if (component_data['etag'] == src_obj_metadata.etag and
           component_data['generation'] == src_obj_metadata.generation):
         return component_data['download_start_byte']
@@ -525,23 +581,24 @@ def GetDownloadStartByte(src_obj_metadata,
     # If the file does not exist, there is not much we can do at this point.
     pass
 
-  finally:
-    if tracker_file:
-      tracker_file.close()
-
   # There wasn't a matching tracker file, which means our starting point is
   # start_byte.
   return start_byte
 
 
-def WriteDownloadComponentTrackerFile(tracker_file_name, src_obj_metadata,
-                                      current_file_pos):
+def WriteDownloadComponentTrackerFile(tracker_file_name,
+                                      src_obj_metadata,
+                                      current_file_pos,
+                                      deferrable=False):
   """Updates or creates a download component tracker file on disk.
 
   Args:
     tracker_file_name: The name of the tracker file.
     src_obj_metadata: Metadata for the source object. Must include etag.
     current_file_pos: The current position in the file.
+    deferrable: If True and a tracker store is configured, the update may be
+        batched with later updates. Only safe for progress updates, since
+        losing one merely causes a resumed download to start further back.
   """
   component_data = {
       'etag': src_obj_metadata.etag,
@@ -549,11 +606,23 @@ def WriteDownloadComponentTrackerFile(tracker_file_name, src_obj_metadata,
       'download_start_byte': current_file_pos,
   }
 
-  _WriteTrackerFile(tracker_file_name, json.dumps(component_data))
+  _WriteTrackerFile(tracker_file_name,
+                    json.dumps(component_data),
+                    deferrable=deferrable)
 
 
-def _WriteTrackerFile(tracker_file_name, data):
+def _WriteTrackerFile(tracker_file_name, data, deferrable=False):
   """Creates a tracker file, storing the input data."""
+  store = _GetTrackerStore()
+  if store:
+    key = _TrackerStoreKey(tracker_file_name)
+    # Tracker file names are prefixed by their TrackerFileType.
+    tracker_file_type = key.split('_TRACKER_', 1)[0]
+    try:
+      store.Put(key, tracker_file_type, data, deferrable=deferrable)
+      return False
+    except sqlite3.Error as e:
+      raise RaiseUnwritableTrackerFileException(tracker_file_name, str(e))
   try:
     fd = os.open(tracker_file_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
                  0o600)
@@ -592,15 +661,13 @@ def GetUploadTrackerData(tracker_file_name, logger, encryption_key_sha256=None):
     Serialization data if the tracker file already exists (resume existing
     upload), None otherwise.
   """
-  tracker_file = None
   remove_tracker_file = False
   encryption_restart = False
 
   # If we already have a matching tracker file, get the serialization data
   # so that we can resume the upload.
   try:
-    tracker_file = open(tracker_file_name, 'r')
-    tracker_data = tracker_file.read()
+    tracker_data = ReadTrackerFile(tracker_file_name)
     tracker_json = json.loads(tracker_data)
     if tracker_json[ENCRYPTION_UPLOAD_TRACKER_ENTRY] != encryption_key_sha256:
       encryption_restart = True
@@ -625,8 +692,6 @@ def GetUploadTrackerData(tracker_file_name, logger, encryption_key_sha256=None):
       # If encryption key is still None, we can resume using the old format.
       return tracker_data
   finally:
-    if tracker_file:
-      tracker_file.close()
     if encryption_restart:
       logger.warn(
           'Upload tracker file (%s) does not match current encryption '
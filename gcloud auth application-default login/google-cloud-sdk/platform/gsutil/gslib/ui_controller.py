@@ -26,13 +26,16 @@ import time
 
 from six.moves import queue as Queue
 
+from gslib.metrics import LogHedgedRequests
 from gslib.metrics import LogPerformanceSummaryParams
 from gslib.metrics import LogRetryableError
 from gslib.thread_message import FileMessage
 from gslib.thread_message import FinalMessage
+from gslib.thread_message import HedgedRequestMessage
 from gslib.thread_message import MetadataMessage
 from gslib.thread_message import PerformanceSummaryMessage
 from gslib.thread_message import ProducerThreadMessage
+from gslib.thread_message import ProgressBatchMessage
 from gslib.thread_message import ProgressMessage
 from gslib.thread_message import RetryableErrorMessage
 from gslib.thread_message import SeekAheadMessage
@@ -165,6 +168,10 @@ class StatusMessageManager(object):
     self.num_objects = 0
     # Only used on data operations. Will remain 0 for metadata operations.
     self.total_size = 0
+    # Download requests duplicated because they stalled, and the bytes
+    # discarded as a result.
+    self.num_hedged_requests = 0
+    self.hedge_wasted_bytes = 0
 
     # Time at last info update displayed.
     self.refresh_message_time = (self.custom_time
@@ -354,6 +361,11 @@ class StatusMessageManager(object):
     if self.total_size:
       string_to_print += ('/%s' %
                           HumanReadableWithDecimalPlaces(self.total_size))
+    if self.num_hedged_requests:
+      string_to_print += (
+          ', %s slow requests hedged (%s discarded)' %
+          (DecimalShort(self.num_hedged_requests),
+           HumanReadableWithDecimalPlaces(self.hedge_wasted_bytes)))
     remaining_width = self.console_width - len(string_to_print)
     if not self.quiet_mode:
       stream.write(('\n' + string_to_print + '.' +
@@ -743,6 +755,10 @@ class DataManager(StatusMessageManager):
     """
     # Retrieving index and dict for this file.
     file_name = status_message.src_url.url_string
+    if file_name not in self.individual_file_progress:
+      # Progress is posted in batches, so an update that was superseded may
+      # arrive after the file finished. The file's size was counted then.
+      return
     file_progress = self.individual_file_progress[file_name]
 
     # Retrieves last update ((0,0) if no previous update) for this file or
@@ -793,6 +809,11 @@ class DataManager(StatusMessageManager):
     elif isinstance(status_message, RetryableErrorMessage):
       LogRetryableError(status_message)
 
+    elif isinstance(status_message, HedgedRequestMessage):
+      self.num_hedged_requests += status_message.num_hedges
+      self.hedge_wasted_bytes += status_message.wasted_bytes
+      LogHedgedRequests(status_message)
+
     elif isinstance(status_message, PerformanceSummaryMessage):
       self._HandlePerformanceSummaryMessage(status_message)
 
@@ -899,6 +920,7 @@ class DataManager(StatusMessageManager):
         ProgressMessage,
         FinalMessage,
         RetryableErrorMessage,
+        HedgedRequestMessage,
         PerformanceSummaryMessage,
     )):
       return True
@@ -1017,6 +1039,10 @@ class UIController(object):
                               stream,
                               cur_time=estimation_message.time)
       return
+    if isinstance(status_message, ProgressBatchMessage):
+      for message in status_message.messages:
+        self.Call(message, stream, cur_time=cur_time)
+      return
     if self.dump_status_message_fp:
       # TODO: Add Unicode support to string methods on message classes.
       # Currently, dump will fail with a UnicodeEncodeErorr if the message
@@ -317,11 +317,13 @@ def GetTabCompletionLogFilename():
   return os.path.join(GetGsutilStateDir(), 'tab-completion-logs')
 
 
-def GetTabCompletionCacheFilename():
+def GetTabCompletionCacheDir():
   tab_completion_dir = os.path.join(GetGsutilStateDir(), 'tab-completion')
   # Limit read permissions on the directory to owner for privacy.
   system_util.CreateDirIfNeeded(tab_completion_dir, mode=0o700)
-  return os.path.join(tab_completion_dir, 'cache')
+  cache_dir = os.path.join(tab_completion_dir, 'listings')
+  system_util.CreateDirIfNeeded(cache_dir, mode=0o700)
+  return cache_dir
 
 
 def HasConfiguredCredentials():
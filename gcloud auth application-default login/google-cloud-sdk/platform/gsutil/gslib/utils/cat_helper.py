@@ -19,19 +19,27 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import collections
+from concurrent import futures
 import io
+import os
 import sys
+import threading
 
 from boto import config
 
+from gslib.cloud_api import CloudApi
 from gslib.cloud_api import EncryptionException
+from gslib.cloud_api_delegator import CloudApiDelegator
 from gslib.exception import CommandException
 from gslib.exception import NO_URLS_MATCHED_TARGET
 from gslib.storage_url import StorageUrlFromString
+from gslib.utils.cloud_api_helper import GetDownloadSerializationData
 from gslib.utils.encryption_helper import CryptoKeyWrapperFromKey
 from gslib.utils.encryption_helper import FindMatchingCSEKInBotoConfig
 from gslib.utils.metadata_util import ObjectIsGzipEncoded
 from gslib.utils import text_util
+from gslib.utils.unit_util import HumanReadableToBytes
 
 _CAT_BUCKET_LISTING_FIELDS = [
     'bucket',
@@ -40,10 +48,37 @@ _CAT_BUCKET_LISTING_FIELDS = [
     'customerEncryption',
     'generation',
     'md5Hash',
+    'mediaLink',
     'name',
     'size',
 ]
 
+# Sliced cat is disabled unless a threshold is configured, since it holds up
+# to max_components * component_size bytes in memory per object.
+DEFAULT_SLICED_OBJECT_CAT_THRESHOLD = '0'
+DEFAULT_SLICED_OBJECT_CAT_COMPONENT_SIZE = '16M'
+DEFAULT_SLICED_OBJECT_CAT_MAX_COMPONENTS = 8
+
+
+class _RangeBuffer(io.BytesIO):
+  """In-memory download stream for one byte range of an object.
+
+  Positions are reported as offsets within the object, so that a resumable
+  download retrying the range resumes from the last byte received.
+  """
+
+  def __init__(self, start_byte):
+    super(_RangeBuffer, self).__init__()
+    self.start_byte = start_byte
+
+  def tell(self):
+    return self.start_byte + super(_RangeBuffer, self).tell()
+
+  def seek(self, offset, whence=os.SEEK_SET):
+    if whence == os.SEEK_SET:
+      offset -= self.start_byte
+    return self.start_byte + super(_RangeBuffer, self).seek(offset, whence)
+
 
 class CatHelper(object):
   """Provides methods for the "cat" command and associated functionality."""
@@ -55,6 +90,122 @@ class CatHelper(object):
       command_obj: gsutil command instance of calling command.
     """
     self.command_obj = command_obj
+    self._thread_local = threading.local()
+
+  def _GetThreadGsutilApi(self):
+    """Returns a Cloud API instance for the calling thread.
+
+    Each thread fetching ranges for a sliced cat needs its own API instance,
+    since an instance's HTTP connections may not be shared between threads.
+    """
+    gsutil_api = getattr(self._thread_local, 'gsutil_api', None)
+    if gsutil_api is None:
+      command_obj = self.command_obj
+      gsutil_api = CloudApiDelegator(
+          command_obj.bucket_storage_uri_class,
+          command_obj.gsutil_api_map,
+          command_obj.logger,
+          command_obj.gsutil_api.status_queue,
+          debug=command_obj.debug,
+          http_headers=command_obj.non_metadata_headers,
+          trace_token=command_obj.trace_token,
+          perf_trace_token=command_obj.perf_trace_token,
+          user_project=command_obj.user_project)
+      self._thread_local.gsutil_api = gsutil_api
+    return gsutil_api
+
+  def _GetSlicedCatComponentSize(self, cat_object, compressed_encoding):
+    """Returns the range size to use for a sliced cat, or None if not sliced.
+
+    Args:
+      cat_object: Metadata of the object being output.
+      compressed_encoding: True if the object is stored gzip-encoded. Such
+          objects may be decompressed by the service, so their bytes cannot be
+          fetched in ranges.
+    """
+    threshold = HumanReadableToBytes(
+        config.get('GSUtil', 'sliced_object_cat_threshold',
+                   DEFAULT_SLICED_OBJECT_CAT_THRESHOLD))
+    component_size = HumanReadableToBytes(
+        config.get('GSUtil', 'sliced_object_cat_component_size',
+                   DEFAULT_SLICED_OBJECT_CAT_COMPONENT_SIZE))
+    max_components = config.getint('GSUtil', 'sliced_object_cat_max_components',
+                                   DEFAULT_SLICED_OBJECT_CAT_MAX_COMPONENTS)
+    if (threshold > 0 and component_size > 0 and max_components > 1 and
+        not compressed_encoding and cat_object.size and
+        cat_object.size >= threshold):
+      return component_size
+    return None
+
+  def _CatObjectSliced(self, cat_object, storage_url, start_byte, end_byte,
+                       component_size, decryption_keywrapper, cat_out_fd):
+    """Outputs an object by fetching byte ranges concurrently.
+
+    Up to sliced_object_cat_max_components ranges are fetched at once, each
+    over its own connection. Completed ranges are held until every range
+    preceding them has been written, so the output is identical to that of a
+    single streamed download.
+
+    Args:
+      cat_object: Metadata of the object to output.
+      storage_url: StorageUrl of the object.
+      start_byte: First byte to output; if negative, the number of bytes to
+          output from the end of the object.
+      end_byte: Last byte to output (inclusive), or None for the end of the
+          object.
+      component_size: Number of bytes to fetch per range request.
+      decryption_keywrapper: CryptoKeyWrapper for the object, or None.
+      cat_out_fd: File to write the output to.
+    """
+    object_size = cat_object.size
+    if start_byte < 0:
+      start_byte = max(object_size + start_byte, 0)
+    if end_byte is None or end_byte >= object_size:
+      end_byte = object_size - 1
+    max_components = config.getint('GSUtil', 'sliced_object_cat_max_components',
+                                   DEFAULT_SLICED_OBJECT_CAT_MAX_COMPONENTS)
+    user_project = self.command_obj.user_project
+    generation = cat_object.generation
+
+    def _FetchRange(range_start, range_end):
+      download_stream = _RangeBuffer(range_start)
+      # Passing the object's media link saves a metadata request per range.
+      serialization_data = None
+      if cat_object.mediaLink:
+        serialization_data = GetDownloadSerializationData(
+            cat_object, progress=range_start, user_project=user_project)
+      self._GetThreadGsutilApi().GetObjectMedia(
+          cat_object.bucket,
+          cat_object.name,
+          download_stream,
+          provider=storage_url.scheme,
+          generation=generation,
+          object_size=object_size,
+          download_strategy=CloudApi.DownloadStrategy.RESUMABLE,
+          start_byte=range_start,
+          end_byte=range_end,
+          serialization_data=serialization_data,
+          decryption_tuple=decryption_keywrapper)
+      return download_stream.getvalue()
+
+    ranges = ((range_start, min(range_start + component_size, end_byte + 1) - 1)
+              for range_start in range(start_byte, end_byte + 1,
+                                       component_size))
+    executor = futures.ThreadPoolExecutor(max_workers=max_components)
+    # Ranges being fetched or waiting to be written, in output order. Its
+    # length bounds both the concurrent requests and the buffered data.
+    pending = collections.deque()
+    try:
+      for byte_range in ranges:
+        if len(pending) >= max_components:
+          text_util.write_to_fd(cat_out_fd, pending.popleft().result())
+        pending.append(executor.submit(_FetchRange, *byte_range))
+      while pending:
+        text_util.write_to_fd(cat_out_fd, pending.popleft().result())
+    finally:
+      for future in pending:
+        future.cancel()
+      executor.shutdown(wait=True)
 
   def _WriteBytesBufferedFileToFile(self, src_fd, dst_fd):
     """Copies contents of the source to the destination via buffered IO.
@@ -143,17 +294,24 @@ class CatHelper(object):
             storage_url = StorageUrlFromString(blr.url_string)
             if storage_url.IsCloudUrl():
               compressed_encoding = ObjectIsGzipEncoded(cat_object)
-              self.command_obj.gsutil_api.GetObjectMedia(
-                  cat_object.bucket,
-                  cat_object.name,
-                  cat_out_fd,
-                  compressed_encoding=compressed_encoding,
-                  start_byte=start_byte,
-                  end_byte=end_byte,
-                  object_size=cat_object.size,
-                  generation=storage_url.generation,
-                  decryption_tuple=decryption_keywrapper,
-                  provider=storage_url.scheme)
+              component_size = self._GetSlicedCatComponentSize(
+                  cat_object, compressed_encoding)
+              if component_size:
+                self._CatObjectSliced(cat_object, storage_url, start_byte,
+                                      end_byte, component_size,
+                                      decryption_keywrapper, cat_out_fd)
+              else:
+                self.command_obj.gsutil_api.GetObjectMedia(
+                    cat_object.bucket,
+                    cat_object.name,
+                    cat_out_fd,
+                    compressed_encoding=compressed_encoding,
+                    start_byte=start_byte,
+                    end_byte=end_byte,
+                    object_size=cat_object.size,
+                    generation=storage_url.generation,
+                    decryption_tuple=decryption_keywrapper,
+                    provider=storage_url.scheme)
               cat_out_fd.flush()
 
             else:
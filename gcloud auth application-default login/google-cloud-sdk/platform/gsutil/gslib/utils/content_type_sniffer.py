@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""In-process detection of content types from file contents.
+
+Used for the use_magicfile option. Content types are detected from the first
+SNIFF_HEADER_SIZE bytes of a file, in the same "type; charset=..." form that
+"file -b --mime" prints: binary formats are recognized by their signatures
+(magic bytes), and other files are classified as text (with a charset) or
+binary. Text that doesn't declare a more specific format in its contents
+(such as HTML or XML) is typed by its file extension when that names a text
+format, so that, for example, stylesheets are text/css rather than
+text/plain.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import codecs
+import functools
+import json
+import mimetypes
+import os
+import re
+
+from boto import config
+
+# Number of bytes at the start of a file that content types are detected from.
+SNIFF_HEADER_SIZE = 4096
+
+# Content type for files with no contents, as reported by "file --mime".
+EMPTY_CONTENT_TYPE = 'inode/x-empty; charset=binary'
+
+_BINARY_CHARSET = 'binary'
+
+# Signatures of binary formats, as (offset, magic bytes, content type), in the
+# order they are checked.
+_SIGNATURES = (
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'\x00\x00\x01\x00', 'image/vnd.microsoft.icon'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'PK\x03\x04', 'application/zip'),
+    (0, b'PK\x05\x06', 'application/zip'),
+    (0, b'\x1f\x8b', 'application/gzip'),
+    (0, b'BZh', 'application/x-bzip2'),
+    (0, b'\xfd7zXZ\x00', 'application/x-xz'),
+    (0, b'7z\xbc\xaf\x27\x1c', 'application/x-7z-compressed'),
+    (0, b'\x28\xb5\x2f\xfd', 'application/zstd'),
+    (257, b'ustar', 'application/x-tar'),
+    (0, b'\x7fELF', 'application/x-executable'),
+    (0, b'\x00asm', 'application/wasm'),
+    (0, b'wOFF', 'font/woff'),
+    (0, b'wOF2', 'font/woff2'),
+    (0, b'\x00\x01\x00\x00\x00', 'font/sfnt'),
+    (0, b'OTTO', 'font/sfnt'),
+    (0, b'ID3', 'audio/mpeg'),
+    (0, b'OggS', 'audio/ogg'),
+    (0, b'fLaC', 'audio/flac'),
+    (0, b'SQLite format 3\x00', 'application/vnd.sqlite3'),
+    (0, b'\x1a\x45\xdf\xa3', 'video/x-matroska'),
+    (4, b'ftyp', 'video/mp4'),
+    (0, b'RIFF', None),  # Refined by _RefineSignatureMatch.
+)
+
+# Signatures short or common enough to occur at the start of text, which are
+# only checked for data that isn't text.
+_WEAK_SIGNATURES = (
+    (0, b'BM', 'image/bmp'),
+    (0, b'\xff\xfb', 'audio/mpeg'),
+    (0, b'\xff\xf3', 'audio/mpeg'),
+    (0, b'\xff\xf2', 'audio/mpeg'),
+)
+
+# Number of leading bytes that signature matches depend on, used with the file
+# extension as the key for caching them.
+_SIGNATURE_LENGTH = max(
+    offset + len(magic) for offset, magic, _ in _SIGNATURES) + 8
+
+# ELF object file types (e_type, bytes 16-17).
+_ELF_TYPES = {
+    1: 'application/x-object',
+    2: 'application/x-executable',
+    3: 'application/x-sharedlib',
+    4: 'application/x-coredump',
+}
+
+_RIFF_FORMATS = {
+    b'WEBP': 'image/webp',
+    b'WAVE': 'audio/x-wav',
+    b'AVI ': 'video/x-msvideo',
+}
+
+# ISO base media file format brands (bytes 8-11) that aren't video/mp4.
+_FTYP_BRANDS = {
+    b'M4A ': 'audio/x-m4a',
+    b'qt  ': 'video/quicktime',
+    b'heic': 'image/heic',
+    b'heix': 'image/heic',
+    b'avif': 'image/avif',
+    b'3gp4': 'video/3gpp',
+    b'3gp5': 'video/3gpp',
+}
+
+# Zip-based formats, recognized by their file extension.
+_ZIP_BASED_TYPE_PREFIXES = ('application/vnd.openxmlformats-officedocument.',
+                            'application/vnd.oasis.opendocument.',
+                            'application/java-archive',
+                            'application/vnd.android.package-archive',
+                            'application/epub+zip')
+
+# Non-text/* content types that text files' extensions may map to.
+_TEXT_APPLICATION_TYPES = frozenset([
+    'application/javascript',
+    'application/json',
+    'application/manifest+json',
+    'application/x-javascript',
+    'application/x-sh',
+    'application/xml',
+    'image/svg+xml',
+])
+
+# Text formats recognized from the start of their contents, checked in order
+# against the lowercased text with leading whitespace removed.
+_TEXT_PREFIXES = (
+    (b'<?xml', None),  # Refined by _ClassifyText.
+    (b'<!doctype html', 'text/html'),
+    (b'<svg', 'image/svg+xml'),
+    (b'%!ps', 'application/postscript'),
+)
+
+_HTML_TAG_REGEX = re.compile(
+    br'<(html|head|body|title|script|style|table|iframe)[\s>]', re.IGNORECASE)
+
+_SHEBANG_REGEX = re.compile(br'#!\s*(?:\S*/)?(?:env\s+)?(\w+)')
+
+_SCRIPT_TYPES = {
+    b'sh': 'text/x-shellscript',
+    b'bash': 'text/x-shellscript',
+    b'zsh': 'text/x-shellscript',
+    b'python': 'text/x-script.python',
+    b'python3': 'text/x-script.python',
+    b'perl': 'text/x-perl',
+    b'ruby': 'text/x-ruby',
+    b'node': 'application/javascript',
+}
+
+# Bytes that occur in ASCII text: BEL through CR, ESC, and printable ASCII.
+_ASCII_TEXT_BYTES = frozenset(
+    list(range(0x07, 0x0e)) + [0x1b] + list(range(0x20, 0x7f)))
+
+# ASCII control bytes that don't occur in text of any charset.
+_CONTROL_BYTES = frozenset(range(0x80)) - _ASCII_TEXT_BYTES
+
+# Bytes that occur in ISO-8859 text, in addition to ASCII text.
+_ISO_8859_TEXT_BYTES = _ASCII_TEXT_BYTES | frozenset(range(0xa0, 0x100))
+
+
+def ShouldSniffContentTypes():
+  """Returns True if content types should be detected from file contents."""
+  return config.getbool('GSUtil', 'use_magicfile', False)
+
+
+def _GetExtension(file_name):
+  return os.path.splitext(file_name)[1][1:].lower()
+
+
+def _GuessTypeFromExtension(extension):
+  if not extension:
+    return None
+  content_type, _ = mimetypes.guess_type('file.' + extension)
+  return content_type
+
+
+def _RefineSignatureMatch(content_type, signature, extension):
+  """Returns the content type for a signature match, using format details."""
+  if signature.startswith(b'RIFF'):
+    return _RIFF_FORMATS.get(signature[8:12])
+  if content_type == 'application/x-executable' and len(signature) >= 18:
+    # Byte 5 is 1 for little-endian files and 2 for big-endian ones.
+    if signature[5:6] == b'\x02':
+      e_type = bytearray(signature[16:18])[1]
+    else:
+      e_type = bytearray(signature[16:18])[0]
+    return _ELF_TYPES.get(e_type, content_type)
+  if content_type == 'video/mp4':
+    return _FTYP_BRANDS.get(signature[8:12], content_type)
+  if content_type == 'video/x-matroska' and b'webm' in signature:
+    return 'video/webm'
+  if content_type == 'application/zip':
+    extension_type = _GuessTypeFromExtension(extension)
+    if extension_type and extension_type.startswith(_ZIP_BASED_TYPE_PREFIXES):
+      return extension_type
+  return content_type
+
+
+@functools.lru_cache(maxsize=1024)
+def _MatchSignature(extension, signature):
+  """Returns the binary content type with a matching signature, or None.
+
+  Args:
+    extension: Lowercased file extension, without the dot.
+    signature: Up to the first _SIGNATURE_LENGTH bytes of the file.
+
+  Returns:
+    Content type without a charset, or None.
+  """
+  for offset, magic, content_type in _SIGNATURES:
+    if signature.startswith(magic, offset):
+      content_type = _RefineSignatureMatch(content_type, signature, extension)
+      if content_type:
+        return content_type
+  return None
+
+
+def _GetTextCharset(header, truncated):
+  """Returns the charset of header if it's text, or None if it's binary."""
+  byte_values = frozenset(bytearray(header))
+  if byte_values <= _ASCII_TEXT_BYTES:
+    # Text that is ASCII as far as it was read may continue in any superset of
+    # ASCII; UTF-8 is by far the most likely.
+    return 'utf-8' if truncated else 'us-ascii'
+  if header.startswith(codecs.BOM_UTF16_LE):
+    return 'utf-16le'
+  if header.startswith(codecs.BOM_UTF16_BE):
+    return 'utf-16be'
+  if not byte_values & _CONTROL_BYTES:
+    try:
+      # A header cut off at SNIFF_HEADER_SIZE may end part way through a
+      # multi-byte character.
+      codecs.getincrementaldecoder('utf-8')().decode(header, final=not truncated)
+      return 'utf-8'
+    except UnicodeDecodeError:
+      pass
+  if byte_values <= _ISO_8859_TEXT_BYTES:
+    return 'iso-8859-1'
+  return None
+
+
+def _ClassifyText(header, truncated, extension):
+  """Returns the content type of text, without a charset."""
+  start = header.lstrip(codecs.BOM_UTF8).lstrip()
+  lowered = start[:64].lower()
+  for prefix, content_type in _TEXT_PREFIXES:
+    if lowered.startswith(prefix):
+      if content_type:
+        return content_type
+      # An XML declaration; look for the root element.
+      if b'<svg' in header:
+        return 'image/svg+xml'
+      if _HTML_TAG_REGEX.search(header):
+        return 'text/html'
+      return 'text/xml'
+  if start.startswith(b'<') and _HTML_TAG_REGEX.search(header):
+    return 'text/html'
+  match = _SHEBANG_REGEX.match(start)
+  if match and match.group(1) in _SCRIPT_TYPES:
+    return _SCRIPT_TYPES[match.group(1)]
+  if not truncated and start[:1] in (b'{', b'['):
+    try:
+      json.loads(header.decode('utf-8'))
+      return 'application/json'
+    except ValueError:
+      pass
+  extension_type = _GuessTypeFromExtension(extension)
+  if extension_type and (extension_type.startswith('text/') or
+                         extension_type in _TEXT_APPLICATION_TYPES):
+    return extension_type
+  return 'text/plain'
+
+
+def SniffContentType(header, file_name, truncated=None):
+  """Detects a content type from the start of a file's contents.
+
+  Args:
+    header: Bytes at the start of the file, normally its first
+        SNIFF_HEADER_SIZE bytes.
+    file_name: Name or path of the file, whose extension refines some types.
+    truncated: True if the file is longer than header. Defaults to whether
+        header is SNIFF_HEADER_SIZE bytes or longer.
+
+  Returns:
+    Content type with a charset parameter, e.g. 'text/html; charset=utf-8'
+    or 'image/png; charset=binary'.
+  """
+  if not header:
+    return EMPTY_CONTENT_TYPE
+  header = header[:SNIFF_HEADER_SIZE]
+  if truncated is None:
+    truncated = len(header) == SNIFF_HEADER_SIZE
+  extension = _GetExtension(file_name)
+
+  content_type = _MatchSignature(extension, header[:_SIGNATURE_LENGTH])
+  if content_type:
+    return '%s; charset=%s' % (content_type, _BINARY_CHARSET)
+
+  charset = _GetTextCharset(header, truncated)
+  if charset:
+    return '%s; charset=%s' % (_ClassifyText(header, truncated,
+                                             extension), charset)
+
+  for offset, magic, content_type in _WEAK_SIGNATURES:
+    if header.startswith(magic, offset):
+      return '%s; charset=%s' % (content_type, _BINARY_CHARSET)
+  return 'application/octet-stream; charset=%s' % _BINARY_CHARSET
+
+
+def SniffFileContentType(file_path, fp=None):
+  """Detects the content type of a local file from its contents.
+
+  Args:
+    file_path: Path of the file.
+    fp: File object already open on the file, if any. Its first
+        SNIFF_HEADER_SIZE bytes are read and its position is then restored, so
+        the file needn't be opened again.
+
+  Returns:
+    Content type, as returned by SniffContentType.
+
+  Raises:
+    IOError or OSError if the file can't be read.
+  """
+  if fp is None:
+    with open(file_path, 'rb') as f:
+      header = f.read(SNIFF_HEADER_SIZE + 1)
+  else:
+    position = fp.tell()
+    fp.seek(0)
+    header = fp.read(SNIFF_HEADER_SIZE + 1)
+    fp.seek(position)
+  return SniffContentType(header,
+                          file_path,
+                          truncated=len(header) > SNIFF_HEADER_SIZE)
@@ -36,13 +36,15 @@ import pyu2f
 import random
 import re
 import shutil
+import sqlite3
 import six
 import stat
-import subprocess
 import tempfile
 import textwrap
+import threading
 import time
 import traceback
+import zlib
 
 import six
 from six.moves import range
@@ -68,12 +70,15 @@ from gslib.cloud_api import ResumableUploadException
 from gslib.cloud_api import ResumableUploadStartOverException
 from gslib.cloud_api import ServiceException
 from gslib.commands.compose import MAX_COMPOSE_ARITY
+from gslib.commands.config import DEFAULT_DAISY_CHAIN_BUFFER_SIZE
+from gslib.commands.config import DEFAULT_DAISY_CHAIN_DOWNLOAD_STREAMS
 from gslib.commands.config import DEFAULT_PARALLEL_COMPOSITE_UPLOAD_COMPONENT_SIZE
 from gslib.commands.config import DEFAULT_PARALLEL_COMPOSITE_UPLOAD_THRESHOLD
 from gslib.commands.config import DEFAULT_SLICED_OBJECT_DOWNLOAD_COMPONENT_SIZE
 from gslib.commands.config import DEFAULT_SLICED_OBJECT_DOWNLOAD_MAX_COMPONENTS
 from gslib.commands.config import DEFAULT_SLICED_OBJECT_DOWNLOAD_THRESHOLD
 from gslib.commands.config import DEFAULT_GZIP_COMPRESSION_LEVEL
+from gslib.commands.config import DEFAULT_PARALLEL_GZIP_THREAD_COUNT
 from gslib.cs_api_map import ApiSelector
 from gslib.daisy_chain_wrapper import DaisyChainWrapper
 from gslib.exception import CommandException
@@ -93,6 +98,7 @@ from gslib.storage_url import ContainsWildcard
 from gslib.storage_url import GenerationFromUrlAndString
 from gslib.storage_url import IsCloudSubdirPlaceholder
 from gslib.storage_url import StorageUrlFromString
+from gslib.streaming_gzip_upload import StreamingGzipUploadWrapper
 from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
 from gslib.thread_message import FileMessage
 from gslib.thread_message import RetryableErrorMessage
@@ -102,8 +108,8 @@ from gslib.tracker_file import ENCRYPTION_UPLOAD_TRACKER_ENTRY
 from gslib.tracker_file import GetDownloadStartByte
 from gslib.tracker_file import GetTrackerFilePath
 from gslib.tracker_file import GetUploadTrackerData
-from gslib.tracker_file import RaiseUnwritableTrackerFileException
 from gslib.tracker_file import ReadOrCreateDownloadTrackerFile
+from gslib.tracker_file import ReadTrackerFile
 from gslib.tracker_file import SERIALIZATION_UPLOAD_TRACKER_ENTRY
 from gslib.tracker_file import TrackerFileType
 from gslib.tracker_file import WriteDownloadComponentTrackerFile
@@ -122,13 +128,15 @@ from gslib.utils.cloud_api_helper import GetDownloadSerializationData
 from gslib.utils.constants import DEFAULT_FILE_BUFFER_SIZE
 from gslib.utils.constants import MIN_SIZE_COMPUTE_LOGGING
 from gslib.utils.constants import UTF8
+from gslib.utils.content_type_sniffer import ShouldSniffContentTypes
+from gslib.utils.content_type_sniffer import SniffFileContentType
 from gslib.utils.encryption_helper import CryptoKeyType
 from gslib.utils.encryption_helper import CryptoKeyWrapperFromKey
 from gslib.utils.encryption_helper import FindMatchingCSEKInBotoConfig
 from gslib.utils.encryption_helper import GetEncryptionKeyWrapper
 from gslib.utils.hashing_helper import Base64EncodeHash
 from gslib.utils.hashing_helper import CalculateB64EncodedMd5FromContents
-from gslib.utils.hashing_helper import CalculateHashesFromContents
+from gslib.utils.hashing_helper import CalculateHashesFromFile
 from gslib.utils.hashing_helper import CHECK_HASH_IF_FAST_ELSE_FAIL
 from gslib.utils.hashing_helper import CHECK_HASH_NEVER
 from gslib.utils.hashing_helper import ConcatCrc32c
@@ -136,6 +144,13 @@ from gslib.utils.hashing_helper import GetDownloadHashAlgs
 from gslib.utils.hashing_helper import GetMd5
 from gslib.utils.hashing_helper import GetUploadHashAlgs
 from gslib.utils.hashing_helper import HashingFileUploadWrapper
+from gslib.utils.hedging_util import GetHedgePolicy
+from gslib.utils.hedging_util import HedgedGetObjectMedia
+from gslib.utils.manifest_util import MANIFEST_INDEX_BATCH_SIZE
+from gslib.utils.manifest_util import ManifestAppender
+from gslib.utils.manifest_util import GetManifestFingerprint
+from gslib.utils.manifest_util import ManifestLineReader
+from gslib.utils.manifest_util import OpenManifestIndex
 from gslib.utils.metadata_util import ObjectIsGzipEncoded
 from gslib.utils.parallelism_framework_util import AtomicDict
 from gslib.utils.parallelism_framework_util import CheckMultiprocessingAvailableAndInit
@@ -269,6 +284,10 @@ PerformSlicedDownloadReturnValues = namedtuple(
 # Chunk size to use while zipping/unzipping gzip files.
 GZIP_CHUNK_SIZE = 8192
 
+# Maximum size of each piece of output when uncompressing gzip-encoded
+# downloads as they are written.
+GUNZIP_OUTPUT_CHUNK_SIZE = 1024 * 1024
+
 # Indicates that all files should be gzipped, in _UploadFileToObject
 GZIP_ALL_FILES = 'GZIP_ALL_FILES'
 
@@ -278,6 +297,18 @@ TRACKERFILE_UPDATE_THRESHOLD = TEN_MIB
 
 PARALLEL_COMPOSITE_SUGGESTION_THRESHOLD = 150 * 1024 * 1024
 
+# With adaptive_component_sizing, parallel composite uploads and sliced
+# downloads are split into this many components per available worker (subject
+# to the configured maximum), so that workers which finish early pick up
+# remaining components instead of idling while a slow component finishes.
+ADAPTIVE_COMPONENTS_PER_WORKER = 4
+
+# Adaptive sizing never makes components smaller than this, nor smaller than
+# the amount of data one stream transfers in ADAPTIVE_MIN_COMPONENT_SECONDS at
+# the bandwidth observed so far, so per-request overhead stays small.
+ADAPTIVE_MIN_COMPONENT_SIZE = 8 * 1024 * 1024
+ADAPTIVE_MIN_COMPONENT_SECONDS = 2
+
 # S3 requires special Multipart upload logic (that we currently don't implement)
 # for files > 5GiB in size.
 S3_MAX_UPLOAD_SIZE = 5 * 1024 * 1024 * 1024
@@ -419,6 +450,24 @@ def CreateCopyHelperOpts(perform_mv=False,
   return global_copy_helper_opts
 
 
+def ReinitializeSharedState():
+  """Recreates the module's cross-process maps and locks after a fork.
+
+  They are created with parallelism_framework_util.top_level_manager when this
+  module is imported, so processes forked from a parent that imported it
+  (such as the gsutil daemon) would otherwise share them with each other.
+  """
+  global open_files_map, open_files_lock
+  global suggested_sliced_transfers, suggested_sliced_transfers_lock
+  parallelism_framework_util.ReinitializeTopLevelManager()
+  manager = (parallelism_framework_util.top_level_manager
+             if CheckMultiprocessingAvailableAndInit().is_available else None)
+  open_files_map = AtomicDict(manager=manager)
+  open_files_lock = parallelism_framework_util.CreateLock()
+  suggested_sliced_transfers = AtomicDict(manager=manager)
+  suggested_sliced_transfers_lock = parallelism_framework_util.CreateLock()
+
+
 # pylint: disable=global-variable-undefined
 # pylint: disable=global-variable-not-assigned
 def GetCopyHelperOpts():
@@ -796,15 +845,14 @@ def _CreateDigestsFromLocalFile(status_queue, algs, file_name, src_url,
     hash_dict['md5'] = GetMd5()
   if 'crc32c' in algs:
     hash_dict['crc32c'] = crcmod.predefined.Crc('crc-32c')
-  with open(file_name, 'rb') as fp:
-    CalculateHashesFromContents(fp,
-                                hash_dict,
-                                callback_processor=ProgressCallbackWithTimeout(
-                                    src_obj_metadata.size,
-                                    FileProgressCallbackHandler(
-                                        status_queue,
-                                        src_url=src_url,
-                                        operation_name='Hashing').call))
+  CalculateHashesFromFile(file_name,
+                          hash_dict,
+                          callback_processor=ProgressCallbackWithTimeout(
+                              src_obj_metadata.size,
+                              FileProgressCallbackHandler(
+                                  status_queue,
+                                  src_url=src_url,
+                                  operation_name='Hashing').call))
   digests = {}
   for alg_name, digest in six.iteritems(hash_dict):
     digests[alg_name] = Base64EncodeHash(digest.hexdigest())
@@ -1010,7 +1058,8 @@ def _PartitionFile(canned_acl,
                    tracker_file,
                    tracker_file_lock,
                    encryption_key_sha256=None,
-                   gzip_encoded=False):
+                   gzip_encoded=False,
+                   num_workers=None):
   """Partitions a file into FilePart objects to be uploaded and later composed.
 
   These objects, when composed, will match the original file. This entails
@@ -1032,6 +1081,8 @@ def _PartitionFile(canned_acl,
     tracker_file_lock: The lock protecting access to the tracker file.
     encryption_key_sha256: Encryption key SHA256 for use in this upload, if any.
     gzip_encoded: Whether to use gzip transport encoding for the upload.
+    num_workers: Number of processes * threads that will upload components
+        if adaptive component sizing is enabled, else None.
 
   Returns:
     dst_args: The destination URIs for the temporary component objects.
@@ -1039,8 +1090,13 @@ def _PartitionFile(canned_acl,
   parallel_composite_upload_component_size = HumanReadableToBytes(
       config.get('GSUtil', 'parallel_composite_upload_component_size',
                  DEFAULT_PARALLEL_COMPOSITE_UPLOAD_COMPONENT_SIZE))
-  (num_components, component_size) = _GetPartitionInfo(
-      file_size, MAX_COMPOSE_ARITY, parallel_composite_upload_component_size)
+  if num_workers:
+    (num_components, component_size) = _GetAdaptivePartitionInfo(
+        file_size, MAX_COMPOSE_ARITY, parallel_composite_upload_component_size,
+        num_workers, _stream_bandwidth.GetEstimate())
+  else:
+    (num_components, component_size) = _GetPartitionInfo(
+        file_size, MAX_COMPOSE_ARITY, parallel_composite_upload_component_size)
 
   dst_args = {}  # Arguments to create commands and pass to subprocesses.
   file_names = []  # Used for the 2-step process of forming dst_args.
@@ -1167,6 +1223,8 @@ def _DoParallelCompositeUpload(fp,
   # Dict to track component info so we may align FileMessage values
   # before and after the operation.
   components_info = {}
+  num_workers = (_GetSliceWorkerCount(command_obj)
+                 if _UseAdaptiveComponentSizing() else None)
   # Get the set of all components that should be uploaded.
   dst_args = _PartitionFile(canned_acl,
                             dst_obj_metadata.contentType,
@@ -1179,7 +1237,8 @@ def _DoParallelCompositeUpload(fp,
                             tracker_file_name,
                             tracker_file_lock,
                             encryption_key_sha256=encryption_key_sha256,
-                            gzip_encoded=gzip_encoded)
+                            gzip_encoded=gzip_encoded,
+                            num_workers=num_workers)
 
   (components_to_upload, existing_components,
    existing_objects_to_delete) = (FilterExistingComponents(
@@ -1223,6 +1282,7 @@ def _DoParallelCompositeUpload(fp,
                     message_type=FileMessage.EXISTING_OBJECT_TO_DELETE))
   # In parallel, copy all of the file parts that haven't already been
   # uploaded to temporary objects.
+  upload_start_time = time.time()
   cp_results = command_obj.Apply(
       _PerformParallelUploadFileToObject,
       components_to_upload,
@@ -1230,6 +1290,11 @@ def _DoParallelCompositeUpload(fp,
       arg_checker=gslib.command.DummyArgChecker,
       parallel_operations_override=command_obj.ParallelOverrideReason.SLICE,
       should_return_results=True)
+  if num_workers:
+    _stream_bandwidth.Record(
+        sum(component.file_length for component in components_to_upload),
+        time.time() - upload_start_time,
+        min(len(components_to_upload), num_workers))
   uploaded_components = []
   for cp_result in cp_results:
     uploaded_components.append(cp_result[2])
@@ -1677,13 +1742,21 @@ def _CopyObjToObjInTheCloud(src_url,
           dst_obj.md5Hash)
 
 
-def _SetContentTypeFromFile(src_url, dst_obj_metadata):
+def _SetContentTypeFromFile(src_url,
+                            dst_obj_metadata,
+                            src_obj_metadata=None,
+                            src_obj_filestream=None):
   """Detects and sets Content-Type if src_url names a local file.
 
   Args:
     src_url: Source StorageUrl.
     dst_obj_metadata: Object-specific metadata that should be overidden during
                      the copy.
+    src_obj_metadata: apitools Object for the file from the listing phase, if
+                      any. Its contentType is used if the file's contents were
+                      already examined while listing.
+    src_obj_filestream: File object already open on the file's contents, if
+                        any, to examine instead of opening the file again.
   """
   # contentType == '' if user requested default type.
   if (dst_obj_metadata.contentType is None and src_url.IsFileUrl() and
@@ -1697,25 +1770,16 @@ def _SetContentTypeFromFile(src_url, dst_obj_metadata):
     # and 'file' would partially consume them.
     if object_name != '-':
       real_file_path = os.path.realpath(object_name)
-      if config.getbool('GSUtil', 'use_magicfile', False) and not IS_WINDOWS:
-        try:
-          p = subprocess.Popen(['file', '-b', '--mime', real_file_path],
-                               stdout=subprocess.PIPE,
-                               stderr=subprocess.PIPE)
-          output, error = p.communicate()
-          p.stdout.close()
-          p.stderr.close()
-          if p.returncode != 0 or error:
-            raise CommandException(
-                'Encountered error running "file -b --mime %s" '
-                '(returncode=%d).\n%s' % (real_file_path, p.returncode, error))
-          # Parse output by removing line delimiter
-          content_type = output.rstrip()
-          content_type = six.ensure_str(content_type)
-        except OSError as e:  # 'file' executable may not always be present.
-          raise CommandException(
-              'Encountered OSError running "file -b --mime %s"\n%s' %
-              (real_file_path, e))
+      if ShouldSniffContentTypes():
+        if src_obj_metadata and src_obj_metadata.contentType:
+          content_type = src_obj_metadata.contentType
+        else:
+          try:
+            content_type = SniffFileContentType(real_file_path,
+                                                fp=src_obj_filestream)
+          except (IOError, OSError) as e:
+            raise CommandException('Could not read "%s" to detect its content '
+                                   'type.\n%s' % (real_file_path, e))
       else:
         _, _, extension = real_file_path.rpartition('.')
         if extension in COMMON_EXTENSION_RULES:
@@ -1735,7 +1799,8 @@ def _UploadFileToObjectNonResumable(src_url,
                                     dst_obj_metadata,
                                     preconditions,
                                     gsutil_api,
-                                    gzip_encoded=False):
+                                    gzip_encoded=False,
+                                    is_stream=False):
   """Uploads the file using a non-resumable strategy.
 
   This function does not support component transfers.
@@ -1749,6 +1814,8 @@ def _UploadFileToObjectNonResumable(src_url,
     preconditions: Preconditions for the upload, if any.
     gsutil_api: gsutil Cloud API instance to use for the upload.
     gzip_encoded: Whether to use gzip transport encoding for the upload.
+    is_stream: Whether src_obj_filestream is of unknown length, e.g. because
+        it is compressed while being uploaded.
 
   Returns:
     Elapsed upload time, uploaded Object with generation, md5, and size fields
@@ -1767,7 +1834,7 @@ def _UploadFileToObjectNonResumable(src_url,
 
   encryption_keywrapper = GetEncryptionKeyWrapper(config)
 
-  if src_url.IsStream() or src_url.IsFifo():
+  if is_stream or src_url.IsStream() or src_url.IsFifo():
     # TODO: gsutil-beta: Provide progress callbacks for streaming uploads.
     uploaded_object = gsutil_api.UploadObjectStreaming(
         src_obj_filestream,
@@ -2056,6 +2123,65 @@ def _ApplyZippedUploadCompression(src_url, src_obj_filestream, src_obj_size,
   return StorageUrlFromString(gzip_path), compressed_filestream, gzip_size
 
 
+def _ShouldStreamZippedUploadCompression(src_url, dst_url, src_obj_size,
+                                         gsutil_api, parallel_composite_upload):
+  """Determines whether a zipped upload can be compressed while uploading.
+
+  This is a helper function for _UploadFileToObject. Streaming compression
+  relies on buffered resumable JSON uploads of unknown size, and the
+  compressed stream cannot be partitioned for a parallel composite upload.
+  Files below the resumable threshold are still compressed to a temporary
+  file so that they can be sent in a single non-resumable request.
+
+  Args:
+    src_url: Source FileUrl.
+    dst_url: Destination CloudUrl.
+    src_obj_size (int or None): Size of the source file.
+    gsutil_api: gsutil Cloud API to use for the copy.
+    parallel_composite_upload: Whether the upload will be split into
+        components.
+
+  Returns:
+    True if the file should be compressed with StreamingGzipUploadWrapper
+    rather than to a temporary file.
+  """
+  return (_GetParallelGzipThreadCount() > 0 and
+          not parallel_composite_upload and src_obj_size is not None and
+          src_obj_size >= ResumableThreshold() and not src_url.IsStream() and
+          not src_url.IsFifo() and
+          gsutil_api.GetApiSelector(provider=dst_url.scheme)
+          == ApiSelector.JSON)
+
+
+def _GetParallelGzipThreadCount():
+  return config.getint('GSUtil', 'parallel_gzip_thread_count',
+                       DEFAULT_PARALLEL_GZIP_THREAD_COUNT)
+
+
+def _ApplyStreamingZippedUploadCompression(src_url, src_obj_filestream,
+                                           src_obj_size, logger):
+  """Wraps a to-be-uploaded local file so it is compressed as it is read.
+
+  This is a helper function for _UploadFileToObject.
+
+  Args:
+    src_url: Source FileUrl.
+    src_obj_filestream: Read stream of the source file - will be closed when
+      the returned stream is closed.
+    src_obj_size (int or None): Size of the source file.
+    logger: for outputting log messages.
+
+  Returns:
+    Read stream of the compressed file contents.
+  """
+  if src_obj_size is not None and src_obj_size >= MIN_SIZE_COMPUTE_LOGGING:
+    logger.debug('Compressing %s (streaming)...', src_url)
+  compression_level = config.getint('GSUtil', 'gzip_compression_level',
+                                    DEFAULT_GZIP_COMPRESSION_LEVEL)
+  return StreamingGzipUploadWrapper(src_obj_filestream, compression_level,
+                                    _GetParallelGzipThreadCount())
+
+
 def _DelegateUploadFileToObject(upload_delegate, upload_url, upload_stream,
                                 zipped_file, gzip_encoded_file,
                                 parallel_composite_upload, logger):
@@ -2166,6 +2292,17 @@ def _UploadFileToObject(src_url,
   upload_url = src_url
   upload_stream = src_obj_filestream
   upload_size = src_obj_size
+  # True if the upload stream's length is unknown until it has been read.
+  upload_is_stream = src_url.IsStream() or src_url.IsFifo()
+
+  parallel_composite_upload = _ShouldDoParallelCompositeUpload(
+      logger,
+      allow_splitting,
+      src_url,
+      dst_url,
+      src_obj_size,
+      gsutil_api,
+      canned_acl=global_copy_helper_opts.canned_acl)
 
   zipped_file, gzip_encoded_file = _SelectUploadCompressionStrategy(
       src_url.object_name, is_component, gzip_exts, gzip_encoded)
@@ -2173,8 +2310,18 @@ def _UploadFileToObject(src_url,
   if gzip_encoded_file and not is_component:
     logger.debug('Using compressed transport encoding for %s.', src_url)
   elif zipped_file:
-    upload_url, upload_stream, upload_size = _ApplyZippedUploadCompression(
-        src_url, src_obj_filestream, src_obj_size, logger)
+    if _ShouldStreamZippedUploadCompression(src_url, dst_url, src_obj_size,
+                                            gsutil_api,
+                                            parallel_composite_upload):
+      upload_stream = _ApplyStreamingZippedUploadCompression(
+          src_url, src_obj_filestream, src_obj_size, logger)
+      upload_size = None
+      upload_is_stream = True
+      # There is no temporary file to clean up after the upload.
+      zipped_file = False
+    else:
+      upload_url, upload_stream, upload_size = _ApplyZippedUploadCompression(
+          src_url, src_obj_filestream, src_obj_size, logger)
     dst_obj_metadata.contentEncoding = 'gzip'
     # If we're sending an object with gzip encoding, it's possible it also
     # has an incompressible content type. Google Cloud Storage will remove
@@ -2203,19 +2350,10 @@ def _UploadFileToObject(src_url,
   hash_algs = GetUploadHashAlgs()
   digesters = dict((alg, hash_algs[alg]()) for alg in hash_algs or {})
 
-  parallel_composite_upload = _ShouldDoParallelCompositeUpload(
-      logger,
-      allow_splitting,
-      upload_url,
-      dst_url,
-      src_obj_size,
-      gsutil_api,
-      canned_acl=global_copy_helper_opts.canned_acl)
   non_resumable_upload = ((0 if upload_size is None else upload_size)
-                          < ResumableThreshold() or src_url.IsStream() or
-                          src_url.IsFifo())
+                          < ResumableThreshold() or upload_is_stream)
 
-  if ((src_url.IsStream() or src_url.IsFifo()) and
+  if (upload_is_stream and
       gsutil_api.GetApiSelector(provider=dst_url.scheme) == ApiSelector.JSON):
     orig_stream = upload_stream
     # Add limited seekable properties to the stream via buffering.
@@ -2253,7 +2391,8 @@ def _UploadFileToObject(src_url,
                                            dst_obj_metadata,
                                            preconditions,
                                            gsutil_api,
-                                           gzip_encoded=gzip_encoded_file)
+                                           gzip_encoded=gzip_encoded_file,
+                                           is_stream=upload_is_stream)
 
   def CallResumableUpload():
     return _UploadFileToObjectResumable(upload_url,
@@ -2325,7 +2464,7 @@ def _UploadFileToObject(src_url,
           uploaded_object.md5Hash)
 
 
-def _GetDownloadFile(dst_url, src_obj_metadata, logger):
+def _GetDownloadFile(dst_url, src_obj_metadata, logger, gunzip_inline=False):
   """Creates a new download file, and deletes the file that will be replaced.
 
   Names and creates a temporary file for this download. Also, if there is an
@@ -2336,6 +2475,8 @@ def _GetDownloadFile(dst_url, src_obj_metadata, logger):
     dst_url: Destination FileUrl.
     src_obj_metadata: Metadata from the source object.
     logger: for outputting log messages.
+    gunzip_inline: If true, a gzip-encoded object will be uncompressed while it
+                   is downloaded, so no temporary zip file is needed.
 
   Returns:
     (download_file_name, need_to_unzip)
@@ -2362,7 +2503,7 @@ def _GetDownloadFile(dst_url, src_obj_metadata, logger):
   # server sends decompressed bytes for a file that is stored compressed
   # (double compressed case), there is no way we can validate the hash and
   # we will fail our hash check for the object.
-  if ObjectIsGzipEncoded(src_obj_metadata):
+  if ObjectIsGzipEncoded(src_obj_metadata) and not gunzip_inline:
     need_to_unzip = True
     download_file_name = temporary_file_util.GetTempZipFileName(dst_url)
     logger.info('Downloading to temp gzip filename %s', download_file_name)
@@ -2505,7 +2646,6 @@ def _MaintainSlicedDownloadTrackerFiles(src_obj_metadata, dst_url,
     num_components: The number of components to perform this download with.
   """
   assert src_obj_metadata.etag
-  tracker_file = None
 
   # Only can happen if the resumable threshold is set higher than the
   # parallel transfer threshold.
@@ -2524,14 +2664,12 @@ def _MaintainSlicedDownloadTrackerFiles(src_obj_metadata, dst_url,
     # A parallel resumption should be attempted only if the destination file
     # size is exactly the same as the source size and the tracker file matches.
     if existing_file_size == src_obj_metadata.size:
-      tracker_file = open(tracker_file_name, 'r')
-      tracker_file_data = json.load(tracker_file)
+      tracker_file_data = json.loads(ReadTrackerFile(tracker_file_name))
       if (tracker_file_data['etag'] == src_obj_metadata.etag and
           tracker_file_data['generation'] == src_obj_metadata.generation and
           tracker_file_data['num_components'] == num_components):
         return
       else:
-        tracker_file.close()
         logger.warn('Sliced download tracker file doesn\'t match for '
                     'download of %s. Restarting download from scratch.' %
                     dst_url.object_name)
@@ -2546,23 +2684,17 @@ def _MaintainSlicedDownloadTrackerFiles(src_obj_metadata, dst_url,
   finally:
     if fp:
       fp.close()
-    if tracker_file:
-      tracker_file.close()
 
   # Delete component tracker files to guarantee download starts from scratch.
   DeleteDownloadTrackerFiles(dst_url, api_selector)
 
   # Create a new sliced download tracker file to represent this download.
-  try:
-    with open(tracker_file_name, 'w') as tracker_file:
-      tracker_file_data = {
-          'etag': src_obj_metadata.etag,
-          'generation': src_obj_metadata.generation,
-          'num_components': num_components,
-      }
-      tracker_file.write(json.dumps(tracker_file_data))
-  except IOError as e:
-    RaiseUnwritableTrackerFileException(tracker_file_name, e.strerror)
+  tracker_file_data = {
+      'etag': src_obj_metadata.etag,
+      'generation': src_obj_metadata.generation,
+      'num_components': num_components,
+  }
+  WriteJsonDataToTrackerFile(tracker_file_name, tracker_file_data)
 
 
 class SlicedDownloadFileWrapper(object):
@@ -2613,9 +2745,13 @@ class SlicedDownloadFileWrapper(object):
     if (self._last_tracker_file_byte is None or
         current_file_pos - self._last_tracker_file_byte > threshold or
         current_file_pos == self._end_byte + 1):
-      WriteDownloadComponentTrackerFile(self._tracker_file_name,
-                                        self._src_obj_metadata,
-                                        current_file_pos)
+      # Intermediate progress may be batched by the tracker store; the update
+      # marking the component complete is always written through.
+      WriteDownloadComponentTrackerFile(
+          self._tracker_file_name,
+          self._src_obj_metadata,
+          current_file_pos,
+          deferrable=current_file_pos != self._end_byte + 1)
       self._last_tracker_file_byte = current_file_pos
 
   def seek(self, offset, whence=os.SEEK_SET):  # pylint: disable=invalid-name
@@ -2636,11 +2772,103 @@ class SlicedDownloadFileWrapper(object):
       self._orig_fp.close()
 
 
+class GunzipDownloadFileWrapper(object):
+  """Wraps a file object to decompress gzip-encoded bytes as they are written.
+
+  Passing a GunzipDownloadFileWrapper to GetObjectMedia for an object stored
+  with Content-Encoding: gzip writes the uncompressed content to the wrapped
+  file in the same pass as the download, instead of writing the compressed
+  bytes and uncompressing them afterwards. Positions reported by tell() are
+  offsets in the compressed stream, so that a download interrupted and retried
+  within this process resumes from the right byte of the object; hashes
+  computed by the Cloud API during the download are likewise over the
+  compressed bytes, matching the object's metadata.
+  """
+
+  def __init__(self, fp, object_name):
+    """Initializes the GunzipDownloadFileWrapper.
+
+    Args:
+      fp: The already-open, empty file object to write uncompressed data to.
+      object_name: Name of the destination file, for error messages.
+    """
+    self._orig_fp = fp
+    self._object_name = object_name
+    self._decompressor = None
+    self._compressed_bytes = 0
+
+  @property
+  def mode(self):
+    """Returns the mode of the underlying file descriptor, or None."""
+    return getattr(self._orig_fp, 'mode', None)
+
+  def _RaiseDecompressionError(self, reason):
+    raise CommandException(
+        'Download of %s failed because its gzip-encoded content could not be '
+        'uncompressed (%s).' % (self._object_name, reason))
+
+  def write(self, data):  # pylint: disable=invalid-name
+    data = six.ensure_binary(data)
+    self._compressed_bytes += len(data)
+    try:
+      while data:
+        if self._decompressor is None:
+          # Like gzip.open, accept concatenated gzip members and ignore zero
+          # padding between or after them.
+          data = data.lstrip(b'\0')
+          if not data:
+            break
+          self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # Bound each piece of output so highly compressed data doesn't expand
+        # into one huge buffer.
+        output = self._decompressor.decompress(data,
+                                               GUNZIP_OUTPUT_CHUNK_SIZE)
+        while True:
+          self._orig_fp.write(output)
+          if self._decompressor.eof:
+            break
+          # Output shorter than the limit means all input was consumed and no
+          # output is pending.
+          if (not self._decompressor.unconsumed_tail and
+              len(output) < GUNZIP_OUTPUT_CHUNK_SIZE):
+            break
+          output = self._decompressor.decompress(
+              self._decompressor.unconsumed_tail, GUNZIP_OUTPUT_CHUNK_SIZE)
+        data = b''
+        if self._decompressor.eof:
+          data = self._decompressor.unused_data
+          self._decompressor = None
+    except zlib.error as e:
+      self._RaiseDecompressionError(e)
+
+  def Finish(self):
+    """Checks that the downloaded bytes ended with a complete gzip member."""
+    if self._decompressor is not None:
+      self._RaiseDecompressionError('the gzip stream is truncated')
+
+  def seek(self, offset, whence=os.SEEK_SET):  # pylint: disable=invalid-name
+    # Uncompressed output can't be rewound or skipped ahead of, so the only
+    # valid seek is to the current position.
+    assert whence == os.SEEK_SET and offset == self._compressed_bytes
+
+  def tell(self):  # pylint: disable=invalid-name
+    return self._compressed_bytes
+
+  def flush(self):  # pylint: disable=invalid-name
+    self._orig_fp.flush()
+
+  def close(self):  # pylint: disable=invalid-name
+    if self._orig_fp:
+      self._orig_fp.close()
+
+
 def _PartitionObject(src_url,
                      src_obj_metadata,
                      dst_url,
                      download_file_name,
-                     decryption_key=None):
+                     decryption_key=None,
+                     num_workers=None,
+                     api_selector=None):
   """Partitions an object into components to be downloaded.
 
   Each component is a byte range of the object. The byte ranges
@@ -2654,6 +2882,10 @@ def _PartitionObject(src_url,
     dst_url: Destination FileUrl.
     download_file_name: Temporary file name to be used for the download.
     decryption_key: Base64-encoded decryption key for the source object, if any.
+    num_workers: Number of processes * threads that will download components
+        if adaptive component sizing is enabled, else None.
+    api_selector: The Cloud API implementation used, for finding the tracker
+        file of an interrupted download when adaptive sizing is enabled.
 
   Returns:
     components_to_download: A list of PerformSlicedDownloadObjectToFileArgs
@@ -2667,8 +2899,21 @@ def _PartitionObject(src_url,
                                  'sliced_object_download_max_components',
                                  DEFAULT_SLICED_OBJECT_DOWNLOAD_MAX_COMPONENTS)
 
-  num_components, component_size = _GetPartitionInfo(
-      src_obj_metadata.size, max_components, sliced_download_component_size)
+  if num_workers:
+    # Resuming requires the same component boundaries as the interrupted
+    # download, so reuse its component count if there is one.
+    num_components = _GetSlicedDownloadTrackerComponentCount(
+        src_obj_metadata, dst_url, api_selector)
+    if num_components:
+      component_size = DivideAndCeil(src_obj_metadata.size, num_components)
+    else:
+      num_components, component_size = _GetAdaptivePartitionInfo(
+          src_obj_metadata.size, max_components,
+          sliced_download_component_size, num_workers,
+          _stream_bandwidth.GetEstimate())
+  else:
+    num_components, component_size = _GetPartitionInfo(
+        src_obj_metadata.size, max_components, sliced_download_component_size)
 
   components_to_download = []
   component_lengths = []
@@ -2727,8 +2972,16 @@ def _DoSlicedDownload(src_url,
   # so just discard the metadata.
   src_obj_metadata.customerEncryption = None
 
+  num_workers = (_GetSliceWorkerCount(command_obj)
+                 if _UseAdaptiveComponentSizing() else None)
   components_to_download, component_lengths = _PartitionObject(
-      src_url, src_obj_metadata, dst_url, download_file_name, decryption_key)
+      src_url,
+      src_obj_metadata,
+      dst_url,
+      download_file_name,
+      decryption_key,
+      num_workers=num_workers,
+      api_selector=api_selector)
 
   num_components = len(components_to_download)
   _MaintainSlicedDownloadTrackerFiles(src_obj_metadata, dst_url,
@@ -2757,6 +3010,7 @@ def _DoSlicedDownload(src_url,
                     message_type=FileMessage.COMPONENT_TO_DOWNLOAD,
                     bytes_already_downloaded=bytes_already_downloaded))
 
+  download_start_time = time.time()
   cp_results = command_obj.Apply(
       _PerformSlicedDownloadObjectToFile,
       components_to_download,
@@ -2764,6 +3018,10 @@ def _DoSlicedDownload(src_url,
       arg_checker=gslib.command.DummyArgChecker,
       parallel_operations_override=command_obj.ParallelOverrideReason.SLICE,
       should_return_results=True)
+  if num_workers:
+    _stream_bandwidth.Record(
+        sum(cp_result.bytes_transferred for cp_result in cp_results),
+        time.time() - download_start_time, min(num_components, num_workers))
 
   if len(cp_results) < num_components:
     raise CommandException(
@@ -2814,7 +3072,8 @@ def _DownloadObjectToFileResumable(src_url,
                                    component_num=None,
                                    start_byte=0,
                                    end_byte=None,
-                                   decryption_key=None):
+                                   decryption_key=None,
+                                   gunzip_inline=False):
   """Downloads an object to a local file using the resumable strategy.
 
   Args:
@@ -2831,6 +3090,9 @@ def _DownloadObjectToFileResumable(src_url,
     start_byte: The first byte of a byte range for a sliced download.
     end_byte: The last byte of a byte range for a sliced download.
     decryption_key: Base64-encoded decryption key for the source object, if any.
+    gunzip_inline: If true, uncompress the gzip-encoded object into the
+                   download file as it is downloaded. Not supported for sliced
+                   downloads.
 
   Returns:
     (bytes_transferred, server_encoding)
@@ -2856,6 +3118,10 @@ def _DownloadObjectToFileResumable(src_url,
     fp = open(download_file_name, 'r+b')
     fp.seek(start_byte)
     api_selector = gsutil_api.GetApiSelector(provider=src_url.scheme)
+    if gunzip_inline:
+      # A partial download file holds uncompressed bytes, which don't map back
+      # to a position in the compressed object, so always start from scratch.
+      fp.truncate(0)
     existing_file_size = GetFileSize(fp)
 
     tracker_file_name, download_start_byte = ReadOrCreateDownloadTrackerFile(
@@ -2934,6 +3200,8 @@ def _DownloadObjectToFileResumable(src_url,
     if is_sliced and src_obj_metadata.size >= ResumableThreshold():
       fp = SlicedDownloadFileWrapper(fp, tracker_file_name, src_obj_metadata,
                                      start_byte, end_byte)
+    elif gunzip_inline:
+      fp = GunzipDownloadFileWrapper(fp, dst_url.object_name)
 
     compressed_encoding = ObjectIsGzipEncoded(src_obj_metadata)
 
@@ -2943,7 +3211,32 @@ def _DownloadObjectToFileResumable(src_url,
     # caught-up hash will be incorrect.  We recalculate the hash on
     # the local file in the case of a failed gzip hash anyway, but it would
     # be better if we actively detected this case.
-    if not download_complete:
+    hedge_policy = GetHedgePolicy()
+    if not download_complete and hedge_policy and not (compressed_encoding or
+                                                       gunzip_inline):
+      fp.seek(download_start_byte)
+
+      def _GetMedia(api, stream, start):
+        return api.GetObjectMedia(
+            src_url.bucket_name,
+            src_url.object_name,
+            stream,
+            start_byte=start,
+            end_byte=end_byte,
+            generation=src_url.generation,
+            object_size=src_obj_metadata.size,
+            download_strategy=CloudApi.DownloadStrategy.RESUMABLE,
+            provider=src_url.scheme,
+            serialization_data=GetDownloadSerializationData(
+                src_obj_metadata, progress=start,
+                user_project=api.user_project),
+            decryption_tuple=CryptoKeyWrapperFromKey(decryption_key))
+
+      server_encoding = HedgedGetObjectMedia(gsutil_api, hedge_policy, fp,
+                                             download_start_byte, end_byte,
+                                             digesters, progress_callback,
+                                             _GetMedia)
+    elif not download_complete:
       fp.seek(download_start_byte)
       server_encoding = gsutil_api.GetObjectMedia(
           src_url.bucket_name,
@@ -2960,6 +3253,8 @@ def _DownloadObjectToFileResumable(src_url,
           digesters=digesters,
           progress_callback=progress_callback,
           decryption_tuple=CryptoKeyWrapperFromKey(decryption_key))
+      if gunzip_inline:
+        fp.Finish()
 
   except ResumableDownloadException as e:
     logger.warning('Caught ResumableDownloadException (%s) for download of %s.',
@@ -3018,18 +3313,43 @@ def _DownloadObjectToFileNonResumable(src_url,
       with open(global_copy_helper_opts.test_callback_file, 'rb') as test_fp:
         progress_callback = pickle.loads(test_fp.read()).call
 
-    server_encoding = gsutil_api.GetObjectMedia(
-        src_url.bucket_name,
-        src_url.object_name,
-        fp,
-        generation=src_url.generation,
-        object_size=src_obj_metadata.size,
-        download_strategy=CloudApi.DownloadStrategy.ONE_SHOT,
-        provider=src_url.scheme,
-        serialization_data=serialization_data,
-        digesters=digesters,
-        progress_callback=progress_callback,
-        decryption_tuple=CryptoKeyWrapperFromKey(decryption_key))
+    hedge_policy = GetHedgePolicy()
+    if (hedge_policy and src_obj_metadata.size and
+        not ObjectIsGzipEncoded(src_obj_metadata)):
+      end_byte = src_obj_metadata.size - 1
+
+      def _GetMedia(api, stream, start):
+        return api.GetObjectMedia(
+            src_url.bucket_name,
+            src_url.object_name,
+            stream,
+            start_byte=start,
+            end_byte=end_byte,
+            generation=src_url.generation,
+            object_size=src_obj_metadata.size,
+            download_strategy=CloudApi.DownloadStrategy.ONE_SHOT,
+            provider=src_url.scheme,
+            serialization_data=GetDownloadSerializationData(
+                src_obj_metadata, progress=start,
+                user_project=api.user_project),
+            decryption_tuple=CryptoKeyWrapperFromKey(decryption_key))
+
+      server_encoding = HedgedGetObjectMedia(gsutil_api, hedge_policy, fp, 0,
+                                             end_byte, digesters,
+                                             progress_callback, _GetMedia)
+    else:
+      server_encoding = gsutil_api.GetObjectMedia(
+          src_url.bucket_name,
+          src_url.object_name,
+          fp,
+          generation=src_url.generation,
+          object_size=src_obj_metadata.size,
+          download_strategy=CloudApi.DownloadStrategy.ONE_SHOT,
+          provider=src_url.scheme,
+          serialization_data=serialization_data,
+          digesters=digesters,
+          progress_callback=progress_callback,
+          decryption_tuple=CryptoKeyWrapperFromKey(decryption_key))
   finally:
     if fp:
       fp.close()
@@ -3090,8 +3410,17 @@ def _DownloadObjectToFile(src_url,
   sliced_download = _ShouldDoSlicedDownload(download_strategy, src_obj_metadata,
                                             allow_splitting, logger)
 
-  download_file_name, need_to_unzip = _GetDownloadFile(dst_url,
-                                                       src_obj_metadata, logger)
+  # Gzip-encoded objects are uncompressed while they are downloaded when the
+  # bytes arrive in order and are known to be the stored (compressed) bytes.
+  # Sliced downloads write ranges out of order, and the XML API may send bytes
+  # that the service gzipped on the fly, so those still download to a
+  # temporary zip file that is uncompressed after validation.
+  gunzip_inline = (ObjectIsGzipEncoded(src_obj_metadata) and
+                   not sliced_download and
+                   download_strategy is CloudApi.DownloadStrategy.RESUMABLE and
+                   api_selector == ApiSelector.JSON)
+  download_file_name, need_to_unzip = _GetDownloadFile(
+      dst_url, src_obj_metadata, logger, gunzip_inline=gunzip_inline)
 
   # Ensure another process/thread is not already writing to this file.
   with open_files_lock:
@@ -3147,6 +3476,7 @@ def _DownloadObjectToFile(src_url,
           logger,
           digesters,
           decryption_key=decryption_key,
+          gunzip_inline=gunzip_inline,
       )
     else:
       raise CommandException('Invalid download strategy %s chosen for'
@@ -3154,7 +3484,10 @@ def _DownloadObjectToFile(src_url,
                              (download_strategy, download_file_name))
   end_time = time.time()
 
-  server_gzip = server_encoding and server_encoding.lower().endswith('gzip')
+  # When uncompressing inline, the gzip encoding the server reports is the
+  # object's stored encoding, which has already been removed.
+  server_gzip = (server_encoding and
+                 server_encoding.lower().endswith('gzip') and not gunzip_inline)
   local_md5 = _ValidateAndCompleteDownload(logger,
                                            src_url,
                                            src_obj_metadata,
@@ -3453,13 +3786,21 @@ def _CopyObjToObjDaisyChainMode(src_url,
   compressed_encoding = ObjectIsGzipEncoded(src_obj_metadata)
   encryption_keywrapper = GetEncryptionKeyWrapper(config)
 
+  buffer_size = HumanReadableToBytes(
+      config.get('GSUtil', 'daisy_chain_buffer_size',
+                 DEFAULT_DAISY_CHAIN_BUFFER_SIZE))
+  download_streams = config.getint('GSUtil', 'daisy_chain_download_streams',
+                                   DEFAULT_DAISY_CHAIN_DOWNLOAD_STREAMS)
+
   start_time = time.time()
   upload_fp = DaisyChainWrapper(src_url,
                                 src_obj_metadata.size,
                                 gsutil_api,
                                 compressed_encoding=compressed_encoding,
                                 progress_callback=progress_callback,
-                                decryption_key=decryption_key)
+                                decryption_key=decryption_key,
+                                buffer_size=buffer_size,
+                                download_streams=download_streams)
   uploaded_object = None
   if src_obj_metadata.size == 0:
     # Resumable uploads of size 0 are not supported.
@@ -3912,7 +4253,13 @@ def PerformCopy(logger,
       src_obj_metadata.name = src_url.object_name
       src_obj_metadata.bucket = src_url.bucket_name
     else:
-      _SetContentTypeFromFile(src_url, dst_obj_metadata)
+      # When STET is used the open stream holds encrypted bytes, so examine
+      # the file itself.
+      _SetContentTypeFromFile(
+          src_url,
+          dst_obj_metadata,
+          src_obj_metadata=src_obj_metadata,
+          src_obj_filestream=None if use_stet else src_obj_filestream)
     # Only set KMS key name if destination provider is 'gs'.
     encryption_keywrapper = GetEncryptionKeyWrapper(config)
     if (encryption_keywrapper and
@@ -4041,48 +4388,72 @@ class Manifest(object):
   def __init__(self, path):
     # self.items contains a dictionary of rows
     self.items = {}
-    self.manifest_filter = {}
     self.lock = parallelism_framework_util.CreateLock()
 
     self.manifest_path = os.path.expanduser(path)
+    self.index = OpenManifestIndex(self.manifest_path)
+    self._appender = None
     self._ParseManifest()
     self._CreateManifestFile()
 
+  def __getstate__(self):
+    # The appender is local to a process; other processes create their own.
+    state = self.__dict__.copy()
+    state['_appender'] = None
+    return state
+
   def _ParseManifest(self):
-    """Load and parse a manifest file.
+    """Brings the index of completed sources up to date with the manifest file.
 
-    This information will be used to skip any files that have a skip or OK
-    status.
+    Sources recorded with a skip or OK status will not be copied again. Only
+    rows appended since the index was last updated are read; the index is
+    rebuilt if the manifest file was replaced, truncated or rewritten.
     """
     try:
-      if os.path.exists(self.manifest_path):
-        # Note: we can't use io.open here or CSV reader will become upset
-        # https://stackoverflow.com/a/18449496
-        with open(self.manifest_path, 'r') as f:
-          first_row = True
-          reader = csv.reader(f)
-          for row in reader:
-            if first_row:
-              try:
-                source_index = row.index('Source')
-                result_index = row.index('Result')
-              except ValueError:
-                # No header and thus not a valid manifest file.
-                raise CommandException('Missing headers in manifest file: %s' %
-                                       self.manifest_path)
-            first_row = False
-            source = row[source_index]
-            result = row[result_index]
-            if result in ['OK', 'skip']:
-              # We're always guaranteed to take the last result of a specific
-              # source url.
-              self.manifest_filter[source] = result
-    except IOError:
+      if not os.path.exists(self.manifest_path):
+        if self.index.GetState()[1]:
+          self.index.Reset(-1)
+        return
+      with open(self.manifest_path, 'rb') as f:
+        file_stat = os.fstat(f.fileno())
+        indexed_file_id, offset, fingerprint = self.index.GetState()
+        if (indexed_file_id != file_stat.st_ino or
+            offset > file_stat.st_size or
+            (offset and fingerprint != GetManifestFingerprint(f, offset))):
+          self.index.Reset(file_stat.st_ino)
+          offset = 0
+        lines = ManifestLineReader(f)
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+          return
+        try:
+          source_index = header.index('Source')
+          result_index = header.index('Result')
+        except ValueError:
+          # No header and thus not a valid manifest file.
+          raise CommandException('Missing headers in manifest file: %s' %
+                                 self.manifest_path)
+        if offset > lines.position:
+          lines.Seek(offset)
+        completed = []
+        for row in reader:
+          if (len(row) > max(source_index, result_index) and
+              row[result_index] in ['OK', 'skip']):
+            completed.append(row[source_index])
+            if len(completed) >= MANIFEST_INDEX_BATCH_SIZE:
+              self.index.AddCompleted(
+                  completed, lines.position,
+                  GetManifestFingerprint(f, lines.position))
+              completed = []
+        self.index.AddCompleted(completed, lines.position,
+                                GetManifestFingerprint(f, lines.position))
+    except (IOError, sqlite3.Error):
       raise CommandException('Could not parse %s' % self.manifest_path)
 
   def WasSuccessful(self, src):
     """Returns whether the specified src url was marked as successful."""
-    return src in self.manifest_filter
+    return self.index.Contains(src)
 
   def _CreateManifestFile(self):
     """Opens the manifest file and assigns it to the file pointer."""
@@ -4165,17 +4536,15 @@ class Manifest(object):
     ]
 
     data = [six.ensure_str(value) for value in data]
+    self._GetAppender().AppendRow(data)
 
-    # Aquire a lock to prevent multiple threads writing to the same file at
-    # the same time. This would cause a garbled mess in the manifest file.
-    with self.lock:
-      if IS_WINDOWS and six.PY3:
-        f = open(self.manifest_path, 'a', 1, newline='')
-      else:
-        f = open(self.manifest_path, 'a', 1)  # 1 == line buffered
-      writer = csv.writer(f)
-      writer.writerow(data)
-      f.close()
+  def _GetAppender(self):
+    """Returns the ManifestAppender for the current process."""
+    appender = self._appender
+    if appender is None or appender.pid != os.getpid():
+      appender = ManifestAppender(self.manifest_path, self.lock)
+      self._appender = appender
+    return appender
 
   def _RemoveItemFromManifest(self, url):
     # Remove the item from the dictionary since we're done with it and
@@ -4205,6 +4574,253 @@ class SkipGlacierError(SkipUnsupportedObjectError):
     self.unsupported_type = 'GLACIER'
 
 
+def CanPerformCopyAsync(src_url, dst_url, src_obj_metadata=None, headers=None):
+  """Returns whether PerformCopyAsync can perform a copy.
+
+  Only whole small objects are copied by the asynchronous engine, between a
+  local file and a gs:// object, and only when no option changes the bytes or
+  metadata that are copied. Every other copy is performed by PerformCopy.
+
+  Args:
+    src_url: Source StorageUrl.
+    dst_url: Destination StorageUrl.
+    src_obj_metadata: Source object metadata, as for PerformCopy.
+    headers: optional headers to use for the copy operation.
+
+  Returns:
+    True if PerformCopyAsync can perform the copy.
+  """
+  opts = global_copy_helper_opts
+  if (opts.perform_mv or opts.no_clobber or opts.use_manifest or
+      opts.preserve_acl or opts.canned_acl or opts.dest_storage_class or
+      opts.test_callback_file or _RENAME_ON_HASH_MISMATCH):
+    return False
+  if headers:
+    preconditions = PreconditionsFromHeaders(headers)
+    if (ObjectMetadataFromHeaders(headers) != apitools_messages.Object() or
+        preconditions.gen_match is not None or
+        preconditions.meta_gen_match is not None):
+      return False
+  if GetEncryptionKeyWrapper(config):
+    return False
+  from gslib.async_engine import GetSmallObjectThreshold  # pylint: disable=g-import-not-at-top
+  threshold = GetSmallObjectThreshold()
+
+  if src_url.IsCloudUrl() and dst_url.IsFileUrl():
+    return bool(src_url.scheme == 'gs' and src_obj_metadata and
+                src_obj_metadata.size is not None and
+                src_obj_metadata.size <= threshold and
+                not ObjectIsGzipEncoded(src_obj_metadata) and
+                not src_obj_metadata.customerEncryption and
+                not dst_url.IsStream() and not dst_url.IsFifo() and
+                not dst_url.object_name.endswith(dst_url.delim))
+
+  if src_url.IsFileUrl() and dst_url.IsCloudUrl():
+    if (dst_url.scheme != 'gs' or src_url.IsStream() or src_url.IsFifo() or
+        not os.path.isfile(src_url.object_name)):
+      return False
+    # Sniffing reads the file with blocking I/O, which would stall the event
+    # loop.
+    if ShouldSniffContentTypes() and not (src_obj_metadata and
+                                          src_obj_metadata.contentType):
+      return False
+    if src_obj_metadata and src_obj_metadata.size:
+      src_obj_size = src_obj_metadata.size
+    else:
+      src_obj_size = os.path.getsize(src_url.object_name)
+    return src_obj_size <= threshold
+
+  return False
+
+
+async def PerformCopyAsync(logger,
+                           src_url,
+                           dst_url,
+                           engine,
+                           src_obj_metadata=None):
+  """Performs a copy accepted by CanPerformCopyAsync on the event loop.
+
+  Args:
+    logger: for outputting log messages.
+    src_url: Source StorageUrl.
+    dst_url: Destination StorageUrl.
+    engine: AsyncEngine to use for the copy.
+    src_obj_metadata: Source object metadata, as for PerformCopy.
+
+  Returns:
+    (elapsed_time, bytes_transferred, version-specific dst_url, md5), as for
+    PerformCopy.
+
+  Raises:
+    FileConcurrencySkipError: if this download is already in progress.
+    CommandException: if other errors encountered.
+  """
+  if src_url.IsCloudUrl():
+    return await _DownloadObjectToFileAsync(src_url, src_obj_metadata, dst_url,
+                                            engine, logger)
+  return await _UploadFileToObjectAsync(src_url, src_obj_metadata, dst_url,
+                                        engine, logger)
+
+
+async def _DownloadObjectToFileAsync(src_url, src_obj_metadata, dst_url,
+                                     engine, logger):
+  """Downloads a small object to a local file in a single request.
+
+  Args:
+    src_url: Source CloudUrl.
+    src_obj_metadata: Metadata from the source object.
+    dst_url: Destination FileUrl.
+    engine: AsyncEngine to use for the download.
+    logger: for outputting log messages.
+
+  Returns:
+    (elapsed_time, bytes_transferred, dst_url, md5)
+  """
+  global open_files_map, open_files_lock
+  _LogCopyOperation(logger, src_url, dst_url, None)
+  PutToQueueWithTimeout(
+      engine.status_queue,
+      FileMessage(src_url,
+                  dst_url,
+                  time.time(),
+                  message_type=FileMessage.FILE_DOWNLOAD,
+                  size=src_obj_metadata.size,
+                  finished=False))
+
+  download_file_name, _ = _GetDownloadFile(dst_url, src_obj_metadata, logger)
+  with open_files_lock:
+    if open_files_map.get(download_file_name, False):
+      raise FileConcurrencySkipError
+    open_files_map[download_file_name] = True
+
+  hash_algs = GetDownloadHashAlgs(logger,
+                                  consider_md5=src_obj_metadata.md5Hash,
+                                  consider_crc32c=src_obj_metadata.crc32c)
+  digesters = dict((alg, hash_algs[alg]()) for alg in hash_algs or {})
+
+  start_time = time.time()
+  if src_obj_metadata.size:
+    contents = await engine.GetObjectMedia(src_url.bucket_name,
+                                           src_url.object_name,
+                                           generation=src_url.generation)
+  else:
+    contents = b''
+  end_time = time.time()
+
+  with open(download_file_name, 'wb') as fp:
+    fp.write(contents)
+  for digester in digesters.values():
+    digester.update(contents)
+
+  # The engine has already removed any gzip transport encoding, so the bytes
+  # on disk are the object's stored bytes.
+  local_md5 = _ValidateAndCompleteDownload(logger, src_url, src_obj_metadata,
+                                           dst_url, False, False, digesters,
+                                           hash_algs, download_file_name,
+                                           ApiSelector.JSON, len(contents),
+                                           engine.json_api)
+
+  with open_files_lock:
+    open_files_map.delete(download_file_name)
+
+  PutToQueueWithTimeout(
+      engine.status_queue,
+      FileMessage(src_url,
+                  dst_url,
+                  message_time=end_time,
+                  message_type=FileMessage.FILE_DOWNLOAD,
+                  size=src_obj_metadata.size,
+                  finished=True))
+
+  return (end_time - start_time, len(contents), dst_url, local_md5)
+
+
+async def _UploadFileToObjectAsync(src_url, src_obj_metadata, dst_url, engine,
+                                   logger):
+  """Uploads a small local file to an object in a single request.
+
+  Args:
+    src_url: Source FileUrl.
+    src_obj_metadata: apitools Object for the file from the listing phase, if
+                      any.
+    dst_url: Destination CloudUrl.
+    engine: AsyncEngine to use for the upload.
+    logger: for outputting log messages.
+
+  Returns:
+    (elapsed_time, bytes_transferred, dst_url with generation, md5)
+  """
+  try:
+    with open(src_url.object_name, 'rb') as fp:
+      contents = fp.read()
+  except Exception as e:  # pylint: disable=broad-except
+    raise CommandException('Error opening file "%s": %s.' % (src_url, str(e)))
+
+  dst_obj_metadata = apitools_messages.Object(name=dst_url.object_name,
+                                              bucket=dst_url.bucket_name)
+  content_language = config.get_value('GSUtil', 'content_language')
+  if content_language:
+    dst_obj_metadata.contentLanguage = content_language
+  _SetContentTypeFromFile(src_url,
+                          dst_obj_metadata,
+                          src_obj_metadata=src_obj_metadata)
+  if src_obj_metadata:
+    CopyObjectMetadata(src_obj_metadata, dst_obj_metadata, override=False)
+  if config.get('GSUtil', 'check_hashes') == CHECK_HASH_NEVER:
+    dst_obj_metadata.md5Hash = None
+
+  _LogCopyOperation(logger, src_url, dst_url, dst_obj_metadata)
+  PutToQueueWithTimeout(
+      engine.status_queue,
+      FileMessage(src_url,
+                  dst_url,
+                  time.time(),
+                  message_type=FileMessage.FILE_UPLOAD,
+                  size=len(contents),
+                  finished=False))
+
+  hash_algs = GetUploadHashAlgs()
+  digesters = dict((alg, hash_algs[alg]()) for alg in hash_algs or {})
+  for digester in digesters.values():
+    digester.update(contents)
+
+  start_time = time.time()
+  uploaded_object = await engine.UploadObject(contents,
+                                              dst_obj_metadata,
+                                              fields=UPLOAD_RETURN_FIELDS)
+  elapsed_time = time.time() - start_time
+
+  try:
+    _CheckHashes(logger,
+                 dst_url,
+                 uploaded_object,
+                 src_url.object_name,
+                 _CreateDigestsFromDigesters(digesters),
+                 is_upload=True)
+  except HashMismatchException:
+    # If the digest doesn't match, delete the object.
+    await engine.DeleteObject(dst_url.bucket_name,
+                              dst_url.object_name,
+                              generation=uploaded_object.generation)
+    raise
+
+  result_url = dst_url.Clone()
+  result_url.generation = GenerationFromUrlAndString(result_url,
+                                                     uploaded_object.generation)
+
+  PutToQueueWithTimeout(
+      engine.status_queue,
+      FileMessage(src_url,
+                  dst_url,
+                  time.time(),
+                  message_type=FileMessage.FILE_UPLOAD,
+                  size=len(contents),
+                  finished=True))
+
+  return (elapsed_time, uploaded_object.size, result_url,
+          uploaded_object.md5Hash)
+
+
 def GetPathBeforeFinalDir(url, exp_src_url):
   """Returns the path section before the final directory component of the URL.
 
@@ -4306,6 +4922,113 @@ def _GetPartitionInfo(file_size, max_components, default_component_size):
   return (num_components, component_size)
 
 
+def _GetAdaptivePartitionInfo(file_size,
+                              max_components,
+                              default_component_size,
+                              num_workers,
+                              stream_bandwidth=None):
+  """Gets partition info sized for the available workers and bandwidth.
+
+  Unlike _GetPartitionInfo, which only splits the file into components of
+  default_component_size, this splits it into enough components to give each
+  worker ADAPTIVE_COMPONENTS_PER_WORKER of them. Workers take components from
+  a shared queue, so one that finishes early takes over remaining components
+  rather than waiting on a slow one.
+
+  Args:
+    file_size: The number of bytes in the file to be partitioned.
+    max_components: The maximum number of components that can be composed.
+    default_component_size: The largest size of a component.
+    num_workers: The number of processes * threads transferring components.
+    stream_bandwidth: Observed bytes per second of a single stream, or None.
+
+  Returns:
+    The number of components in the partitioned file, and the size of each
+    component (except the last, which may be smaller).
+  """
+  min_component_size = ADAPTIVE_MIN_COMPONENT_SIZE
+  if stream_bandwidth:
+    min_component_size = max(
+        min_component_size,
+        int(stream_bandwidth * ADAPTIVE_MIN_COMPONENT_SECONDS))
+  min_component_size = min(min_component_size, default_component_size)
+
+  num_components = min(num_workers * ADAPTIVE_COMPONENTS_PER_WORKER,
+                       file_size // min_component_size)
+  # Enough components that none is larger than default_component_size, even
+  # if that makes some smaller than min_component_size.
+  num_components = max(num_components,
+                       DivideAndCeil(file_size, default_component_size))
+  num_components = max(min(num_components, max_components), 2)
+
+  component_size = DivideAndCeil(file_size, num_components)
+  # Rounding up the component size can leave fewer non-empty components.
+  num_components = max(DivideAndCeil(file_size, component_size), 2)
+  return (num_components, component_size)
+
+
+def _UseAdaptiveComponentSizing():
+  return config.getbool('GSUtil', 'adaptive_component_sizing', False)
+
+
+def _GetSliceWorkerCount(command_obj):
+  """Returns the number of workers that Apply will use for slice operations."""
+  # pylint: disable=protected-access
+  process_count, thread_count = command_obj._GetProcessAndThreadCount(
+      None,
+      None,
+      command_obj.ParallelOverrideReason.SLICE,
+      print_macos_warning=False)
+  # pylint: enable=protected-access
+  if not command_obj.multiprocessing_is_available:
+    process_count = 1
+  return process_count * thread_count
+
+
+def _GetSlicedDownloadTrackerComponentCount(src_obj_metadata, dst_url,
+                                            api_selector):
+  """Returns the component count of a matching sliced download, or None."""
+  tracker_file_name = GetTrackerFilePath(dst_url,
+                                         TrackerFileType.SLICED_DOWNLOAD,
+                                         api_selector)
+  try:
+    tracker_file_data = json.loads(ReadTrackerFile(tracker_file_name))
+    if (tracker_file_data['etag'] == src_obj_metadata.etag and
+        tracker_file_data['generation'] == src_obj_metadata.generation):
+      return tracker_file_data['num_components']
+  except (IOError, KeyError, ValueError):
+    pass
+  return None
+
+
+class _StreamBandwidthEstimator(object):
+  """Moving average of single-stream bandwidth seen by this process."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._estimate = None
+
+  def Record(self, num_bytes, elapsed_seconds, num_streams):
+    """Adds a measurement of num_streams streams transferring num_bytes."""
+    # Small transfers are dominated by request latency rather than bandwidth.
+    if (num_bytes < ADAPTIVE_MIN_COMPONENT_SIZE or elapsed_seconds <= 0 or
+        num_streams < 1):
+      return
+    bandwidth = num_bytes / elapsed_seconds / num_streams
+    with self._lock:
+      if self._estimate is None:
+        self._estimate = bandwidth
+      else:
+        self._estimate = (self._estimate + bandwidth) / 2
+
+  def GetEstimate(self):
+    with self._lock:
+      return self._estimate
+
+
+_stream_bandwidth = _StreamBandwidthEstimator()
+
+
 def _DeleteTempComponentObjectFn(cls, url_to_delete, thread_state=None):
   """Wrapper func to be used with command.Apply to delete temporary objects."""
   gsutil_api = GetCloudApiInstance(cls, thread_state)
@@ -19,10 +19,14 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+import atexit
 import base64
 import binascii
+from concurrent import futures
 import hashlib
+import multiprocessing
 import os
+import threading
 
 import six
 
@@ -35,6 +39,8 @@ from gslib.utils.constants import DEFAULT_FILE_BUFFER_SIZE
 from gslib.utils.constants import MIN_SIZE_COMPUTE_LOGGING
 from gslib.utils.constants import TRANSFER_BUFFER_SIZE
 from gslib.utils.constants import UTF8
+from gslib.utils.parallelism_framework_util import CheckMultiprocessingAvailableAndInit
+from gslib.utils.unit_util import HumanReadableToBytes
 
 SLOW_CRCMOD_WARNING = """
 WARNING: You have requested checksumming but your crcmod installation isn't
@@ -88,6 +94,11 @@ CHECK_HASH_IF_FAST_ELSE_SKIP = 'if_fast_else_skip'
 CHECK_HASH_ALWAYS = 'always'
 CHECK_HASH_NEVER = 'never'
 
+# Files at least this large have their CRC32C computed over several byte
+# ranges concurrently. A value of 0 disables parallel hashing.
+DEFAULT_PARALLEL_HASHING_THRESHOLD = '150M'
+DEFAULT_PARALLEL_HASHING_MAX_WORKERS = min(multiprocessing.cpu_count(), 8)
+
 # Table storing polynomial values of x^(2^k) mod CASTAGNOLI_POLY for all k < 31,
 # where x^(2^k) and CASTAGNOLI_POLY are both considered polynomials. This is
 # sufficient since x^(2^31) mod CASTAGNOLI_POLY = x.
@@ -215,6 +226,155 @@ def CalculateHashesFromContents(fp, hash_dict, callback_processor=None):
       callback_processor.Progress(len(data))
 
 
+def _CalculateCrc32cForRange(file_name, start, length):
+  """Calculates the CRC32C of a byte range of a file.
+
+  This is a module-level function so that it can be run in a worker process.
+
+  Args:
+    file_name: Path of the file to read.
+    start: Offset of the first byte of the range.
+    length: Number of bytes in the range.
+
+  Returns:
+    CRC32C of the range as an integer, suitable for ConcatCrc32c.
+  """
+  crc = crcmod.predefined.Crc('crc-32c')
+  with open(file_name, 'rb') as fp:
+    fp.seek(start)
+    bytes_remaining = length
+    while bytes_remaining:
+      data = fp.read(min(DEFAULT_FILE_BUFFER_SIZE, bytes_remaining))
+      if not data:
+        break
+      crc.update(data)
+      bytes_remaining -= len(data)
+  return crc.crcValue
+
+
+def _CreateParallelHashingExecutor(num_workers):
+  """Returns an executor for computing CRC32Cs of file ranges.
+
+  crcmod holds the GIL while hashing, with or without its C extension, so
+  ranges are hashed in separate processes whenever possible. The calling
+  process may already be running worker threads, so the workers are started
+  by a fork server, or spawned, rather than forked from it. gsutil's own
+  worker processes are daemonic and cannot have children; they, and platforms
+  without multiprocessing support, fall back to threads, which still overlap
+  disk reads with hashing.
+
+  Args:
+    num_workers: Maximum number of concurrent workers.
+
+  Returns:
+    A concurrent.futures.Executor.
+  """
+  if (CheckMultiprocessingAvailableAndInit().is_available and
+      not multiprocessing.current_process().daemon):
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+      context = multiprocessing.get_context('forkserver')
+    else:
+      context = multiprocessing.get_context('spawn')
+    return futures.ProcessPoolExecutor(max_workers=num_workers,
+                                       mp_context=context)
+  return futures.ThreadPoolExecutor(max_workers=num_workers)
+
+
+# Parallel hashing executors by process ID. Starting workers is expensive, so
+# each process creates its executor on first use and keeps it.
+_parallel_hashing_executors = {}
+_parallel_hashing_executors_lock = threading.Lock()
+
+
+def _GetParallelHashingExecutor(num_workers):
+  """Returns this process's parallel hashing executor, creating it if needed.
+
+  Args:
+    num_workers: Maximum number of concurrent workers, if the executor has to
+        be created.
+
+  Returns:
+    A concurrent.futures.Executor.
+  """
+  pid = os.getpid()
+  with _parallel_hashing_executors_lock:
+    executor = _parallel_hashing_executors.get(pid)
+    if executor is None:
+      executor = _CreateParallelHashingExecutor(num_workers)
+      _parallel_hashing_executors[pid] = executor
+  return executor
+
+
+@atexit.register
+def _ShutDownParallelHashingExecutor():
+  """Shuts down this process's executor while the modules it uses remain."""
+  with _parallel_hashing_executors_lock:
+    executor = _parallel_hashing_executors.pop(os.getpid(), None)
+  if executor:
+    executor.shutdown(wait=True)
+
+
+def CalculateHashesFromFile(file_name, hash_dict, callback_processor=None):
+  """Calculates hashes of the contents of a local file.
+
+  If hash_dict contains a CRC32C digester and the file is at least
+  parallel_hashing_threshold bytes, the file is split into ranges whose
+  CRC32Cs are computed concurrently and combined with ConcatCrc32c. Other
+  digesters (MD5 cannot be combined this way) are updated in a single pass
+  over the file while the ranges are being hashed.
+
+  Args:
+    file_name: Path of the file to hash.
+    hash_dict: Dict of (string alg_name: initialized hashing class)
+        Hashing class will be populated with digests upon return.
+    callback_processor: Optional callback processing class that implements
+        Progress(integer amount of bytes processed).
+  """
+  file_size = os.path.getsize(file_name)
+  threshold = HumanReadableToBytes(
+      config.get('GSUtil', 'parallel_hashing_threshold',
+                 DEFAULT_PARALLEL_HASHING_THRESHOLD))
+  num_workers = config.getint('GSUtil', 'parallel_hashing_max_workers',
+                              DEFAULT_PARALLEL_HASHING_MAX_WORKERS)
+  if ('crc32c' not in hash_dict or threshold <= 0 or file_size < threshold or
+      num_workers < 2):
+    with open(file_name, 'rb') as fp:
+      CalculateHashesFromContents(fp,
+                                  hash_dict,
+                                  callback_processor=callback_processor)
+    return
+
+  range_size = -(-file_size // num_workers)
+  ranges = [(start, min(range_size, file_size - start))
+            for start in range(0, file_size, range_size)]
+  sequential_hash_dict = dict(
+      (alg, digester)
+      for alg, digester in six.iteritems(hash_dict)
+      if alg != 'crc32c')
+
+  executor = _GetParallelHashingExecutor(num_workers)
+  crc_futures = [
+      executor.submit(_CalculateCrc32cForRange, file_name, start, length)
+      for start, length in ranges
+  ]
+  if sequential_hash_dict:
+    # The sequential pass is the slowest part, so it drives progress.
+    with open(file_name, 'rb') as fp:
+      CalculateHashesFromContents(fp,
+                                  sequential_hash_dict,
+                                  callback_processor=callback_processor)
+  elif callback_processor:
+    range_lengths = dict(
+        (future, length) for future, (_, length) in zip(crc_futures, ranges))
+    for future in futures.as_completed(crc_futures):
+      callback_processor.Progress(range_lengths[future])
+
+  crc = crc_futures[0].result()
+  for future, (_, length) in zip(crc_futures[1:], ranges[1:]):
+    crc = ConcatCrc32c(crc, future.result(), length)
+  hash_dict['crc32c'].crcValue = crc
+
+
 def CalculateB64EncodedCrc32cFromContents(fp):
   """Calculates a base64 CRC32c checksum of the contents of a seekable stream.
 
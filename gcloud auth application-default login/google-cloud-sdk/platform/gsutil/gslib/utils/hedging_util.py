@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Hedged object downloads, which bound the latency of slow requests.
+
+When the download_hedge_percentile boto config option is set, a download
+request that goes without receiving data for longer than that percentile of
+the times to first byte seen so far is duplicated on another connection,
+starting from the first byte not yet received. Whichever request next delivers
+data carries on the download, and the others are abandoned. The number of
+duplicate requests is limited to a fraction of all requests, so that a
+service that is slow across the board isn't sent twice the requests.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import threading
+import time
+import weakref
+
+from boto import config
+
+from gslib.cloud_api import ResumableDownloadException
+from gslib.cloud_api_delegator import CloudApiDelegator
+from gslib.progress_callback import ProgressCallbackWithTimeout
+from gslib.thread_message import HedgedRequestMessage
+from gslib.utils import text_util
+from gslib.utils.parallelism_framework_util import PutToQueueWithTimeout
+
+# Hedging is off unless a percentile is configured.
+DEFAULT_DOWNLOAD_HEDGE_PERCENTILE = 0
+
+# Number of the most recent times to first byte that deadlines are based on.
+_LATENCY_SAMPLES = 1000
+# Until this many times are known, _INITIAL_DEADLINE seconds is used.
+_MIN_LATENCY_SAMPLES = 20
+_INITIAL_DEADLINE = 2.0
+# Deadlines are never shorter than this many seconds.
+_MIN_DEADLINE = 0.05
+# At most this fraction of requests, plus _HEDGE_BURST, are hedged.
+_MAX_HEDGE_RATIO = 0.1
+_HEDGE_BURST = 2
+_MAX_HEDGES_PER_REQUEST = 2
+
+
+class _HedgeCancelled(Exception):
+  """Raised to abandon a request whose data is no longer wanted."""
+
+
+class _HedgePolicy(object):
+  """Decides when to hedge, from the times to first byte seen so far."""
+
+  def __init__(self, percentile):
+    self.percentile = percentile
+    self._lock = threading.Lock()
+    self._latencies = collections.deque(maxlen=_LATENCY_SAMPLES)
+    self._num_requests = 0
+    self._num_hedges = 0
+
+  def AddLatency(self, seconds):
+    with self._lock:
+      self._latencies.append(seconds)
+
+  def StartRequest(self):
+    """Counts a request and returns the seconds it may go without data."""
+    with self._lock:
+      self._num_requests += 1
+      if len(self._latencies) < _MIN_LATENCY_SAMPLES:
+        return _INITIAL_DEADLINE
+      latencies = sorted(self._latencies)
+    index = min(len(latencies) - 1,
+                int(len(latencies) * self.percentile / 100.0))
+    return max(_MIN_DEADLINE, latencies[index])
+
+  def TryHedge(self):
+    """Returns True, and counts a hedge, if the hedging budget allows one."""
+    with self._lock:
+      if (self._num_hedges >=
+          self._num_requests * _MAX_HEDGE_RATIO + _HEDGE_BURST):
+        return False
+      self._num_hedges += 1
+      return True
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def GetHedgePolicy():
+  """Returns the process's _HedgePolicy, or None if hedging is disabled."""
+  global _policy
+  percentile = config.getfloat('GSUtil', 'download_hedge_percentile',
+                               DEFAULT_DOWNLOAD_HEDGE_PERCENTILE)
+  if not 0 < percentile < 100:
+    return None
+  with _policy_lock:
+    if _policy is None or _policy.percentile != percentile:
+      _policy = _HedgePolicy(percentile)
+    return _policy
+
+
+# Idle Cloud API instances for hedged requests, by the API instance whose
+# requests they duplicate. Instances can't be shared by concurrent requests.
+_idle_apis = weakref.WeakKeyDictionary()
+_idle_apis_lock = threading.Lock()
+
+
+def _AcquireApi(gsutil_api):
+  with _idle_apis_lock:
+    idle_apis = _idle_apis.setdefault(gsutil_api, [])
+    if idle_apis:
+      return idle_apis.pop()
+  return CloudApiDelegator(gsutil_api.bucket_storage_uri_class,
+                           gsutil_api.api_map,
+                           gsutil_api.logger,
+                           gsutil_api.status_queue,
+                           provider=gsutil_api.provider,
+                           debug=gsutil_api.debug,
+                           http_headers=gsutil_api.http_headers,
+                           trace_token=gsutil_api.trace_token,
+                           perf_trace_token=gsutil_api.perf_trace_token,
+                           user_project=gsutil_api.user_project)
+
+
+def _ReleaseApi(gsutil_api, api):
+  with _idle_apis_lock:
+    _idle_apis.setdefault(gsutil_api, []).append(api)
+
+
+class _HedgedDownload(object):
+  """State shared by the requests downloading one byte range.
+
+  Only one request, the owner, writes at a time. A request becomes the owner
+  when it delivers data starting at the first byte not yet written, if there
+  is no owner; hedging a request clears the owner, so that either it or its
+  hedge can carry on.
+  """
+
+  def __init__(self, fp, start_byte, end_byte, digesters, progress_callback,
+               policy):
+    self.cond = threading.Condition()
+    self.fp = fp
+    self.end_byte = end_byte
+    self.digesters = digesters
+    self.policy = policy
+    self.owner = None
+    # Offset of the first byte not yet written.
+    self.committed = start_byte
+    self.last_progress_time = time.time()
+    # _AttemptStreams of the requests still running.
+    self.streams = set()
+    self.finished = False
+    self.result = None
+    self.error = None
+    self.callback_processor = None
+    if progress_callback:
+      progress_callback(start_byte, end_byte + 1)
+      self.callback_processor = ProgressCallbackWithTimeout(
+          end_byte + 1, progress_callback)
+      self.callback_processor.Progress(start_byte)
+
+
+class _AttemptStream(object):
+  """File-like object one request writes the download through."""
+
+  def __init__(self, download):
+    self._download = download
+    self._position = download.committed
+    self._start_time = time.time()
+    self._got_first_byte = False
+    self.wasted_bytes = 0
+
+  @property
+  def mode(self):
+    return 'wb'
+
+  def write(self, data):  # pylint: disable=invalid-name
+    """Writes data if this request owns the download, else abandons it."""
+    download = self._download
+    if not self._got_first_byte:
+      self._got_first_byte = True
+      download.policy.AddLatency(time.time() - self._start_time)
+    with download.cond:
+      if (download.finished or download.owner not in (None, self) or
+          self._position != download.committed):
+        self.wasted_bytes += len(data)
+        raise _HedgeCancelled()
+      download.owner = self
+      text_util.write_to_fd(download.fp, data)
+      for digester in download.digesters.values():
+        digester.update(data)
+      self._position += len(data)
+      download.committed = self._position
+      download.last_progress_time = time.time()
+      if download.callback_processor:
+        download.callback_processor.Progress(len(data))
+
+  def tell(self):  # pylint: disable=invalid-name
+    return self._position
+
+  def seek(self, offset):  # pylint: disable=invalid-name
+    self._position = offset
+
+  def flush(self):  # pylint: disable=invalid-name
+    pass
+
+
+def _RunAttempt(download, stream, gsutil_api, get_media_func):
+  """Runs one request for the download, in its own thread."""
+  api = _AcquireApi(gsutil_api)
+  abandoned = False
+  try:
+    result = get_media_func(api, stream, stream.tell())
+    with download.cond:
+      # Another request may have taken over after this one wrote its last
+      # byte; whichever returns first once the range is written completes it.
+      if (not download.finished and
+          download.committed == download.end_byte + 1):
+        download.finished = True
+        download.result = result
+  except _HedgeCancelled:
+    abandoned = True
+  except Exception as e:  # pylint: disable=broad-except
+    with download.cond:
+      # Let the other requests carry on, if they can.
+      if download.owner is stream:
+        download.owner = None
+      download.error = e
+  finally:
+    with download.cond:
+      download.streams.discard(stream)
+      download.cond.notify_all()
+  # An abandoned request may have been stopped partway through a response,
+  # so its connections aren't reused.
+  if not abandoned:
+    _ReleaseApi(gsutil_api, api)
+  if stream.wasted_bytes:
+    PutToQueueWithTimeout(
+        gsutil_api.status_queue,
+        HedgedRequestMessage(0, stream.wasted_bytes, time.time()))
+
+
+def _StartAttempt(download, gsutil_api, get_media_func):
+  stream = _AttemptStream(download)
+  download.streams.add(stream)
+  thread = threading.Thread(target=_RunAttempt,
+                            args=(download, stream, gsutil_api,
+                                  get_media_func))
+  thread.daemon = True
+  thread.start()
+
+
+def HedgedGetObjectMedia(gsutil_api, policy, fp, start_byte, end_byte,
+                         digesters, progress_callback, get_media_func):
+  """Downloads a byte range of an object, hedging requests that stall.
+
+  Requests run in their own threads, each with its own Cloud API instance, so
+  that a request that is abandoned while waiting for data doesn't hold up the
+  caller.
+
+  Args:
+    gsutil_api: gsutil Cloud API instance whose settings requests use.
+    policy: _HedgePolicy from GetHedgePolicy.
+    fp: File to write the range to, positioned at start_byte.
+    start_byte: First byte of the range.
+    end_byte: Last byte of the range.
+    digesters: Dict of digesters to update with the downloaded bytes.
+    progress_callback: Callback for download progress, or None.
+    get_media_func: Function (api, stream, start_byte) that downloads the
+        object from start_byte to end_byte into stream with api, without
+        digesters or progress callbacks, and returns the server encoding.
+
+  Returns:
+    The result of get_media_func for the request that completed the range.
+
+  Raises:
+    The last error raised by get_media_func, if no request completes.
+    ResumableDownloadException if the requests returned without writing the
+    whole range.
+  """
+  download = _HedgedDownload(fp, start_byte, end_byte, digesters,
+                             progress_callback, policy)
+  deadline = policy.StartRequest()
+  num_hedges = 0
+  may_hedge = True
+  with download.cond:
+    _StartAttempt(download, gsutil_api, get_media_func)
+    while not download.finished:
+      # After a request fails, only requests that have fallen behind may be
+      # left, and those can't complete the range.
+      if download.error and not any(stream.tell() == download.committed
+                                    for stream in download.streams):
+        break
+      if not download.streams:
+        # Every request returned without completing the range.
+        break
+      remaining = download.last_progress_time + deadline - time.time()
+      if not may_hedge or download.committed > download.end_byte:
+        # Once the whole range is written, the request that wrote it only has
+        # to return.
+        download.cond.wait()
+      elif remaining > 0:
+        download.cond.wait(remaining)
+      elif num_hedges < _MAX_HEDGES_PER_REQUEST and policy.TryHedge():
+        num_hedges += 1
+        download.owner = None
+        download.last_progress_time = time.time()
+        _StartAttempt(download, gsutil_api, get_media_func)
+      else:
+        # Let the requests already sent finish.
+        may_hedge = False
+    finished = download.finished
+    # Stop requests that are still running from writing.
+    download.finished = True
+  if num_hedges:
+    PutToQueueWithTimeout(gsutil_api.status_queue,
+                          HedgedRequestMessage(num_hedges, 0, time.time()))
+  if not finished:
+    if download.error:
+      raise download.error
+    raise ResumableDownloadException(
+        'Download of bytes %d-%d ended after %d bytes.' %
+        (start_byte, end_byte, download.committed - start_byte))
+  return download.result
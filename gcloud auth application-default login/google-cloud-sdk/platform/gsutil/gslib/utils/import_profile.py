@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Reports the time gsutil spends importing modules at startup.
+
+Used by "gsutil test -i" to track down startup time regressions. The timings
+come from running gsutil in a subprocess with Python's -X importtime option.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import re
+import subprocess
+import sys
+
+import six
+
+import gslib
+from gslib.utils.constants import UTF8
+
+DEFAULT_IMPORT_PROFILE_MODULES = 20
+
+# Microseconds spent importing one module, excluding (self_us) and including
+# (cumulative_us) the modules it imported in turn, and its nesting depth in
+# the import tree (0 for modules imported directly by the entry point).
+ImportTiming = collections.namedtuple(
+    'ImportTiming', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+_IMPORT_TIME_LINE_RE = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+_COMMAND_MODULE_PREFIX = 'gslib.commands.'
+
+
+def ParseImportTimes(output):
+  """Parses the report written to stderr by python -X importtime.
+
+  Args:
+    output: Text written to stderr; lines other than import timings are
+        ignored.
+
+  Returns:
+    List of ImportTiming, in the order the imports completed.
+  """
+  timings = []
+  for line in output.splitlines():
+    match = _IMPORT_TIME_LINE_RE.match(line)
+    if match:
+      timings.append(
+          ImportTiming(match.group(4), int(match.group(1)),
+                       int(match.group(2)), (len(match.group(3)) - 1) // 2))
+  return timings
+
+
+def ProfileImports(gsutil_args):
+  """Runs gsutil in a subprocess and returns the time spent on each import.
+
+  Args:
+    gsutil_args: Arguments to pass to gsutil, e.g. ['version'].
+
+  Returns:
+    List of ImportTiming.
+  """
+  cmd = [sys.executable, '-X', 'importtime', gslib.GSUTIL_PATH]
+  cmd.extend(gsutil_args)
+  process = subprocess.Popen(cmd,
+                             stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+  _, stderr = process.communicate()
+  return ParseImportTimes(six.ensure_text(stderr, UTF8, errors='replace'))
+
+
+def FormatImportProfile(timings, num_modules=DEFAULT_IMPORT_PROFILE_MODULES):
+  """Summarizes import timings as human-readable text.
+
+  Args:
+    timings: List of ImportTiming.
+    num_modules: Number of modules to list in each section.
+
+  Returns:
+    The report, as a string.
+  """
+
+  def _FormatTimings(title, sorted_timings, key):
+    lines = [title]
+    for timing in sorted_timings[:num_modules]:
+      lines.append('  %9.1f ms  %s' % (key(timing) / 1000.0, timing.module))
+    return lines
+
+  total_us = sum(timing.self_us for timing in timings)
+  lines = [
+      'Imported %d modules in %.1f ms.' % (len(timings), total_us / 1000.0),
+      ''
+  ]
+  lines.extend(
+      _FormatTimings(
+          'Slowest top-level imports, including the modules they import:',
+          sorted((timing for timing in timings if timing.depth == 0),
+                 key=lambda timing: timing.cumulative_us,
+                 reverse=True), lambda timing: timing.cumulative_us))
+  lines.append('')
+  lines.extend(
+      _FormatTimings(
+          'Slowest modules, excluding the modules they import:',
+          sorted(timings, key=lambda timing: timing.self_us, reverse=True),
+          lambda timing: timing.self_us))
+  # Child processes started by the command report their imports too, so a
+  # module may appear more than once.
+  command_modules = sorted(
+      set(timing.module[len(_COMMAND_MODULE_PREFIX):]
+          for timing in timings
+          if timing.module.startswith(_COMMAND_MODULE_PREFIX)))
+  lines.append('')
+  lines.append('Command modules imported: %s' %
+               (', '.join(command_modules) or 'none'))
+  return '\n'.join(lines)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Watching local directory trees for changes with Linux inotify.
+
+inotify is called through ctypes, so no extra packages are needed. Watches are
+per directory, so a watcher adds one for every directory in the tree, and for
+directories created or moved into it as they appear.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+from gslib.exception import CommandException
+from gslib.utils.system_util import IS_LINUX
+
+# Event flags, from <sys/inotify.h>.
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+# Changes to files are reported once they are closed after writing, rather
+# than on each write, so that partly written files aren't picked up.
+_WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+               IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+               IN_ONLYDIR | IN_DONT_FOLLOW)
+
+# struct inotify_event without its trailing name: wd, mask, cookie, len.
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Enough for several hundred events per read.
+_READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _GetLibc():
+  global _libc
+  if _libc is None:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                        use_errno=True)
+  return _libc
+
+
+class DirectoryChanges(object):
+  """Changes reported by a DirectoryWatcher.
+
+  Attributes:
+    paths: Set of paths of files that were created, changed or removed. Each
+        must be checked to see which.
+    removed_dirs: Set of paths of directories that were removed or moved away.
+        The files under them are not listed in paths.
+    overflowed: True if the kernel dropped events, so that the other
+        attributes are incomplete and the tree must be compared in full.
+  """
+
+  def __init__(self):
+    self.paths = set()
+    self.removed_dirs = set()
+    self.overflowed = False
+
+
+class DirectoryWatcher(object):
+  """Reports the files changed under a local directory."""
+
+  def __init__(self, root, recursive):
+    """Starts watching a directory.
+
+    Args:
+      root: Path of the directory to watch.
+      recursive: If True, watch the directories under root as well.
+
+    Raises:
+      CommandException if watching is unsupported or the kernel refuses.
+    """
+    if not IS_LINUX:
+      raise CommandException('Watching directories for changes requires '
+                             'Linux.')
+    self._root = root
+    self._recursive = recursive
+    self._paths_by_wd = {}
+    self._fd = _GetLibc().inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if self._fd < 0:
+      raise CommandException('Failed to start watching %s: %s' %
+                             (root, os.strerror(ctypes.get_errno())))
+    self.WatchTree()
+
+  def Close(self):
+    if self._fd >= 0:
+      os.close(self._fd)
+      self._fd = -1
+
+  def WatchTree(self, path=None):
+    """Watches a directory and, if recursive, the directories under it.
+
+    Watches are added before each directory is listed, so that files created
+    meanwhile are either listed or reported later.
+
+    Args:
+      path: Path of the directory, which defaults to the root. Directories that
+          are already watched are updated in place.
+
+    Returns:
+      List of paths of the files found.
+    """
+    file_paths = []
+    dirs = [path or self._root]
+    while dirs:
+      dir_path = dirs.pop()
+      if not self._Watch(dir_path):
+        continue
+      try:
+        with os.scandir(dir_path) as it:
+          entries = list(it)
+      except OSError:
+        continue
+      for entry in entries:
+        try:
+          is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+          continue
+        if not is_dir:
+          file_paths.append(entry.path)
+        elif self._recursive:
+          dirs.append(entry.path)
+    return file_paths
+
+  def _Watch(self, dir_path):
+    """Adds a watch to a directory, returning False if it doesn't exist."""
+    wd = _GetLibc().inotify_add_watch(self._fd, os.fsencode(dir_path),
+                                      _WATCH_MASK)
+    if wd < 0:
+      err = ctypes.get_errno()
+      if err in (errno.ENOENT, errno.ENOTDIR):
+        return False
+      if err == errno.ENOSPC:
+        raise CommandException(
+            'Ran out of inotify watches while watching %s. The limit can be '
+            'raised with the fs.inotify.max_user_watches sysctl.' % dir_path)
+      raise CommandException('Failed to watch %s: %s' %
+                             (dir_path, os.strerror(err)))
+    # Watching a directory that was moved returns its existing descriptor,
+    # which then refers to the new path.
+    self._paths_by_wd[wd] = dir_path
+    return True
+
+  def WaitForChanges(self, delay, max_delay):
+    """Blocks until files change, then collects changes until they settle.
+
+    Args:
+      delay: Seconds without further events after which changes are returned.
+      max_delay: Seconds after the first event after which changes are
+          returned even if events continue.
+
+    Returns:
+      DirectoryChanges.
+    """
+    changes = DirectoryChanges()
+    deadline = None
+    # Block without a timeout until something happens.
+    timeout = None
+    while True:
+      readable, _, _ = select.select([self._fd], [], [], timeout)
+      if not readable:
+        break
+      self._ReadEvents(changes)
+      now = time.time()
+      if deadline is None:
+        deadline = now + max_delay
+      timeout = min(delay, deadline - now)
+      if timeout <= 0:
+        break
+    return changes
+
+  def _ReadEvents(self, changes):
+    while True:
+      try:
+        data = os.read(self._fd, _READ_SIZE)
+      except BlockingIOError:
+        return
+      offset = 0
+      while offset < len(data):
+        wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+        offset += _EVENT_HEADER.size
+        name = data[offset:offset + name_len].rstrip(b'\0')
+        offset += name_len
+        self._HandleEvent(changes, wd, mask, name)
+
+  def _HandleEvent(self, changes, wd, mask, name):
+    """Records one event in changes."""
+    if mask & IN_Q_OVERFLOW:
+      changes.overflowed = True
+      return
+    if mask & IN_IGNORED:
+      self._paths_by_wd.pop(wd, None)
+      return
+    dir_path = self._paths_by_wd.get(wd)
+    if dir_path is None:
+      return
+    if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+      # Other directories are reported by the events of their parents.
+      if dir_path == self._root:
+        raise CommandException('%s was removed or moved while being watched.' %
+                               self._root)
+      return
+    path = os.path.join(dir_path, os.fsdecode(name))
+    if mask & IN_ISDIR:
+      if not self._recursive:
+        return
+      if mask & (IN_CREATE | IN_MOVED_TO):
+        changes.paths.update(self.WatchTree(path))
+      elif mask & (IN_DELETE | IN_MOVED_FROM):
+        changes.removed_dirs.add(path)
+      return
+    # New regular files are reported when closed after writing. Only links,
+    # which are never opened, are reported as soon as they are created.
+    if mask & IN_CREATE and not os.path.islink(path):
+      return
+    changes.paths.add(path)
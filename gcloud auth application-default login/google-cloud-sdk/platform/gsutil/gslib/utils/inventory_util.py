@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Listing objects from storage inventory reports.
+
+Inventory reports list the objects in a bucket and their metadata as CSV or
+Parquet files, one row per object. Commands read them with --listing-from
+instead of listing large buckets through the API. A report describes the
+bucket at the time it was generated, so the directories holding objects that
+changed shortly before then can be listed live instead (see
+InventoryReport.IterObjects).
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import csv
+import datetime
+import io
+import os
+import tempfile
+import time
+
+from apitools.base.protorpclite import util as protorpc_util
+
+from gslib.bucket_listing_ref import BucketListingObject
+from gslib.exception import CommandException
+from gslib.storage_url import StorageUrlFromString
+from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
+from gslib.utils.constants import UTF8
+from gslib.utils.posix_util import ConvertDatetimeToPOSIX
+from gslib.utils.prefix_size_index import GetDirectory
+from gslib.wildcard_iterator import CreateWildcardIterator
+
+# pylint: disable=g-import-not-at-top
+try:
+  from pyarrow import parquet
+except ImportError:
+  parquet = None
+# pylint: enable=g-import-not-at-top
+
+# Columns a report must have, and the other columns that are used if present.
+# Column names are the JSON API names of the object fields.
+_REQUIRED_COLUMNS = ('bucket', 'name', 'size')
+_OPTIONAL_COLUMNS = ('generation', 'timeCreated', 'updated', 'crc32c',
+                     'md5Hash')
+
+
+def _CheckColumns(path, columns):
+  missing = [column for column in _REQUIRED_COLUMNS if column not in columns]
+  if missing:
+    raise CommandException(
+        'Inventory report %s is missing the %s column(s). Reports must '
+        'include the %s of each object.' %
+        (path, ', '.join(missing), ', '.join(_REQUIRED_COLUMNS)))
+
+
+def _IterCsvRows(path):
+  """Yields a dict of column name to value for each row of a CSV report."""
+  with io.open(path, 'r', encoding=UTF8, newline='') as fp:
+    reader = csv.DictReader(fp)
+    _CheckColumns(path, reader.fieldnames or [])
+    for row in reader:
+      yield row
+
+
+def _IterParquetRows(path):
+  """Yields a dict of column name to value for each row of a Parquet report."""
+  if parquet is None:
+    raise CommandException(
+        'Reading the Parquet inventory report %s requires the pyarrow '
+        'package. Install it, or use a CSV report.' % path)
+  parquet_file = parquet.ParquetFile(path)
+  names = parquet_file.schema_arrow.names
+  _CheckColumns(path, names)
+  columns = [
+      column for column in _REQUIRED_COLUMNS + _OPTIONAL_COLUMNS
+      if column in names
+  ]
+  for batch in parquet_file.iter_batches(columns=columns):
+    for row in batch.to_pylist():
+      yield row
+
+
+def _IterFileRows(path):
+  if path.lower().endswith('.parquet'):
+    return _IterParquetRows(path)
+  return _IterCsvRows(path)
+
+
+def _ParseTime(value):
+  """Returns a report's timestamp as a datetime, or None if it is empty."""
+  if not value:
+    return None
+  if isinstance(value, datetime.datetime):
+    return value
+  return protorpc_util.decode_datetime(value)
+
+
+def _ParseInt(value):
+  return None if value in (None, '') else int(value)
+
+
+def _MakeObject(row):
+  """Returns an apitools Object holding the fields of a report row."""
+  return apitools_messages.Object(
+      bucket=row['bucket'],
+      name=row['name'],
+      size=int(row['size']),
+      generation=_ParseInt(row.get('generation')),
+      timeCreated=_ParseTime(row.get('timeCreated')),
+      updated=_ParseTime(row.get('updated')),
+      crc32c=row.get('crc32c') or None,
+      md5Hash=row.get('md5Hash') or None)
+
+
+class InventoryReport(object):
+  """The files of one or more inventory reports, readable locally.
+
+  Instances only hold file paths, so that they can be passed to other
+  processes along with the command using them.
+  """
+
+  def __init__(self, url_strs, gsutil_api, logger, temp_files):
+    """Finds, and downloads if necessary, the files of the reports.
+
+    Args:
+      url_strs: Local paths or cloud URLs of the report files. Wildcards may be
+          used to name all the shards of a report.
+      gsutil_api: Cloud API instance used to list and download report files.
+      logger: logging.Logger for progress messages.
+      temp_files: List to which the (closed) temporary files that cloud report
+          files are downloaded to are appended. The caller must remove them
+          when done with the report.
+
+    Raises:
+      CommandException if a URL matches no files.
+    """
+    self.paths = []
+    # Time the oldest report file was written, in seconds since the epoch.
+    self.report_time = None
+    for url_str in url_strs:
+      blrs = list(
+          CreateWildcardIterator(url_str, gsutil_api,
+                                 logger=logger).IterObjects(
+                                     bucket_listing_fields=[
+                                         'name', 'generation', 'timeCreated'
+                                     ]))
+      if not blrs:
+        raise CommandException('No inventory report files matched %s' %
+                               url_str)
+      for blr in sorted(blrs, key=lambda blr: blr.url_string):
+        url = blr.storage_url
+        if url.IsFileUrl():
+          path = url.object_name
+          written = os.path.getmtime(path)
+        else:
+          path = self._Download(blr, gsutil_api, logger, temp_files)
+          written = ConvertDatetimeToPOSIX(blr.root_object.timeCreated)
+        self.paths.append(path)
+        if self.report_time is None or written < self.report_time:
+          self.report_time = written
+
+  def _Download(self, blr, gsutil_api, logger, temp_files):
+    """Downloads a report file to a temporary file and returns its path."""
+    url = blr.storage_url
+    logger.info('Downloading inventory report %s...', url)
+    # Keep the extension, which identifies Parquet files.
+    temp_file = tempfile.NamedTemporaryFile(
+        prefix='gsutil-inventory-',
+        suffix=os.path.splitext(url.object_name)[1],
+        delete=False)
+    temp_files.append(temp_file)
+    with temp_file:
+      gsutil_api.GetObjectMedia(url.bucket_name,
+                                url.object_name,
+                                temp_file,
+                                generation=blr.root_object.generation,
+                                provider=url.scheme)
+    return temp_file.name
+
+  def _IterBucketRows(self, bucket_name):
+    for path in self.paths:
+      for row in _IterFileRows(path):
+        if row['bucket'] == bucket_name:
+          yield row
+
+  def IterObjects(self,
+                  bucket_url,
+                  prefix,
+                  recursive,
+                  list_objects_func,
+                  logger,
+                  verify_recent_seconds=None):
+    """Yields the objects the report lists under a prefix.
+
+    If the report has no objects in the bucket at all, it is listed with
+    list_objects_func instead.
+
+    Args:
+      bucket_url: StorageUrl of the bucket.
+      prefix: Prefix of the objects to yield; '' for the whole bucket,
+          otherwise ending in '/'.
+      recursive: If False, only yield objects directly under the prefix.
+      list_objects_func: Function (prefix, recursive) returning an iterator of
+          BucketListingObjects for objects listed live under a prefix.
+      logger: logging.Logger for progress messages.
+      verify_recent_seconds: If set, the directories holding objects that the
+          report shows were created or updated within this many seconds of
+          now are listed live, instead of their objects being read from the
+          report. This takes an extra pass over the report.
+
+    Yields:
+      BucketListingObject for each object, with the report's fields in its
+      root_object.
+    """
+    bucket_name = bucket_url.bucket_name
+    url_prefix = '%s://%s/' % (bucket_url.scheme, bucket_name)
+    prefix_len = len(prefix)
+
+    def _IterPrefixRows():
+      for row in self._IterBucketRows(bucket_name):
+        name = row['name']
+        if name.startswith(prefix) and (recursive or
+                                        '/' not in name[prefix_len:]):
+          yield row
+
+    recent_directories = set()
+    if verify_recent_seconds is not None:
+      cutoff = time.time() - verify_recent_seconds
+      for row in _IterPrefixRows():
+        changed = _ParseTime(row.get('updated') or row.get('timeCreated'))
+        if changed is None or ConvertDatetimeToPOSIX(changed) >= cutoff:
+          recent_directories.add(GetDirectory(row['name']))
+
+    found_bucket = False
+    for row in self._IterBucketRows(bucket_name):
+      found_bucket = True
+      name = row['name']
+      if (not name.startswith(prefix) or
+          (not recursive and '/' in name[prefix_len:]) or
+          (recent_directories and GetDirectory(name) in recent_directories)):
+        continue
+      yield BucketListingObject(StorageUrlFromString(url_prefix + name),
+                                root_object=_MakeObject(row))
+    if not found_bucket:
+      logger.info(
+          'The inventory report lists no objects in %s; listing it instead.',
+          bucket_url)
+      for blr in list_objects_func(prefix, recursive):
+        yield blr
+      return
+    if recent_directories:
+      logger.info(
+          'Listing %d recently changed directories under %s%s...',
+          len(recent_directories), url_prefix, prefix)
+    for directory in sorted(recent_directories):
+      for blr in list_objects_func(directory, False):
+        yield blr
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Storage helpers for the cp -L manifest.
+
+The manifest itself stays a CSV file that is only ever appended to. Which
+sources it records as completed is kept in a SQLite index next to it, so that
+resuming a large copy only has to scan rows appended since the previous run
+and never holds the set of completed sources in memory.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import atexit
+import csv
+import hashlib
+import locale
+import logging
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+
+import six
+
+MANIFEST_INDEX_SUFFIX = '.index'
+
+# Number of completed sources inserted into the index per transaction while
+# catching up with the manifest file.
+MANIFEST_INDEX_BATCH_SIZE = 10000
+
+# How long to wait for another process to release a write lock, in seconds.
+_BUSY_TIMEOUT = 60
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS completed (source TEXT PRIMARY KEY)'
+    '  WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS state ('
+    '  key TEXT PRIMARY KEY,'
+    '  value INTEGER NOT NULL)',
+)
+
+# Identifies the manifest file that the index was built from.
+_FILE_ID_KEY = 'file_id'
+# Byte offset in the manifest file up to which rows have been indexed.
+_OFFSET_KEY = 'offset'
+# Digest of the manifest contents indexed so far; see GetManifestFingerprint.
+_FINGERPRINT_KEY = 'fingerprint'
+
+# Number of bytes at the start of the manifest and before the indexed offset
+# that are hashed to fingerprint the indexed contents.
+_FINGERPRINT_WINDOW = 64 * 1024
+
+class ManifestIndex(object):
+  """An on-disk set of the sources a manifest records as completed.
+
+  Instances may be shared by threads and passed to other processes; each
+  process opens its own connection to the index on first use.
+  """
+
+  def __init__(self, index_path):
+    """Opens (creating if necessary) the index.
+
+    Args:
+      index_path: Path of the SQLite database file.
+
+    Raises:
+      sqlite3.Error if the index cannot be opened.
+    """
+    self.index_path = index_path
+    # (pid, connection, lock) for the process that opened the connection.
+    self._connection = None
+    self._Connect()
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state['_connection'] = None
+    return state
+
+  def _Connect(self):
+    """Returns the connection and its lock for the current process."""
+    connection = self._connection
+    if connection is None or connection[0] != os.getpid():
+      conn = sqlite3.connect(self.index_path,
+                             timeout=_BUSY_TIMEOUT,
+                             check_same_thread=False)
+      conn.execute('PRAGMA journal_mode=WAL')
+      conn.execute('PRAGMA synchronous=NORMAL')
+      with conn:
+        for statement in _SCHEMA:
+          conn.execute(statement)
+      connection = (os.getpid(), conn, threading.Lock())
+      self._connection = connection
+    return connection[1], connection[2]
+
+  def GetState(self):
+    """Returns (file_id, offset, fingerprint) recorded by the last update.
+
+    Returns:
+      (None, 0, None) for an empty index. The fingerprint is None until rows
+      have been indexed.
+    """
+    conn, lock = self._Connect()
+    with lock:
+      state = dict(conn.execute('SELECT key, value FROM state').fetchall())
+    return (state.get(_FILE_ID_KEY), state.get(_OFFSET_KEY, 0),
+            state.get(_FINGERPRINT_KEY))
+
+  def Reset(self, file_id):
+    """Empties the index and associates it with a new manifest file."""
+    conn, lock = self._Connect()
+    with lock:
+      with conn:
+        conn.execute('DELETE FROM completed')
+        conn.execute('DELETE FROM state WHERE key = ?', (_FINGERPRINT_KEY,))
+        conn.executemany('INSERT OR REPLACE INTO state VALUES (?, ?)',
+                         ((_FILE_ID_KEY, file_id), (_OFFSET_KEY, 0)))
+
+  def AddCompleted(self, sources, offset, fingerprint):
+    """Records completed sources and the manifest offset they were read up to.
+
+    Args:
+      sources: Iterable of source URL strings.
+      offset: Byte offset in the manifest following the last row read.
+      fingerprint: GetManifestFingerprint of the manifest at offset.
+    """
+    conn, lock = self._Connect()
+    with lock:
+      with conn:
+        conn.executemany('INSERT OR IGNORE INTO completed VALUES (?)',
+                         ((source,) for source in sources))
+        conn.executemany('INSERT OR REPLACE INTO state VALUES (?, ?)',
+                         ((_OFFSET_KEY, offset),
+                          (_FINGERPRINT_KEY, fingerprint)))
+
+  def Contains(self, source):
+    """Returns whether source is recorded as completed."""
+    conn, lock = self._Connect()
+    with lock:
+      row = conn.execute('SELECT 1 FROM completed WHERE source = ?',
+                         (source,)).fetchone()
+    return row is not None
+
+
+def GetManifestFingerprint(fp, offset):
+  """Returns a digest of the manifest contents preceding offset.
+
+  Only the header and the rows just before offset are hashed, which keeps the
+  check cheap for large manifests while still telling a manifest that was
+  rewritten in place (keeping its inode and size) from one that was only
+  appended to.
+
+  Args:
+    fp: Binary file object for the manifest. Its position is preserved.
+    offset: Byte offset up to which the manifest has been indexed.
+
+  Returns:
+    Signed 64-bit integer digest.
+  """
+  position = fp.tell()
+  try:
+    digest = hashlib.sha256()
+    fp.seek(0)
+    digest.update(fp.read(min(offset, _FINGERPRINT_WINDOW)))
+    tail_start = max(0, offset - _FINGERPRINT_WINDOW)
+    fp.seek(tail_start)
+    digest.update(fp.read(offset - tail_start))
+    digest.update(struct.pack('>q', offset))
+  finally:
+    fp.seek(position)
+  return struct.unpack('>q', digest.digest()[:8])[0]
+
+
+def OpenManifestIndex(manifest_path, logger=None):
+  """Opens the index for a manifest file.
+
+  The index lives next to the manifest. If it cannot be created there (for
+  example because the directory is read-only), a temporary index is used
+  instead and rebuilt from the whole manifest on every run.
+
+  Args:
+    manifest_path: Path of the manifest CSV file.
+    logger: Logger for a message when falling back to a temporary index.
+
+  Returns:
+    ManifestIndex instance.
+  """
+  try:
+    return ManifestIndex(manifest_path + MANIFEST_INDEX_SUFFIX)
+  except sqlite3.Error as e:
+    (logger or logging.getLogger()).debug(
+        'Could not open manifest index for %s (%s); using a temporary index.',
+        manifest_path, e)
+  fd, index_path = tempfile.mkstemp(suffix=MANIFEST_INDEX_SUFFIX)
+  os.close(fd)
+  owner_pid = os.getpid()
+
+  @atexit.register
+  def _DeleteTemporaryIndex():  # pylint: disable=unused-variable
+    if os.getpid() == owner_pid:
+      for suffix in ('', '-wal', '-shm'):
+        try:
+          os.unlink(index_path + suffix)
+        except OSError:
+          pass
+
+  return ManifestIndex(index_path)
+
+
+class ManifestLineReader(object):
+  """Iterates over the complete lines of a binary manifest file as text.
+
+  Tracks the byte offset following the last line returned, so that a caller
+  feeding the lines to csv.reader knows where the rows it has consumed end.
+  A final line without a terminating newline may still be being written, so
+  it is not returned.
+  """
+
+  def __init__(self, fp):
+    """Initializes the reader.
+
+    Args:
+      fp: Binary file object, positioned at the start of a line.
+    """
+    self._fp = fp
+    # The manifest is written in the locale's preferred encoding.
+    self._encoding = locale.getpreferredencoding(False)
+    self.position = fp.tell()
+
+  def Seek(self, offset):
+    """Continues reading from offset, which must be the start of a line."""
+    self._fp.seek(offset)
+    self.position = offset
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    line = self._fp.readline()
+    if not line.endswith(b'\n'):
+      if line:
+        # Leave the partial line to be read again once it is complete.
+        self._fp.seek(self.position)
+      raise StopIteration
+    self.position += len(line)
+    return line.decode(self._encoding)
+
+  next = __next__
+
+
+class ManifestAppender(object):
+  """Appends rows to a manifest file, writing concurrent rows together.
+
+  Each thread's row is written before AppendRow returns, but while one thread
+  writes, rows from other threads accumulate and are then written by a single
+  one of them with one file open and write, rather than each thread taking the
+  file lock and opening the file in turn.
+  """
+
+  def __init__(self, path, lock):
+    """Initializes the appender.
+
+    Args:
+      path: Path of the manifest file.
+      lock: Lock serializing writes to the file across processes.
+    """
+    self.path = path
+    self.lock = lock
+    self.pid = os.getpid()
+    self._cond = threading.Condition()
+    self._pending = []
+    # Rows are numbered in the order they were appended; rows numbered below
+    # _written_count have been written to the file.
+    self._appended_count = 0
+    self._written_count = 0
+    self._writing = False
+
+  def AppendRow(self, row):
+    """Writes a row of strings to the manifest file as CSV."""
+    buf = six.StringIO()
+    csv.writer(buf).writerow(row)
+    with self._cond:
+      row_number = self._appended_count
+      self._appended_count += 1
+      self._pending.append(buf.getvalue())
+      while self._written_count <= row_number:
+        if self._writing:
+          self._cond.wait()
+          continue
+        self._writing = True
+        batch, self._pending = self._pending, []
+        batch_end = self._appended_count
+        self._cond.release()
+        try:
+          self._Write(''.join(batch))
+        finally:
+          self._cond.acquire()
+          self._writing = False
+          self._written_count = batch_end
+          self._cond.notify_all()
+
+  def _Write(self, text):
+    # Acquire a lock to prevent multiple processes writing to the same file at
+    # the same time. This would cause a garbled mess in the manifest file.
+    with self.lock:
+      with open(self.path, 'a', newline='') as f:
+        f.write(text)
@@ -410,6 +410,18 @@ Alternatively, edit /etc/launchd.conf with something like:
       stack_trace=_cached_multiprocessing_check_stack_trace)
 
 
+def ReinitializeTopLevelManager():
+  """Replaces top_level_manager with a new one owned by the current process.
+
+  Used by processes forked from a long-lived parent that must not share the
+  state held by the parent's manager. Does nothing if multiprocessing is not
+  available.
+  """
+  if CheckMultiprocessingAvailableAndInit().is_available:
+    global top_level_manager  # pylint: disable=global-variable-undefined
+    top_level_manager = multiprocessing_context.Manager()
+
+
 def CreateLock():
   """Returns either a multiprocessing lock or a threading lock.
 
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Statistics, host sampling and result comparison for the perfdiag command."""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+from collections import namedtuple
+import math
+import os
+import socket
+import ssl
+import threading
+import time
+
+from gslib.utils.unit_util import Percentile
+
+# Version of the perfdiag result file format. Version 1 files, written before
+# the format was versioned, have no "schema_version" key.
+RESULTS_SCHEMA_VERSION = 2
+
+# Percentiles recorded in latency histograms.
+HISTOGRAM_PERCENTILES = (50, 90, 99, 99.9)
+
+# Latency histograms have 2**_HISTOGRAM_SUB_BUCKET_BITS buckets per power of
+# two microseconds (above that many microseconds), so a value's bucket
+# bounds it to within 1/2**(_HISTOGRAM_SUB_BUCKET_BITS - 1) of the value.
+_HISTOGRAM_SUB_BUCKET_BITS = 7
+
+# Seconds between samples of host counters during throughput tests.
+DEFAULT_SAMPLE_INTERVAL = 0.5
+
+# Relative change at which compared metrics are reported as regressions.
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+# Latency increases smaller than this, in seconds, are not reported as
+# regressions however large relative to the baseline, as they are dominated by
+# timer and scheduling noise.
+_MIN_LATENCY_REGRESSION = 0.001
+
+# Connection phases measured by MeasureConnectionPhases, in order.
+CONNECTION_PHASES = ('dns', 'connect', 'tls', 'first_byte')
+
+_THROUGHPUT_TESTS = ('read_throughput', 'read_throughput_file',
+                     'write_throughput', 'write_throughput_file')
+
+# One metric compared between two perfdiag result files. change is the
+# relative change from baseline to current, or None if the baseline is 0.
+MetricComparison = namedtuple(
+    'MetricComparison',
+    ['name', 'baseline', 'current', 'change', 'higher_is_better', 'regressed'])
+
+
+def _GetHistogramBucket(microseconds):
+  """Returns the lower bound of the histogram bucket holding a value."""
+  shift = max(microseconds.bit_length() - _HISTOGRAM_SUB_BUCKET_BITS, 0)
+  return (microseconds >> shift) << shift
+
+
+def MakeLatencyHistogram(trials):
+  """Summarizes latency trials as a log-linear histogram.
+
+  Args:
+    trials: List of latencies, in seconds.
+
+  Returns:
+    Dict with the count, min, max, mean, stdev and percentiles (keyed by
+    percentile as a string, e.g. '99.9') of the trials in seconds, and
+    "buckets", a list of [lower bound in seconds, count] pairs for the
+    non-empty buckets in increasing order. None if there are no trials.
+  """
+  if not trials:
+    return None
+  trials = sorted(trials)
+  n = len(trials)
+  mean = float(sum(trials)) / n
+  counts = {}
+  for trial in trials:
+    bucket = _GetHistogramBucket(max(int(trial * 1000000), 0))
+    counts[bucket] = counts.get(bucket, 0) + 1
+  return {
+      'count': n,
+      'min': trials[0],
+      'max': trials[-1],
+      'mean': mean,
+      'stdev': math.sqrt(sum((x - mean)**2 for x in trials) / n),
+      'percentiles': {
+          '%g' % p: Percentile(trials, p / 100.0)
+          for p in HISTOGRAM_PERCENTILES
+      },
+      'buckets': [[bucket / 1000000.0, counts[bucket]]
+                  for bucket in sorted(counts)],
+  }
+
+
+def UpgradeResults(results):
+  """Adds histograms to results read from a version 1 result file."""
+  if results.get('schema_version', 1) >= RESULTS_SCHEMA_VERSION:
+    return results
+  if 'latency' in results:
+    results['latency_histograms'] = {
+        key: MakeLatencyHistogram(trials)
+        for key, trials in results['latency'].items()
+    }
+  results['schema_version'] = RESULTS_SCHEMA_VERSION
+  return results
+
+
+def MeasureConnectionPhases(host, port, use_tls, timeout=30):
+  """Times the phases of a new connection and request to an endpoint.
+
+  Args:
+    host: Host name of the endpoint.
+    port: Port of the endpoint.
+    use_tls: True if the endpoint uses TLS.
+    timeout: Socket timeout, in seconds.
+
+  Returns:
+    Dict of phase name (from CONNECTION_PHASES; 'tls' only if use_tls) to
+    seconds taken: resolving the host name, opening a TCP connection, the TLS
+    handshake, and from sending a request to receiving the first byte of the
+    response.
+
+  Raises:
+    socket.error or ssl.SSLError if the connection fails.
+  """
+  phases = {}
+  t0 = time.time()
+  address = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+  phases['dns'] = time.time() - t0
+  sock = socket.socket(address[0], address[1], address[2])
+  try:
+    sock.settimeout(timeout)
+    t0 = time.time()
+    sock.connect(address[4])
+    phases['connect'] = time.time() - t0
+    if use_tls:
+      t0 = time.time()
+      sock = ssl.create_default_context().wrap_socket(sock,
+                                                      server_hostname=host)
+      phases['tls'] = time.time() - t0
+    request = ('HEAD / HTTP/1.1\r\nHost: %s\r\nConnection: close\r\n\r\n' %
+               host)
+    t0 = time.time()
+    sock.sendall(request.encode('ascii'))
+    sock.recv(1)
+    phases['first_byte'] = time.time() - t0
+  finally:
+    sock.close()
+  return phases
+
+
+def _ReadHostCounters():
+  """Returns a dict of cumulative host counters available on this system."""
+  counters = {}
+  times = os.times()
+  counters['process_cpu'] = (times[0] + times[1] + times[2] + times[3])
+  try:
+    # The first line of /proc/stat holds cumulative CPU time by state, in
+    # clock ticks; the fourth and fifth states are idle and iowait.
+    with open('/proc/stat', 'r') as f:
+      ticks = [int(value) for value in f.readline().split()[1:]]
+    counters['cpu_busy_ticks'] = sum(ticks) - sum(ticks[3:5])
+    counters['cpu_total_ticks'] = sum(ticks)
+  except (IOError, OSError, ValueError):
+    pass
+  try:
+    rx_bytes = tx_bytes = 0
+    with open('/proc/net/dev', 'r') as f:
+      for line in f.readlines()[2:]:
+        interface, values = line.split(':', 1)
+        if interface.strip() == 'lo':
+          continue
+        values = values.split()
+        rx_bytes += int(values[0])
+        tx_bytes += int(values[8])
+    counters['net_rx_bytes'] = rx_bytes
+    counters['net_tx_bytes'] = tx_bytes
+  except (IOError, OSError, ValueError, IndexError):
+    pass
+  return counters
+
+
+class HostCounterSampler(object):
+  """Samples host CPU and network counters on a thread while running.
+
+  Each sample describes the interval since the previous one, with the keys
+  available on the host among:
+    elapsed: Seconds since sampling started, at the end of the interval.
+    process_cpu_seconds: CPU time used by this process and its finished
+        children during the interval.
+    host_cpu_percent: Percentage of all CPUs' time the host was busy.
+    net_rx_bytes_per_second, net_tx_bytes_per_second: Rates of bytes received
+        and sent on all non-loopback network interfaces.
+  """
+
+  def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+    self.interval = interval
+    self.samples = []
+    self._stop = threading.Event()
+    self._thread = None
+
+  def _Run(self):
+    start = last_time = time.time()
+    last = _ReadHostCounters()
+    while not self._stop.wait(self.interval):
+      now = time.time()
+      current = _ReadHostCounters()
+      self.samples.append(self._MakeSample(last, current, now - last_time,
+                                           now - start))
+      last, last_time = current, now
+
+  @staticmethod
+  def _MakeSample(last, current, seconds, elapsed):
+    sample = {
+        'elapsed': elapsed,
+        'process_cpu_seconds': current['process_cpu'] - last['process_cpu'],
+    }
+    total_ticks = (current.get('cpu_total_ticks', 0) -
+                   last.get('cpu_total_ticks', 0))
+    if total_ticks > 0:
+      sample['host_cpu_percent'] = 100.0 * (
+          current['cpu_busy_ticks'] - last['cpu_busy_ticks']) / total_ticks
+    for key in ('net_rx_bytes', 'net_tx_bytes'):
+      if key in current and key in last and seconds > 0:
+        sample[key + '_per_second'] = (current[key] - last[key]) / seconds
+    return sample
+
+  def __enter__(self):
+    self._thread = threading.Thread(target=self._Run)
+    self._thread.daemon = True
+    self._thread.start()
+    return self
+
+  def __exit__(self, *unused_exc_info):
+    self._stop.set()
+    self._thread.join()
+
+
+def _GetComparedMetrics(results):
+  """Yields (name, value, higher_is_better) for the metrics in results."""
+  for key, histogram in sorted(results.get('latency_histograms', {}).items()):
+    if histogram:
+      for percentile in ('50', '90'):
+        yield ('latency %s p%s' % (key, percentile),
+               histogram['percentiles'][percentile], False)
+  for phase in CONNECTION_PHASES:
+    histogram = results.get('connection_phase_histograms', {}).get(phase)
+    if histogram:
+      yield ('connection %s p50' % phase, histogram['percentiles']['50'],
+             False)
+  for test_name in _THROUGHPUT_TESTS:
+    if test_name in results:
+      yield ('%s bytes/s' % test_name, results[test_name]['bytes_per_second'],
+             True)
+
+
+def CompareResults(baseline, current,
+                   threshold=DEFAULT_REGRESSION_THRESHOLD):
+  """Compares the metrics present in two sets of perfdiag results.
+
+  Args:
+    baseline: Results dict to compare against.
+    current: Results dict to compare.
+    threshold: Relative change in the worse direction (e.g. 0.1 for 10%) at
+        which a metric is flagged as regressed. Latencies must also have
+        increased by at least a millisecond.
+
+  Returns:
+    List of MetricComparison, in a stable order, for the metrics present in
+    both results.
+  """
+  baseline_metrics = {
+      name: value for name, value, _ in _GetComparedMetrics(
+          UpgradeResults(baseline))
+  }
+  comparisons = []
+  for name, value, higher_is_better in _GetComparedMetrics(
+      UpgradeResults(current)):
+    if name not in baseline_metrics:
+      continue
+    baseline_value = baseline_metrics[name]
+    change = ((value - baseline_value) / float(baseline_value)
+              if baseline_value else None)
+    if higher_is_better:
+      regressed = change is not None and -change > threshold
+    else:
+      regressed = (change is not None and change > threshold and
+                   value - baseline_value > _MIN_LATENCY_REGRESSION)
+    comparisons.append(
+        MetricComparison(name, baseline_value, value, change, higher_is_better,
+                         regressed))
+  return comparisons
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# Copyright 2024 Google LLC. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Local index of object sizes by prefix, used by du --index.
+
+The index records the number and total size of the objects directly under
+each directory (prefix ending in '/') of a bucket, as of the last time that
+directory was listed. Listing a prefix again replaces everything recorded
+beneath it, so that a large bucket can be listed once and then kept current
+by listing only the prefixes that change.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import sqlite3
+
+# Sorts after every character that may follow a prefix, so that the
+# directories beneath prefix p are those in the range [p, p + _PREFIX_END).
+_PREFIX_END = '\U0010ffff'
+
+# How long to wait for another process to release a write lock, in seconds.
+_BUSY_TIMEOUT = 60
+
+_SCHEMA = (
+    # Objects directly under each directory. versions is 1 if noncurrent
+    # object versions were included, 0 otherwise.
+    'CREATE TABLE IF NOT EXISTS directories ('
+    '  bucket TEXT NOT NULL,'
+    '  versions INTEGER NOT NULL,'
+    '  directory TEXT NOT NULL,'
+    '  num_objects INTEGER NOT NULL,'
+    '  num_bytes INTEGER NOT NULL,'
+    '  PRIMARY KEY (bucket, versions, directory)) WITHOUT ROWID',
+    # Prefixes that have been listed, and when. Rows for prefixes beneath a
+    # listed prefix are removed when it is listed again.
+    'CREATE TABLE IF NOT EXISTS listings ('
+    '  bucket TEXT NOT NULL,'
+    '  versions INTEGER NOT NULL,'
+    '  prefix TEXT NOT NULL,'
+    '  listed_at REAL NOT NULL,'
+    '  PRIMARY KEY (bucket, versions, prefix)) WITHOUT ROWID',
+)
+
+# Number and total size of a set of objects.
+DirectorySize = collections.namedtuple('DirectorySize',
+                                       ['num_objects', 'num_bytes'])
+
+
+def GetDirectory(object_name):
+  """Returns the directory of an object name, e.g. 'a/b/' for 'a/b/c'."""
+  return object_name[:object_name.rfind('/') + 1]
+
+
+class PrefixSizeIndex(object):
+  """An on-disk record of object sizes by directory, per bucket."""
+
+  def __init__(self, index_path):
+    """Opens (creating if necessary) the index.
+
+    Args:
+      index_path: Path of the SQLite database file.
+
+    Raises:
+      sqlite3.Error if the index cannot be opened.
+    """
+    self.index_path = index_path
+    self._conn = sqlite3.connect(index_path, timeout=_BUSY_TIMEOUT)
+    self._conn.execute('PRAGMA journal_mode=WAL')
+    with self._conn:
+      for statement in _SCHEMA:
+        self._conn.execute(statement)
+
+  def Close(self):
+    self._conn.close()
+
+  def ReplacePrefix(self, bucket_url, prefix, all_versions, directory_sizes,
+                    listed_at):
+    """Replaces what is recorded beneath a prefix with a new listing.
+
+    Args:
+      bucket_url: Bucket URL string, e.g. 'gs://bucket'.
+      prefix: Prefix that was listed; '' for the whole bucket, otherwise
+          ending in '/'.
+      all_versions: True if the listing included noncurrent object versions.
+      directory_sizes: Dict of directory to DirectorySize for the objects
+          listed.
+      listed_at: Time at which the listing started, in seconds since the
+          epoch.
+    """
+    versions = int(all_versions)
+    subtree = (bucket_url, versions, prefix, prefix + _PREFIX_END)
+    with self._conn:
+      self._conn.execute(
+          'DELETE FROM directories WHERE bucket = ? AND versions = ? AND'
+          ' directory >= ? AND directory < ?', subtree)
+      self._conn.execute(
+          'DELETE FROM listings WHERE bucket = ? AND versions = ? AND'
+          ' prefix >= ? AND prefix < ?', subtree)
+      self._conn.executemany(
+          'INSERT INTO directories VALUES (?, ?, ?, ?, ?)',
+          ((bucket_url, versions, directory, size.num_objects, size.num_bytes)
+           for directory, size in directory_sizes.items()))
+      self._conn.execute('INSERT INTO listings VALUES (?, ?, ?, ?)',
+                         (bucket_url, versions, prefix, listed_at))
+
+  def GetListingTimes(self, bucket_url, prefix, all_versions):
+    """Returns when the objects beneath a prefix were listed.
+
+    Args:
+      bucket_url: Bucket URL string.
+      prefix: Prefix; '' for the whole bucket, otherwise ending in '/'.
+      all_versions: True for sizes including noncurrent object versions.
+
+    Returns:
+      (oldest, newest) listing times in seconds since the epoch, or None if
+      no listing of the prefix or an enclosing prefix is recorded.
+    """
+    versions = int(all_versions)
+    enclosing_times = [
+        listed_at for listed_prefix, listed_at in self._conn.execute(
+            'SELECT prefix, listed_at FROM listings'
+            ' WHERE bucket = ? AND versions = ? AND prefix <= ?', (
+                bucket_url, versions, prefix))
+        if prefix.startswith(listed_prefix)
+    ]
+    if not enclosing_times:
+      return None
+    # Listings recorded beneath an enclosing listing are more recent than it.
+    oldest = max(enclosing_times)
+    newest = self._conn.execute(
+        'SELECT MAX(listed_at) FROM listings WHERE bucket = ? AND'
+        ' versions = ? AND prefix > ? AND prefix < ?',
+        (bucket_url, versions, prefix, prefix + _PREFIX_END)).fetchone()[0]
+    return oldest, max(oldest, newest or oldest)
+
+  def GetTotalSize(self, bucket_url, prefix, all_versions):
+    """Returns the DirectorySize of all objects beneath a prefix."""
+    num_objects, num_bytes = self._conn.execute(
+        'SELECT SUM(num_objects), SUM(num_bytes) FROM directories'
+        ' WHERE bucket = ? AND versions = ? AND directory >= ? AND'
+        ' directory < ?',
+        (bucket_url, int(all_versions), prefix,
+         prefix + _PREFIX_END)).fetchone()
+    return DirectorySize(num_objects or 0, num_bytes or 0)
+
+  def IterDirectorySizes(self, bucket_url, prefix, all_versions):
+    """Yields (directory, DirectorySize) beneath a prefix, sorted by name.
+
+    Sizes count only the objects directly under each directory.
+    """
+    for directory, num_objects, num_bytes in self._conn.execute(
+        'SELECT directory, num_objects, num_bytes FROM directories'
+        ' WHERE bucket = ? AND versions = ? AND directory >= ? AND'
+        ' directory < ? ORDER BY directory',
+        (bucket_url, int(all_versions), prefix, prefix + _PREFIX_END)):
+      yield directory, DirectorySize(num_objects, num_bytes)
+
+  def ListBuckets(self, scheme, all_versions):
+    """Returns the URLs of the indexed buckets for a provider, sorted."""
+    return [
+        row[0] for row in self._conn.execute(
+            'SELECT DISTINCT bucket FROM listings WHERE bucket >= ? AND'
+            ' bucket < ? AND versions = ? ORDER BY bucket',
+            ('%s://' % scheme, '%s://%s' % (scheme, _PREFIX_END),
+             int(all_versions)))
+    ]
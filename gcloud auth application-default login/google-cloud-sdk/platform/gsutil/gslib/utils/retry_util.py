@@ -24,12 +24,38 @@ import time
 
 from apitools.base.py import http_wrapper
 from gslib import thread_message
+from gslib.concurrency_autotuner import RecordRetryableError
 from gslib.utils import constants
 from retry_decorator import retry_decorator
 
 Retry = retry_decorator.retry  # pylint: disable=invalid-name
 
 
+def LogRetryableError(retry_args, status_queue=None):
+  """Logs and records a retryable error before the request is retried.
+
+  If the user has had to wait several seconds since their first request, print
+  a progress message to the terminal to let them know we're still retrying,
+  then post a gslib.thread_message.RetryableErrorMessage to the global status
+  queue.
+
+  Args:
+    retry_args: An apitools ExceptionRetryArgs tuple.
+    status_queue: The global status queue, or None.
+  """
+  if (retry_args.total_wait_sec is not None and
+      retry_args.total_wait_sec >= constants.LONG_RETRY_WARN_SEC):
+    logging.info('Retrying request, attempt #%d...', retry_args.num_retries)
+  RecordRetryableError(retry_args.exc)
+  if status_queue:
+    status_queue.put(
+        thread_message.RetryableErrorMessage(
+            retry_args.exc,
+            time.time(),
+            num_retries=retry_args.num_retries,
+            total_wait_sec=retry_args.total_wait_sec))
+
+
 def LogAndHandleRetries(is_data_transfer=False, status_queue=None):
   """Higher-order function allowing retry handler to access global status queue.
 
@@ -52,16 +78,7 @@ def LogAndHandleRetries(is_data_transfer=False, status_queue=None):
     Args:
       retry_args: An apitools ExceptionRetryArgs tuple.
     """
-    if (retry_args.total_wait_sec is not None and
-        retry_args.total_wait_sec >= constants.LONG_RETRY_WARN_SEC):
-      logging.info('Retrying request, attempt #%d...', retry_args.num_retries)
-    if status_queue:
-      status_queue.put(
-          thread_message.RetryableErrorMessage(
-              retry_args.exc,
-              time.time(),
-              num_retries=retry_args.num_retries,
-              total_wait_sec=retry_args.total_wait_sec))
+    LogRetryableError(retry_args, status_queue=status_queue)
     http_wrapper.HandleExceptionsAndRebuildHttpConnections(retry_args)
 
   def RetriesInDataTransferHandler(retry_args):
@@ -74,6 +91,7 @@ def LogAndHandleRetries(is_data_transfer=False, status_queue=None):
     Args:
       retry_args: An apitools ExceptionRetryArgs tuple.
     """
+    RecordRetryableError(retry_args.exc)
     if status_queue:
       status_queue.put(
           thread_message.RetryableErrorMessage(
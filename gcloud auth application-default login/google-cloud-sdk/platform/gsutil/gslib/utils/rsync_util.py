@@ -19,6 +19,16 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+# Values for the rsync_listing_format boto config option, which selects how
+# rsync writes the sorted source and destination listings it diffs.
+LISTING_FORMAT_BINARY = 'binary'
+LISTING_FORMAT_TEXT = 'text'
+DEFAULT_RSYNC_LISTING_FORMAT = LISTING_FORMAT_BINARY
+
+# Seconds that changes to a watched directory must settle for before rsync
+# --watch synchronizes them.
+DEFAULT_RSYNC_WATCH_DELAY = 1
+
 
 class DiffAction(object):
   """Enum class representing possible actions to take for an rsync diff."""
@@ -19,10 +19,12 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+from datetime import timedelta
 import math
 import re
 
 import six
+from gslib.exception import CommandException
 
 if six.PY3:
   long = int
@@ -138,6 +140,33 @@ def DivideAndCeil(dividend, divisor):
   return quotient
 
 
+def DurationToTimeDelta(duration):
+  r"""Parses the given duration and returns an equivalent timedelta.
+
+  Durations are a number, optionally followed by a unit of d, h (the default),
+  m or s, for example '7d' or '30m'.
+  """
+
+  match = re.match(r'^(\d+)([dDhHmMsS])?$', duration)
+  if not match:
+    raise CommandException('Unable to parse duration string')
+
+  duration, modifier = match.groups('h')
+  duration = int(duration)
+  modifier = modifier.lower()
+
+  if modifier == 'd':
+    ret = timedelta(days=duration)
+  elif modifier == 'h':
+    ret = timedelta(hours=duration)
+  elif modifier == 'm':
+    ret = timedelta(minutes=duration)
+  elif modifier == 's':
+    ret = timedelta(seconds=duration)
+
+  return ret
+
+
 def HumanReadableToBytes(human_string):
   """Tries to convert a human-readable string to a number of bytes.
 
@@ -19,13 +19,17 @@ from __future__ import print_function
 from __future__ import division
 from __future__ import unicode_literals
 
+from concurrent import futures
 import fnmatch
 import glob
 import logging
 import os
 import re
+import stat
 import textwrap
+import threading
 
+from boto import config
 import six
 
 from gslib.bucket_listing_ref import BucketListingBucket
@@ -41,6 +45,8 @@ from gslib.storage_url import StorageUrlFromString
 from gslib.storage_url import StripOneSlash
 from gslib.storage_url import WILDCARD_REGEX
 from gslib.third_party.storage_apitools import storage_v1_messages as apitools_messages
+from gslib.utils.content_type_sniffer import ShouldSniffContentTypes
+from gslib.utils.content_type_sniffer import SniffFileContentType
 from gslib.utils.constants import UTF8
 from gslib.utils.text_util import FixWindowsEncodingIfNeeded
 from gslib.utils.text_util import PrintableStr
@@ -51,6 +57,21 @@ if six.PY3:
 
 FLAT_LIST_REGEX = re.compile(r'(?P<before>.*?)\*\*(?P<after>.*)')
 
+# Number of threads used to list and stat the directories of a local tree
+# during recursive file wildcard iteration. Listing local trees is dominated by
+# filesystem latency (especially on network filesystems), not CPU.
+DEFAULT_LOCAL_LISTING_THREAD_COUNT = 8
+
+# Directory scans each recursive listing keeps outstanding on the listing pool,
+# per listing thread. Scans are started only for the directories iteration
+# reaches next, so memory use doesn't grow with the width of the tree.
+_OUTSTANDING_SCANS_PER_THREAD = 2
+
+# Local listing thread pools, keyed by process id. Shared by all listings in a
+# process.
+_listing_executors = {}
+_listing_executors_lock = threading.Lock()
+
 _UNICODE_EXCEPTION_TEXT = (
     'Invalid Unicode path encountered (%s). gsutil cannot proceed '
     'with such files present. Please remove or rename this file and '
@@ -60,6 +81,24 @@ _UNICODE_EXCEPTION_TEXT = (
     'gsutil-compatible encoding) see `gsutil help encoding`.')
 
 
+def _GetListingExecutor(num_threads):
+  """Returns this process's local listing thread pool, creating it if needed.
+
+  Args:
+    num_threads: Number of threads in the pool, if it has to be created.
+
+  Returns:
+    A futures.ThreadPoolExecutor.
+  """
+  pid = os.getpid()
+  with _listing_executors_lock:
+    executor = _listing_executors.get(pid)
+    if executor is None:
+      executor = _listing_executors[pid] = futures.ThreadPoolExecutor(
+          max_workers=num_threads)
+  return executor
+
+
 class WildcardIterator(object):
   """Class for iterating over Google Cloud Storage strings containing wildcards.
 
@@ -555,7 +594,8 @@ class CloudWildcardIterator(WildcardIterator):
         yield blr
 
 
-def _GetFileObject(filepath):
+def _GetFileObject(filepath, file_stat=None, include_size=True,
+                   content_type=None):
   """Returns an apitools Object class with supported file attributes.
 
   To provide size estimates for local to cloud file copies, we need to retrieve
@@ -563,13 +603,87 @@ def _GetFileObject(filepath):
 
   Args:
     filepath: Path to the file.
+    file_stat: os.stat_result for the file, if already known.
+    include_size: If True, fill in the file's size.
+    content_type: Content type detected from the file's contents, if any.
 
   Returns:
     apitools Object that with file name and size attributes filled-in.
   """
-  # TODO: If we are preserving POSIX attributes, we could instead call
-  # os.stat() here.
-  return apitools_messages.Object(size=os.path.getsize(filepath))
+  size = None
+  if include_size:
+    size = (file_stat.st_size
+            if file_stat is not None else os.path.getsize(filepath))
+  return apitools_messages.Object(size=size, contentType=content_type)
+
+
+def _SniffListedFileContentType(filepath, file_stat, is_symlink):
+  """Detects a listed file's content type, for listings with contentType.
+
+  Args:
+    filepath: Path to the file.
+    file_stat: os.stat_result for the file, following symlinks, or None.
+    is_symlink: True if filepath is a symbolic link.
+
+  Returns:
+    The content type, or None if filepath isn't a regular file (reading a
+    FIFO would block) or couldn't be read, in which case it is detected
+    when the file is copied.
+  """
+  if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
+    return None
+  if is_symlink:
+    # The content type depends on the extension of the link's target.
+    filepath = os.path.realpath(filepath)
+  try:
+    return SniffFileContentType(filepath)
+  except (IOError, OSError):
+    return None
+
+
+def _ScanDirectory(dirpath, wildcard, sniff_content_types=False):
+  """Lists one directory of a local tree, for FileWildcardIterator._IterDir.
+
+  Args:
+    dirpath: Path of the directory to list.
+    wildcard: Pattern that file names must match.
+    sniff_content_types: If True, detect the content types of the files.
+
+  Returns:
+    (subdirs, files), both sorted by name.
+    subdirs: (name, is_symlink) for each entry that is a directory, following
+             symlinks (as os.walk does).
+    files: (name, is_symlink, file_stat, content_type) for each other entry
+           matching wildcard, where file_stat is the entry's os.stat_result,
+           following symlinks, or None if it could not be read (e.g. a broken
+           symlink), and content_type is None unless sniff_content_types.
+  """
+  subdirs = []
+  files = []
+  try:
+    with os.scandir(dirpath) as it:
+      entries = sorted(it, key=lambda entry: entry.name)
+  except OSError:
+    # Like os.walk, skip directories that can't be listed.
+    return subdirs, files
+  for entry in entries:
+    try:
+      is_dir = entry.is_dir()
+    except OSError:
+      is_dir = False
+    if is_dir:
+      subdirs.append((entry.name, entry.is_symlink()))
+    elif fnmatch.fnmatch(entry.name, wildcard):
+      try:
+        file_stat = entry.stat()
+      except OSError:
+        file_stat = None
+      is_symlink = entry.is_symlink()
+      content_type = (_SniffListedFileContentType(entry.path, file_stat,
+                                                  is_symlink)
+                      if sniff_content_types else None)
+      files.append((entry.name, is_symlink, file_stat, content_type))
+  return subdirs, files
 
 
 class FileWildcardIterator(WildcardIterator):
@@ -611,9 +725,10 @@ class FileWildcardIterator(WildcardIterator):
 
     Args:
       bucket_listing_fields: Iterable fields to include in listings.
-          Ex. ['size']. Currently only 'size' is supported.
+          Ex. ['size']. Currently only 'size' and 'contentType' (detected
+          from the file's contents, if use_magicfile is set) are supported.
           If present, will populate yielded BucketListingObject.root_object
-          with the file name and size.
+          with the file size and content type.
 
     Raises:
       WildcardException: if invalid wildcard found.
@@ -621,8 +736,13 @@ class FileWildcardIterator(WildcardIterator):
     Yields:
       BucketListingRef of type OBJECT (for files) or PREFIX (for directories)
     """
-    include_size = (bucket_listing_fields and
-                    'size' in set(bucket_listing_fields))
+    include_size = bool(bucket_listing_fields and
+                        'size' in set(bucket_listing_fields))
+    # Detecting content types from file contents is done here, on the listing
+    # threads, rather than once per file when it is copied.
+    include_content_type = bool(bucket_listing_fields and
+                                'contentType' in set(bucket_listing_fields) and
+                                ShouldSniffContentTypes())
 
     wildcard = self.wildcard_url.object_name
     match = FLAT_LIST_REGEX.match(wildcard)
@@ -643,37 +763,70 @@ class FileWildcardIterator(WildcardIterator):
         remaining_wildcard = '*'
       # Skip slash(es).
       remaining_wildcard = remaining_wildcard.lstrip(os.sep)
-      filepaths = self._IterDir(base_dir, remaining_wildcard)
+      filepaths = self._IterDir(base_dir,
+                                remaining_wildcard,
+                                sniff_content_types=include_content_type)
     else:
       # Not a recursive wildcarding request.
-      filepaths = glob.iglob(wildcard)
-    for filepath in filepaths:
+      filepaths = ((filepath, None, None, None)
+                   for filepath in glob.iglob(wildcard))
+    for filepath, is_symlink, file_stat, content_type in filepaths:
       expanded_url = StorageUrlFromString(filepath)
       try:
-        if self.ignore_symlinks and os.path.islink(filepath):
+        if is_symlink is None:
+          is_symlink = self.ignore_symlinks and os.path.islink(filepath)
+        if self.ignore_symlinks and is_symlink:
           if self.logger:
             self.logger.info('Skipping symbolic link %s...', filepath)
           continue
-        if os.path.isdir(filepath):
+        if file_stat is None:
+          is_dir = os.path.isdir(filepath)
+        else:
+          is_dir = stat.S_ISDIR(file_stat.st_mode)
+        if is_dir:
           yield BucketListingPrefix(expanded_url)
         else:
-          blr_object = _GetFileObject(filepath) if include_size else None
-          yield BucketListingObject(expanded_url, root_object=blr_object)
+          if include_content_type and content_type is None:
+            if file_stat is None:
+              try:
+                file_stat = os.stat(filepath)
+              except OSError:
+                pass
+            content_type = _SniffListedFileContentType(
+                filepath, file_stat, is_symlink or os.path.islink(filepath))
+          blr_object = (_GetFileObject(filepath,
+                                       file_stat,
+                                       include_size=include_size,
+                                       content_type=content_type)
+                        if include_size or content_type else None)
+          yield BucketListingObject(expanded_url,
+                                    root_object=blr_object,
+                                    file_stat=file_stat)
       except UnicodeEncodeError:
         raise CommandException('\n'.join(
             textwrap.wrap(_UNICODE_EXCEPTION_TEXT % repr(filepath))))
 
-  def _IterDir(self, directory, wildcard):
+  def _IterDir(self, directory, wildcard, sniff_content_types=False):
     """An iterator over the specified dir and wildcard.
 
+    Directories are listed top-down in the same order as os.walk, with the
+    entries of each directory sorted by name. Subdirectories are listed and
+    their files stat'ed ahead of iteration on a pool of
+    local_listing_thread_count threads, and the stat results are passed on so
+    that callers needn't stat each file again.
+
     Args:
       directory (unicode): The path of the directory to iterate over.
       wildcard (str): The wildcard characters used for filename pattern
           matching.
+      sniff_content_types (bool): If True, detect the content types of the
+          files on the listing threads.
 
     Yields:
-      (str) A string containing the path to a file somewhere under the directory
-      hierarchy of `directory`.
+      (filepath, is_symlink, file_stat, content_type) for each file somewhere
+      under the directory hierarchy of `directory`, where file_stat is the
+      file's os.stat_result or None if it could not be read, and content_type
+      is the detected content type or None.
 
     Raises:
       ComandException: If this method encounters a file path that it cannot
@@ -688,67 +841,99 @@ class FileWildcardIterator(WildcardIterator):
       # the resulting joined path looks like 'c:\\foo'.
       directory += '\\'
 
-    # UTF8-encode directory before passing it to os.walk() so if there are
-    # non-valid UTF8 chars in the file name (e.g., that can happen if the file
-    # originated on Windows) os.walk() will not attempt to decode and then die
-    # with a "codec can't decode byte" error, and instead we can catch the error
-    # at yield time and print a more informative error message.
-    for dirpath, dirnames, filenames in os.walk(six.ensure_text(directory),
-                                                topdown=True):
-      filtered_dirnames = []
-
-      for dirname in dirnames:
-        full_dir_path = os.path.join(dirpath, dirname)
-        # Removes directories in place to prevent them and their children from
-        # being iterated. See https://docs.python.org/3/library/os.html#os.walk
-        if not self._ExcludeDir(full_dir_path):
-          filtered_dirnames.append(dirname)
+    num_threads = config.getint('GSUtil', 'local_listing_thread_count',
+                                DEFAULT_LOCAL_LISTING_THREAD_COUNT)
+    executor = _GetListingExecutor(num_threads) if num_threads > 1 else None
+    max_outstanding_scans = num_threads * _OUTSTANDING_SCANS_PER_THREAD
+    # Scans started on the pool and not yet consumed, by directory path.
+    scans = {}
+
+    def _StartScans():
+      """Starts scans for the directories at the top of the pending stack."""
+      if not executor:
+        return
+      for dirpath in reversed(pending[-max_outstanding_scans:]):
+        if len(scans) >= max_outstanding_scans:
+          break
+        if dirpath not in scans:
+          scans[dirpath] = executor.submit(_ScanDirectory, dirpath, wildcard,
+                                           sniff_content_types)
+
+    # Pass directory as text so that if there are non-valid UTF8 chars in the
+    # file name (e.g., that can happen if the file originated on Windows) the
+    # listing will not attempt to decode and then die with a "codec can't
+    # decode byte" error, and instead we can catch the error at yield time and
+    # print a more informative error message.
+    # Stack of directories still to be iterated, in reverse order. The pool
+    # works ahead of iteration on the directories that will be reached next.
+    pending = [six.ensure_text(directory)]
+    _StartScans()
+    try:
+      while pending:
+        dirpath = pending.pop()
+        scan = scans.pop(dirpath, None)
+        if scan:
+          subdirs, files = scan.result()
         else:
-          # If a symlink is excluded above we don't want to print 2 messages.
-          continue
-        # This only prints a log message as os.walk() will not, by default,
-        # walk down into symbolic links that resolve to directories.
-        if self.logger and os.path.islink(full_dir_path):
-          self.logger.info('Skipping symlink directory "%s"', full_dir_path)
-
-      dirnames[:] = filtered_dirnames
-
-      for f in fnmatch.filter(filenames, wildcard):
-        try:
-          yield os.path.join(dirpath, FixWindowsEncodingIfNeeded(f))
-        except UnicodeDecodeError:
-          # Note: We considered several ways to deal with this, but each had
-          # problems:
-          # 1. Raise an exception and try to catch in a higher layer (the
-          #    gsutil cp command), so we can properly support the gsutil cp -c
-          #    option. That doesn't work because raising an exception during
-          #    iteration terminates the generator.
-          # 2. Accumulate a list of bad filenames and skip processing each
-          #    during iteration, then raise at the end, with exception text
-          #    printing the bad paths. That doesn't work because iteration is
-          #    wrapped in PluralityCheckableIterator, so it's possible there
-          #    are not-yet-performed copy operations at the time we reach the
-          #    end of the iteration and raise the exception - which would cause
-          #    us to skip copying validly named files. Moreover, the gsutil
-          #    cp command loops over argv, so if you run the command gsutil cp
-          #    -rc dir1 dir2 gs://bucket, an invalid unicode name inside dir1
-          #    would cause dir2 never to be visited.
-          # 3. Print the invalid pathname and skip it during iteration. That
-          #    would work but would mean gsutil cp could exit with status 0
-          #    even though some files weren't copied.
-          # 4. Change the WildcardIterator to include an error status along with
-          #    the result. That would solve the problem but would be a
-          #    substantial change (WildcardIterator is used in many parts of
-          #    gsutil), and we didn't feel that magnitude of change was
-          #    warranted by this relatively uncommon corner case.
-          # Instead we chose to abort when one such file is encountered, and
-          # require the user to remove or rename the files and try again.
-          raise CommandException('\n'.join(
-              textwrap.wrap(_UNICODE_EXCEPTION_TEXT %
-                            repr(os.path.join(dirpath, f)))))
+          subdirs, files = _ScanDirectory(dirpath, wildcard,
+                                          sniff_content_types)
+
+        walk_dirs = []
+        for dirname, is_symlink in subdirs:
+          full_dir_path = os.path.join(dirpath, dirname)
+          if self._ExcludeDir(full_dir_path):
+            continue
+          if is_symlink:
+            # Like os.walk, don't walk down into symbolic links that resolve
+            # to directories.
+            if self.logger:
+              self.logger.info('Skipping symlink directory "%s"', full_dir_path)
+            continue
+          walk_dirs.append(full_dir_path)
+        pending.extend(reversed(walk_dirs))
+        _StartScans()
+
+        for f, is_symlink, file_stat, content_type in files:
+          try:
+            yield (os.path.join(dirpath, FixWindowsEncodingIfNeeded(f)),
+                   is_symlink, file_stat, content_type)
+          except UnicodeDecodeError:
+            # Note: We considered several ways to deal with this, but each had
+            # problems:
+            # 1. Raise an exception and try to catch in a higher layer (the
+            #    gsutil cp command), so we can properly support the gsutil cp
+            #    -c option. That doesn't work because raising an exception
+            #    during iteration terminates the generator.
+            # 2. Accumulate a list of bad filenames and skip processing each
+            #    during iteration, then raise at the end, with exception text
+            #    printing the bad paths. That doesn't work because iteration is
+            #    wrapped in PluralityCheckableIterator, so it's possible there
+            #    are not-yet-performed copy operations at the time we reach the
+            #    end of the iteration and raise the exception - which would
+            #    cause us to skip copying validly named files. Moreover, the
+            #    gsutil cp command loops over argv, so if you run the command
+            #    gsutil cp -rc dir1 dir2 gs://bucket, an invalid unicode name
+            #    inside dir1 would cause dir2 never to be visited.
+            # 3. Print the invalid pathname and skip it during iteration. That
+            #    would work but would mean gsutil cp could exit with status 0
+            #    even though some files weren't copied.
+            # 4. Change the WildcardIterator to include an error status along
+            #    with the result. That would solve the problem but would be a
+            #    substantial change (WildcardIterator is used in many parts of
+            #    gsutil), and we didn't feel that magnitude of change was
+            #    warranted by this relatively uncommon corner case.
+            # Instead we chose to abort when one such file is encountered, and
+            # require the user to remove or rename the files and try again.
+            raise CommandException('\n'.join(
+                textwrap.wrap(_UNICODE_EXCEPTION_TEXT %
+                              repr(os.path.join(dirpath, f)))))
+    finally:
+      # Iteration may stop early; don't run scans nobody will read.
+      for scan in scans.values():
+        scan.cancel()
 
   def _ExcludeDir(self, dir):
-    """Check a directory to see if it should be excluded from os.walk.
+    """Check a directory to see if it should be excluded from iteration.
 
     Args:
       dir: String representing the directory to check.
@@ -776,9 +961,10 @@ class FileWildcardIterator(WildcardIterator):
 
     Args:
       bucket_listing_fields: Iterable fields to include in listings.
-          Ex. ['size']. Currently only 'size' is supported.
+          Ex. ['size']. Currently only 'size' and 'contentType' (detected
+          from the file's contents, if use_magicfile is set) are supported.
           If present, will populate yielded BucketListingObject.root_object
-          with the file name and size.
+          with the file size and content type.
 
     Yields:
       BucketListingRefs of type OBJECT or empty iterator if no matches.
@@ -794,9 +980,10 @@ class FileWildcardIterator(WildcardIterator):
 
     Args:
       bucket_listing_fields: Iterable fields to include in listings.
-          Ex. ['size']. Currently only 'size' is supported.
+          Ex. ['size']. Currently only 'size' and 'contentType' (detected
+          from the file's contents, if use_magicfile is set) are supported.
           If present, will populate yielded BucketListingObject.root_object
-          with the file name and size.
+          with the file size and content type.
       expand_top_level_buckets: Ignored; filesystems don't have buckets.
 
     Yields:
@@ -154,6 +154,10 @@ except ImportError:
 def RunMain():
   _fix_google_module()
   # pylint: disable=g-import-not-at-top
+  import gslib.daemon
+  exit_code = gslib.daemon.HandleDaemonInvocation(sys.argv)
+  if exit_code is not None:
+    sys.exit(exit_code)
   import gslib.__main__
   sys.exit(gslib.__main__.main())
 